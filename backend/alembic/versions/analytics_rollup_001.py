@@ -0,0 +1,40 @@
+"""Create analytics_rollup
+
+Day and month buckets of the admin analytics counters (item/shop views,
+clicks, devices, geography) with HyperLogLog sketches of unique users and
+guests, filled incrementally from the "admin_analytics" watermark by
+app/services/analytics_rollup_service.py. The first run starts at the
+oldest tracked event, so existing history is backfilled by the job.
+
+Revision ID: analytics_rollup_001
+Revises: seller_event_rollup_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'analytics_rollup_001'
+down_revision = 'seller_event_rollup_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analytics_rollup',
+        sa.Column('granularity', sa.String(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('metric', sa.String(), nullable=False),
+        sa.Column('dim', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('users', sa.LargeBinary(), nullable=True),
+        sa.Column('guests', sa.LargeBinary(), nullable=True),
+        sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'metric', 'dim')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_rollup')
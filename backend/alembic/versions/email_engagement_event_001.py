@@ -0,0 +1,48 @@
+"""Create email_engagement_event
+
+Append-only open/click hits for tracked emails (see
+app/services/email_engagement.py), replacing the "hits" list the tracking
+endpoints kept rewriting inside EmailLog.metadata_json. The unique
+(tracking_token, action, hit_key) index makes a repeated hit within the
+dedupe window a no-op even when Redis is unavailable.
+
+Hits already stored in metadata_json are left where they are.
+
+Revision ID: email_engagement_event_001
+Revises: analytics_rollup_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'email_engagement_event_001'
+down_revision = 'analytics_rollup_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'email_engagement_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tracking_token', sa.String(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('hit_key', sa.String(), nullable=False),
+        sa.Column('ip', sa.String(), nullable=True),
+        sa.Column('user_agent', sa.String(), nullable=True),
+        sa.Column('redirect_url', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tracking_token', 'action', 'hit_key')
+    )
+    op.create_index(
+        op.f('ix_email_engagement_event_created_at'), 'email_engagement_event', ['created_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_email_engagement_event_created_at'), table_name='email_engagement_event')
+    op.drop_table('email_engagement_event')
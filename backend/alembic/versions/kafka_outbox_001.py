@@ -0,0 +1,42 @@
+"""Create kafka_outbox
+
+Fallback storage for domain events the API could not hand to Kafka (see
+app/services/kafka_producer.py). Rows are replayed in id order once the
+broker is reachable again and deleted as they are delivered, so the table
+is normally empty.
+
+Revision ID: kafka_outbox_001
+Revises: email_engagement_event_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'kafka_outbox_001'
+down_revision = 'email_engagement_event_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'kafka_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('topic', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=True),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('event_type', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_kafka_outbox_created_at'), 'kafka_outbox', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_kafka_outbox_created_at'), table_name='kafka_outbox')
+    op.drop_table('kafka_outbox')
@@ -0,0 +1,41 @@
+"""Add a JSONB GIN index over listing.attributes for facet filtering
+
+Attribute filters are JSONB containment tests on attributes::jsonb (see
+app/services/facet_service.py); jsonb_path_ops keeps the index small and
+serves exactly the @> operator. The indexed expression must stay the same
+cast the queries use.
+
+Revision ID: listing_attributes_001
+Revises: listing_search_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'listing_attributes_001'
+down_revision = 'listing_search_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_listing_attributes_jsonb "
+        "ON listing USING gin ((attributes::jsonb) jsonb_path_ops)"
+    )
+
+    # Facet definitions: attributes of a category in sort order
+    op.create_index(
+        'ix_category_attribute_category_sort',
+        'category_attribute',
+        ['category_id', 'sort_order'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_category_attribute_category_sort', table_name='category_attribute')
+    op.execute("DROP INDEX IF EXISTS ix_listing_attributes_jsonb")
@@ -0,0 +1,50 @@
+"""Create listing_image_hash for near-duplicate image lookup
+
+One row per listing photo pHash, split into four indexed 16-bit bands
+for multi-index Hamming-distance search (app/services/image_hash_index.py).
+Existing listings are indexed by `python -m app.cli.backfill_image_hashes`
+after upgrading.
+
+Revision ID: listing_image_hash_001
+Revises: listing_attributes_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'listing_image_hash_001'
+down_revision = 'listing_attributes_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'listing_image_hash',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('listing_id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('phash', sa.BigInteger(), nullable=False),
+        sa.Column('band_0', sa.Integer(), nullable=False),
+        sa.Column('band_1', sa.Integer(), nullable=False),
+        sa.Column('band_2', sa.Integer(), nullable=False),
+        sa.Column('band_3', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['listing_id'], ['listing.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_listing_image_hash_listing_id', 'listing_image_hash', ['listing_id'])
+    op.create_index('ix_listing_image_hash_owner_id', 'listing_image_hash', ['owner_id'])
+    for band in range(4):
+        op.create_index(f'ix_listing_image_hash_band_{band}', 'listing_image_hash', [f'band_{band}'])
+
+
+def downgrade() -> None:
+    for band in reversed(range(4)):
+        op.drop_index(f'ix_listing_image_hash_band_{band}', table_name='listing_image_hash')
+    op.drop_index('ix_listing_image_hash_owner_id', table_name='listing_image_hash')
+    op.drop_index('ix_listing_image_hash_listing_id', table_name='listing_image_hash')
+    op.drop_table('listing_image_hash')
@@ -0,0 +1,27 @@
+"""Add image_variants to listing
+
+Responsive renditions generated by the image pipeline, keyed by the
+original image URL (see app/services/image_pipeline.py).
+
+Revision ID: listing_image_variants_001
+Revises: listing_image_hash_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'listing_image_variants_001'
+down_revision = 'listing_image_hash_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('listing', sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('listing', 'image_variants')
@@ -0,0 +1,39 @@
+"""Add a composite index backing keyset pagination of listing search
+
+/search/listings/search without a query browses active listings by a
+keyset cursor over (boost_level, created_at, id) DESC, all listing
+columns, so this index lets Postgres seek straight to the cursor position
+instead of sorting and discarding every earlier row.
+
+The public feed and "my listings" also page by keyset, but their order
+interleaves the owner's trust_score / is_verified, which no index on
+listing can cover, so they still sort the matching rows on every page.
+
+Revision ID: listing_keyset_001
+Revises: broadcast_job_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'listing_keyset_001'
+down_revision = 'broadcast_job_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Search browse: WHERE status = 'active' ORDER BY boost/created/id DESC
+    op.create_index(
+        'ix_listing_feed_keyset',
+        'listing',
+        ['status', sa.text('boost_level DESC'), sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_listing_feed_keyset', table_name='listing')
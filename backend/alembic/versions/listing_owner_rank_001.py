@@ -0,0 +1,48 @@
+"""Copy the owner's ranking signals onto listing and index the feed order
+
+The public feed and "my listings" rank by (boost_level, owner trust_score,
+created_at, owner is_verified, id) DESC. With the two owner columns living
+on "user", no index could serve that order, so every page sorted all the
+matching rows. listing.owner_trust_score / owner_is_verified now carry
+copies (kept in step by crud_listing.sync_owner_ranking), so the whole
+sort key is on listing and ix_listing_feed_rank serves the keyset seek.
+
+Revision ID: listing_owner_rank_001
+Revises: view_flush_batch_001
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'listing_owner_rank_001'
+down_revision = 'view_flush_batch_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('listing', sa.Column('owner_trust_score', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('listing', sa.Column('owner_is_verified', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute(
+        'UPDATE listing l '
+        'SET owner_trust_score = COALESCE(u.trust_score, 0), owner_is_verified = COALESCE(u.is_verified, false) '
+        'FROM "user" u WHERE u.id = l.owner_id'
+    )
+    op.create_index(
+        'ix_listing_feed_rank',
+        'listing',
+        [
+            sa.text('boost_level DESC'), sa.text('owner_trust_score DESC'), sa.text('created_at DESC'),
+            sa.text('owner_is_verified DESC'), sa.text('id DESC'),
+        ],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_listing_feed_rank', table_name='listing')
+    op.drop_column('listing', 'owner_is_verified')
+    op.drop_column('listing', 'owner_trust_score')
@@ -0,0 +1,120 @@
+"""Add a stored, weighted search_vector and trigram indexes to listing
+
+listing.search_vector holds the full-text document every listing search
+matches and ranks against (app/services/search_service.py):
+
+    A  title_en (english) + title_so (simple)
+    B  category / subcategory / subsubcategory names
+    C  description_en (english) + description_so (simple)
+
+It is maintained by a BEFORE INSERT/UPDATE trigger on listing, and a
+rename of any category level re-touches the listings filed under it so
+their vectors pick up the new name. Somali text has no stemmer in
+Postgres, so it goes in with the 'simple' config and is additionally
+covered by pg_trgm indexes for substring and typo-tolerant matching.
+
+Revision ID: listing_search_001
+Revises: shop_stats_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'listing_search_001'
+down_revision = 'shop_stats_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.add_column('listing', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION listing_search_vector_update() RETURNS trigger AS $$
+        DECLARE
+            category_names text;
+        BEGIN
+            SELECT concat_ws(' ', c.name_en, c.name_so, s.name_en, s.name_so, ss.name_en, ss.name_so)
+              INTO category_names
+              FROM (SELECT 1) AS one
+              LEFT JOIN category c ON c.id = NEW.category_id
+              LEFT JOIN subcategory s ON s.id = NEW.subcategory_id
+              LEFT JOIN subsubcategory ss ON ss.id = NEW.subsubcategory_id;
+
+            NEW.search_vector :=
+                setweight(to_tsvector('english', coalesce(NEW.title_en, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(NEW.title_so, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(category_names, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(NEW.description_en, '')), 'C') ||
+                setweight(to_tsvector('simple', coalesce(NEW.description_so, '')), 'C');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER listing_search_vector_trg
+        BEFORE INSERT OR UPDATE OF title_en, title_so, description_en, description_so,
+                                   category_id, subcategory_id, subsubcategory_id
+        ON listing
+        FOR EACH ROW EXECUTE PROCEDURE listing_search_vector_update()
+    """)
+
+    # Category renames: a no-op SET on the FK column fires the listing
+    # trigger above for just the affected rows.
+    for table, fk in (
+        ('category', 'category_id'),
+        ('subcategory', 'subcategory_id'),
+        ('subsubcategory', 'subsubcategory_id'),
+    ):
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_search_rename() RETURNS trigger AS $$
+            BEGIN
+                UPDATE listing SET {fk} = {fk} WHERE {fk} = NEW.id;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_search_rename_trg
+            AFTER UPDATE OF name_en, name_so ON {table}
+            FOR EACH ROW
+            WHEN (OLD.name_en IS DISTINCT FROM NEW.name_en OR OLD.name_so IS DISTINCT FROM NEW.name_so)
+            EXECUTE PROCEDURE {table}_search_rename()
+        """)
+
+    # Backfill existing rows through the trigger
+    op.execute("UPDATE listing SET title_en = title_en")
+
+    op.create_index(
+        'ix_listing_search_vector', 'listing', ['search_vector'],
+        unique=False, postgresql_using='gin'
+    )
+
+    # Trigram indexes: typo-tolerant title matching (word_similarity <%)
+    # and indexable ILIKE '%q%' on the Somali text
+    for column in ('title_en', 'title_so', 'description_so'):
+        op.create_index(
+            f'ix_listing_{column}_trgm', 'listing', [column],
+            unique=False, postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    for column in ('description_so', 'title_so', 'title_en'):
+        op.drop_index(f'ix_listing_{column}_trgm', table_name='listing')
+    op.drop_index('ix_listing_search_vector', table_name='listing')
+
+    for table in ('subsubcategory', 'subcategory', 'category'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_search_rename_trg ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS {table}_search_rename()")
+    op.execute("DROP TRIGGER IF EXISTS listing_search_vector_trg ON listing")
+    op.execute("DROP FUNCTION IF EXISTS listing_search_vector_update()")
+
+    op.drop_column('listing', 'search_vector')
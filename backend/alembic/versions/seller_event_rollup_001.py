@@ -0,0 +1,65 @@
+"""Create seller_event_rollup and rollup_watermark, backfill from analytics_event
+
+Daily per-seller event counts for the seller analytics dashboard (see
+app/services/analytics_service.py). Every completed day is rolled up here
+and the "seller_events" watermark set to the start of today, so dashboards
+read rollups from the first request after the upgrade.
+
+Also adds (seller_id, created_at) on analytics_event for the live tail and
+the GROUP BY fallback, which both filter on a seller's recent events.
+
+Revision ID: seller_event_rollup_001
+Revises: listing_image_variants_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'seller_event_rollup_001'
+down_revision = 'listing_image_variants_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'seller_event_rollup',
+        sa.Column('seller_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('event_type', sa.String(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['seller_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('seller_id', 'day', 'event_type', 'source')
+    )
+    op.create_table(
+        'rollup_watermark',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('rolled_until', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.create_index(
+        'ix_analytics_event_seller_id_created_at', 'analytics_event', ['seller_id', 'created_at']
+    )
+
+    op.execute("""
+        INSERT INTO seller_event_rollup (seller_id, day, event_type, source, count)
+        SELECT seller_id, CAST(created_at AS date), event_type, COALESCE(source, 'direct'), COUNT(*)
+        FROM analytics_event
+        WHERE created_at < CAST(CAST(now() AT TIME ZONE 'utc' AS date) AS timestamp)
+        GROUP BY 1, 2, 3, 4
+    """)
+    op.execute("""
+        INSERT INTO rollup_watermark (name, rolled_until, updated_at)
+        VALUES ('seller_events', CAST(CAST(now() AT TIME ZONE 'utc' AS date) AS timestamp), now())
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analytics_event_seller_id_created_at', table_name='analytics_event')
+    op.drop_table('rollup_watermark')
+    op.drop_table('seller_event_rollup')
@@ -0,0 +1,30 @@
+"""Add persisted, unique shop_slug to user
+
+Backs O(log n) lookup in GET /listings/shops/{slug}, which previously
+loaded every shop and normalized each name in Python. Existing shops are
+filled by `python -m app.cli.backfill_shop_slugs` after upgrading.
+
+Revision ID: shop_slug_001
+Revises: listing_keyset_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'shop_slug_001'
+down_revision = 'listing_keyset_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('shop_slug', sa.String(), nullable=True))
+    op.create_index('ix_user_shop_slug', 'user', ['shop_slug'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_shop_slug', table_name='user')
+    op.drop_column('user', 'shop_slug')
@@ -0,0 +1,74 @@
+"""Create shop_stats table and seed it from existing listings
+
+Per-shop listing aggregates for the public and admin shop directories,
+maintained by app/services/shop_stats_service.py. Seeded here so the
+directories have rows for every existing shop immediately.
+
+Revision ID: shop_stats_001
+Revises: shop_slug_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'shop_stats_001'
+down_revision = 'shop_slug_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'shop_stats',
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('active_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sold_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('deleted_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('latest_listing_at', sa.DateTime(), nullable=True),
+        sa.Column('primary_category_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['owner_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['primary_category_id'], ['category.id'], ),
+        sa.PrimaryKeyConstraint('owner_id')
+    )
+    op.create_index('ix_shop_stats_active_count', 'shop_stats', ['active_count'])
+    op.create_index('ix_shop_stats_primary_category_id', 'shop_stats', ['primary_category_id'])
+
+    op.execute("""
+        INSERT INTO shop_stats (owner_id, total_count, active_count, pending_count,
+                                sold_count, deleted_count, latest_listing_at,
+                                primary_category_id, updated_at)
+        WITH per_category AS (
+            SELECT owner_id, category_id, COUNT(*) AS cnt
+            FROM listing WHERE status = 'active'
+            GROUP BY owner_id, category_id
+        ),
+        primary_category AS (
+            SELECT DISTINCT ON (owner_id) owner_id, category_id
+            FROM per_category
+            ORDER BY owner_id, cnt DESC, category_id
+        )
+        SELECT l.owner_id,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE l.status = 'active'),
+               COUNT(*) FILTER (WHERE l.status = 'pending'),
+               COUNT(*) FILTER (WHERE l.status = 'sold'),
+               COUNT(*) FILTER (WHERE l.status = 'deleted'),
+               MAX(l.created_at) FILTER (WHERE l.status = 'active'),
+               pc.category_id,
+               now()
+        FROM listing l
+        LEFT JOIN primary_category pc ON pc.owner_id = l.owner_id
+        GROUP BY l.owner_id, pc.category_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_shop_stats_primary_category_id', table_name='shop_stats')
+    op.drop_index('ix_shop_stats_active_count', table_name='shop_stats')
+    op.drop_table('shop_stats')
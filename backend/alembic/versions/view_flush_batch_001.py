@@ -0,0 +1,36 @@
+"""Create view_flush_batch
+
+Markers for write-behind view-counter batches already applied (see
+app/services/view_counter_service.py), so a flush retried after a crash
+skips them instead of counting the views twice. Markers older than a week
+are pruned by the flush itself.
+
+Revision ID: view_flush_batch_001
+Revises: kafka_outbox_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'view_flush_batch_001'
+down_revision = 'kafka_outbox_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'view_flush_batch',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('flushed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_view_flush_batch_flushed_at'), 'view_flush_batch', ['flushed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_view_flush_batch_flushed_at'), table_name='view_flush_batch')
+    op.drop_table('view_flush_batch')
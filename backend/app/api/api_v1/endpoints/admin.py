@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile,
 from sqlmodel import Session, select, func
 from pydantic import BaseModel
 from app.api import deps
+from app.crud.crud_listing import sync_owner_ranking
 from app.models.listing import Listing, Category, ListingRead
 from app.models.user import User, UserResponse
 from app.models.promotion import Promotion, PromotionStatus
@@ -13,6 +14,9 @@ from app.models.message import Message
 from app.models.marketplace_conversation import MarketplaceConversation as Conversation
 from app.services.storage_service import storage_service
 from app.services.cache_service import cache
+from app.services.shop_slug_service import assign_shop_slug, commit_shop_rename
+from app.services.shop_stats_service import refresh_shop_stats
+from app.services.admin_stats_service import get_admin_stats
 
 # Try importing Seller from routers (Phase 4)
 try:
@@ -156,95 +160,20 @@ def list_all_orders(db: Session = Depends(deps.get_db)) -> Any:
 def read_admin_stats(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_superuser),
+    max_staleness: Optional[int] = Query(
+        None, ge=0, description="Refresh first if the snapshot is older than this many seconds (0 = always)"
+    ),
 ) -> Any:
     """
-    Platform-wide stats for the admin dashboard's Management Overview.
-    Sellers are defined the same way the rest of the app already does (a
-    business_name set), matching get_public_shops -- there's no separate
-    is_seller flag on User.
+    Platform-wide stats for the admin dashboard's Management Overview,
+    served from the snapshot kept by app/services/admin_stats_service.py.
     """
-    from datetime import datetime, timedelta
-    from app.models.verification import VerificationRequest, VerificationStatus
-    from app.models.report import ListingReport
-
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = now - timedelta(days=7)
-    month_start = now - timedelta(days=30)
-    prev_month_start = now - timedelta(days=60)
-
-    total_users = db.exec(select(func.count(User.id))).one()
-    active_users = db.exec(select(func.count(User.id)).where(User.is_active == True)).one()  # noqa: E712
-    suspended_accounts = db.exec(select(func.count(User.id)).where(User.is_suspended == True)).one()  # noqa: E712
-
-    is_seller = User.business_name.isnot(None)
-    active_sellers = db.exec(select(func.count(User.id)).where(is_seller, User.is_active == True)).one()  # noqa: E712
-    active_buyers = max(active_users - active_sellers, 0)
-    verified_sellers = db.exec(select(func.count(User.id)).where(is_seller, User.is_verified == True)).one()  # noqa: E712
-
-    total_shops = db.exec(
-        select(func.count(func.distinct(Listing.owner_id)))
-        .select_from(Listing)
-        .join(User, User.id == Listing.owner_id)
-        .where(Listing.status == "active", User.is_verified == True)  # noqa: E712
-    ).one()
-
-    total_listings = db.exec(select(func.count(Listing.id))).one()
-    active_listings = db.exec(select(func.count(Listing.id)).where(Listing.status == "active")).one()
-    pending_listings = db.exec(select(func.count(Listing.id)).where(Listing.status == "pending")).one()
-    pending_promotions = db.exec(select(func.count(Promotion.id)).where(Promotion.status == PromotionStatus.SUBMITTED)).one()
-
-    pending_seller_verifications = db.exec(
-        select(func.count(VerificationRequest.id)).where(VerificationRequest.status == VerificationStatus.PENDING)
-    ).one()
-
-    reported_listings = db.exec(
-        select(func.count(func.distinct(ListingReport.listing_id))).where(ListingReport.status == "pending")
-    ).one()
-    open_disputes = db.exec(select(func.count(ListingReport.id)).where(ListingReport.status == "pending")).one()
-
-    new_signups_today = db.exec(select(func.count(User.id)).where(User.created_at >= today_start)).one()
-    new_signups_week = db.exec(select(func.count(User.id)).where(User.created_at >= week_start)).one()
-    new_signups_month = db.exec(select(func.count(User.id)).where(User.created_at >= month_start)).one()
-
-    signups_this_month = new_signups_month
-    signups_prev_month = db.exec(
-        select(func.count(User.id)).where(User.created_at >= prev_month_start, User.created_at < month_start)
-    ).one()
-    growth_rate = (
-        round((signups_this_month - signups_prev_month) / signups_prev_month * 100, 1)
-        if signups_prev_month else (100.0 if signups_this_month else 0.0)
-    )
-
-    listings_today = db.exec(select(func.count(Listing.id)).where(Listing.created_at >= today_start)).one()
-    messages_today = db.exec(
-        select(func.count(Message.id)).where(Message.created_at >= today_start)
-    ).one()
+    from datetime import datetime
 
+    snapshot = get_admin_stats(db, max_staleness=max_staleness)
     return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "active_sellers": active_sellers,
-        "active_buyers": active_buyers,
-        "total_shops": total_shops,
-        "total_listings": total_listings,
-        "active_listings": active_listings,
-        "pending_listings": pending_listings,
-        "pending_promotions": pending_promotions,
-        "verified_sellers": verified_sellers,
-        "pending_seller_verifications": pending_seller_verifications,
-        "suspended_accounts": suspended_accounts,
-        "reported_listings": reported_listings,
-        "open_disputes": open_disputes,
-        "new_signups_today": new_signups_today,
-        "new_signups_this_week": new_signups_week,
-        "new_signups_this_month": new_signups_month,
-        "new_users_this_week": new_signups_week,  # legacy key the dashboard already read
-        "platform_growth_rate": growth_rate,
-        "marketplace_activity": {
-            "listings_posted_today": listings_today,
-            "messages_sent_today": messages_today,
-        },
+        **snapshot["stats"],
+        "computed_at": datetime.utcfromtimestamp(snapshot["computed_at"]).isoformat(),
     }
 
 
@@ -283,6 +212,11 @@ def moderate_listing(
     db.commit()
     db.refresh(listing)
 
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception:
+        pass
+
     # Push notification to listing owner
     from app.utils.push import send_push_to_user
     if approve:
@@ -866,6 +800,13 @@ def delete_user_admin(
     except Exception:
         pass
 
+    # 23. Shop directory stats
+    try:
+        with db.begin_nested():
+            db.exec(text("DELETE FROM shop_stats WHERE owner_id = :uid").bindparams(uid=user_id))
+    except Exception:
+        pass
+
     # 18. Finally delete the user
     db.delete(user)
 
@@ -1113,8 +1054,7 @@ def read_email_analytics(
     Get highly performant, enterprise-grade Email Growth Engine analytics.
     Reports campaign CTRs, regional engagement, and onboarding funnel conversion rates.
     """
-    from app.models.email_log import EmailLog
-    import json
+    from app.models.email_log import EmailLog, EmailEngagementEvent
 
     # 1. Aggregate Campaign CTRs using DB Grouping
     group_stats = db.exec(
@@ -1161,30 +1101,18 @@ def read_email_analytics(
         "activation_conversion_ratio": f"{(first_action_sent / welcome_opened * 100):.1f}%" if welcome_opened > 0 else "0.0%"
     }
 
-    # 3. Analyze Regional Engagement from Hit Metadata
-    metadata_logs = db.exec(
-        select(EmailLog.metadata_json)
-        .where(EmailLog.metadata_json != None)
-        .limit(1000)
+    # 3. Analyze Regional Engagement from the latest open/click hits
+    hit_ips = db.exec(
+        select(EmailEngagementEvent.ip).order_by(EmailEngagementEvent.id.desc()).limit(1000)
     ).all()
 
     regional_hits = {}
-    total_tracked_hits = 0
-    for meta_str in metadata_logs:
-        if not meta_str:
-            continue
-        try:
-            meta = json.loads(meta_str)
-            for hit in meta.get("hits", []):
-                total_tracked_hits += 1
-                ip = hit.get("ip", "unknown")
-                # Group by IP segment to simulate geographical region clusters
-                ip_segment = ".".join(ip.split(".")[:2]) if "." in ip else "unknown"
-                if ip_segment not in regional_hits:
-                    regional_hits[ip_segment] = 0
-                regional_hits[ip_segment] += 1
-        except Exception:
-            continue
+    total_tracked_hits = len(hit_ips)
+    for ip in hit_ips:
+        ip = ip or "unknown"
+        # Group by IP segment to simulate geographical region clusters
+        ip_segment = ".".join(ip.split(".")[:2]) if "." in ip else "unknown"
+        regional_hits[ip_segment] = regional_hits.get(ip_segment, 0) + 1
 
     # Return top engagement regions
     sorted_regions = sorted(regional_hits.items(), key=lambda x: x[1], reverse=True)[:5]
@@ -1458,26 +1386,20 @@ def update_shop_details(
 
         if details_data.business_name is not None:
             user.business_name = details_data.business_name
+            assign_shop_slug(db, user)
 
         if details_data.full_name is not None:
             user.full_name = details_data.full_name
 
-        db.add(user)
-        db.commit()
+        commit_shop_rename(db, user)
         db.refresh(user)
 
         # Sync sellers table with updated shop data
         sync_seller_profile(db, user.id, user.full_name, user.business_name)
 
-        # Invalidate cache for this shop
-        try:
-            cache.delete(f"admin:shop:{user_id}")
-            # Also clear paginated list caches since shop name may have changed order
-            for skip in range(0, 1000, 24):
-                cache.delete(f"admin:shops:{skip}:24")
-            cache.delete("admin:shops:0:500")
-        except Exception:
-            pass
+        # Invalidate this shop's detail entry and every shop list page
+        # (the name change may reorder them)
+        cache.invalidate_tags(f"owner:{user_id}", "shops")
 
         return {
             "id": user.id,
@@ -1485,6 +1407,8 @@ def update_shop_details(
             "business_name": user.business_name,
             "message": "Shop details updated successfully"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -1623,25 +1547,17 @@ def get_all_shops(
         # what's transferred here. The edit modal fetches the full value
         # via GET /shops/{id} when it actually needs to render the image.
         query = text("""
-            WITH listing_stats AS (
-                SELECT
-                    l.owner_id,
-                    COUNT(l.id) AS total_listings,
-                    COUNT(CASE WHEN l.status = 'active' THEN 1 END) AS active_listings
-                FROM listing l
-                GROUP BY l.owner_id
-            )
             SELECT u.id, u.email, u.full_name, u.business_name, u.created_at,
                    LEFT(COALESCE(s.shop_page_banner, u.shop_page_banner), 200) as shop_page_banner,
                    LEFT(COALESCE(s.shop_detail_banner, u.shop_detail_banner), 200) as shop_detail_banner,
                    u.shop_description, u.logo_url, u.is_featured, u.free_delivery,
                    u.is_verified, u.is_active, u.location,
-                   COALESCE(ls.total_listings, 0) AS total_listings,
-                   COALESCE(ls.active_listings, 0) AS active_listings,
+                   COALESCE(ss.total_count, 0) AS total_listings,
+                   COALESCE(ss.active_count, 0) AS active_listings,
                    u.phone, u.is_suspended, u.trust_score
             FROM "user" u
             LEFT JOIN sellers s ON s.user_id = CAST(u.id AS VARCHAR)
-            LEFT JOIN listing_stats ls ON ls.owner_id = u.id
+            LEFT JOIN shop_stats ss ON ss.owner_id = u.id
             WHERE u.business_name IS NOT NULL
             ORDER BY u.created_at DESC
             LIMIT :limit OFFSET :skip
@@ -1651,10 +1567,7 @@ def get_all_shops(
 
         shops = []
         for row in result:
-            import unicodedata as _ud
             _name = row[3] or row[2] or ''
-            _norm = _ud.normalize('NFKD', _name).encode('ascii', 'ignore').decode('ascii')
-            _slug = ''.join(c for c in _norm.lower() if c.isalnum()) or f'shop{row[0]}'
             shop = ShopRead(
                 id=row[0],
                 email=row[1],
@@ -1680,7 +1593,7 @@ def get_all_shops(
 
         # Cache for 10 minutes
         try:
-            cache.set(cache_key, json.dumps([shop.dict() for shop in shops], default=str), ttl=600)
+            cache.set(cache_key, json.dumps([shop.dict() for shop in shops], default=str), ttl=600, tags=["shops"])
         except Exception:
             pass
 
@@ -1732,7 +1645,7 @@ def get_shop(
 
         # Cache for 15 minutes
         try:
-            cache.set(cache_key, json.dumps(result.dict(), default=str), ttl=900)
+            cache.set(cache_key, json.dumps(result.dict(), default=str), ttl=900, tags=[f"owner:{shop_id}"])
         except Exception:
             pass
 
@@ -1800,6 +1713,7 @@ def update_shop(
         # Update fields if provided
         if shop_data.business_name is not None:
             shop.business_name = shop_data.business_name
+            assign_shop_slug(db, shop)
         if shop_data.shop_description is not None:
             shop.shop_description = shop_data.shop_description
         if shop_data.logo_url is not None:
@@ -1814,31 +1728,21 @@ def update_shop(
             shop.is_featured = shop_data.is_featured
         if shop_data.is_verified is not None:
             shop.is_verified = shop_data.is_verified
+            sync_owner_ranking(db, shop)
         if shop_data.free_delivery is not None:
             shop.free_delivery = shop_data.free_delivery
         if shop_data.is_active is not None:
             shop.is_active = shop_data.is_active
 
-        db.add(shop)
-        db.commit()
+        commit_shop_rename(db, shop)
         db.refresh(shop)
 
         # Sync sellers table with updated shop data (including banners)
         sync_seller_profile(db, shop.id, shop.full_name, shop.business_name,
                           shop.shop_page_banner, shop.shop_detail_banner)
 
-        # Invalidate cache for this shop
-        try:
-            cache.delete(f"admin:shop:{shop_id}")
-            # Also clear paginated list caches since shop data has changed
-            for skip in range(0, 1000, 24):
-                cache.delete(f"admin:shops:{skip}:24")
-            cache.delete("admin:shops:0:500")
-            # Clear public shops cache as well
-            for skip in range(0, 1000, 24):
-                cache.delete(f"public_shops:{skip}:24:all")
-        except Exception:
-            pass
+        # Invalidate this shop's detail entry plus admin and public shop lists
+        cache.invalidate_tags(f"owner:{shop_id}", "shops")
 
         return ShopRead(
             id=shop.id,
@@ -1887,14 +1791,8 @@ def delete_shop_banner(
         db.commit()
         db.refresh(shop)
 
-        # Invalidate cache for this shop
-        try:
-            cache.delete(f"admin:shop:{shop_id}")
-            # Clear paginated caches
-            for skip in range(0, 1000, 24):
-                cache.delete(f"admin:shops:{skip}:24")
-        except Exception:
-            pass
+        # Invalidate this shop's detail entry and the shop lists
+        cache.invalidate_tags(f"owner:{shop_id}", "shops")
 
         return {"message": f"{banner_type} banner deleted successfully"}
     except HTTPException:
@@ -1921,17 +1819,8 @@ def delete_shop_logo(
         db.commit()
         db.refresh(shop)
 
-        # Invalidate cache for this shop
-        try:
-            cache.delete(f"admin:shop:{shop_id}")
-            # Clear paginated caches
-            for skip in range(0, 1000, 24):
-                cache.delete(f"admin:shops:{skip}:24")
-            # Clear public shops cache
-            for skip in range(0, 1000, 24):
-                cache.delete(f"public_shops:{skip}:24:all")
-        except Exception:
-            pass
+        # Invalidate this shop's detail entry plus admin and public shop lists
+        cache.invalidate_tags(f"owner:{shop_id}", "shops")
 
         return {"message": "Shop logo deleted successfully"}
     except HTTPException:
@@ -1981,9 +1870,12 @@ def update_user_admin(
         for field, value in update_data.items():
             if hasattr(user, field):
                 setattr(user, field, value)
+        if "trust_score" in update_data or "is_verified" in update_data:
+            sync_owner_ranking(db, user)
+        if "business_name" in update_data:
+            assign_shop_slug(db, user)
 
-        db.add(user)
-        db.commit()
+        commit_shop_rename(db, user)
         db.refresh(user)
         return user
     except HTTPException:
@@ -2036,15 +1928,15 @@ async def update_shop_name(
         # Update business name
         old_name = user.business_name
         user.business_name = data.business_name.strip()
+        assign_shop_slug(db, user)
 
-        db.add(user)
-        db.commit()
+        commit_shop_rename(db, user)
         db.refresh(user)
 
         # Invalidate cache for this user
         cache.delete(f"user:{user_id}")
         cache.delete(f"user_listings:{user_id}")
-        cache.delete("all_shops")
+        cache.invalidate_tags(f"owner:{user_id}", "shops")
 
         return {
             "success": True,
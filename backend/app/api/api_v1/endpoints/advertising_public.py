@@ -12,6 +12,7 @@ from app.models.advertising import (
     AdvertisementStatus,
     BannerStatus,
 )
+from app.services.analytics_ingest import analytics_ingest
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/advertising", tags=["advertising-public"])
@@ -194,34 +195,19 @@ def check_shop_featured(
 # Analytics Tracking Endpoints
 # ============================================================================
 
-@router.post("/banners/{banner_id}/impression")
+@router.post("/banners/{banner_id}/impression", status_code=202)
 def track_banner_impression(
     *,
-    db: Session = Depends(deps.get_db),
     banner_id: int,
 ) -> Any:
     """
     Track an impression for a homepage banner.
-    Called when the banner is displayed on the homepage.
+    Called when the banner is displayed on the homepage. Impressions are
+    summed per banner and applied in batches; unknown banners are dropped
+    at that point.
     """
-    stats = db.exec(
-        select(HomepageBannerStats).where(HomepageBannerStats.banner_id == banner_id)
-    ).first()
-
-    if not stats:
-        # Create stats record if it doesn't exist
-        banner = db.get(HomepageBanner, banner_id)
-        if not banner:
-            raise HTTPException(status_code=404, detail="Banner not found")
-
-        stats = HomepageBannerStats(banner_id=banner_id, impressions=1)
-        db.add(stats)
-    else:
-        stats.impressions += 1
-        stats.updated_at = datetime.utcnow()
-
-    db.commit()
-    return {"success": True, "impressions": stats.impressions}
+    analytics_ingest.count_banner_impression(banner_id)
+    return {"success": True}
 
 
 @router.post("/banners/{banner_id}/click")
@@ -254,41 +240,17 @@ def track_banner_click(
     return {"success": True, "clicks": stats.clicks}
 
 
-@router.post("/listings/{listing_id}/impression")
+@router.post("/listings/{listing_id}/impression", status_code=202)
 def track_listing_impression(
     *,
-    db: Session = Depends(deps.get_db),
     listing_id: int,
 ) -> Any:
     """
     Track an impression for a featured product advertisement.
+    Counted against the listing's active advertisement when the batch is
+    applied; impressions of listings without one are dropped then.
     """
-    from app.models.advertising import Advertisement
-
-    now = datetime.utcnow()
-
-    ad = db.exec(
-        select(Advertisement)
-        .where(
-            Advertisement.listing_id == listing_id,
-            Advertisement.status == AdvertisementStatus.ACTIVE,
-            Advertisement.end_date > now,
-        )
-    ).first()
-
-    if not ad:
-        return {"success": False, "message": "No active advertisement for this listing"}
-
-    stats = db.exec(
-        select(AdvertisementStats).where(AdvertisementStats.advertisement_id == ad.id)
-    ).first()
-
-    if stats:
-        stats.impressions += 1
-        stats.updated_at = datetime.utcnow()
-        db.add(stats)
-        db.commit()
-
+    analytics_ingest.count_listing_ad_impression(listing_id)
     return {"success": True}
 
 
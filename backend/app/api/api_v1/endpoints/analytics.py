@@ -7,62 +7,77 @@ from typing import Any, List, Optional
 from app.api import deps
 from app.models.analytics import ItemView, ShopView
 from app.models.user import User
+from app.services.analytics_ingest import analytics_ingest
+from app.services.analytics_rollup_service import (
+    CLICKS,
+    GEO_CITIES,
+    GEO_COUNTRIES,
+    ITEM_VIEW_DEVICES,
+    ITEM_VIEWS,
+    SHOP_CLICKS,
+    SHOP_VIEW_DEVICES,
+    SHOP_VIEWS,
+    rollup_counts,
+    rollup_unique_counts,
+    split_geo_city,
+)
 
 router = APIRouter()
 
 
-@router.post("/track/item-view")
+def _user_names(db: Session, user_ids: List[int]) -> dict:
+    """full_name by user id, for labelling rollup rankings."""
+    if not user_ids:
+        return {}
+    return dict(db.exec(select(User.id, User.full_name).where(User.id.in_(user_ids))).all())
+
+
+@router.post("/track/item-view", status_code=202)
 def track_item_view(
     *,
-    db: Session = Depends(deps.get_db),
     listing_id: int,
     time_spent_seconds: int = 0,
     device_type: Optional[str] = None,
     referrer: Optional[str] = None,
     request: Request,
-    current_user: Optional[User] = Depends(deps.get_current_user),
+    user_id: Optional[int] = Depends(deps.get_current_user_id_optional),
 ) -> Any:
-    """Track when a user/guest views an item listing."""
-    item_view = ItemView(
+    """Track when a user/guest views an item listing (written in the next batch)."""
+    item_view = analytics_ingest.track(
+        ItemView,
         listing_id=listing_id,
-        user_id=current_user.id if current_user else None,
+        user_id=user_id,
         device_type=device_type,
         ip_address=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
         time_spent_seconds=time_spent_seconds,
         referrer=referrer,
     )
-    db.add(item_view)
-    db.commit()
-    db.refresh(item_view)
-    return {"status": "ok", "view_id": item_view.id}
+    return {"status": "ok", "view_id": item_view["id"]}
 
 
-@router.post("/track/shop-view")
+@router.post("/track/shop-view", status_code=202)
 def track_shop_view(
     *,
-    db: Session = Depends(deps.get_db),
     shop_owner_id: int,
     time_spent_seconds: int = 0,
     device_type: Optional[str] = None,
     referrer: Optional[str] = None,
     request: Request,
-    current_user: Optional[User] = Depends(deps.get_current_user),
+    user_id: Optional[int] = Depends(deps.get_current_user_id_optional),
 ) -> Any:
-    """Track when a user/guest views a shop profile."""
-    shop_view = ShopView(
+    """Track when a user/guest views a shop profile (written in the next batch)."""
+    shop_view = analytics_ingest.track(
+        ShopView,
         shop_owner_id=shop_owner_id,
-        user_id=current_user.id if current_user else None,
+        user_id=user_id,
         device_type=device_type,
         ip_address=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
         time_spent_seconds=time_spent_seconds,
         referrer=referrer,
     )
-    db.add(shop_view)
-    db.commit()
-    db.refresh(shop_view)
-    return {"status": "ok", "view_id": shop_view.id}
+    return {"status": "ok", "view_id": shop_view["id"]}
 
 
 @router.get("/admin/top-items")
@@ -73,44 +88,32 @@ def get_top_items(
     days: int = Query(7, ge=1, le=90),
     limit: int = Query(20, ge=1, le=100),
 ) -> Any:
-    """Get top viewed items for admin dashboard."""
+    """Get top viewed items for admin dashboard (unique counts are estimates)."""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-
     # Get top items by view count
     from app.models.listing import Listing
-    
-    statement = (
-        select(
-            ItemView.listing_id,
-            Listing.title_en,
-            func.count(ItemView.id).label("view_count"),
-            func.count(func.distinct(ItemView.user_id)).label("unique_users"),
-            func.count(func.distinct(ItemView.ip_address)).label("unique_guests"),
-        )
-        .join(Listing, ItemView.listing_id == Listing.id)
-        .where(ItemView.viewed_at >= cutoff_date)
-        .group_by(ItemView.listing_id, Listing.title_en)
-        .order_by(func.count(ItemView.id).desc())
-        .limit(limit)
-    )
 
-    results = db.exec(statement).all()
+    ranked = rollup_counts(db, ITEM_VIEWS, days, limit=limit)
+    uniques = rollup_unique_counts(db, ITEM_VIEWS, days, [dim for dim, _ in ranked])
+    listing_ids = [int(dim) for dim, _ in ranked]
+    titles = dict(db.exec(
+        select(Listing.id, Listing.title_en).where(Listing.id.in_(listing_ids))
+    ).all()) if listing_ids else {}
 
     return {
         "period_days": days,
         "items": [
             {
-                "listing_id": r[0],
-                "listing_title": r[1] or f"Listing #{r[0]}",
-                "view_count": r[2],
-                "unique_users": r[3],
-                "unique_guests": r[4],
-                "total_unique_visitors": r[3] + r[4],
+                "listing_id": int(dim),
+                "listing_title": titles.get(int(dim)) or f"Listing #{dim}",
+                "view_count": count,
+                "unique_users": uniques[dim][0],
+                "unique_guests": uniques[dim][1],
+                "total_unique_visitors": uniques[dim][0] + uniques[dim][1],
             }
-            for r in results
+            for dim, count in ranked
         ]
     }
 
@@ -123,42 +126,27 @@ def get_top_shops(
     days: int = Query(7, ge=1, le=90),
     limit: int = Query(20, ge=1, le=100),
 ) -> Any:
-    """Get top viewed shops for admin dashboard."""
+    """Get top viewed shops for admin dashboard (unique counts are estimates)."""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-
     # Get top shops by view count
-    statement = (
-        select(
-            ShopView.shop_owner_id,
-            User.full_name,
-            func.count(ShopView.id).label("view_count"),
-            func.count(func.distinct(ShopView.user_id)).label("unique_users"),
-            func.count(func.distinct(ShopView.ip_address)).label("unique_guests"),
-        )
-        .join(User, ShopView.shop_owner_id == User.id)
-        .where(ShopView.viewed_at >= cutoff_date)
-        .group_by(ShopView.shop_owner_id, User.full_name)
-        .order_by(func.count(ShopView.id).desc())
-        .limit(limit)
-    )
-
-    results = db.exec(statement).all()
+    ranked = rollup_counts(db, SHOP_VIEWS, days, limit=limit)
+    uniques = rollup_unique_counts(db, SHOP_VIEWS, days, [dim for dim, _ in ranked])
+    names = _user_names(db, [int(dim) for dim, _ in ranked])
 
     return {
         "period_days": days,
         "shops": [
             {
-                "shop_owner_id": r[0],
-                "shop_owner_name": r[1] or f"Shop #{r[0]}",
-                "view_count": r[2],
-                "unique_users": r[3],
-                "unique_guests": r[4],
-                "total_unique_visitors": r[3] + r[4],
+                "shop_owner_id": int(dim),
+                "shop_owner_name": names.get(int(dim)) or f"Shop #{dim}",
+                "view_count": count,
+                "unique_users": uniques[dim][0],
+                "unique_guests": uniques[dim][1],
+                "total_unique_visitors": uniques[dim][0] + uniques[dim][1],
             }
-            for r in results
+            for dim, count in ranked
         ]
     }
 
@@ -326,86 +314,80 @@ def get_shop_stats(
     }
 
 
-@router.post("/track/search")
+@router.post("/track/search", status_code=202)
 def track_search(
     *,
-    db: Session = Depends(deps.get_db),
     query: str,
     result_count: int = 0,
     device_type: Optional[str] = None,
     category_filter: Optional[str] = None,
     location_filter: Optional[str] = None,
     request: Request,
-    current_user: Optional[User] = Depends(deps.get_current_user),
+    user_id: Optional[int] = Depends(deps.get_current_user_id_optional),
 ) -> Any:
     """Track search queries for marketplace analytics."""
     from app.models.analytics import SearchEvent
     
-    search_event = SearchEvent(
+    analytics_ingest.track(
+        SearchEvent,
         query=query,
         result_count=result_count,
-        user_id=current_user.id if current_user else None,
+        user_id=user_id,
         device_type=device_type,
         ip_address=request.client.host if request.client else None,
         category_filter=category_filter,
         location_filter=location_filter,
     )
-    db.add(search_event)
-    db.commit()
     return {"status": "ok"}
 
 
-@router.post("/track/click")
+@router.post("/track/click", status_code=202)
 def track_click(
     *,
-    db: Session = Depends(deps.get_db),
     event_type: str,
     listing_id: Optional[int] = None,
     shop_id: Optional[int] = None,
     device_type: Optional[str] = None,
     request: Request,
-    current_user: Optional[User] = Depends(deps.get_current_user),
+    user_id: Optional[int] = Depends(deps.get_current_user_id_optional),
 ) -> Any:
     """Track user clicks (chat, call, favorite, etc.)."""
     from app.models.analytics import ClickEvent
     
-    click_event = ClickEvent(
+    analytics_ingest.track(
+        ClickEvent,
         event_type=event_type,
         listing_id=listing_id,
         shop_id=shop_id,
-        user_id=current_user.id if current_user else None,
+        user_id=user_id,
         device_type=device_type,
         ip_address=request.client.host if request.client else None,
     )
-    db.add(click_event)
-    db.commit()
     return {"status": "ok"}
 
 
-@router.post("/track/conversion")
+@router.post("/track/conversion", status_code=202)
 def track_conversion(
     *,
-    db: Session = Depends(deps.get_db),
     stage: str,
     listing_id: Optional[int] = None,
     shop_id: Optional[int] = None,
     device_type: Optional[str] = None,
     request: Request,
-    current_user: Optional[User] = Depends(deps.get_current_user),
+    user_id: Optional[int] = Depends(deps.get_current_user_id_optional),
 ) -> Any:
     """Track conversion funnel events."""
     from app.models.analytics import ConversionFunnelEvent
     
-    event = ConversionFunnelEvent(
+    analytics_ingest.track(
+        ConversionFunnelEvent,
         stage=stage,
         listing_id=listing_id,
         shop_id=shop_id,
-        user_id=current_user.id if current_user else None,
+        user_id=user_id,
         device_type=device_type,
         ip_address=request.client.host if request.client else None,
     )
-    db.add(event)
-    db.commit()
     return {"status": "ok"}
 
 
@@ -617,24 +599,11 @@ def get_conversion_funnel(
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    from app.models.analytics import ItemView, ClickEvent
-    
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-
-    # Stage counts
-    views = db.exec(
-        select(func.count(ItemView.id)).where(ItemView.viewed_at >= cutoff_date)
-    ).one() or 1
-
-    clicks = db.exec(
-        select(func.count(ClickEvent.id)).where(ClickEvent.clicked_at >= cutoff_date)
-    ).one() or 0
-
-    chats = db.exec(
-        select(func.count(ClickEvent.id)).where(
-            ClickEvent.event_type == 'chat', ClickEvent.clicked_at >= cutoff_date
-        )
-    ).one() or 0
+    # Stage counts (views across all device types, clicks across all click types)
+    views = sum(count for _, count in rollup_counts(db, ITEM_VIEW_DEVICES, days)) or 1
+    clicks_by_type = dict(rollup_counts(db, CLICKS, days))
+    clicks = sum(clicks_by_type.values())
+    chats = clicks_by_type.get("chat", 0)
 
     return {
         "period_days": days,
@@ -741,74 +710,40 @@ def get_geographic_analytics(
     days: int = Query(7, ge=1, le=90),
     limit: int = Query(20, ge=1, le=100),
 ) -> Any:
-    """Get visitor analytics by city/country with map coordinates."""
+    """Get visitor analytics by city/country with map coordinates (unique counts are estimates)."""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    from app.models.analytics import GeographicEvent
-
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-
     # Visitors by city
-    city_stats = db.exec(
-        select(
-            GeographicEvent.city,
-            GeographicEvent.latitude,
-            GeographicEvent.longitude,
-            GeographicEvent.country,
-            func.count(GeographicEvent.id).label("visitor_count"),
-            func.count(func.distinct(GeographicEvent.user_id)).label("unique_users"),
-        )
-        .where(
-            GeographicEvent.created_at >= cutoff_date,
-            GeographicEvent.city.isnot(None),
-        )
-        .group_by(
-            GeographicEvent.city,
-            GeographicEvent.latitude,
-            GeographicEvent.longitude,
-            GeographicEvent.country,
-        )
-        .order_by(func.count(GeographicEvent.id).desc())
-        .limit(limit)
-    ).all()
+    city_stats = rollup_counts(db, GEO_CITIES, days, limit=limit)
+    city_uniques = rollup_unique_counts(db, GEO_CITIES, days, [dim for dim, _ in city_stats])
 
     # Visitors by country
-    country_stats = db.exec(
-        select(
-            GeographicEvent.country,
-            func.count(GeographicEvent.id).label("visitor_count"),
-            func.count(func.distinct(GeographicEvent.user_id)).label("unique_users"),
-        )
-        .where(
-            GeographicEvent.created_at >= cutoff_date,
-            GeographicEvent.country.isnot(None),
-        )
-        .group_by(GeographicEvent.country)
-        .order_by(func.count(GeographicEvent.id).desc())
-        .limit(limit)
-    ).all()
+    country_stats = rollup_counts(db, GEO_COUNTRIES, days, limit=limit)
+    country_uniques = rollup_unique_counts(db, GEO_COUNTRIES, days, [dim for dim, _ in country_stats])
+
+    cities = []
+    for dim, count in city_stats:
+        city, country, latitude, longitude = split_geo_city(dim)
+        cities.append({
+            "city": city,
+            "latitude": latitude,
+            "longitude": longitude,
+            "country": country,
+            "visitor_count": count,
+            "unique_users": city_uniques[dim][0],
+        })
 
     return {
         "period_days": days,
-        "cities": [
-            {
-                "city": c[0],
-                "latitude": c[1],
-                "longitude": c[2],
-                "country": c[3],
-                "visitor_count": c[4],
-                "unique_users": c[5],
-            }
-            for c in city_stats
-        ],
+        "cities": cities,
         "countries": [
             {
-                "country": c[0],
-                "visitor_count": c[1],
-                "unique_users": c[2],
+                "country": dim,
+                "visitor_count": count,
+                "unique_users": country_uniques[dim][0],
             }
-            for c in country_stats
+            for dim, count in country_stats
         ],
     }
 
@@ -905,31 +840,11 @@ def get_device_analytics(
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    from app.models.analytics import ItemView, ShopView
-
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-
-    # Device distribution for views
-    device_dist = db.exec(
-        select(
-            ItemView.device_type,
-            func.count(ItemView.id).label("count"),
-        )
-        .where(ItemView.viewed_at >= cutoff_date, ItemView.device_type.isnot(None))
-        .group_by(ItemView.device_type)
-        .order_by(func.count(ItemView.id).desc())
-    ).all()
+    # Device distribution for views ("" = device type not reported)
+    device_dist = rollup_counts(db, ITEM_VIEW_DEVICES, days, exclude_dims=[""])
 
     # Shop views by device
-    shop_device_dist = db.exec(
-        select(
-            ShopView.device_type,
-            func.count(ShopView.id).label("count"),
-        )
-        .where(ShopView.viewed_at >= cutoff_date, ShopView.device_type.isnot(None))
-        .group_by(ShopView.device_type)
-        .order_by(func.count(ShopView.id).desc())
-    ).all()
+    shop_device_dist = rollup_counts(db, SHOP_VIEW_DEVICES, days, exclude_dims=[""])
 
     total_views = sum(d[1] for d in device_dist) or 1
 
@@ -966,56 +881,13 @@ def get_seller_rankings(
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    from app.models.analytics import ShopView, ClickEvent
-    from app.models.user import User as UserModel
-
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-
     if metric == "views":
-        results = db.exec(
-            select(
-                ShopView.shop_owner_id,
-                UserModel.full_name,
-                func.count(ShopView.id).label("metric_value"),
-            )
-            .join(UserModel, ShopView.shop_owner_id == UserModel.id)
-            .where(ShopView.viewed_at >= cutoff_date)
-            .group_by(ShopView.shop_owner_id, UserModel.full_name)
-            .order_by(func.count(ShopView.id).desc())
-            .limit(limit)
-        ).all()
+        results = rollup_counts(db, SHOP_VIEWS, days, limit=limit)
     elif metric == "chats":
-        results = db.exec(
-            select(
-                ClickEvent.shop_id,
-                UserModel.full_name,
-                func.count(ClickEvent.id).label("metric_value"),
-            )
-            .join(UserModel, ClickEvent.shop_id == UserModel.id)
-            .where(
-                ClickEvent.event_type == "chat",
-                ClickEvent.clicked_at >= cutoff_date,
-            )
-            .group_by(ClickEvent.shop_id, UserModel.full_name)
-            .order_by(func.count(ClickEvent.id).desc())
-            .limit(limit)
-        ).all()
+        results = rollup_counts(db, SHOP_CLICKS, days, splits=["chat"], limit=limit)
     else:  # conversions
-        results = db.exec(
-            select(
-                ClickEvent.shop_id,
-                UserModel.full_name,
-                func.count(ClickEvent.id).label("metric_value"),
-            )
-            .join(UserModel, ClickEvent.shop_id == UserModel.id)
-            .where(
-                ClickEvent.event_type.in_(["chat", "whatsapp", "call"]),
-                ClickEvent.clicked_at >= cutoff_date,
-            )
-            .group_by(ClickEvent.shop_id, UserModel.full_name)
-            .order_by(func.count(ClickEvent.id).desc())
-            .limit(limit)
-        ).all()
+        results = rollup_counts(db, SHOP_CLICKS, days, splits=["chat", "whatsapp", "call"], limit=limit)
+    names = _user_names(db, [int(dim) for dim, _ in results])
 
     return {
         "metric": metric,
@@ -1023,11 +895,11 @@ def get_seller_rankings(
         "rankings": [
             {
                 "rank": idx + 1,
-                "shop_id": r[0],
-                "shop_name": r[1] or f"Shop #{r[0]}",
-                "value": r[2],
+                "shop_id": int(dim),
+                "shop_name": names.get(int(dim)) or f"Shop #{dim}",
+                "value": value,
             }
-            for idx, r in enumerate(results)
+            for idx, (dim, value) in enumerate(results)
         ],
     }
 
@@ -2,6 +2,8 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from app.api import deps
+from app.services.cache_service import cache
+from app.services.facet_service import FACETS_TAG
 from app.models.attribute import Attribute, AttributeCreate, AttributeUpdate, AttributeRead
 from app.models.attribute_group import AttributeGroup, AttributeGroupCreate, AttributeGroupRead
 from app.models.attribute_option import AttributeOption, AttributeOptionCreate, AttributeOptionRead
@@ -102,6 +104,7 @@ def update_attribute(
 
     db.add(attribute)
     db.commit()
+    cache.invalidate_tags(FACETS_TAG)
     db.refresh(attribute)
     return attribute
 
@@ -119,6 +122,7 @@ def delete_attribute(
 
     db.delete(attribute)
     db.commit()
+    cache.invalidate_tags(FACETS_TAG)
     return {"ok": True}
 
 
@@ -154,6 +158,7 @@ def create_attribute_option(
     option = AttributeOption.from_orm(option_in)
     db.add(option)
     db.commit()
+    cache.invalidate_tags(FACETS_TAG)
     db.refresh(option)
     return option
 
@@ -172,4 +177,5 @@ def delete_attribute_option(
 
     db.delete(option)
     db.commit()
+    cache.invalidate_tags(FACETS_TAG)
     return {"ok": True}
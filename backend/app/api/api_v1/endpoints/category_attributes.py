@@ -2,6 +2,8 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from app.api import deps
+from app.services.cache_service import cache
+from app.services.facet_service import FACETS_TAG
 from app.models.category_attribute import CategoryAttribute, CategoryAttributeCreate, CategoryAttributeRead
 from app.models.subcategory_attribute import SubcategoryAttribute, SubcategoryAttributeCreate, SubcategoryAttributeRead
 
@@ -45,6 +47,7 @@ def assign_attribute_to_category(
     cat_attr = CategoryAttribute.from_orm(assignment)
     db.add(cat_attr)
     db.commit()
+    cache.invalidate_tags(FACETS_TAG)
     db.refresh(cat_attr)
     return cat_attr
 
@@ -69,6 +72,7 @@ def remove_attribute_from_category(
 
     db.delete(assignment)
     db.commit()
+    cache.invalidate_tags(FACETS_TAG)
     return {"ok": True}
 
 
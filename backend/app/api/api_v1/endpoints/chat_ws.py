@@ -3,12 +3,12 @@ WebSocket endpoint for real-time chat (messages, typing indicators, presence).
 """
 import uuid
 import logging
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from datetime import datetime
 from typing import Optional, Dict, Set
 
 from app.api import deps
+from app.db.session import AsyncSessionLocal
 from app.models.user import User
 from app.crud.crud_message import crud_message
 
@@ -29,7 +29,6 @@ typing_status: Dict[tuple, bool] = {}
 async def websocket_chat_endpoint(
     websocket: WebSocket,
     token: str = Query(...),
-    db: Session = Depends(deps.get_db),
 ):
     """
     WebSocket endpoint for real-time chat.
@@ -37,9 +36,12 @@ async def websocket_chat_endpoint(
     """
     connection_id = str(uuid.uuid4())
 
-    # Authenticate user from token
+    # Authenticate user from token. The session is only held for this
+    # lookup: a Depends(get_db) session would stay checked out of the pool
+    # for as long as the socket is open
     try:
-        current_user = deps.get_current_user_from_token(token, db)
+        async with AsyncSessionLocal() as db:
+            current_user = await db.run_sync(lambda session: deps.get_current_user_from_token(token, session))
         if not current_user:
             await websocket.close(code=4001, reason="Unauthorized")
             return
@@ -72,10 +74,10 @@ async def websocket_chat_endpoint(
                     # Reply with the other user's *current* status immediately --
                     # presence broadcasts only cover status changes from here on,
                     # so without this the requester has no idea until it changes.
-                    await websocket.send_json({
+                    manager.send_to_connection(connection_id, {
                         "event_type": "presence",
                         "user_id": other_user_id,
-                        "status": "online" if manager.is_user_online(str(other_user_id)) else "offline",
+                        "status": "online" if await manager.is_user_online(str(other_user_id)) else "offline",
                         "timestamp": datetime.utcnow().isoformat(),
                     })
 
@@ -150,12 +152,12 @@ async def websocket_chat_endpoint(
 
     except WebSocketDisconnect:
         await manager.disconnect(str(user_id), connection_id)
-        if not manager.is_user_online(str(user_id)):
+        if not await manager.is_user_online(str(user_id)):
             await manager.send_presence_update(str(user_id), status="offline")
         logger.info(f"User {user_id} WebSocket disconnected")
 
     except Exception as e:
         logger.error(f"WebSocket error for user {user_id}: {e}")
         await manager.disconnect(str(user_id), connection_id)
-        if not manager.is_user_online(str(user_id)):
+        if not await manager.is_user_online(str(user_id)):
             await manager.send_presence_update(str(user_id), status="offline")
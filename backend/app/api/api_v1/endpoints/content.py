@@ -1,5 +1,5 @@
 from typing import Any, List, Dict
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from sqlmodel import Session
 from app.api import deps
 from app.crud import crud_content
@@ -111,95 +111,32 @@ def read_system_version() -> Any:
 
 
 @router.get("/email/track-open")
-def track_email_open(token: str, request: Request, db: Session = Depends(deps.get_db)) -> Any:
+def track_email_open(token: str, request: Request, background_tasks: BackgroundTasks) -> Any:
     """
     Tracks email open rate via a transparent pixel.
-    Captures IP, User Agent, and handles duplicate opens safely without double-triggering.
+    The pixel goes out straight away; the hit (IP, User Agent) is recorded
+    afterwards, deduplicated, without rewriting the EmailLog row each time.
     """
-    from app.models.email_log import EmailLog
-    from datetime import datetime
-    import base64
     from fastapi.responses import Response
-    import json
+    from app.services.email_engagement import OPEN, TRACKING_PIXEL_GIF, record_hit
 
     client_ip = request.client.host if request.client else "unknown"
     user_agent = request.headers.get("user-agent", "unknown")
-
-    log_entry = db.query(EmailLog).filter(EmailLog.tracking_token == token).first()
-    if log_entry:
-        # Check current status and update opened timestamp if not already opened/clicked
-        meta = {}
-        if log_entry.metadata_json:
-            try:
-                meta = json.loads(log_entry.metadata_json)
-            except Exception:
-                meta = {}
-        
-        # Track active hits and IPs in metadata list
-        if "hits" not in meta:
-            meta["hits"] = []
-        meta["hits"].append({
-            "timestamp": datetime.utcnow().isoformat(),
-            "ip": client_ip,
-            "user_agent": user_agent,
-            "action": "open"
-        })
-        log_entry.metadata_json = json.dumps(meta)
-
-        if log_entry.status not in ["opened", "clicked", "unsubscribed"]:
-            log_entry.status = "opened"
-            log_entry.opened_at = datetime.utcnow()
-        
-        db.add(log_entry)
-        db.commit()
-
-    # Tiny 1x1 transparent GIF
-    pixel_data = base64.b64decode(b"R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
-    return Response(content=pixel_data, media_type="image/gif")
+    background_tasks.add_task(record_hit, token, OPEN, client_ip, user_agent)
+    return Response(content=TRACKING_PIXEL_GIF, media_type="image/gif")
 
 
 @router.get("/email/track-click")
-def track_email_click(token: str, redirect_url: str, request: Request, db: Session = Depends(deps.get_db)) -> Any:
+def track_email_click(token: str, redirect_url: str, request: Request, background_tasks: BackgroundTasks) -> Any:
     """
     Tracks email clicks (CTR) and redirects user to secure target destination safely.
     """
-    from app.models.email_log import EmailLog
-    from datetime import datetime
     from fastapi.responses import RedirectResponse
-    import json
+    from app.services.email_engagement import CLICK, record_hit
 
     client_ip = request.client.host if request.client else "unknown"
     user_agent = request.headers.get("user-agent", "unknown")
-
-    log_entry = db.query(EmailLog).filter(EmailLog.tracking_token == token).first()
-    if log_entry:
-        meta = {}
-        if log_entry.metadata_json:
-            try:
-                meta = json.loads(log_entry.metadata_json)
-            except Exception:
-                meta = {}
-
-        if "hits" not in meta:
-            meta["hits"] = []
-        meta["hits"].append({
-            "timestamp": datetime.utcnow().isoformat(),
-            "ip": client_ip,
-            "user_agent": user_agent,
-            "action": "click",
-            "redirect_url": redirect_url
-        })
-        log_entry.metadata_json = json.dumps(meta)
-
-        if log_entry.status != "unsubscribed":
-            log_entry.status = "clicked"
-            if not log_entry.clicked_at:
-                log_entry.clicked_at = datetime.utcnow()
-            if not log_entry.opened_at:
-                log_entry.opened_at = datetime.utcnow() # Safe assumption: opened before clicked
-
-        db.add(log_entry)
-        db.commit()
+    background_tasks.add_task(record_hit, token, CLICK, client_ip, user_agent, redirect_url)
 
     # Secure redirect to the absolute URL
     return RedirectResponse(url=redirect_url)
@@ -196,6 +196,7 @@ def get_segment_members(
         raise HTTPException(status_code=404, detail="Segment not found")
 
     members, total_count = segmentation_service.get_segment_members(db, segment, limit, offset)
+    seller_ids = segmentation_service.seller_ids(db, [m.id for m in members])
 
     return {
         "members": [
@@ -203,7 +204,7 @@ def get_segment_members(
                 "id": m.id,
                 "full_name": m.full_name,
                 "email": m.email,
-                "is_seller": m.is_seller,
+                "is_seller": m.id in seller_ids,
                 "verified_level": m.verified_level
             }
             for m in members
@@ -5,6 +5,7 @@ from app.models.listing import Listing
 from app.models.message import Message
 from app.models.favorite import Favorite
 from app.models.wallet import Wallet
+from app.services.view_counter_service import pending_listing_views, pending_profile_views
 
 router = APIRouter()
 
@@ -31,9 +32,16 @@ def get_user_stats(
     wallet = db.exec(select(Wallet).where(Wallet.user_id == current_user.id)).first()
     balance = wallet.balance if wallet else 0.0
     
-    # Get real views (listing views sum + profile views)
-    listing_views = db.exec(select(func.sum(Listing.views)).where(Listing.owner_id == current_user.id)).one() or 0
-    total_views = listing_views + current_user.profile_views
+    # Get real views (listing views sum + profile views), plus views still
+    # buffered in Redis and not yet flushed to the table
+    listing_views = db.exec(select(Listing.id, Listing.views).where(Listing.owner_id == current_user.id)).all()
+    pending_views = pending_listing_views(db, (listing_id for listing_id, _ in listing_views))
+    total_views = (
+        sum(views or 0 for _, views in listing_views)
+        + sum(pending_views.values())
+        + current_user.profile_views
+        + pending_profile_views(db, [current_user.id]).get(current_user.id, 0)
+    )
     
     return {
         "listings": listings_count,
@@ -1,17 +1,21 @@
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Union
+import asyncio
 import logging
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, BackgroundTasks, Header, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, BackgroundTasks, Header, Form, Request, Response
 from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 from app.api import deps
 from app.crud import crud_listing
-from app.models.listing import Listing, ListingBase, ListingRead, Category, SubSubCategory
+from app.db.session import engine
+from app.models.listing import Listing, ListingBase, ListingRead, ListingPage, Category, SubSubCategory
 from app.models.subcategory import Subcategory
 from app.core.metrics import LISTINGS_CREATED_TOTAL
 from app.models.user import User
 from app.models.audit import AuditLog
 from app.models.marketing_code import MarketingCode
 from app.services.cache_service import cache
+from app.services.category_tree_service import category_tree
 from app.services.security_service import security_service
 from app.services.moderation_service import moderation_service
 from app.services.marketing_service import marketing_service
@@ -19,11 +23,17 @@ from app.models.marketing import EmailEventType
 from app.core.security import risk_security
 from app.core.config import settings
 from app.services.kafka_producer import publish_upload_failure_event, publish_tracking_event
+from app.utils.pagination import InvalidCursor
 import uuid
 import os
 from app.services.storage_service import storage_service
 from app.services.screening_service import calculate_listing_risk
 from app.services.shop_category_service import update_shop_primary_category
+from app.services.shop_stats_service import refresh_shop_stats
+from app.services.view_counter_service import pending_listing_views, record_listing_view
+from app.services.image_hash_index import find_near_duplicates, index_listing_images
+from app.services.image_pipeline import DONE as IMAGE_PROCESSED, image_pipeline
+from app.services.shop_slug_service import find_unslugged_shop, slugify_shop_name
 from app.services.shop_listing_sync_service import sync_shop_listings_to_primary_category
 from datetime import datetime, timedelta
 
@@ -72,11 +82,18 @@ async def upload_image(
     filename = f"{uuid.uuid4()}.{extension}"
 
     try:
-        url, phash = await storage_service.upload_file(contents, filename, high_quality=high_quality)
+        if high_quality:
+            url, phash = await storage_service.upload_file(contents, filename, high_quality=True)
+            return {"filename": filename, "url": url, "phash": phash}
+        # Listing photo: persist the original now, variants + pHash follow
+        # from the image pipeline and are attached when the listing is saved
+        url, _ = await storage_service.upload_file(contents, filename, defer_processing=True)
+        image_pipeline.submit(url, contents)
         return {
             "filename": filename,
             "url": url,
-            "phash": phash
+            "phash": "",
+            "status": "processing",
         }
     except Exception as e:
         error_msg = str(e)
@@ -95,60 +112,81 @@ async def upload_image(
         raise HTTPException(status_code=500, detail=f"Failed to upload image: {error_msg}")
 
 
-@router.post("/upload-multiple", response_model=List[dict])
+async def _upload_one(file: UploadFile, user_id: int, semaphore: asyncio.Semaphore) -> dict:
+    """Validate and store one file of a multi-upload; never raises."""
+    name = file.filename
+    if not name:
+        return {"original_filename": name, "status": "rejected", "error": "No file name"}
+
+    extension = name.split(".")[-1].lower()
+    if extension not in settings.ALLOWED_EXTENSIONS:
+        return {"original_filename": name, "status": "rejected", "error": "File extension not allowed"}
+
+    contents = await file.read(settings.MAX_FILE_SIZE + 1)
+    if len(contents) > settings.MAX_FILE_SIZE:
+        return {"original_filename": name, "status": "rejected", "error": "File too large"}
+
+    filename = f"{uuid.uuid4()}.{extension}"
+    try:
+        async with semaphore:
+            url, _ = await storage_service.upload_file(contents, filename, defer_processing=True)
+        image_pipeline.submit(url, contents)
+        return {
+            "original_filename": name,
+            "status": "processing",
+            "filename": filename,
+            "url": url,
+            "phash": "",
+        }
+    except Exception as e:
+        error_msg = str(e)
+        logger.warning(f"⚠️ Failed to upload image {filename}: {error_msg}")
+        # Publish upload failure event
+        try:
+            await publish_upload_failure_event(
+                user_id=user_id,
+                endpoint="/listings/upload-multiple",
+                filename=filename,
+                error=error_msg,
+                file_type="image",
+            )
+        except Exception as pub_err:
+            logger.debug(f"Failed to publish upload failure event: {pub_err}")
+        return {"original_filename": name, "status": "failed", "error": error_msg}
+
+
+@router.post("/upload-multiple", response_model=Union[List[dict], dict])
 async def upload_multiple_images(
     *,
     files: List[UploadFile] = File(...),
+    report: bool = False,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Upload multiple images for a listing.
     Returns list of uploaded image info with url and filename.
+
+    Files upload concurrently (up to UPLOAD_CONCURRENCY at a time) and
+    return as soon as the originals are stored; variants and pHashes are
+    generated in the background by the image pipeline. With report=true
+    the response is {"files": [...]}, one entry per submitted file in
+    order, each with a status of processing / rejected / failed.
     """
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
 
-    results = []
-    for file in files:
-        if not file.filename:
-            continue
+    semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+    outcomes = await asyncio.gather(*(_upload_one(file, current_user.id, semaphore) for file in files))
 
-        extension = file.filename.split(".")[-1].lower()
-        if extension not in settings.ALLOWED_EXTENSIONS:
-            continue
-
-        contents = await file.read(settings.MAX_FILE_SIZE + 1)
-        if len(contents) > settings.MAX_FILE_SIZE:
-            continue
-
-        filename = f"{uuid.uuid4()}.{extension}"
-
-        try:
-            url, phash = await storage_service.upload_file(contents, filename)
-            results.append({
-                "filename": filename,
-                "url": url,
-                "phash": phash
-            })
-        except Exception as e:
-            error_msg = str(e)
-            logger.warning(f"⚠️ Failed to upload image {filename}: {error_msg}")
-            # Publish upload failure event
-            try:
-                await publish_upload_failure_event(
-                    user_id=current_user.id,
-                    endpoint="/listings/upload-multiple",
-                    filename=filename,
-                    error=error_msg,
-                    file_type="image",
-                )
-            except Exception as pub_err:
-                logger.debug(f"Failed to publish upload failure event: {pub_err}")
-            # Skip failed files and continue with others
-            continue
+    if report:
+        return {"files": outcomes}
 
+    results = [
+        {"filename": o["filename"], "url": o["url"], "phash": o["phash"], "status": o["status"]}
+        for o in outcomes if o["status"] == "processing"
+    ]
     if not results:
         raise HTTPException(status_code=400, detail="No valid files were uploaded")
 
@@ -198,76 +236,23 @@ async def upload_video(
 
 @router.get("/categories", response_model=List[Any])
 def read_categories(
+    request: Request,
     db: Session = Depends(deps.get_db),
 ) -> Any:
     """
     Retrieve categories with subcategories.
     Includes active_listing_count so clients can filter to categories
     that actually have live ads.
-    """
-    import json
-    from sqlalchemy import text
-
-    # Single efficient query: count active listings per category
-    rows = db.execute(
-        text(
-            """
-            SELECT l.category_id, COUNT(*) AS cnt
-            FROM listing l
-            JOIN "user" u ON u.id = l.owner_id
-            WHERE l.status = 'active'
-              AND u.is_suspended = false
-            GROUP BY l.category_id
-            """
-        )
-    ).fetchall()
-    active_counts: dict[int, int] = {row.category_id: row.cnt for row in rows}
-
-    categories = crud_listing.get_categories(db)
-    result = []
-
-    for cat in categories:
-        cat_attrs = cat.attributes_schema
-        if isinstance(cat_attrs, str):
-            try: cat_attrs = json.loads(cat_attrs)
-            except: cat_attrs = {}
-
-        subs = crud_listing.get_subcategories(db, category_id=cat.id)
-        subcategories = []
-        for sub in (subs or []):
-            subcategories.append({
-                "id": sub.id,
-                "name_en": sub.name_en,
-                "name_so": sub.name_so,
-                "slug": sub.slug,
-                "image_url": sub.image_url,
-                "subsubcategories": [
-                    {
-                        "id": ssub.id,
-                        "name_en": ssub.name_en,
-                        "name_so": ssub.name_so,
-                        "slug": ssub.slug,
-                        "image_url": ssub.image_url,
-                        "brands": ssub.brands or [],
-                    }
-                    for ssub in db.exec(select(SubSubCategory).where(SubSubCategory.subcategory_id == sub.id)).all() or []
-                ],
-            })
-
-        cat_dict = {
-            "id": cat.id,
-            "name_en": cat.name_en,
-            "name_so": cat.name_so,
-            "slug": cat.slug,
-            "icon_name": cat.icon_name,
-            "image_url": cat.image_url,
-            "attributes_schema": cat_attrs,
-            "subcategories": subcategories,
-            "active_listing_count": active_counts.get(cat.id, 0),
-        }
-        result.append(cat_dict)
 
-    return result
+    Served from a prebuilt snapshot (see category_tree_service) with an
+    ETag; clients sending a matching If-None-Match get a bodyless 304.
+    """
+    etag, body = category_tree.get(db)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    client_etags = {t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")}
+    if etag in client_etags or "*" in client_etags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/categories/stats/shop-counts")
@@ -322,7 +307,7 @@ def create_category(
         attributes_schema=category_in.get("attributes_schema", {})
     )
     result = crud_listing.create_category(db, category_in=cat)
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return result
 
 
@@ -348,7 +333,7 @@ def update_category(
     db.add(category)
     db.commit()
     db.refresh(category)
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return category
 
 
@@ -363,7 +348,7 @@ def delete_category(
     Delete a category (Admin only).
     """
     result = crud_listing.remove_category(db, id=id)
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return result
 
 
@@ -389,7 +374,7 @@ def create_subcategory(
         category_id=subcategory_in["category_id"],
     )
     result = crud_listing.create_subcategory(db, subcategory_in=subcat)
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return result
 
 
@@ -409,7 +394,7 @@ def update_subcategory(
         raise HTTPException(status_code=404, detail="Subcategory not found")
     
     result = crud_listing.update_subcategory(db, db_obj=subcat, subcategory_in=subcategory_in)
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return result
 
 
@@ -424,7 +409,7 @@ def delete_subcategory(
     Delete a subcategory (Admin only).
     """
     result = crud_listing.remove_subcategory(db, id=id)
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return result
 
 
@@ -453,7 +438,7 @@ def create_subsubcategory(
     db.add(subsubcat)
     db.commit()
     db.refresh(subsubcat)
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return subsubcat
 
 
@@ -479,7 +464,7 @@ def update_subsubcategory(
     db.add(subsubcat)
     db.commit()
     db.refresh(subsubcat)
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return subsubcat
 
 
@@ -498,7 +483,7 @@ def delete_subsubcategory(
         raise HTTPException(status_code=404, detail="Sub-subcategory not found")
     db.delete(subsubcat)
     db.commit()
-    cache.delete_pattern("cache:categories:*")
+    cache.invalidate_tags("categories")
     return subsubcat
 
 
@@ -563,31 +548,90 @@ def read_subsubcategory_attributes(
     return attrs if attrs else {}
 
 
-@router.get("/me", response_model=List[ListingRead])
+def _listing_page(listings: List[Listing], limit: int) -> ListingPage:
+    """Wrap a cursor-mode result, emitting next_cursor only if the page is full."""
+    next_cursor = crud_listing.listing_feed_cursor(listings[-1]) if listings and len(listings) >= limit else None
+    return ListingPage(items=[ListingRead.model_validate(l) for l in listings], next_cursor=next_cursor)
+
+
+@router.get("/me", response_model=Union[List[ListingRead], ListingPage])
 def read_my_listings(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
 ) -> Any:
     """
     Retrieve listings of current user.
+    Passing `cursor` (empty for the first page) switches to keyset
+    pagination and returns {"items": [...], "next_cursor": ...}.
     """
-    return crud_listing.get_listings(db, skip=skip, limit=limit, owner_id=current_user.id)
+    try:
+        listings = crud_listing.get_listings(db, skip=skip, limit=limit, owner_id=current_user.id, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cursor is None:
+        return listings
+    return _listing_page(listings, limit)
 
 
-def _listings_fully_loaded(listings: List[ListingRead]) -> bool:
+def _listings_fully_loaded(listings: Union[List[ListingRead], ListingPage]) -> bool:
     """Guards against caching a result where the owner relationship is missing
     for a listing that has an owner_id."""
+    if isinstance(listings, ListingPage):
+        listings = listings.items
     return all(l.owner is not None for l in listings if l.owner_id)
 
 
-@router.get("/", response_model=List[ListingRead])
-@cache.cached(prefix="listings", ttl=60, should_cache=_listings_fully_loaded)
+def _listing_feed_tags(kwargs: dict) -> List[str]:
+    """Cache tags for a read_listings() call, keyed off its filters.
+
+    Entries scoped to a numeric category or an owner are tagged with just
+    those, so a write only drops the feeds it can actually appear in; any
+    other shape (no filter, category slug) falls under "listings:feed".
+    """
+    tags = []
+    category_id = kwargs.get("category_id")
+    if category_id and str(category_id).isdigit():
+        tags.append(f"category:{category_id}")
+    if kwargs.get("owner_id"):
+        tags.append(f"owner:{kwargs['owner_id']}")
+    if not tags or (category_id and not str(category_id).isdigit()):
+        tags.append("listings:feed")
+    return tags
+
+
+def _invalidate_listing_caches(listing: Listing, previous_category_id: Optional[int] = None) -> None:
+    """Drop cached feeds and shop pages a write to `listing` can affect.
+
+    Pass the category the listing had before the write when it may have
+    moved, so the feed it left stops listing it too.
+    """
+    tags = ["listings:feed", f"category:{listing.category_id}", f"owner:{listing.owner_id}", "shops"]
+    if previous_category_id is not None and previous_category_id != listing.category_id:
+        tags.append(f"category:{previous_category_id}")
+    cache.invalidate_tags(*tags)
+
+
+def _queue_image_attachment(listing: Listing) -> None:
+    """Have the image pipeline's pHashes/variants written back to `listing`."""
+    if not listing.images:
+        return
+    try:
+        from app.tasks.image_tasks import attach_listing_images
+        attach_listing_images.delay(listing.id)
+    except Exception as e:
+        logger.warning(f"Failed to queue image attachment for listing {listing.id}: {e}")
+
+
+@router.get("/", response_model=Union[List[ListingRead], ListingPage])
+@cache.cached(prefix="listings", ttl=60, should_cache=_listings_fully_loaded, tags=_listing_feed_tags)
 def read_listings(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     category_id: Optional[str] = None,
     owner_id: Optional[int] = None,
     q: Optional[str] = None,
@@ -603,6 +647,9 @@ def read_listings(
     Retrieve listings.
     category_id can be either a numeric ID or a category slug (e.g., 'animals')
     approval_status can be: pending, approved, rejected (admin/agent only)
+    cursor switches to keyset pagination: send it empty for the first page,
+    then echo back each response's next_cursor. The response becomes
+    {"items": [...], "next_cursor": ...}; `skip` is ignored in this mode.
     """
     attributes = None
     if attrs:
@@ -624,7 +671,7 @@ def read_listings(
             else:
                 # Unknown category slug: return no results rather than
                 # silently dropping the filter and returning everything.
-                return []
+                return [] if cursor is None else ListingPage(items=[])
 
     # Security: Only admins/agents can filter by approval status or see non-active statuses
     effective_status = status
@@ -634,19 +681,28 @@ def read_listings(
         effective_approval_status = None  # Regular users can't filter by approval status
 
     # If approval_status filter is requested, apply additional filtering
-    listings = crud_listing.get_listings(
-        db,
-        skip=skip,
-        limit=limit,
-        category_id=resolved_category_id,
-        search=q,
-        status=effective_status,
-        location=location,
-        attributes=attributes,
-        owner_id=owner_id,
-        min_price=min_price,
-        max_price=max_price,
-    )
+    try:
+        listings = crud_listing.get_listings(
+            db,
+            skip=skip,
+            limit=limit,
+            category_id=resolved_category_id,
+            search=q,
+            status=effective_status,
+            location=location,
+            attributes=attributes,
+            owner_id=owner_id,
+            min_price=min_price,
+            max_price=max_price,
+            cursor=cursor,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The cursor must come from the last row the DB returned, before the
+    # approval_status post-filter below drops any, or the next page would
+    # re-serve rows this one already skipped over.
+    next_cursor = crud_listing.listing_feed_cursor(listings[-1], search=q) if listings and len(listings) >= limit else None
 
     # Additional approval_status filtering for admins/agents
     if effective_approval_status and (current_user and (current_user.is_admin or current_user.is_agent)):
@@ -659,31 +715,87 @@ def read_listings(
     # *write* was correct in memory but lost `owner` on serialization, then every cache
     # *hit* served it back as null. ListingRead declares `owner` as a real field, so
     # encoding it (for cache storage) round-trips correctly.
-    return [ListingRead.model_validate(l) for l in listings]
+    items = [ListingRead.model_validate(l) for l in listings]
+    if cursor is None:
+        return items
+    return ListingPage(items=items, next_cursor=next_cursor)
+
+
+def _after_listing_created(listing_id: int, owner_id: int, shop_user_id: int, title: str) -> None:
+    # Runs in the threadpool (via BackgroundTasks) with its own sync session,
+    # after the response is sent: none of this changes what the seller gets
+    # back, and awaited inline it was over half of create_listing's latency
+    from app.crud.crud_notification import crud_notification
+    from app.utils.push import send_push_to_user
+
+    with Session(engine) as session:
+        # Update shop's primary category based on listing distribution
+        try:
+            update_shop_primary_category(session, shop_user_id)
+        except Exception:
+            session.rollback()  # Never fail the rest due to category update
+
+        # Keep the shop directory aggregates in step
+        try:
+            refresh_shop_stats(session, owner_id)
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Failed to refresh shop_stats for owner {owner_id}: {e}")
+
+        # In-app notification for ad posting
+        try:
+            crud_notification.create(
+                session,
+                obj_in={
+                    "type": "ad_posted",
+                    "data": {
+                        "listing_id": listing_id,
+                        "title": title,
+                        "status": "pending",
+                        "message": f"Your listing '{title}' has been submitted for review. You'll be notified within 4 hours."
+                    }
+                },
+                user_id=owner_id
+            )
+        except Exception:
+            session.rollback()
+
+        # Push notification for ad posted
+        send_push_to_user(
+            session,
+            user_id=owner_id,
+            title="Listing Submitted!",
+            body=f"'{title}' is under review. We'll notify you soon.",
+            data={"type": "ad_posted", "listing_id": str(listing_id), "path": f"/listing/{listing_id}"}
+        )
 
 
 @router.post("/", response_model=Listing)
 async def create_listing(
     *,
-    db: Session = Depends(deps.get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(deps.get_async_db),
     listing_in: ListingBase,
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: User = Depends(deps.get_current_active_user_async),
     owner_id: Optional[int] = None,
     x_device_fingerprint: Optional[str] = Header(None),
 ) -> Any:
     """
     Create new listing.
+
+    Runs on the async engine; the sync services it shares with the rest of
+    the API are called through db.run_sync().
     """
     # Determine effective owner (Admin/Agent impersonation support) up front so
     # verification, subscription, and duplicate checks below apply to the
     # shop actually receiving the listing, not to the admin/agent's own account.
     effective_owner_id = current_user.id
     if owner_id and (current_user.is_admin or current_user.is_agent):
-        target_user = db.get(User, owner_id)
+        target_user = await db.get(User, owner_id)
         if not target_user:
             raise HTTPException(status_code=404, detail="Target user for impersonation not found")
         effective_owner_id = owner_id
-    owner_for_checks = db.get(User, effective_owner_id) if effective_owner_id != current_user.id else current_user
+    owner_for_checks = await db.get(User, effective_owner_id) if effective_owner_id != current_user.id else current_user
 
     # Verify the owner has at least tier2 trust level (ID/business verification) to create listings
     from app.models.user import UserVerifiedLevel
@@ -695,26 +807,26 @@ async def create_listing(
 
     # Check product limit based on subscription plan
     from app.services.subscription_service import subscription_service
-    if not subscription_service.can_add_products(effective_owner_id, db):
+    if not await db.run_sync(lambda session: subscription_service.can_add_products(effective_owner_id, session)):
         raise HTTPException(
             status_code=402,
             detail="Product limit reached. Upgrade to Pro plan for unlimited products. Start 7-day free trial to unlock more features."
         )
 
     # Prevent duplicated active listings from the same owner (allow reposting sold/closed/deleted ones)
-    existing_duplicate = db.exec(
+    existing_duplicate = (await db.exec(
         select(Listing).where(
             Listing.owner_id == effective_owner_id,
             Listing.title_en == listing_in.title_en,
             Listing.status.in_(["active", "pending"])
         )
-    ).first()
+    )).first()
     if existing_duplicate:
         raise HTTPException(status_code=400, detail="Duplicate product detected. This shop already has a listing with this title.")
     # 1. Device Intelligence & Fingerprinting
     if x_device_fingerprint:
-        device = security_service.get_or_create_device(db, x_device_fingerprint, {})
-        security_service.link_user_to_device(db, current_user, device)
+        device = await db.run_sync(security_service.get_or_create_device, x_device_fingerprint, {})
+        await db.run_sync(security_service.link_user_to_device, current_user, device)
         if device.is_banned:
             raise HTTPException(status_code=403, detail="Access denied for this device.")
 
@@ -728,34 +840,30 @@ async def create_listing(
         risk_security.check_listing_limit(current_user)
 
     # 3. Messaging & Content Moderation
-    flags = moderation_service.analyze_listing(
-        db, 
-        current_user, 
-        listing_in.title_en, 
-        listing_in.description_en or "", 
+    flags = await db.run_sync(
+        moderation_service.analyze_listing,
+        current_user,
+        listing_in.title_en,
+        listing_in.description_en or "",
         listing_in.price
     )
     
-    # Layer 3.5: Duplicate Image Detection (PHash)
-    if listing_in.image_hashes:
-        for h in listing_in.image_hashes:
-            if not h: continue
-            # Check if this hash exists in other listings (not by this user)
-            # In a real system, we'd use a specialized vector DB or Hamming distance index
-            # For now, exact hash match for identifying repeated farm accounts
-            # Fix: cast JSON to JSONB for proper containment check in PostgreSQL
-            from sqlalchemy.dialects.postgresql import JSONB
-            from sqlalchemy import cast
-            
-            duplicates = db.query(Listing).filter(
-                cast(Listing.image_hashes, JSONB).contains([h]),
-                Listing.owner_id != current_user.id
-            ).count()
-            
-            if duplicates > 0:
-                flags.append("duplicate_image_detected")
-                break
-    
+    # Layer 3.5: Duplicate Image Detection (PHash) -- Hamming-distance
+    # lookup in the banded pHash index, so recropped/re-encoded copies of
+    # another seller's photos are caught too. Photos still in the image
+    # pipeline are checked again when their results are attached.
+    candidate_hashes = [h for h in (listing_in.image_hashes or []) if h]
+    for url in listing_in.images or []:
+        processed = image_pipeline.get_result(url)
+        if processed and processed.get("status") == IMAGE_PROCESSED:
+            candidate_hashes.append(processed["phash"])
+    if candidate_hashes:
+        duplicates = await db.run_sync(
+            lambda session: find_near_duplicates(session, candidate_hashes, exclude_owner_id=effective_owner_id, limit=1)
+        )
+        if duplicates:
+            flags.append("duplicate_image_detected")
+
     # Layer 6: Status Logic
     status = "active"
 
@@ -763,18 +871,19 @@ async def create_listing(
     if owner_for_checks and owner_for_checks.primary_category_id:
         listing_in.category_id = owner_for_checks.primary_category_id
 
-    listing = crud_listing.create_listing(db, listing_in=listing_in, owner_id=effective_owner_id)
+    listing = await db.run_sync(
+        lambda session: crud_listing.create_listing(session, listing_in=listing_in, owner_id=effective_owner_id)
+    )
     listing.status = "pending"  # Draft status - not visible yet
     listing.moderation_status = "pending"  # Waiting for admin review
     db.add(listing)
-    db.commit()
-    db.refresh(listing)
+    await db.run_sync(index_listing_images, listing)
 
     # Track business metric
     try:
         category_name = "unknown"
         if listing.category_id:
-            cat = db.get(Category, listing.category_id)
+            cat = await db.get(Category, listing.category_id)
             if cat:
                 category_name = cat.name_en
 
@@ -796,21 +905,25 @@ async def create_listing(
 
     # Track first-ad conversion for marketing referral codes
     if current_user.referral_code and not current_user.referral_listing_counted:
-        mc = db.exec(select(MarketingCode).where(MarketingCode.code == current_user.referral_code)).first()
+        mc = (await db.exec(select(MarketingCode).where(MarketingCode.code == current_user.referral_code))).first()
         if mc:
             mc.ads_posted_count += 1
             db.add(mc)
         current_user.referral_listing_counted = True
         db.add(current_user)
 
-    db.commit()
-    db.refresh(listing)
-
-    # Update shop's primary category based on listing distribution
-    try:
-        update_shop_primary_category(db, current_user.id)
-    except Exception:
-        pass  # Never fail request due to category update
+    await db.commit()
+    await db.refresh(listing)
+    _queue_image_attachment(listing)
+
+    # Shop aggregates and the seller's own notices don't hold up the response
+    background_tasks.add_task(
+        _after_listing_created,
+        listing_id=listing.id,
+        owner_id=effective_owner_id,
+        shop_user_id=current_user.id,
+        title=listing.title_en,
+    )
 
     # Publish Kafka event for moderation
     try:
@@ -859,38 +972,9 @@ async def create_listing(
         import logging
         logging.getLogger("listings_api").warning(f"Failed to publish listing creation event: {e}")
 
-    # In-app notification for ad posting
-    from app.crud.crud_notification import crud_notification
-    try:
-        crud_notification.create(
-            db,
-            obj_in={
-                "type": "ad_posted",
-                "data": {
-                    "listing_id": listing.id,
-                    "title": listing.title_en,
-                    "status": "pending",
-                    "message": f"Your listing '{listing.title_en}' has been submitted for review. You'll be notified within 4 hours."
-                }
-            },
-            user_id=effective_owner_id
-        )
-    except Exception:
-        pass
-
-    # Push notification for ad posted
-    from app.utils.push import send_push_to_user
-    send_push_to_user(
-        db,
-        user_id=effective_owner_id,
-        title="Listing Submitted!",
-        body=f"'{listing.title_en}' is under review. We'll notify you soon.",
-        data={"type": "ad_posted", "listing_id": str(listing.id), "path": f"/listing/{listing.id}"}
-    )
-
     # Publish tracking event for listing creation
     try:
-        category_obj = db.get(Category, listing.category_id)
+        category_obj = await db.get(Category, listing.category_id)
         await publish_tracking_event(
             user_id=effective_owner_id,
             event_type="listing_created",
@@ -927,17 +1011,13 @@ def get_public_shops(
     Optionally filter by category_id.
     """
     from sqlalchemy import text
-    import json as _json
 
     # Try cache first (except for searches)
     cache_key = f"public_shops:{skip}:{limit}:{category_id or 'all'}"
     if not search and not shop_id:
-        try:
-            cached = cache.get(cache_key)
-            if cached:
-                return _json.loads(cached)
-        except Exception:
-            pass
+        cached = cache.get(cache_key)
+        if cached:
+            return cached
 
     try:
         # Build filters
@@ -966,17 +1046,10 @@ def get_public_shops(
         rotation_seed = f"{_now.strftime('%Y-%m-%d-%H-%M')}-{_now.second // 10}"
         params["rotation_seed"] = rotation_seed
 
-        # Fast CTE-based aggregation
-        # Count all active listings per shop (not filtered by category)
+        # Per-shop listing counts come from the materialized shop_stats
+        # table (kept current by the listing write paths), and the total
+        # rides along as a window count instead of a second query.
         query_str = f"""
-            WITH shop_stats AS (
-                SELECT l.owner_id,
-                       COUNT(l.id) as listing_count,
-                       MAX(l.created_at) as latest_listing
-                FROM listing l
-                WHERE l.status = 'active'
-                GROUP BY l.owner_id
-            )
             SELECT u.id,
                    CAST(u.id AS VARCHAR),
                    COALESCE(u.business_name, u.full_name, 'Shop'),
@@ -987,12 +1060,14 @@ def get_public_shops(
                    COALESCE(u.response_time, 'Typically responds within a few hours'),
                    COALESCE(u.is_featured, false),
                    COALESCE(u.free_delivery, false),
-                   COALESCE(ss.listing_count, 0),
-                   ss.latest_listing,
+                   COALESCE(ss.active_count, 0),
+                   ss.latest_listing_at,
                    COALESCE(u.market, 'Eastleigh Market'),
                    u.phone,
                    u.logo_url,
-                   u.is_verified
+                   u.is_verified,
+                   u.shop_slug,
+                   COUNT(*) OVER() AS total_count
             FROM "user" u
             LEFT JOIN shop_stats ss ON ss.owner_id = u.id
             WHERE u.business_name IS NOT NULL
@@ -1002,13 +1077,13 @@ def get_public_shops(
             LIMIT :limit OFFSET :skip
         """
 
-        # Separate count query for total (runs fast without LIMIT)
+        # Only needed when paging past the end, where no row carries the window count
         count_query_str = f"""
-            SELECT COUNT(DISTINCT u.id)
+            SELECT COUNT(*)
             FROM "user" u
             WHERE u.business_name IS NOT NULL
               {category_filter}
-              {search_filter.replace('AND (u.business_name', 'AND (u.business_name') if search_filter else ''}
+              {search_filter}
         """
 
         # Execute main query to get all verified shops in category
@@ -1016,16 +1091,12 @@ def get_public_shops(
         result = db.execute(query, params)
         rows = result.fetchall()
 
-        # Build response from CTE results
+        # Build response from query results
         shops = []
         for row in rows:
-            # Generate URL-friendly slug from shop name: all lowercase, alphanumeric only
-            # e.g. "Moon Glow Cosmetics" -> "moonglowcosmetics"
+            # Persisted slug; derived on the fly only for shops not yet backfilled
             shop_name = row[2] or f'shop{row[0]}'
-            import unicodedata
-            normalized = unicodedata.normalize('NFKD', shop_name).encode('ascii', 'ignore').decode('ascii')
-            slug = ''.join(c for c in normalized.lower() if c.isalnum())
-            slug = slug or f'shop{row[0]}'  # Fallback if slug is empty
+            slug = row[16] or slugify_shop_name(shop_name, row[0])
 
             shops.append({
                 "id": str(row[0]),
@@ -1057,16 +1128,17 @@ def get_public_shops(
                 }
             })
 
-        # Total count query
-        count_query = text(count_query_str)
-        total_count = db.execute(count_query, params).scalar() or len(shops)
+        if rows:
+            total_count = rows[0][17]
+        elif skip > 0:
+            total_count = db.execute(text(count_query_str), params).scalar() or 0
+        else:
+            total_count = 0
 
         # Cache the result for this rotation window
         response_data = {"total": total_count, "shops": shops}
-        try:
-            cache.setex(cache_key, 10, _json.dumps(response_data))
-        except Exception:
-            pass
+        if not search and not shop_id:
+            cache.set(cache_key, response_data, ttl=10, tags=["shops"])
 
         return response_data
     except Exception as e:
@@ -1095,15 +1167,16 @@ def get_shop_by_slug(
             if candidate and candidate.business_name:
                 user = candidate
 
-        # If not found by ID, or slug is text, find by business name/slug match
+        # If not found by ID, or slug is text, resolve through the unique
+        # shop_slug index. The incoming slug goes through the same
+        # normalization, so "Moon-Glow" and "moonglow" both land on it.
         if not user:
-            clean_slug = slug.lower().strip().replace('-', '').replace('_', '').replace(' ', '')
-            all_users = db.exec(select(User).where(User.business_name.isnot(None))).all()
-            for u in all_users:
-                u_name = (u.business_name or u.full_name or '').lower().strip().replace('-', '').replace('_', '').replace(' ', '')
-                if u_name == clean_slug or str(u.id) == slug:
-                    user = u
-                    break
+            clean_slug = slugify_shop_name(slug, 0)
+            user = db.exec(
+                select(User).where(User.shop_slug == clean_slug, User.business_name.isnot(None))
+            ).first()
+            if not user:
+                user = find_unslugged_shop(db, clean_slug)
 
         if not user:
             raise HTTPException(status_code=404, detail="Shop not found")
@@ -1115,9 +1188,7 @@ def get_shop_by_slug(
         ).one()
 
         shop_name = user.business_name or user.full_name or f"shop{user.id}"
-        import unicodedata as _ud
-        _normalized = _ud.normalize('NFKD', shop_name).encode('ascii', 'ignore').decode('ascii')
-        derived_slug = ''.join(c for c in _normalized.lower() if c.isalnum()) or f"shop{user.id}"
+        derived_slug = user.shop_slug or slugify_shop_name(shop_name, user.id)
 
         return {
             "id": str(user.id),
@@ -1198,31 +1269,20 @@ def read_listing(
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
 
-    # Increment views
-    listing.views += 1
-    db.add(listing)
-    db.commit()
-    db.refresh(listing)
-
-    # Per-user view record (guests aren't tracked -- nothing to email them
-    # at) so the "viewed but never messaged the seller" reminder and the
-    # browsing-history-personalized promo campaigns have real data to work
-    # from. Best-effort: a tracking write should never break the page.
-    if current_user and current_user.id != listing.owner_id:
-        try:
-            from app.models.marketing import UserBrowsingHistory
-            db.add(UserBrowsingHistory(
-                user_id=current_user.id,
-                listing_id=listing.id,
-                category_id=listing.category_id,
-                shop_id=listing.owner_id,
-            ))
-            db.commit()
-        except Exception:
-            db.rollback()
+    # Count the view, and record it in the viewer's browsing history (guests
+    # aren't tracked -- nothing to email them at) so the "viewed but never
+    # messaged the seller" reminder and the browsing-history-personalized
+    # promo campaigns have real data to work from. Both are buffered in
+    # Redis and flushed in bulk by a beat task.
+    try:
+        record_listing_view(db, listing, current_user.id if current_user else None)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to record view of listing {listing.id}: {e}")
 
     # Query for owner's active business storefront and attach it
     listing_data = ListingRead.model_validate(listing)
+    listing_data.views += pending_listing_views(db, [listing.id]).get(listing.id, 0)
     if listing_data.owner:
         from app.models.business import Business
         from sqlmodel import select
@@ -1257,17 +1317,29 @@ def update_listing(
         raise HTTPException(status_code=404, detail="Listing not found")
     if not current_user.is_admin and (listing.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough privileges")
+    previous_category_id = listing.category_id
     listing = crud_listing.update_listing(db=db, db_obj=listing, listing_in=listing_in)
+    if 'image_hashes' in listing_in.model_fields_set:
+        index_listing_images(db, listing)
+        db.commit()
+    if 'images' in listing_in.model_fields_set:
+        _queue_image_attachment(listing)
+
+    # Clear feeds and shop pages this listing appears in, or just left
+    _invalidate_listing_caches(listing, previous_category_id)
 
     # Recalculate shop's primary category based on updated listing
     try:
         update_shop_primary_category(db, listing.owner_id)
-        # Clear all shop-related caches
-        cache.delete_pattern("shops:*")
-        cache.delete_pattern("public_shops:*")
     except Exception:
         pass  # Never fail request due to category update
 
+    # Keep the shop directory aggregates in step
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
+
     return listing
 
 
@@ -1292,6 +1364,7 @@ async def patch_listing(
 
     # Track old price for price drop detection
     old_price = listing.price
+    previous_category_id = listing.category_id
 
     for field, value in listing_in.items():
         if hasattr(listing, field):
@@ -1306,8 +1379,12 @@ async def patch_listing(
 
     listing.updated_at = dt.utcnow()
     db.add(listing)
+    if 'image_hashes' in listing_in:
+        index_listing_images(db, listing)
     db.commit()
     db.refresh(listing)
+    if 'images' in listing_in:
+        _queue_image_attachment(listing)
 
     # Detect price drop and send notifications
     new_price = listing.price
@@ -1320,15 +1397,21 @@ async def patch_listing(
         except Exception as e:
             logger.warning(f"Failed to process price drop notification: {e}")
 
+    # Clear feeds and shop pages this listing appears in, or just left
+    _invalidate_listing_caches(listing, previous_category_id)
+
     # Recalculate shop's primary category after any listing change
     try:
         update_shop_primary_category(db, listing.owner_id)
-        # Clear all shop-related caches
-        cache.delete_pattern("shops:*")
-        cache.delete_pattern("public_shops:*")
     except Exception:
         pass  # Never fail request due to category update
 
+    # Keep the shop directory aggregates in step
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
+
     return listing
 
 
@@ -1354,15 +1437,21 @@ def delete_listing(
     listing_title = listing.title_en
     listing = crud_listing.remove_listing(db=db, id=id)
 
+    # Clear feeds and shop pages this listing appeared in
+    _invalidate_listing_caches(listing)
+
     # Recalculate shop's primary category after deletion
     try:
         update_shop_primary_category(db, owner_id)
-        # Clear all shop-related caches
-        cache.delete_pattern("shops:*")
-        cache.delete_pattern("public_shops:*")
     except Exception:
         pass  # Never fail request due to category update
 
+    # Keep the shop directory aggregates in step
+    try:
+        refresh_shop_stats(db, owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {owner_id}: {e}")
+
     # Only notify the owner when an admin removed their live listing --
     # not when they deleted it themselves.
     if is_admin_takedown:
@@ -1508,6 +1597,14 @@ def merge_duplicate_shops(
 
 # ============== APPROVAL ENDPOINTS ==============
 
+def _send_event_email(**kwargs) -> None:
+    # Runs in the threadpool (via BackgroundTasks) with its own sync session,
+    # as the request's AsyncSession is closed by now. The blocking queries
+    # and SMTP send stay in this thread, off the event loop
+    with Session(engine) as session:
+        marketing_service.send_event_email_sync(session=session, **kwargs)
+
+
 def _check_approval_permission(user: User) -> None:
     """Check if user has permission to approve/reject listings."""
     if not user.is_active:
@@ -1521,8 +1618,9 @@ async def approve_listing(
     listing_id: int,
     approval_req: ListingApprovalRequest,
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_user),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Admin or Agent approves a listing for visibility.
@@ -1535,26 +1633,32 @@ async def approve_listing(
     # Check permissions (supports both admin and agent roles)
     _check_approval_permission(current_user)
 
-    listing = db.get(Listing, listing_id)
+    listing = await db.get(Listing, listing_id)
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
 
     # Use CRUD method for approval
-    listing = crud_listing.approve_listing(
-        db,
+    listing = await db.run_sync(lambda session: crud_listing.approve_listing(
+        session,
         listing=listing,
         approved_by_user_id=current_user.id,
         notes=approval_req.notes
-    )
+    ))
+
+    _invalidate_listing_caches(listing)
 
     # Recalculate shop's primary category after approval
     try:
-        update_shop_primary_category(db, listing.owner_id)
-        cache.delete_pattern("shops:*")
-        cache.delete_pattern("public_shops:*")
+        await db.run_sync(update_shop_primary_category, listing.owner_id)
     except Exception:
         pass
 
+    # Keep the shop directory aggregates in step
+    try:
+        await db.run_sync(refresh_shop_stats, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
+
     # Publish Kafka event
     try:
         from app.services.kafka_producer import publish_catalog_event, publish_notification_dispatch
@@ -1587,12 +1691,12 @@ async def approve_listing(
         import logging
         logging.getLogger("listings_api").warning(f"Failed to publish approval event: {e}")
 
-    # Send listing approved email via marketing automation
+    # Send listing approved email via marketing automation, after the response
     try:
-        seller = db.get(User, listing.owner_id)
+        seller = await db.get(User, listing.owner_id)
         if seller:
-            await marketing_service.send_event_email(
-                session=db,
+            background_tasks.add_task(
+                _send_event_email,
                 user_id=listing.owner_id,
                 event_type=EmailEventType.LISTING_APPROVED,
                 context={
@@ -1650,14 +1754,20 @@ async def reject_listing(
         notes=rejection_req.notes
     )
 
+    _invalidate_listing_caches(listing)
+
     # Recalculate shop's primary category after rejection
     try:
         update_shop_primary_category(db, listing.owner_id)
-        cache.delete_pattern("shops:*")
-        cache.delete_pattern("public_shops:*")
     except Exception:
         pass
 
+    # Keep the shop directory aggregates in step
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
+
     # Publish Kafka event
     try:
         from app.services.kafka_producer import publish_catalog_event, publish_notification_dispatch
@@ -1796,8 +1906,8 @@ async def feature_listing(
     boost_level: str,  # "basic", "vip", "diamond"
     payment_method: str,  # "mpesa", "stripe"
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Seller pays to feature a listing (boost visibility).
@@ -1813,7 +1923,7 @@ async def feature_listing(
     from app.models.featured_listing import FeaturedListing
 
     # Validate listing exists and belongs to user
-    listing = db.get(Listing, listing_id)
+    listing = await db.get(Listing, listing_id)
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
 
@@ -1853,8 +1963,8 @@ async def feature_listing(
         payment_status="pending",
     )
     db.add(featured)
-    db.commit()
-    db.refresh(featured)
+    await db.commit()
+    await db.refresh(featured)
 
     # Publish Kafka event
     try:
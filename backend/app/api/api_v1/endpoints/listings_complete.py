@@ -21,6 +21,7 @@ from app.models.listing import Listing
 from app.models.featured_listing import FeaturedListing
 from app.models.user import User
 from app.auth.auth import get_current_user
+from app.services.shop_stats_service import refresh_shop_stats
 from app.services.kafka_producer import (
     publish_catalog_event,
     publish_notification_dispatch,
@@ -65,6 +66,8 @@ async def create_listing(
     # Create listing (DRAFT - not yet visible)
     db_listing = Listing(
         owner_id=current_user.id,
+        owner_trust_score=current_user.trust_score or 0,
+        owner_is_verified=bool(current_user.is_verified),
         title_en=listing.title_en,
         title_so=listing.title_so,
         description_en=listing.description_en,
@@ -170,6 +173,11 @@ async def approve_listing(
     db.commit()
     db.refresh(listing)
 
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
+
     logger.info(
         f"Listing approved",
         extra={
@@ -243,6 +251,11 @@ async def reject_listing(
     db.commit()
     db.refresh(listing)
 
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
+
     logger.warning(
         f"Listing rejected",
         extra={
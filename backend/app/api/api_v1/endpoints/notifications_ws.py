@@ -3,10 +3,10 @@ WebSocket endpoint for real-time notifications.
 Handles personal notification subscriptions for authenticated users.
 """
 
-from fastapi import APIRouter, Query, Depends, status
+from fastapi import APIRouter, Query, status
 from fastapi.websockets import WebSocket
 from sqlmodel import Session
-from app.db.session import get_db
+from app.db.session import AsyncSessionLocal
 from app.models import User
 from app.core.config import settings
 from app.core.logging_config import get_logger
@@ -27,7 +27,7 @@ def verify_token_get_user(token: str, session: Session) -> User | None:
         user_id = payload.get("sub")
         if not user_id:
             return None
-        user = session.get(User, user_id)
+        user = session.get(User, int(user_id))
         return user
     except (JWTError, Exception) as e:
         logger.error(f"Token verification failed: {e}")
@@ -38,7 +38,6 @@ def verify_token_get_user(token: str, session: Session) -> User | None:
 async def websocket_notifications(
     websocket: WebSocket,
     token: str = Query(...),
-    session: Session = Depends(get_db),
 ):
     """
     WebSocket endpoint for real-time notifications.
@@ -59,7 +58,9 @@ async def websocket_notifications(
     """
     try:
         # Verify token and get user
-        user = verify_token_get_user(token, session)
+        # Session held for the lookup only, not for the life of the socket
+        async with AsyncSessionLocal() as session:
+            user = await session.run_sync(lambda sync_session: verify_token_get_user(token, sync_session))
         if not user:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
             return
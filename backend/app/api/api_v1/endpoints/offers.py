@@ -1,5 +1,6 @@
 """Offers endpoints for marketplace negotiations."""
 
+import logging
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session
@@ -9,6 +10,9 @@ from app.models.user import User
 from app.models.listing import Listing
 from app.crud.crud_offer import crud_offer
 from app.services.user_notification_service import user_notification_service
+from app.services.shop_stats_service import refresh_shop_stats
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -141,6 +145,13 @@ def update_offer(
 
     offer = crud_offer.update(db, db_obj=offer, obj_in=offer_in.model_dump(exclude_unset=True))
 
+    if offer_in.status == "accepted":
+        # The listing is now sold: keep the shop directory aggregates in step
+        try:
+            refresh_shop_stats(db, listing.owner_id)
+        except Exception as e:
+            logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
+
     return offer
 
 
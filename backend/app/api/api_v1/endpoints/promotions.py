@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.api import deps
 from app.models.promotion import Promotion, PromotionPlan, PromotionStatus, PromotionCode, PromotionCodeStatus
 from app.models.listing import Listing
@@ -10,6 +11,7 @@ from app.models.mobile_money import MobileTransaction
 from app.models.audit import AuditLog
 from app.utils.code_generator import generate_promotion_code, generate_voucher_code
 from app.services import lipana as lipana_service
+from app.services.shop_stats_service import refresh_shop_stats
 from app.core.config import settings
 from pydantic import BaseModel
 import logging
@@ -115,7 +117,7 @@ def create_promotion_request(
 @router.post("/webhook", include_in_schema=False)
 async def lipana_webhook(
     request: Request,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
 ) -> Any:
     """Receive Lipana payment.success events and auto-activate the promotion. Idempotent."""
     from app.services.cache_service import cache
@@ -154,9 +156,9 @@ async def lipana_webhook(
         return {"received": True, "action": "duplicate_ignored"}
 
     # Find the promotion that matches this Lipana transaction
-    promo = db.exec(
+    promo = (await db.exec(
         select(Promotion).where(Promotion.lipana_tx_id == lipana_tx_id)
-    ).first()
+    )).first()
 
     if not promo:
         logger.warning(f"Lipana webhook: no promotion found for tx {lipana_tx_id}")
@@ -165,11 +167,12 @@ async def lipana_webhook(
     if promo.status in (PromotionStatus.PAID, PromotionStatus.APPROVED):
         return {"received": True, "action": "already_active"}
 
-    # Auto-activate the promotion
-    activate_promotion(db, promo, matched_transaction_ref=lipana_tx_id)
+    # Auto-activate the promotion. activate_promotion() is shared with the
+    # sync admin endpoints, so it runs on the async session's sync facade.
+    await db.run_sync(lambda session: activate_promotion(session, promo, matched_transaction_ref=lipana_tx_id))
 
     # Audit log
-    listing = db.get(Listing, promo.listing_id)
+    listing = await db.get(Listing, promo.listing_id)
     actor_id = listing.owner_id if listing else 0
     log = AuditLog(
         user_id=actor_id,
@@ -179,7 +182,7 @@ async def lipana_webhook(
         details=f"Lipana payment confirmed for promo #{promo.id} (tx: {lipana_tx_id}). Promotion auto-activated."
     )
     db.add(log)
-    db.commit()
+    await db.commit()
 
     logger.info(f"Promotion #{promo.id} auto-activated via Lipana webhook (tx: {lipana_tx_id})")
     return {"received": True, "action": "activated", "promo_id": promo.id}
@@ -1019,6 +1022,10 @@ def agent_end_listing(
         details=f"Agent ended listing #{listing_id}: {listing.title_en}",
     ))
     db.commit()
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
     return {"success": True}
 
 
@@ -1042,6 +1049,10 @@ def agent_reactivate_listing(
         details=f"Agent reactivated listing #{listing_id}: {listing.title_en}",
     ))
     db.commit()
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
     return {"success": True}
 
 
@@ -1065,6 +1076,10 @@ def agent_approve_listing(
         details=f"Agent approved listing #{listing_id}: {listing.title_en}",
     ))
     db.commit()
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
     return {"success": True}
 
 
@@ -1088,4 +1103,8 @@ def agent_reject_listing(
         details=f"Agent rejected listing #{listing_id}: {listing.title_en}",
     ))
     db.commit()
+    try:
+        refresh_shop_stats(db, listing.owner_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
     return {"success": True}
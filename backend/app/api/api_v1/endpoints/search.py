@@ -1,6 +1,7 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select, func
+from sqlalchemy import tuple_
 from sqlalchemy.orm import selectinload
 from datetime import datetime
 from app.api import deps
@@ -8,11 +9,32 @@ from app.models.listing import Listing
 from app.models.listing_attribute import ListingAttribute
 from app.models.attribute import Attribute
 from app.models.subscription import FeaturedSelling
+from app.services.facet_service import (
+    FACET_FIELD_TYPES,
+    attribute_match,
+    build_facets,
+    facet_counts,
+    facet_definitions,
+    normalize_filters,
+)
+from app.services.search_service import search_cursor, search_keyset_filter, search_statement
+from app.utils.pagination import InvalidCursor, cursor_datetime, decode_cursor, encode_cursor
 
 router = APIRouter()
 
 
-@router.get("/listings/search", response_model=List[Any])
+def _search_keyset_filter(cursor: str):
+    """Rows sorting strictly after `cursor` in (boost_level, created_at, id) DESC order."""
+    values = decode_cursor(cursor)
+    try:
+        boost, last_id = int(values["b"]), int(values["i"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor("Malformed pagination cursor") from e
+    created_at = cursor_datetime(values.get("c"))
+    return tuple_(Listing.boost_level, Listing.created_at, Listing.id) < tuple_(boost, created_at, last_id)
+
+
+@router.get("/listings/search", response_model=Any)
 def search_listings(
     *,
     db: Session = Depends(deps.get_db),
@@ -25,58 +47,38 @@ def search_listings(
     featured_only: bool = Query(False, description="Show only featured products"),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; send empty for the first page"),
+    facets: bool = Query(False, description="Include per-option attribute counts (needs category_id)"),
 ) -> Any:
     """
     Advanced search with full-text search, category filtering, and attribute filtering.
-    Supports featured product filtering.
+    Supports featured product filtering. With `q`, results are ordered by
+    relevance (boosted/trusted sellers ranked up); without it, by boost and date.
+
+    Passing `cursor` switches to keyset pagination: the response becomes
+    {"items": [...], "next_cursor": ...} and `skip` is ignored.
+
+    `facets=true` adds "facets": each filterable attribute of the category
+    with live per-option counts. Counts for an attribute ignore that
+    attribute's own filter, so other options stay selectable.
 
     Example attribute filter:
     {"brand": ["nike", "adidas"], "condition": ["new", "like-new"], "price_range": [100, 500]}
     """
-    statement = select(Listing).where(Listing.status == "active")
-
-    # Text search
-    if q:
-        search_filter = f"%{q}%"
-        statement = statement.where(
-            (Listing.title_en.ilike(search_filter))
-            | (Listing.title_so.ilike(search_filter))
-            | (Listing.description_en.ilike(search_filter))
-            | (Listing.description_so.ilike(search_filter))
-        )
+    filters = [Listing.status == "active"]
 
     # Category filter
     if category_id:
-        statement = statement.where(Listing.category_id == category_id)
+        filters.append(Listing.category_id == category_id)
 
     if subcategory_id:
-        statement = statement.where(Listing.subcategory_id == subcategory_id)
+        filters.append(Listing.subcategory_id == subcategory_id)
 
     # Price filter
     if min_price is not None:
-        statement = statement.where(Listing.price >= min_price)
+        filters.append(Listing.price >= min_price)
     if max_price is not None:
-        statement = statement.where(Listing.price <= max_price)
-
-    # Attribute filters
-    if attributes:
-        import json
-        try:
-            attr_filters = json.loads(attributes)
-            for attr_slug, values in attr_filters.items():
-                if not isinstance(values, list):
-                    values = [values]
-
-                # Join with ListingAttribute and Attribute tables
-                subquery = select(ListingAttribute.listing_id).join(
-                    Attribute, ListingAttribute.attribute_id == Attribute.id
-                ).where(
-                    (Attribute.slug == attr_slug)
-                    & (ListingAttribute.value.in_(values))
-                )
-                statement = statement.where(Listing.id.in_(subquery))
-        except json.JSONDecodeError:
-            pass
+        filters.append(Listing.price <= max_price)
 
     # Featured filter
     if featured_only:
@@ -90,18 +92,64 @@ def search_listings(
         ).all()
         featured_ids = {p.listing_id for p in featured_placements if p.listing_id}
         if featured_ids:
-            statement = statement.where(Listing.id.in_(featured_ids))
+            filters.append(Listing.id.in_(featured_ids))
         else:
             # No featured products, return empty
-            return []
+            if facets:
+                return {"items": [], "next_cursor": None, "facets": []}
+            return [] if cursor is None else {"items": [], "next_cursor": None}
 
-    # Sorting: Featured products first, then by boost level and date
-    statement = statement.order_by(
-        Listing.boost_level.desc(),
-        Listing.created_at.desc(),
-    ).offset(skip).limit(limit)
+    # Text search: relevance-ordered via the shared search index;
+    # browsing without `q` keeps the boost/recency order
+    if q:
+        base = search_statement(q, *filters)
+    else:
+        base = select(Listing).where(*filters).order_by(
+            Listing.boost_level.desc(),
+            Listing.created_at.desc(),
+            Listing.id.desc(),
+        )
 
-    listings = db.exec(statement).all()
+    # Attribute filters (JSONB containment on listing.attributes)
+    attr_filters = {}
+    if attributes:
+        import json
+        try:
+            parsed = json.loads(attributes)
+            if isinstance(parsed, dict):
+                attr_filters = normalize_filters(parsed)
+        except json.JSONDecodeError:
+            pass
+
+    statement = base.where(*[attribute_match(key, values) for key, values in attr_filters.items()])
+    if cursor:
+        try:
+            statement = statement.where(search_keyset_filter(q, cursor) if q else _search_keyset_filter(cursor))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        statement = statement.offset(skip)
+    statement = statement.limit(limit)
+
+    # Facet counts ride along as one extra column so the page and its
+    # counts come back in a single query
+    facet_defs, facet_keys = [], []
+    if facets and category_id:
+        facet_defs = facet_definitions(db, category_id)
+        facet_keys = [d["slug"] for d in facet_defs if d["field_type"] in FACET_FIELD_TYPES]
+    counts_subquery = facet_counts(base, attr_filters, facet_keys) if facet_keys else None
+
+    raw_counts = None
+    if counts_subquery is not None:
+        rows = db.exec(statement.add_columns(counts_subquery.label("facet_counts"))).all()
+        listings = [row[0] for row in rows]
+        if rows:
+            raw_counts = rows[0][1]
+        else:
+            # Empty page (e.g. past the end): counts are still meaningful
+            raw_counts = db.exec(select(counts_subquery)).first()
+    else:
+        listings = db.exec(statement).all()
 
     # Get all featured product IDs for this result set
     featured_listing_ids = set()
@@ -133,7 +181,21 @@ def search_listings(
     # Sort to put featured at top
     results.sort(key=lambda x: not x["is_featured"])
 
-    return results
+    if cursor is None and not facets:
+        return results
+
+    # Cursor tracks the DB order, not the featured-first display order above
+    next_cursor = None
+    if cursor is not None and listings and len(listings) >= limit:
+        last = listings[-1]
+        if q:
+            next_cursor = search_cursor(last)
+        else:
+            next_cursor = encode_cursor({"b": last.boost_level or 0, "c": last.created_at, "i": last.id})
+    response = {"items": results, "next_cursor": next_cursor}
+    if facets:
+        response["facets"] = build_facets(facet_defs, raw_counts, attr_filters)
+    return response
 
 
 @router.get("/listings/{listing_id}/attributes", response_model=List[Any])
@@ -170,46 +232,7 @@ def get_attribute_filters(
 ) -> Any:
     """
     Get available attribute filters and their options for a category.
-    Used to build dynamic filter UI.
+    Used to build dynamic filter UI. Served from the cached facet
+    definitions (one joined query on a miss).
     """
-    from app.models.category_attribute import CategoryAttribute
-    from app.models.attribute_option import AttributeOption
-
-    # Get attributes assigned to this category
-    cat_attrs = db.exec(
-        select(CategoryAttribute)
-        .where(CategoryAttribute.category_id == category_id)
-        .order_by(CategoryAttribute.sort_order)
-    ).all()
-
-    filters = []
-    for cat_attr in cat_attrs:
-        attr = db.get(Attribute, cat_attr.attribute_id)
-        if not attr:
-            continue
-
-        # Get options if select/multiselect
-        options = []
-        if attr.field_type in ["select", "multiselect"]:
-            opts = db.exec(
-                select(AttributeOption)
-                .where(AttributeOption.attribute_id == attr.id)
-                .order_by(AttributeOption.sort_order)
-            ).all()
-            options = [
-                {"value": opt.value, "display_name": opt.display_name}
-                for opt in opts
-            ]
-
-        filters.append(
-            {
-                "id": attr.id,
-                "name": attr.name,
-                "slug": attr.slug,
-                "field_type": attr.field_type,
-                "required": cat_attr.required,
-                "options": options,
-            }
-        )
-
-    return {"category_id": category_id, "filters": filters}
+    return {"category_id": category_id, "filters": facet_definitions(db, category_id)}
@@ -22,6 +22,7 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 from app.services.storage_service import storage_service
+from app.services.shop_slug_service import assign_shop_slug, commit_shop_rename
 
 router = APIRouter()
 
@@ -343,6 +344,7 @@ def update_current_seller_profile(
         if existing_biz:
             raise HTTPException(status_code=400, detail="A shop or business with this name already exists. Please choose a unique name.")
         current_user.business_name = profile_update.business_name
+        assign_shop_slug(db, current_user)
 
     # Update allowed fields
     if profile_update.full_name is not None:
@@ -354,8 +356,7 @@ def update_current_seller_profile(
     if profile_update.market is not None:
         current_user.market = profile_update.market
 
-    db.add(current_user)
-    db.commit()
+    commit_shop_rename(db, current_user)
     db.refresh(current_user)
 
     # Send shop creation email if this is a new shop
@@ -1,9 +1,10 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import Response
-from sqlmodel import Session, select, or_, col
+from sqlmodel import Session, select, col
 from app.api import deps
 from app.models.listing import Listing
+from app.services.search_service import search_statement
 from app.services.sitemap_service import generate_sitemap_xml
 
 router = APIRouter()
@@ -61,33 +62,14 @@ def get_seo_landing(
         location_text = f"{c_clean}, {country_clean}"
 
     # 2. Query Live Listings Matching the Criteria
-    query = select(Listing).where(Listing.status == "active")
-    
-    # Filter by product/subject if provided
-    if p_clean:
-        query = query.where(
-            or_(
-                col(Listing.title_en).ilike(f"%{p_clean}%"),
-                col(Listing.title_so).ilike(f"%{p_clean}%"),
-                col(Listing.description_en).ilike(f"%{p_clean}%")
-            )
-        )
-    elif skill_clean:
-        query = query.where(
-            or_(
-                col(Listing.title_en).ilike(f"%{skill_clean}%"),
-                col(Listing.description_en).ilike(f"%{skill_clean}%")
-            )
-        )
-    elif srv_clean:
-        query = query.where(
-            or_(
-                col(Listing.title_en).ilike(f"%{srv_clean}%"),
-                col(Listing.description_en).ilike(f"%{srv_clean}%")
-            )
-        )
-    elif cat_clean != "Products":
-        query = query.where(col(Listing.category_en).ilike(f"%{cat_clean}%"))
+    # Product/skill/service/category text all go through the shared search
+    # index (category names are part of the indexed document), so landing
+    # pages rank the same listings the site search would.
+    search_term = p_clean or skill_clean or srv_clean or (cat_clean if cat_clean != "Products" else "")
+    if search_term:
+        query = search_statement(search_term, Listing.status == "active")
+    else:
+        query = select(Listing).where(Listing.status == "active")
 
     # Filter by location
     if city:
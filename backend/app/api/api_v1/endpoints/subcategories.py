@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from app.api import deps
 from app.models.subcategory import Subcategory, SubcategoryCreate, SubcategoryUpdate, SubcategoryRead
+from app.services.cache_service import cache
 
 router = APIRouter()
 
@@ -49,6 +50,7 @@ def create_subcategory(
     db.add(subcategory)
     db.commit()
     db.refresh(subcategory)
+    cache.invalidate_tags("categories")
     return subcategory
 
 
@@ -71,6 +73,7 @@ def update_subcategory(
     db.add(subcategory)
     db.commit()
     db.refresh(subcategory)
+    cache.invalidate_tags("categories")
     return subcategory
 
 
@@ -87,4 +90,5 @@ def delete_subcategory(
 
     db.delete(subcategory)
     db.commit()
+    cache.invalidate_tags("categories")
     return {"ok": True}
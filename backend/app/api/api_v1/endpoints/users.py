@@ -9,6 +9,7 @@ from app.models.user import UserCreate, User, UserUpdate, PasswordChange, UserRe
 from app.utils.email import send_verification_email
 from app.utils.redis import set_verification_code, get_verification_code, delete_verification_code
 from app.services.storage_service import storage_service
+from app.services.view_counter_service import record_profile_view
 
 router = APIRouter()
 
@@ -130,9 +131,7 @@ def track_user_view(
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    user.profile_views += 1
-    db.add(user)
-    db.commit()
+    record_profile_view(db, user_id)
     return {"message": "View tracked"}
 
 
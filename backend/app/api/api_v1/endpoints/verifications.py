@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, Body, File, UploadFile, F
 from sqlmodel import Session, select
 from sqlalchemy.orm import selectinload
 from app.api import deps
+from app.crud.crud_listing import sync_owner_ranking
 from app.models.user import User
 from app.models.verification import (
     VerificationRequest,
@@ -240,6 +241,7 @@ def update_verification_status(
             else:
                 user.verified_level = UserVerifiedLevel.tier2
             db.add(user)
+            sync_owner_ranking(db, user)
 
     db.add(AuditLog(
         user_id=current_user.id,
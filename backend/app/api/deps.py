@@ -4,10 +4,11 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.db.session import Session as DbSession, engine
+from app.db.session import Session as DbSession, engine, get_async_db  # noqa: F401 -- re-exported for Depends(deps.get_async_db)
 from app.models.user import User
 from app.core.limiter import limiter
 import structlog
@@ -23,10 +24,8 @@ def get_db() -> Generator:
         yield session
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: Optional[str] = Depends(reusable_oauth2),
-) -> User:
+def _token_user_id(token: Optional[str]) -> int:
+    """User id from a bearer token; raises 401 for a missing or invalid one."""
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -44,20 +43,22 @@ def get_current_user(
                 detail="Invalid token payload",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        return int(token_data)  # asyncpg, unlike psycopg2, won't coerce "12" for an integer key
     except jwt.JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except ValidationError:
+    except (ValidationError, ValueError, TypeError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.get(User, token_data)
+
+def _authenticated(user: Optional[User]) -> User:
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,6 +75,25 @@ def get_current_user(
     return user
 
 
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: Optional[str] = Depends(reusable_oauth2),
+) -> User:
+    return _authenticated(db.get(User, _token_user_id(token)))
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: Optional[str] = Depends(reusable_oauth2),
+) -> User:
+    """
+    get_current_user on the request's AsyncSession, for `async def` endpoints
+    on get_async_db -- the sync one would hold a sync pool connection (its
+    request-scoped Session) until the response is sent.
+    """
+    return _authenticated(await db.get(User, _token_user_id(token)))
+
+
 def get_current_user_optional(
     db: Session = Depends(get_db),
     token: Optional[str] = Depends(reusable_oauth2),
@@ -100,6 +120,25 @@ def get_current_user_optional(
     return user
 
 
+def get_current_user_id_optional(
+    token: Optional[str] = Depends(reusable_oauth2),
+) -> Optional[int]:
+    """
+    User id from the bearer token, or None -- without loading the user.
+    For fire-and-forget endpoints (analytics tracking) that only need to
+    attribute an event, not authorize it.
+    """
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        return int(payload["sub"])
+    except (jwt.JWTError, KeyError, TypeError, ValueError):
+        return None
+
+
 def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -108,6 +147,12 @@ def get_current_active_user(
     return current_user
 
 
+async def get_current_active_user_async(
+    current_user: User = Depends(get_current_user_async),
+) -> User:
+    return get_current_active_user(current_user)
+
+
 def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -148,7 +193,8 @@ def get_current_user_from_token(token: str, db: Session = Depends(get_db)) -> Op
         token_data = payload.get("sub")
         if not token_data:
             return None
-    except (jwt.JWTError, ValidationError):
+        token_data = int(token_data)  # asyncpg, unlike psycopg2, won't coerce "12" for an integer key
+    except (jwt.JWTError, ValidationError, ValueError, TypeError):
         return None
 
     user = db.get(User, token_data)
@@ -0,0 +1,26 @@
+"""Management command to backfill the listing image pHash index."""
+
+import click
+from sqlmodel import Session
+from app.db import engine
+from app.services.image_hash_index import backfill_image_hashes
+
+
+@click.command()
+@click.option('--limit', type=int, default=None, help='Maximum number of listings to scan (default: all)')
+@click.option('--batch-size', type=int, default=500, help='Listings per commit')
+def backfill_command(limit: int, batch_size: int):
+    """Index image_hashes of every listing not yet in listing_image_hash."""
+    click.echo("Starting image hash backfill...")
+
+    with Session(engine) as db:
+        try:
+            indexed = backfill_image_hashes(db, batch_size=batch_size, limit=limit)
+            click.echo(f"✓ Successfully indexed images of {indexed} listings")
+        except Exception as e:
+            click.echo(f"✗ Error during backfill: {str(e)}", err=True)
+            raise
+
+
+if __name__ == '__main__':
+    backfill_command()
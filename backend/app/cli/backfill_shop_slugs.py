@@ -0,0 +1,26 @@
+"""Management command to backfill persisted shop slugs."""
+
+import click
+from sqlmodel import Session
+from app.db import engine
+from app.services.shop_slug_service import backfill_shop_slugs
+
+
+@click.command()
+@click.option('--limit', type=int, default=None, help='Maximum number of shops to process (default: all)')
+@click.option('--batch-size', type=int, default=500, help='Shops per commit')
+def backfill_command(limit: int, batch_size: int):
+    """Backfill user.shop_slug for every shop that doesn't have one yet."""
+    click.echo("Starting shop slug backfill...")
+
+    with Session(engine) as db:
+        try:
+            updated = backfill_shop_slugs(db, batch_size=batch_size, limit=limit)
+            click.echo(f"✓ Successfully assigned slugs to {updated} shops")
+        except Exception as e:
+            click.echo(f"✗ Error during backfill: {str(e)}", err=True)
+            raise
+
+
+if __name__ == '__main__':
+    backfill_command()
@@ -29,6 +29,13 @@ class Settings(BaseSettings):
     BREVO_FROM_EMAIL: str = "marketing@suqafuran.com"
     BREVO_FROM_NAME: str = "Suqafuran"
 
+    # EMAIL DELIVERY (app/services/email_delivery.py)
+    EMAIL_DELIVERY_CONCURRENCY: int = 8  # Provider calls in flight at once per process
+    EMAIL_DELIVERY_BATCH_SIZE: int = 50  # Messages per provider batch call (Resend accepts up to 100)
+
+    # EMAIL ENGAGEMENT (app/services/email_engagement.py)
+    EMAIL_ENGAGEMENT_DEDUPE_SECONDS: int = 600  # Repeat opens/clicks from one client within this window count once
+
     # AFRICA'S TALKING (SMS notifications)
     AFRICASTALKING_USERNAME: str = "sandbox"
     AFRICASTALKING_API_KEY: str = ""
@@ -91,6 +98,41 @@ class Settings(BaseSettings):
             return f"redis://:{password}@{host}:{port}/{db}"
         return f"redis://{host}:{port}/{db}"
 
+    # CACHE (app/services/cache_service.py)
+    CACHE_L1_ENABLED: bool = True  # Per-process LRU in front of Redis for @cache.cached
+    CACHE_L1_MAX_BYTES: int = 32 * 1024 * 1024  # Per worker; sized by encoded JSON length
+    CACHE_L1_TTL: int = 5  # Seconds; short so cross-worker staleness stays bounded
+    CACHE_LOCK_TTL: int = 10  # Single-flight recompute lock lifetime (seconds)
+    CACHE_LOCK_WAIT: float = 2.0  # How long a waiter polls for the leader's result
+    CACHE_STALE_TTL: int = 300  # How long a stale copy may be served while recomputing
+
+    # ANALYTICS INGEST (app/services/analytics_ingest.py)
+    ANALYTICS_BUFFER_SIZE: int = 100_000  # Per-process ring buffer; oldest events drop when full
+    ANALYTICS_BATCH_SIZE: int = 500  # Flush as soon as this many events are buffered...
+    ANALYTICS_FLUSH_INTERVAL_MS: int = 1000  # ...or after this long, whichever comes first
+
+    # ANALYTICS ROLLUPS (app/services/analytics_rollup_service.py)
+    ANALYTICS_ROLLUP_LAG_SECONDS: int = 120  # Newer rows stay in the raw tail; covers ingest buffering
+    ANALYTICS_ROLLUP_STEP_HOURS: int = 24  # Raw window aggregated per transaction
+    ANALYTICS_ROLLUP_DAY_RETENTION_DAYS: int = 400  # Must exceed the longest dashboard window plus a month
+
+    # WEBSOCKET BACKPLANE (app/services/ws_backplane.py)
+    WS_BACKPLANE_ENABLED: bool = True  # Fan WebSocket broadcasts out to every worker/pod via Redis pub/sub
+    WS_PRESENCE_TTL_SECONDS: int = 90  # Presence of a worker that stops heartbeating expires after this
+    WS_SEND_QUEUE_SIZE: int = 256  # Messages queued per chat connection before a slow client is dropped
+
+    # LIVE DELIVERY TRACKING (services/live_location_service.py)
+    LIVE_DELIVERY_TTL_SECONDS: int = 12 * 3600  # Live state/trail of a delivery expire this long after its last update
+    LIVE_DELIVERY_DONE_TTL_SECONDS: int = 3600  # ...or this long after it is completed/cancelled
+    LIVE_LOCATION_PUSH_INTERVAL_SECONDS: float = 2.0  # At most one WebSocket push per delivery per interval
+    LIVE_LOCATION_BREADCRUMB_METERS: int = 25  # Skip trail points closer than this to the previous one...
+    LIVE_LOCATION_BREADCRUMB_SECONDS: int = 60  # ...unless this long has passed since it
+    LIVE_LOCATION_TRAIL_MAX: int = 2000  # Breadcrumbs kept per delivery
+    LIVE_RIDER_STALE_SECONDS: int = 120  # Riders silent this long drop out of nearby-rider searches
+
+    # ADMIN STATS (app/services/admin_stats_service.py)
+    ADMIN_STATS_MAX_STALENESS: int = 120  # Seconds; /admin/stats refreshes older snapshots inline
+
     # KAFKA
     KAFKA_BOOTSTRAP_SERVERS: str = "kafka:29092"  # Kafka broker address (internal Docker network)
     KAFKA_SASL_USERNAME: Optional[str] = None
@@ -98,6 +140,16 @@ class Settings(BaseSettings):
     KAFKA_SECURITY_PROTOCOL: str = "PLAINTEXT"
     KAFKA_SASL_MECHANISM: str = "PLAIN"
 
+    # KAFKA PRODUCER (app/services/kafka_producer.py)
+    KAFKA_LINGER_MS: int = 20  # Wait this long for more events to share a produce request
+    KAFKA_MAX_BATCH_BYTES: int = 128 * 1024  # Per-partition batch size
+    KAFKA_COMPRESSION_TYPE: Optional[str] = "lz4"  # lz4, zstd, gzip, snappy or None; lz4/zstd need cramjam
+    KAFKA_OUTBOX_SIZE: int = 10_000  # Events queued in-process; overflow goes to the kafka_outbox table
+    KAFKA_OUTBOX_RETRY_SECONDS: int = 30  # How often to reconnect and replay the kafka_outbox table
+    KAFKA_OUTBOX_REPLAY_BATCH: int = 500  # Rows replayed per transaction
+    KAFKA_OUTBOX_MAX_ATTEMPTS: int = 10  # Failed replays before a row is dead-lettered (kept, no longer replayed)
+    KAFKA_OUTBOX_RETENTION_HOURS: int = 72  # kafka_outbox rows older than this are deleted, replayed or not
+
     # Kafka Topics
     KAFKA_TOPIC_BUSINESS_EVENTS: str = "suqafuran-business-events"
     KAFKA_TOPIC_ORDERS: str = "suqafuran-orders"
@@ -155,6 +207,13 @@ class Settings(BaseSettings):
     ALLOWED_EXTENSIONS: Any = ["jpg", "jpeg", "png", "webp", "svg", "pdf", "gif"]
     ALLOWED_VIDEO_EXTENSIONS: Any = ["mp4", "webm", "mov", "avi", "mkv"]
     UPLOAD_DIR: str = "./uploads"
+    # Max pHash Hamming distance (of 64 bits) at which two listing photos
+    # count as the same image -- see app/services/image_hash_index.py
+    IMAGE_DUPLICATE_MAX_DISTANCE: int = 6
+    # Image pipeline (app/services/image_pipeline.py): worker processes
+    # rendering variants, and files processed at once per multi-upload
+    IMAGE_PIPELINE_WORKERS: int = 2
+    UPLOAD_CONCURRENCY: int = 4
 
     # CLOUDINARY
     CLOUDINARY_CLOUD_NAME: str = ""
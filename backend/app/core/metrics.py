@@ -43,3 +43,69 @@ ACTIVE_WEBSOCKET_CONNECTIONS = Gauge(
     "suqafuran_active_websocket_connections",
     "Number of currently active websocket connections"
 )
+
+# Cache Metrics (app/services/cache_service.py)
+CACHE_REQUESTS_TOTAL = Counter(
+    "suqafuran_cache_requests_total",
+    "Cache lookups by tier and outcome",
+    ["tier", "result"] # tier: l1/redis, result: hit/miss
+)
+
+CACHE_COALESCED_TOTAL = Counter(
+    "suqafuran_cache_coalesced_total",
+    "Cache misses that did not recompute because another worker held the single-flight lock",
+    ["outcome"] # stale, waited, timeout
+)
+
+CACHE_L1_BYTES = Gauge(
+    "suqafuran_cache_l1_bytes",
+    "Encoded size of entries currently held in this process's L1 cache"
+)
+
+# Analytics Ingest Metrics (app/services/analytics_ingest.py)
+ANALYTICS_EVENTS_TOTAL = Counter(
+    "suqafuran_analytics_events_total",
+    "Tracking events by kind and outcome",
+    ["kind", "outcome"] # outcome: written, dropped (buffer full), failed (rejected by the DB)
+)
+
+ANALYTICS_BUFFERED_EVENTS = Gauge(
+    "suqafuran_analytics_buffered_events",
+    "Tracking events waiting in this process's ingest buffer"
+)
+
+# Email Delivery Metrics (app/services/email_delivery.py)
+EMAILS_DELIVERED_TOTAL = Counter(
+    "suqafuran_emails_delivered_total",
+    "Outgoing emails by provider and outcome",
+    ["provider", "outcome"] # outcome: sent, failed (every provider refused)
+)
+
+EMAIL_DELIVERY_SECONDS = Histogram(
+    "suqafuran_email_delivery_seconds",
+    "Time per provider call (one batch of messages)",
+    ["provider"]
+)
+
+EMAIL_DELIVERIES_IN_FLIGHT = Gauge(
+    "suqafuran_email_deliveries_in_flight",
+    "Provider calls currently running in this process"
+)
+
+# Kafka Producer Metrics (app/services/kafka_producer.py)
+KAFKA_EVENTS_TOTAL = Counter(
+    "suqafuran_kafka_events_total",
+    "Domain events by outcome",
+    ["outcome"] # published, spilled (written to kafka_outbox), replayed (from kafka_outbox), dropped,
+                # dead_lettered (out of replay attempts), expired (aged out of kafka_outbox)
+)
+
+KAFKA_PUBLISH_SECONDS = Histogram(
+    "suqafuran_kafka_publish_seconds",
+    "Time from publish_event to the broker's acknowledgement"
+)
+
+KAFKA_OUTBOX_DEPTH = Gauge(
+    "suqafuran_kafka_outbox_depth",
+    "Events waiting in this process's in-memory Kafka outbox"
+)
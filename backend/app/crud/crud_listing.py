@@ -1,15 +1,50 @@
 from typing import List, Optional
-from sqlmodel import Session, select, func
-from sqlalchemy import or_
+from sqlmodel import Session, select
+from sqlalchemy import tuple_, update
 from sqlalchemy.orm import selectinload
 from app.models.listing import Listing, ListingBase, Category, SubSubCategory
 from app.models.subcategory import Subcategory
+from app.utils.pagination import InvalidCursor, cursor_datetime, decode_cursor, encode_cursor
 
 
 def get_listing(db: Session, id: int) -> Optional[Listing]:
     return db.exec(select(Listing).where(Listing.id == id).options(selectinload(Listing.owner))).first()
 
 
+def listing_feed_cursor(listing: Listing, search: Optional[str] = None) -> str:
+    """Encode the feed sort tuple of `listing` as an opaque next-page cursor.
+
+    Must mirror the ORDER BY in get_listings() column for column; pass the
+    same `search` so a relevance-ordered page gets a search cursor.
+    """
+    if search:
+        from app.services.search_service import search_cursor
+        return search_cursor(listing)
+    return encode_cursor({
+        "b": listing.boost_level or 0,
+        "t": listing.owner_trust_score or 0,
+        "c": listing.created_at,
+        "v": bool(listing.owner_is_verified),
+        "i": listing.id,
+    })
+
+
+def _feed_keyset_filter(cursor: str):
+    """WHERE clause selecting rows that sort strictly after `cursor`."""
+    values = decode_cursor(cursor)
+    try:
+        boost, trust, verified, last_id = int(values["b"]), int(values["t"]), bool(values["v"]), int(values["i"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor("Malformed pagination cursor") from e
+    created_at = cursor_datetime(values.get("c"))
+    # Every sort column is DESC, so "after" is a plain row-value less-than,
+    # which ix_listing_feed_rank serves as an index seek
+    return (
+        tuple_(Listing.boost_level, Listing.owner_trust_score, Listing.created_at, Listing.owner_is_verified, Listing.id)
+        < tuple_(boost, trust, created_at, verified, last_id),
+    )
+
+
 def get_listings(
     db: Session,
     *,
@@ -23,55 +58,45 @@ def get_listings(
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
 ) -> List[Listing]:
+    """
+    Ranked listing feed. Pages by OFFSET (`skip`) unless a keyset `cursor`
+    from listing_feed_cursor() is given, in which case `skip` is ignored.
+    With `search`, results are ordered by relevance instead (see
+    app/services/search_service.py). Raises InvalidCursor for a token
+    that doesn't decode.
+    """
     from app.models.user import User
-    statement = (
-        select(Listing)
-        .join(User, Listing.owner_id == User.id)
-        .where(User.is_suspended == False) # Security: Hide listings from suspended scammers
-        .order_by(
-            Listing.boost_level.desc(), 
-            User.trust_score.desc(), # Primary anti-scam signal for ranking
-            Listing.created_at.desc(),
-            User.is_verified.desc()
+    from app.services.search_service import search_statement
+    if search:
+        statement = search_statement(search, cursor=cursor)
+    else:
+        # Security: Hide listings from suspended scammers. A NOT IN filter
+        # rather than a join: Postgres guesses the keyset seek matches ~1 row,
+        # and with a join it then hash-joins and re-sorts everything after the
+        # cursor instead of reading ix_listing_feed_rank in order
+        suspended = select(User.id).where(User.is_suspended == True)  # noqa: E712
+        statement = (
+            select(Listing)
+            .where(Listing.owner_id.not_in(suspended))
+            .order_by(
+                Listing.boost_level.desc(), 
+                Listing.owner_trust_score.desc(), # Primary anti-scam signal for ranking
+                Listing.created_at.desc(),
+                Listing.owner_is_verified.desc(),
+                Listing.id.desc(),  # Unique tie-breaker so keyset cursors never skip/repeat rows
+            )
         )
-        .offset(skip)
-        .limit(limit)
-        .options(selectinload(Listing.owner))
-    )
+        if cursor:
+            statement = statement.where(*_feed_keyset_filter(cursor))
+    statement = statement.limit(limit).options(selectinload(Listing.owner))
+    if not cursor:
+        statement = statement.offset(skip)
     if category_id:
         statement = statement.where(Listing.category_id == category_id)
     if owner_id:
         statement = statement.where(Listing.owner_id == owner_id)
-    if search:
-        search_filter = f"%{search}%"
-        # Full-text match over title/description PLUS the listing's own
-        # category/subcategory/subsubcategory names, with English stemming --
-        # this is what makes a generic term like "shoes" or "clothes" match
-        # items filed under Shoes/Clothing even when the listing's own text
-        # never uses that exact word ("clothes" and "Clothing" share a stem).
-        # Somali fields keep plain substring matching since English stemming
-        # doesn't apply to Somali text.
-        statement = (
-            statement
-            .join(Category, Listing.category_id == Category.id, isouter=True)
-            .join(Subcategory, Listing.subcategory_id == Subcategory.id, isouter=True)
-            .join(SubSubCategory, Listing.subsubcategory_id == SubSubCategory.id, isouter=True)
-            .where(
-                or_(
-                    func.to_tsvector(
-                        'english',
-                        func.coalesce(Listing.title_en, '') + ' ' +
-                        func.coalesce(Listing.description_en, '') + ' ' +
-                        func.coalesce(Category.name_en, '') + ' ' +
-                        func.coalesce(Subcategory.name_en, '') + ' ' +
-                        func.coalesce(SubSubCategory.name_en, '')
-                    ).op('@@')(func.plainto_tsquery('english', search)),
-                    Listing.title_so.ilike(search_filter),
-                    Listing.description_so.ilike(search_filter),
-                )
-            )
-        )
     if location:
         statement = statement.where(Listing.location.ilike(f"%{location}%"))
     if min_price is not None:
@@ -110,8 +135,11 @@ def get_listings(
                     if ssc:
                         statement = statement.where(Listing.subsubcategory_id == ssc.id)
         
-        for key, value in attrs_copy.items():
-            statement = statement.where(func.json_extract_path_text(Listing.attributes, key) == str(value))
+        # JSONB containment so ix_listing_attributes_jsonb applies; a list
+        # value matches any of its entries
+        from app.services.facet_service import attribute_match, normalize_filters
+        for key, values in normalize_filters(attrs_copy).items():
+            statement = statement.where(attribute_match(key, values))
     
     return db.exec(statement).all()
 
@@ -119,8 +147,15 @@ def get_listings(
 def create_listing(
     db: Session, *, listing_in: ListingBase, owner_id: int
 ) -> Listing:
+    from app.models.user import User
+    owner = db.get(User, owner_id)
     db_obj = Listing.model_validate(
-        listing_in, update={"owner_id": owner_id}
+        listing_in,
+        update={
+            "owner_id": owner_id,
+            "owner_trust_score": (owner.trust_score or 0) if owner else 0,
+            "owner_is_verified": bool(owner.is_verified) if owner else False,
+        },
     )
     db.add(db_obj)
     db.commit()
@@ -140,6 +175,21 @@ def update_listing(
     return db_obj
 
 
+def sync_owner_ranking(db: Session, user) -> None:
+    """Copy `user`'s trust_score / is_verified onto their listings' owner_*
+    columns, which the feed ranks by. Call wherever either changes, before
+    the commit that saves the user, so both land in one transaction."""
+    db.execute(
+        update(Listing)
+        .where(
+            Listing.owner_id == user.id,
+            (Listing.owner_trust_score != (user.trust_score or 0))
+            | (Listing.owner_is_verified != bool(user.is_verified)),
+        )
+        .values(owner_trust_score=user.trust_score or 0, owner_is_verified=bool(user.is_verified))
+    )
+
+
 def remove_listing(db: Session, *, id: int) -> Listing:
     obj = db.get(Listing, id)
     if obj:
@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Optional
 from sqlmodel import Session, select, func
 from app.core.security import get_password_hash, verify_password
+from app.crud.crud_listing import sync_owner_ranking
 from app.models.user import User, UserCreate, UserUpdate
 
 
@@ -93,10 +94,14 @@ def update_user(db: Session, db_obj: User, user_in: UserUpdate) -> User:
     
     for field, value in update_data.items():
         setattr(db_obj, field, value)
+    if "trust_score" in update_data or "is_verified" in update_data:
+        sync_owner_ranking(db, db_obj)
+    from app.services.shop_slug_service import assign_shop_slug, commit_shop_rename
+    if "business_name" in update_data:
+        assign_shop_slug(db, db_obj)
     
     db_obj.updated_at = datetime.utcnow()
-    db.add(db_obj)
-    db.commit()
+    commit_shop_rename(db, db_obj)
     db.refresh(db_obj)
     return db_obj
 
@@ -105,6 +110,7 @@ def verify_user(db: Session, db_obj: User) -> User:
     db_obj.is_verified = True
     db_obj.updated_at = datetime.utcnow()
     db.add(db_obj)
+    sync_owner_ranking(db, db_obj)
     db.commit()
     db.refresh(db_obj)
     return db_obj
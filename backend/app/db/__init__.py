@@ -1,3 +1,3 @@
-from app.db.session import SessionLocal, init_db, get_db as get_session, engine
+from app.db.session import SessionLocal, init_db, get_db as get_session, engine, AsyncSessionLocal, get_async_db as get_async_session, async_engine
 
-__all__ = ["SessionLocal", "init_db", "get_session", "engine"]
+__all__ = ["SessionLocal", "init_db", "get_session", "engine", "AsyncSessionLocal", "get_async_session", "async_engine"]
@@ -1,5 +1,8 @@
 import os
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
 
 # Configurable per-process -- backend, celery-worker, and celery-beat each run
@@ -24,6 +27,45 @@ engine = create_engine(
     connect_args={"connect_timeout": 10, "options": "-c statement_timeout=30000"},
 )
 
+# asyncpg-backed engine for `async def` endpoints, so their queries await
+# instead of blocking the event loop (and every other request/WebSocket on
+# the worker) the way a sync Session does there. Sized from the same env
+# vars as `engine`; DB_ASYNC_POOL_SIZE/DB_ASYNC_MAX_OVERFLOW override them
+# once most traffic has moved over and the two pools should be split
+# differently. The engine connects lazily, so processes that never use it
+# (celery-worker, celery-beat) don't spend connections on it.
+ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", str(POOL_SIZE)))
+ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", str(MAX_OVERFLOW)))
+
+
+def _async_database_url():
+    """DATABASE_URL on the asyncpg driver, plus connect args it needs instead of libpq's."""
+    url = make_url(settings.DATABASE_URL)
+    query = dict(url.query)
+    connect_args = {"timeout": 10, "server_settings": {"statement_timeout": "30000"}}
+    # asyncpg takes `ssl`, not libpq's `sslmode` (managed Postgres URLs carry ?sslmode=require)
+    sslmode = query.pop("sslmode", None)
+    if sslmode:
+        connect_args["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+_async_url, _async_connect_args = _async_database_url()
+
+async_engine = create_async_engine(
+    _async_url,
+    pool_pre_ping=True,
+    pool_recycle=60,
+    pool_size=ASYNC_POOL_SIZE,
+    max_overflow=ASYNC_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    connect_args=_async_connect_args,
+)
+
+# expire_on_commit=False: an expired attribute would reload lazily on
+# access, which AsyncSession can't do outside an await
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 
 def SessionLocal():
     return Session(engine)
@@ -37,3 +79,9 @@ def init_db():
 def get_db():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_db():
+    """AsyncSession for `async def` endpoints; await its queries instead of blocking the loop."""
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -98,7 +98,6 @@ async def logging_middleware(request: Request, call_next):
     return response
 
 
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
 
 # GZip Compression (added first, so it executes last/innermost)
@@ -120,10 +119,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve uploaded files
+# Serve uploaded files (listing photos as their resized rendition, see LocalImageFiles)
 import os
+from app.services.storage_service import LocalImageFiles
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-app.mount("/api/v1/listings/images", StaticFiles(directory=settings.UPLOAD_DIR), name="images")
+app.mount("/api/v1/listings/images", LocalImageFiles(directory=settings.UPLOAD_DIR), name="images")
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 # Monitoring
@@ -156,6 +156,13 @@ async def ensure_checkout_receipt_schema():
         logger.error(f"Failed to ensure checkout_receipt schema: {e}")
 
 
+@app.on_event("startup")
+async def start_ws_backplane():
+    """Fan WebSocket broadcasts and presence out across workers via Redis."""
+    from app.services.ws_backplane import ws_backplane
+    await ws_backplane.start()
+
+
 @app.on_event("startup")
 async def start_background_event_consumer():
     """
@@ -226,6 +233,19 @@ async def start_background_event_consumer():
     email_notifier.start()
 
 
+@app.on_event("shutdown")
+def flush_analytics_ingest():
+    """Write out tracking events still waiting in the ingest buffer."""
+    from app.services.analytics_ingest import analytics_ingest
+    analytics_ingest.stop()
+
+
+@app.on_event("shutdown")
+async def stop_ws_backplane():
+    from app.services.ws_backplane import ws_backplane
+    await ws_backplane.stop()
+
+
 @app.on_event("shutdown")
 async def stop_kafka_services():
     """Gracefully shut down Kafka services."""
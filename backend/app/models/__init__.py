@@ -17,9 +17,14 @@ from app.models.site_content import SiteContent
 from app.models.support import SupportTicket
 from app.models.device import Device, UserDeviceLink
 from app.models.fraud import FraudEvent, RiskHistory
-from app.models.email_log import EmailLog
+from app.models.email_log import EmailLog, EmailEngagementEvent
 from app.models.campaign_send_log import CampaignSendLog
 from app.models.broadcast_job import BroadcastJob, BroadcastJobRecipient
+from app.models.shop_stats import ShopStats
+from app.models.listing_image_hash import ListingImageHash
+from app.models.analytics_rollup import SellerEventRollup, AnalyticsRollup, RollupWatermark
+from app.models.kafka_outbox import KafkaOutboxEvent
+from app.models.view_flush import ViewFlushBatch
 from app.models.otp_log import OTPLog
 from app.models.saved_address import SavedAddress
 from app.models.order import Order, OrderItem, OrderStatus, FulfillmentType
@@ -78,6 +83,7 @@ __all__ = [
     "VerificationRequest",
     "Wallet",
     "EmailLog",
+    "EmailEngagementEvent",
     "Transaction",
     "Favorite",
     "Notification",
@@ -150,4 +156,11 @@ __all__ = [
     "APIKey",
     "CustomDomain",
     "AdvertisingCredit",
+    "ShopStats",
+    "ListingImageHash",
+    "SellerEventRollup",
+    "AnalyticsRollup",
+    "RollupWatermark",
+    "KafkaOutboxEvent",
+    "ViewFlushBatch",
 ]
@@ -0,0 +1,49 @@
+"""Pre-aggregated analytics rollups and their watermarks."""
+
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import Column, LargeBinary
+from sqlmodel import Field, SQLModel
+
+
+class SellerEventRollup(SQLModel, table=True):
+    """Daily AnalyticsEvent counts per seller, event type and source.
+
+    Rebuilt for each completed day by app.tasks.analytics_rollup_tasks;
+    AnalyticsService answers seller dashboards from these rows plus the
+    raw events newer than the "seller_events" watermark."""
+    __tablename__ = "seller_event_rollup"
+
+    seller_id: int = Field(foreign_key="user.id", primary_key=True)
+    day: date = Field(primary_key=True)
+    event_type: str = Field(primary_key=True)
+    source: str = Field(primary_key=True)  # AnalyticsEvent.source, "direct" when unset
+    count: int = Field(default=0)
+
+
+class AnalyticsRollup(SQLModel, table=True):
+    """Admin analytics counters per day or month bucket, maintained by
+    app/services/analytics_rollup_service.py.
+
+    `dim` is the grouping value as text (a listing id, a device type, ...);
+    `users`/`guests` are HyperLogLog sketches (app/utils/hll.py) of the
+    distinct user ids / IP addresses seen, for metrics that report them."""
+    __tablename__ = "analytics_rollup"
+
+    granularity: str = Field(primary_key=True)  # "day" or "month"
+    bucket_start: datetime = Field(primary_key=True)
+    metric: str = Field(primary_key=True)  # e.g. "item_views", "shop_clicks:chat"
+    dim: str = Field(primary_key=True)
+    count: int = Field(default=0)
+    users: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
+    guests: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
+
+
+class RollupWatermark(SQLModel, table=True):
+    """How far a rollup has been built: raw rows before `rolled_until`
+    are covered by the rollup table, later ones must be read directly."""
+    __tablename__ = "rollup_watermark"
+
+    name: str = Field(primary_key=True)
+    rolled_until: datetime
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import UniqueConstraint
 from sqlmodel import Field, SQLModel
 import secrets
 
@@ -19,3 +20,20 @@ class EmailLog(SQLModel, table=True):
     provider_used: Optional[str] = None
     campaign_id: Optional[str] = None
     metadata_json: Optional[str] = None
+
+
+class EmailEngagementEvent(SQLModel, table=True):
+    """One open or click of a tracked email, appended by
+    app/services/email_engagement.py. EmailLog.opened_at/clicked_at keep
+    the first of each; this table keeps every distinct hit."""
+    __tablename__ = "email_engagement_event"
+    __table_args__ = (UniqueConstraint("tracking_token", "action", "hit_key"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tracking_token: str
+    action: str  # open, click
+    hit_key: str  # digest of ip/user agent/redirect url + dedupe window
+    ip: Optional[str] = None
+    user_agent: Optional[str] = None
+    redirect_url: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,25 @@
+"""Durable fallback for domain events Kafka could not take."""
+
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Column, Text
+from sqlmodel import Field, SQLModel
+
+
+class KafkaOutboxEvent(SQLModel, table=True):
+    """An event app/services/kafka_producer.py failed to publish (broker
+    down, or the in-process outbox full). The producer replays these in id
+    order once Kafka is reachable and deletes each row it delivers. Rows
+    that fail KAFKA_OUTBOX_MAX_ATTEMPTS replays are dead-lettered: left
+    for inspection but skipped. Every row is deleted after
+    KAFKA_OUTBOX_RETENTION_HOURS."""
+    __tablename__ = "kafka_outbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    topic: str
+    key: Optional[str] = None
+    value: str = Field(sa_column=Column(Text, nullable=False))  # the serialized event envelope
+    event_type: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    attempts: int = Field(default=0)  # failed replays so far
+    last_error: Optional[str] = None
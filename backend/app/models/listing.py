@@ -61,6 +61,13 @@ class Listing(ListingBase, table=True):
     owner_id: int = Field(foreign_key="user.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # The owner's trust_score / is_verified, copied here so the feed's ORDER BY
+    # is all listing columns and ix_listing_feed_rank serves the keyset seek;
+    # crud_listing.sync_owner_ranking() keeps them in step with the user row
+    owner_trust_score: int = Field(default=0)
+    owner_is_verified: bool = Field(default=False)
+    # Set only by the image pipeline, never by clients -- hence not in ListingBase
+    image_variants: Optional[dict] = Field(default={}, sa_column=Column(JSON)) # {image url: {"thumb"|"card"|"full": {"webp"|"avif": url}}}, filled by the image pipeline
 
     owner: Optional["User"] = Relationship(
         back_populates="listings",
@@ -73,9 +80,16 @@ class ListingRead(ListingBase):
     owner_id: int
     created_at: datetime
     updated_at: datetime
+    image_variants: Optional[dict] = {}
     owner: Optional[OwnerRead] = None
 
 
+class ListingPage(SQLModel):
+    """Cursor-mode page of the listing feed; pass next_cursor back as `cursor`."""
+    items: List[ListingRead]
+    next_cursor: Optional[str] = None
+
+
 class Category(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name_en: str = Field(index=True)
@@ -0,0 +1,24 @@
+"""Perceptual-hash index over listing images for near-duplicate lookup."""
+
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import BigInteger, Column
+from sqlmodel import Field, SQLModel
+
+
+class ListingImageHash(SQLModel, table=True):
+    """One row per (listing, image pHash), maintained by
+    app/services/image_hash_index.py. The 64-bit hash is also split into
+    four 16-bit bands, each indexed, so a Hamming-distance search probes a
+    handful of exact band values instead of scanning every hash."""
+    __tablename__ = "listing_image_hash"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    listing_id: int = Field(foreign_key="listing.id", index=True)
+    owner_id: int = Field(index=True)
+    phash: int = Field(sa_column=Column(BigInteger, nullable=False))  # signed 64-bit view of the hash
+    band_0: int = Field(index=True)
+    band_1: int = Field(index=True)
+    band_2: int = Field(index=True)
+    band_3: int = Field(index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
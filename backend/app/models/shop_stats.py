@@ -0,0 +1,24 @@
+"""Per-shop listing aggregates for the shop directory."""
+
+from datetime import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+
+
+class ShopStats(SQLModel, table=True):
+    """One row per shop, kept current by app/services/shop_stats_service.py
+    whenever one of its listings is created, moderated, edited or deleted,
+    and reconciled against the listing table nightly. Lets the public and
+    admin shop directories join a row per shop instead of aggregating every
+    listing on each request."""
+    __tablename__ = "shop_stats"
+
+    owner_id: int = Field(foreign_key="user.id", primary_key=True)
+    total_count: int = Field(default=0)
+    active_count: int = Field(default=0, index=True)
+    pending_count: int = Field(default=0)
+    sold_count: int = Field(default=0)
+    deleted_count: int = Field(default=0)
+    latest_listing_at: Optional[datetime] = Field(default=None)  # newest *active* listing
+    primary_category_id: Optional[int] = Field(default=None, foreign_key="category.id", index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -74,6 +74,7 @@ class UserBase(SQLModel):
 
     # Shop/Business Fields
     business_name: Optional[str] = Field(default=None)  # Business/shop name
+    shop_slug: Optional[str] = Field(default=None, unique=True, index=True)  # Derived from business_name, see shop_slug_service
     shop_description: Optional[str] = Field(default=None)  # Shop description
     shop_page_banner: Optional[str] = Field(default=None)  # Banner for shops listing page
     shop_detail_banner: Optional[str] = Field(default=None)  # Banner for shop detail page
@@ -0,0 +1,15 @@
+"""Markers for view-counter batches already applied to the database."""
+
+from datetime import datetime
+from sqlmodel import Field, SQLModel
+
+
+class ViewFlushBatch(SQLModel, table=True):
+    """One row per batch app/services/view_counter_service.py has applied,
+    written in the same transaction as the batch itself. A flush that dies
+    after committing but before clearing its Redis key finds the marker on
+    the retry and skips the batch instead of counting it twice."""
+    __tablename__ = "view_flush_batch"
+
+    id: str = Field(primary_key=True)  # "<key>:<batch uuid>[:<chunk offset>]"
+    flushed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,196 @@
+"""
+Snapshot of the platform-wide stats on the admin dashboard.
+
+The Management Overview polls /admin/stats, which used to run ~20 separate
+COUNT queries per call -- and per admin with the dashboard open. The stats
+are now computed with one query per table -- COUNT(*) FILTER (WHERE ...)
+for the tables with several counts -- and kept as a snapshot in Redis:
+
+- app.tasks.admin_stats_tasks.refresh_admin_stats recomputes it every
+  minute, so the endpoint normally just reads it
+- a read older than `max_staleness` seconds refreshes it inline; the
+  refresh is single-flight (a Redis lock), so admins asking at once share
+  one computation instead of each running the queries
+
+If Redis is unavailable the stats are computed directly, as before.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlmodel import Session, func, select
+
+from app.core.config import settings
+from app.models.listing import Listing
+from app.models.message import Message
+from app.models.promotion import Promotion, PromotionStatus
+from app.models.report import ListingReport
+from app.models.user import User
+from app.models.verification import VerificationRequest, VerificationStatus
+from app.services.cache_service import cache
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "admin:stats:snapshot"
+SNAPSHOT_TTL = 24 * 3600
+REFRESH_LOCK_KEY = "admin:stats:refresh_lock"
+REFRESH_LOCK_TTL = 60
+# How long a reader waits for someone else's refresh before serving the old snapshot
+REFRESH_WAIT = 5.0
+
+
+def compute_admin_stats(db: Session) -> Dict[str, Any]:
+    """
+    Platform-wide stats for the admin dashboard's Management Overview.
+    Sellers are defined the same way the rest of the app already does (a
+    business_name set), matching get_public_shops -- there's no separate
+    is_seller flag on User.
+    """
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = now - timedelta(days=7)
+    month_start = now - timedelta(days=30)
+    prev_month_start = now - timedelta(days=60)
+
+    is_seller = User.business_name.isnot(None)
+    users = db.exec(
+        select(
+            func.count(),
+            func.count().filter(User.is_active == True),  # noqa: E712
+            func.count().filter(User.is_suspended == True),  # noqa: E712
+            func.count().filter(is_seller, User.is_active == True),  # noqa: E712
+            func.count().filter(is_seller, User.is_verified == True),  # noqa: E712
+            func.count().filter(User.created_at >= today_start),
+            func.count().filter(User.created_at >= week_start),
+            func.count().filter(User.created_at >= month_start),
+            func.count().filter(User.created_at >= prev_month_start, User.created_at < month_start),
+        ).select_from(User)
+    ).one()
+    (total_users, active_users, suspended_accounts, active_sellers, verified_sellers,
+     new_signups_today, new_signups_week, new_signups_month, signups_prev_month) = users
+
+    listings = db.exec(
+        select(
+            func.count(),
+            func.count().filter(Listing.status == "active"),
+            func.count().filter(Listing.status == "pending"),
+            func.count().filter(Listing.created_at >= today_start),
+            func.count(func.distinct(Listing.owner_id)).filter(
+                Listing.status == "active", User.is_verified == True  # noqa: E712
+            ),
+        )
+        .select_from(Listing)
+        .outerjoin(User, User.id == Listing.owner_id)
+    ).one()
+    total_listings, active_listings, pending_listings, listings_today, total_shops = listings
+
+    # Tables with a single condition: a plain WHERE lets Postgres use the status index
+    pending_promotions = db.exec(
+        select(func.count(Promotion.id)).where(Promotion.status == PromotionStatus.SUBMITTED)
+    ).one()
+    pending_seller_verifications = db.exec(
+        select(func.count(VerificationRequest.id)).where(VerificationRequest.status == VerificationStatus.PENDING)
+    ).one()
+    reported_listings, open_disputes = db.exec(
+        select(func.count(func.distinct(ListingReport.listing_id)), func.count(ListingReport.id))
+        .where(ListingReport.status == "pending")
+    ).one()
+    messages_today = db.exec(
+        select(func.count(Message.id)).where(Message.created_at >= today_start)
+    ).one()
+
+    signups_this_month = new_signups_month
+    growth_rate = (
+        round((signups_this_month - signups_prev_month) / signups_prev_month * 100, 1)
+        if signups_prev_month else (100.0 if signups_this_month else 0.0)
+    )
+
+    return {
+        "total_users": total_users,
+        "active_users": active_users,
+        "active_sellers": active_sellers,
+        "active_buyers": max(active_users - active_sellers, 0),
+        "total_shops": total_shops,
+        "total_listings": total_listings,
+        "active_listings": active_listings,
+        "pending_listings": pending_listings,
+        "pending_promotions": pending_promotions,
+        "verified_sellers": verified_sellers,
+        "pending_seller_verifications": pending_seller_verifications,
+        "suspended_accounts": suspended_accounts,
+        "reported_listings": reported_listings,
+        "open_disputes": open_disputes,
+        "new_signups_today": new_signups_today,
+        "new_signups_this_week": new_signups_week,
+        "new_signups_this_month": new_signups_month,
+        "new_users_this_week": new_signups_week,  # legacy key the dashboard already read
+        "platform_growth_rate": growth_rate,
+        "marketplace_activity": {
+            "listings_posted_today": listings_today,
+            "messages_sent_today": messages_today,
+        },
+    }
+
+
+def _store(db: Session) -> Dict[str, Any]:
+    snapshot = {"computed_at": time.time(), "stats": compute_admin_stats(db)}
+    cache.set(SNAPSHOT_KEY, snapshot, ttl=SNAPSHOT_TTL)
+    return snapshot
+
+
+def _try_lock() -> Optional[str]:
+    """Our lock token if we hold the refresh lock, None if someone else does, "" if Redis is down."""
+    try:
+        return cache.acquire_lock(REFRESH_LOCK_KEY, REFRESH_LOCK_TTL)
+    except Exception:
+        return ""
+
+
+def refresh_admin_stats(db: Session) -> Optional[Dict[str, Any]]:
+    """Recompute the snapshot; None if a refresh is already in progress."""
+    token = _try_lock()
+    if token is None:
+        return None
+    try:
+        return _store(db)
+    finally:
+        if token:
+            try:
+                # Compare-and-delete: a refresh that outran REFRESH_LOCK_TTL
+                # must not release the lock a newer refresh now holds
+                cache.release_lock(REFRESH_LOCK_KEY, token)
+            except Exception:
+                pass  # Expires on its own after REFRESH_LOCK_TTL
+
+
+def get_admin_stats(db: Session, max_staleness: Optional[int] = None) -> Dict[str, Any]:
+    """
+    The latest snapshot, refreshed first if it is older than `max_staleness`
+    seconds (default ADMIN_STATS_MAX_STALENESS; 0 forces a refresh).
+
+    Returns:
+        {"computed_at": epoch seconds, "stats": {...}}
+    """
+    if max_staleness is None:
+        max_staleness = settings.ADMIN_STATS_MAX_STALENESS
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot and time.time() - snapshot["computed_at"] <= max_staleness:
+        return snapshot
+
+    fresh = refresh_admin_stats(db)
+    if fresh:
+        return fresh
+
+    # Another worker is refreshing: take its result rather than repeat the queries
+    deadline = time.monotonic() + REFRESH_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        latest = cache.get(SNAPSHOT_KEY)
+        if latest and (not snapshot or latest["computed_at"] > snapshot["computed_at"]):
+            return latest
+    if snapshot:
+        return snapshot
+    logger.warning("Admin stats refresh still running elsewhere, computing directly")
+    return _store(db)
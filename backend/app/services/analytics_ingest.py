@@ -0,0 +1,273 @@
+"""
+Batched ingestion for the analytics tracking endpoints.
+
+Tracking calls (item/shop views, searches, clicks, funnel events, ad
+impressions) used to open a session and commit one row per HTTP request,
+and banner impressions did a read-modify-write on a single stats row. Now
+an endpoint only validates and appends the event to a per-process ring
+buffer (a bounded deque -- when full, the oldest events are dropped rather
+than blocking the request), then returns 202.
+
+A daemon thread drains the buffer every ANALYTICS_FLUSH_INTERVAL_MS, or
+as soon as ANALYTICS_BATCH_SIZE events are waiting:
+- event rows go in as one multi-row INSERT per table
+- counter events are summed per target first, then applied as one
+  `SET n = n + delta` UPDATE per counter table (atomic, no read first)
+
+Events are held in memory until flushed, so a crash loses at most one
+interval's worth; the shutdown hook flushes whatever is left. A flush that
+can't reach the database puts its events back at the front of the buffer
+for the next one (as many as fit -- the rest are counted as dropped); rows
+the database rejects are counted as failed.
+
+Usage:
+    from app.services.analytics_ingest import analytics_ingest
+    analytics_ingest.track(ItemView, listing_id=42, user_id=None)
+    analytics_ingest.count_banner_impression(banner_id)
+"""
+
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Tuple, Type
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, select
+
+from app.core.config import settings
+from app.core.metrics import ANALYTICS_BUFFERED_EVENTS, ANALYTICS_EVENTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+BANNER_IMPRESSION = "banner_impression"
+LISTING_AD_IMPRESSION = "listing_ad_impression"
+
+
+def _kind_label(kind: Any) -> str:
+    return str(getattr(kind, "__tablename__", kind))
+
+
+def _fill_defaults(model: Type[SQLModel], row: Dict[str, Any], factories: bool) -> Dict[str, Any]:
+    """Fill `row`'s missing fields from the model: default_factory ones or plain defaults."""
+    for name, field in model.model_fields.items():
+        if name in row:
+            continue
+        if field.default_factory is not None:
+            if factories:
+                row[name] = field.default_factory()
+        elif not factories:
+            row[name] = None if field.is_required() else field.default
+    return row
+
+
+class AnalyticsIngest:
+    def __init__(self):
+        self._buffer: deque = deque(maxlen=settings.ANALYTICS_BUFFER_SIZE)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # -- producer side (request path) --------------------------------------
+
+    def _enqueue(self, kind: Any, payload: Any) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            ANALYTICS_EVENTS_TOTAL.labels(kind=_kind_label(kind), outcome="dropped").inc()
+        self._buffer.append((kind, payload))
+        if self._thread is None:
+            self.start()
+        if len(self._buffer) >= settings.ANALYTICS_BATCH_SIZE:
+            self._wakeup.set()
+
+    def track(self, model: Type[SQLModel], **fields: Any) -> Dict[str, Any]:
+        """
+        Queue one row for `model`'s table. id/timestamp defaults are filled
+        now, so they reflect when the event happened, not when it's written.
+
+        Returns:
+            The row as it will be inserted
+        """
+        row = _fill_defaults(model, fields, factories=True)
+        self._enqueue(model, row)
+        return row
+
+    def count_banner_impression(self, banner_id: int) -> None:
+        self._enqueue(BANNER_IMPRESSION, banner_id)
+
+    def count_listing_ad_impression(self, listing_id: int) -> None:
+        self._enqueue(LISTING_AD_IMPRESSION, listing_id)
+
+    # -- consumer side (flush thread) --------------------------------------
+
+    def start(self) -> None:
+        """Start the flush thread (idempotent)."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="analytics-ingest", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write out anything still buffered."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+        # Put back by a flush that couldn't reach the database; nothing will retry them now
+        for kind, _ in self._drain():
+            ANALYTICS_EVENTS_TOTAL.labels(kind=_kind_label(kind), outcome="dropped").inc()
+
+    def _run(self) -> None:
+        interval = settings.ANALYTICS_FLUSH_INTERVAL_MS / 1000
+        while not self._stopping:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Analytics flush failed: {e}")
+
+    def _drain(self) -> List[Tuple[Any, Any]]:
+        events = []
+        try:
+            while True:
+                events.append(self._buffer.popleft())
+        except IndexError:
+            pass
+        return events
+
+    def _requeue(self, events: List[Tuple[Any, Any]]) -> None:
+        """Put drained `events` back in front of anything queued since, as
+        many as fit; the oldest of them are dropped first, as on overflow."""
+        excess = max(len(events) - (self._buffer.maxlen - len(self._buffer)), 0)
+        for kind, _ in events[:excess]:
+            ANALYTICS_EVENTS_TOTAL.labels(kind=_kind_label(kind), outcome="dropped").inc()
+        self._buffer.extendleft(reversed(events[excess:]))
+        ANALYTICS_BUFFERED_EVENTS.set(len(self._buffer))
+
+    def flush(self) -> Dict[str, int]:
+        """
+        Write out everything buffered so far.
+
+        Returns:
+            Events written per table/counter
+        """
+        from app.db.session import engine
+
+        events = self._drain()
+        ANALYTICS_BUFFERED_EVENTS.set(len(self._buffer))
+        if not events:
+            return {}
+
+        payloads: Dict[Any, List[Any]] = defaultdict(list)
+        for kind, payload in events:
+            payloads[kind].append(payload)
+
+        written = {}
+        unwritten = []
+        with Session(engine) as db:
+            for kind, kind_payloads in payloads.items():
+                try:
+                    if kind == BANNER_IMPRESSION:
+                        written[kind] = self._apply_banner_impressions(db, Counter(kind_payloads))
+                    elif kind == LISTING_AD_IMPRESSION:
+                        written[kind] = self._apply_listing_ad_impressions(db, Counter(kind_payloads))
+                    else:
+                        written[kind.__tablename__] = self._insert(db, kind, kind_payloads)
+                except OperationalError as e:
+                    db.rollback()
+                    logger.warning(f"Analytics flush of {_kind_label(kind)} failed, requeueing: {e}")
+                    unwritten.extend((kind, payload) for payload in kind_payloads)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Analytics flush of {_kind_label(kind)} failed: {e}")
+                    ANALYTICS_EVENTS_TOTAL.labels(kind=_kind_label(kind), outcome="failed").inc(len(kind_payloads))
+        if unwritten:
+            self._requeue(unwritten)
+        return written
+
+    def _insert(self, db: Session, model: Type[SQLModel], rows: List[Dict[str, Any]]) -> int:
+        table = model.__tablename__
+        rows = [_fill_defaults(model, row, factories=False) for row in rows]
+        try:
+            db.execute(insert(model), rows)
+            db.commit()
+            ANALYTICS_EVENTS_TOTAL.labels(kind=table, outcome="written").inc(len(rows))
+            return len(rows)
+        except OperationalError:
+            raise  # The database itself is unreachable; flush() requeues the batch
+        except Exception as e:
+            # One bad row (e.g. a listing deleted since the event) fails the
+            # whole statement; fall back to row-at-a-time so only it is lost
+            db.rollback()
+            logger.warning(f"Batch insert into {table} failed, retrying row by row: {e}")
+
+        written = 0
+        for row in rows:
+            try:
+                db.execute(insert(model), [row])
+                db.commit()
+                written += 1
+            except Exception:
+                db.rollback()
+        ANALYTICS_EVENTS_TOTAL.labels(kind=table, outcome="written").inc(written)
+        ANALYTICS_EVENTS_TOTAL.labels(kind=table, outcome="failed").inc(len(rows) - written)
+        return written
+
+    def _apply_banner_impressions(self, db: Session, counts: Counter) -> int:
+        params = {"ids": list(counts), "ns": list(counts.values())}
+        db.execute(text(
+            "UPDATE homepage_banner_stats s "
+            "SET impressions = s.impressions + d.n, updated_at = (now() AT TIME ZONE 'utc') "
+            "FROM unnest(CAST(:ids AS integer[]), CAST(:ns AS integer[])) AS d(banner_id, n) "
+            "WHERE s.banner_id = d.banner_id"
+        ), params)
+        # First impression of a banner creates its stats row; unknown banners are dropped
+        db.execute(text(
+            "INSERT INTO homepage_banner_stats (banner_id, impressions, clicks, created_at, updated_at) "
+            "SELECT d.banner_id, d.n, 0, (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc') "
+            "FROM unnest(CAST(:ids AS integer[]), CAST(:ns AS integer[])) AS d(banner_id, n) "
+            "JOIN homepage_banner b ON b.id = d.banner_id "
+            "WHERE NOT EXISTS (SELECT 1 FROM homepage_banner_stats s WHERE s.banner_id = d.banner_id)"
+        ), params)
+        db.commit()
+        total = sum(counts.values())
+        ANALYTICS_EVENTS_TOTAL.labels(kind=BANNER_IMPRESSION, outcome="written").inc(total)
+        return total
+
+    def _apply_listing_ad_impressions(self, db: Session, counts: Counter) -> int:
+        from app.models.advertising import Advertisement, AdvertisementStatus
+
+        # The listing's active advertisement at flush time (first one, if several)
+        ad_ids = {}
+        for ad_id, listing_id in db.exec(
+            select(Advertisement.id, Advertisement.listing_id)
+            .where(
+                Advertisement.listing_id.in_(list(counts)),
+                Advertisement.status == AdvertisementStatus.ACTIVE,
+                Advertisement.end_date > datetime.utcnow(),
+            )
+            .order_by(Advertisement.id)
+        ).all():
+            ad_ids.setdefault(listing_id, ad_id)
+        if not ad_ids:
+            return 0
+
+        db.execute(text(
+            "UPDATE advertisement_stats s "
+            "SET impressions = s.impressions + d.n, updated_at = (now() AT TIME ZONE 'utc') "
+            "FROM unnest(CAST(:ids AS integer[]), CAST(:ns AS integer[])) AS d(advertisement_id, n) "
+            "WHERE s.advertisement_id = d.advertisement_id"
+        ), {"ids": list(ad_ids.values()), "ns": [counts[listing_id] for listing_id in ad_ids]})
+        db.commit()
+        total = sum(counts[listing_id] for listing_id in ad_ids)
+        ANALYTICS_EVENTS_TOTAL.labels(kind=LISTING_AD_IMPRESSION, outcome="written").inc(total)
+        return total
+
+
+analytics_ingest = AnalyticsIngest()
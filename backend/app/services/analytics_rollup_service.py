@@ -0,0 +1,404 @@
+"""
+Incremental rollups for the admin analytics dashboards.
+
+The admin endpoints (top items/shops, seller rankings, device, geographic
+and funnel analytics) used to GROUP BY / COUNT DISTINCT the raw tracking
+tables over windows of up to a year on every load. They now read
+analytics_rollup, where each metric (see METRICS) is counted per dim in
+day and month buckets, with HyperLogLog sketches for the unique users and
+guests the endpoints report.
+
+roll_up() (beat, every minute) aggregates raw rows in [watermark, now - lag)
+into both bucket sizes and advances the "admin_analytics" watermark in the
+same transaction. The lag leaves room for events still sitting in the
+ingest buffers, which are stamped when tracked, not when written.
+
+A read covers its window with days up to the first month boundary and
+whole months after it -- at most ~45 buckets per dim, so a 365-day ranking
+reads about as many rows as a 30-day one -- and adds the raw rows after
+the watermark. Counts and tail are read in one statement, so they see the
+same watermark; sketches may overlap the tail, which distinct counts
+tolerate.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, and_, cast, delete, func, literal, or_, tuple_, union_all
+from sqlalchemy import select as sa_select
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.analytics import ClickEvent, GeographicEvent, ItemView, ShopView
+from app.models.analytics_rollup import AnalyticsRollup, RollupWatermark
+from app.utils.hll import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "admin_analytics"
+DAY = "day"
+MONTH = "month"
+# Steps of ANALYTICS_ROLLUP_STEP_HOURS per run; a long backfill continues on the next run
+MAX_STEPS_PER_RUN = 60
+# Rows per bulk lookup/upsert statement
+CHUNK_SIZE = 1000
+
+
+@dataclass
+class RollupMetric:
+    """Rows of `model` counted per `dim` (stored as text)."""
+    name: str
+    model: Any
+    ts: Any
+    dim: Any
+    where: Tuple[Any, ...] = ()
+    split: Any = None  # column whose value is appended to the name, e.g. "shop_clicks:chat"
+    users: Any = None  # column sketched into AnalyticsRollup.users
+    guests: Any = None  # column sketched into AnalyticsRollup.guests
+
+
+ITEM_VIEWS = RollupMetric(
+    "item_views", ItemView, ItemView.viewed_at, ItemView.listing_id,
+    users=ItemView.user_id, guests=ItemView.ip_address,
+)
+SHOP_VIEWS = RollupMetric(
+    "shop_views", ShopView, ShopView.viewed_at, ShopView.shop_owner_id,
+    users=ShopView.user_id, guests=ShopView.ip_address,
+)
+# Views without a device type count under "" -- they still belong in funnel totals
+ITEM_VIEW_DEVICES = RollupMetric(
+    "item_view_devices", ItemView, ItemView.viewed_at, func.coalesce(ItemView.device_type, ""),
+)
+SHOP_VIEW_DEVICES = RollupMetric(
+    "shop_view_devices", ShopView, ShopView.viewed_at, func.coalesce(ShopView.device_type, ""),
+)
+CLICKS = RollupMetric("clicks", ClickEvent, ClickEvent.clicked_at, ClickEvent.event_type)
+SHOP_CLICKS = RollupMetric(
+    "shop_clicks", ClickEvent, ClickEvent.clicked_at, ClickEvent.shop_id,
+    where=(ClickEvent.shop_id.isnot(None),), split=ClickEvent.event_type,
+)
+# dim is "city|country|latitude|longitude"; see split_geo_city()
+GEO_CITIES = RollupMetric(
+    "geo_cities", GeographicEvent, GeographicEvent.created_at,
+    func.concat(
+        GeographicEvent.city, "|", GeographicEvent.country, "|",
+        GeographicEvent.latitude, "|", GeographicEvent.longitude,
+    ),
+    where=(GeographicEvent.city.isnot(None),), users=GeographicEvent.user_id,
+)
+GEO_COUNTRIES = RollupMetric(
+    "geo_countries", GeographicEvent, GeographicEvent.created_at, GeographicEvent.country,
+    where=(GeographicEvent.country.isnot(None),), users=GeographicEvent.user_id,
+)
+
+METRICS = [
+    ITEM_VIEWS, SHOP_VIEWS, ITEM_VIEW_DEVICES, SHOP_VIEW_DEVICES,
+    CLICKS, SHOP_CLICKS, GEO_CITIES, GEO_COUNTRIES,
+]
+
+
+def _truncate(ts: datetime, granularity: str) -> datetime:
+    if granularity == MONTH:
+        return datetime(ts.year, ts.month, 1)
+    return datetime.combine(ts.date(), time.min)
+
+
+def _window_start(days: int) -> datetime:
+    """Start of the day `days` days ago -- dashboard windows are whole days."""
+    return _truncate(datetime.utcnow() - timedelta(days=days), DAY)
+
+
+def split_geo_city(dim: str) -> Tuple[str, Optional[str], Optional[float], Optional[float]]:
+    """(city, country, latitude, longitude) from a GEO_CITIES dim."""
+    city, country, latitude, longitude = dim.rsplit("|", 3)
+    return (
+        city,
+        country or None,
+        float(latitude) if latitude else None,
+        float(longitude) if longitude else None,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------------
+
+def _aggregate(db: Session, start: datetime, until: datetime) -> Dict[Tuple, list]:
+    """[count, users sketch, guests sketch] per (granularity, bucket, metric, dim) for raw rows in [start, until)."""
+    increments: Dict[Tuple, list] = {}
+    for metric in METRICS:
+        day = func.date_trunc("day", metric.ts)
+        dim = cast(metric.dim, String)
+        columns = [day.label("day"), dim.label("dim"), func.count().label("n")]
+        group_by = [day, dim]
+        if metric.split is not None:
+            columns.append(metric.split.label("split"))
+            group_by.append(metric.split)
+        for sketch in ("users", "guests"):
+            column = getattr(metric, sketch)
+            if column is not None:
+                columns.append(func.array_agg(func.distinct(column)).filter(column.isnot(None)).label(sketch))
+
+        rows = db.execute(
+            sa_select(*columns)
+            .where(metric.ts >= start, metric.ts < until, *metric.where)
+            .group_by(*group_by)
+        ).mappings().all()
+
+        for row in rows:
+            name = metric.name if metric.split is None else f"{metric.name}:{row['split']}"
+            for granularity in (DAY, MONTH):
+                key = (granularity, _truncate(row["day"], granularity), name, row["dim"])
+                entry = increments.setdefault(key, [0, None, None])
+                entry[0] += row["n"]
+                for i, sketch in ((1, "users"), (2, "guests")):
+                    if getattr(metric, sketch) is not None:
+                        if entry[i] is None:
+                            entry[i] = HyperLogLog()
+                        entry[i].update(row[sketch] or [])
+    return increments
+
+
+def _apply(db: Session, increments: Dict[Tuple, list]) -> None:
+    """Add `increments` to the stored buckets (sketches merged here, so callers must hold the watermark lock)."""
+    keys = list(increments)
+    columns = (
+        AnalyticsRollup.granularity, AnalyticsRollup.bucket_start,
+        AnalyticsRollup.metric, AnalyticsRollup.dim,
+    )
+    for i in range(0, len(keys), CHUNK_SIZE):
+        existing = db.execute(
+            sa_select(*columns, AnalyticsRollup.count, AnalyticsRollup.users, AnalyticsRollup.guests)
+            .where(tuple_(*columns).in_(keys[i:i + CHUNK_SIZE]))
+        ).all()
+        for granularity, bucket_start, metric, dim, count, users, guests in existing:
+            entry = increments[(granularity, bucket_start, metric, dim)]
+            entry[0] += count
+            if entry[1] is not None:
+                entry[1].merge(HyperLogLog.from_bytes(users))
+            if entry[2] is not None:
+                entry[2].merge(HyperLogLog.from_bytes(guests))
+
+    values = [
+        {
+            "granularity": granularity,
+            "bucket_start": bucket_start,
+            "metric": metric,
+            "dim": dim,
+            "count": count,
+            "users": users.to_bytes() if users is not None else None,
+            "guests": guests.to_bytes() if guests is not None else None,
+        }
+        for (granularity, bucket_start, metric, dim), (count, users, guests) in increments.items()
+    ]
+    stmt = insert(AnalyticsRollup.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["granularity", "bucket_start", "metric", "dim"],
+        set_={"count": stmt.excluded.count, "users": stmt.excluded.users, "guests": stmt.excluded.guests},
+    )
+    for i in range(0, len(values), CHUNK_SIZE):
+        db.execute(stmt, values[i:i + CHUNK_SIZE])
+
+
+def _initial_watermark(db: Session) -> datetime:
+    """Start of the day of the oldest tracked event, so the first runs backfill history."""
+    oldest = [
+        db.exec(select(func.min(ts))).one()
+        for ts in {metric.model: metric.ts for metric in METRICS}.values()
+    ]
+    oldest = [ts for ts in oldest if ts]
+    return _truncate(min(oldest) if oldest else datetime.utcnow(), DAY)
+
+
+def roll_up(db: Session) -> Dict[str, Any]:
+    """
+    Aggregate raw tracking rows newer than the watermark into the rollups,
+    one ANALYTICS_ROLLUP_STEP_HOURS window per transaction, and drop day
+    buckets past retention.
+
+    Returns:
+        {"steps": windows applied, "buckets": buckets written, "rolled_until": ISO
+        timestamp, "pruned": day buckets deleted}, or {"skipped": 1} if another
+        run holds the watermark
+    """
+    exists = db.exec(select(RollupWatermark.name).where(RollupWatermark.name == WATERMARK)).first()
+    if not exists:
+        db.execute(
+            insert(RollupWatermark.__table__)
+            .values(name=WATERMARK, rolled_until=_initial_watermark(db), updated_at=datetime.utcnow())
+            .on_conflict_do_nothing()
+        )
+        db.commit()
+
+    steps = buckets = 0
+    rolled_until = None
+    step = timedelta(hours=settings.ANALYTICS_ROLLUP_STEP_HOURS)
+    while steps < MAX_STEPS_PER_RUN:
+        # Row lock held until commit: an overlapping run skips instead of applying the same rows twice
+        watermark = db.exec(
+            select(RollupWatermark)
+            .where(RollupWatermark.name == WATERMARK)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if watermark is None:
+            db.rollback()
+            if not steps:
+                return {"skipped": 1}
+            break
+
+        start = watermark.rolled_until
+        until = min(start + step, datetime.utcnow() - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS))
+        if until <= start:
+            rolled_until = start
+            db.rollback()
+            break
+
+        increments = _aggregate(db, start, until)
+        _apply(db, increments)
+        watermark.rolled_until = until
+        watermark.updated_at = datetime.utcnow()
+        db.add(watermark)
+        db.commit()
+        steps += 1
+        buckets += len(increments)
+        rolled_until = until
+
+    cutoff = _truncate(datetime.utcnow() - timedelta(days=settings.ANALYTICS_ROLLUP_DAY_RETENTION_DAYS), DAY)
+    pruned = db.execute(
+        delete(AnalyticsRollup).where(AnalyticsRollup.granularity == DAY, AnalyticsRollup.bucket_start < cutoff)
+    ).rowcount
+    db.commit()
+
+    return {
+        "steps": steps,
+        "buckets": buckets,
+        "rolled_until": rolled_until.isoformat() if rolled_until else None,
+        "pruned": pruned,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def _window_buckets(start: datetime, now: datetime) -> Tuple[List[datetime], List[datetime]]:
+    """
+    Day buckets up to the first month boundary after `start`, then month
+    buckets through the current one. Buckets only hold rows older than the
+    watermark, so the current day/month bucket is safe to include.
+    """
+    days, months = [], []
+    cursor = start
+    while cursor <= now:
+        if cursor.day == 1:
+            months.append(cursor)
+            cursor = (cursor + timedelta(days=32)).replace(day=1)
+        else:
+            days.append(cursor)
+            cursor += timedelta(days=1)
+    return days, months
+
+
+def _in_window(start: datetime):
+    days, months = _window_buckets(start, datetime.utcnow())
+    return or_(
+        and_(AnalyticsRollup.granularity == DAY, AnalyticsRollup.bucket_start.in_(days)),
+        and_(AnalyticsRollup.granularity == MONTH, AnalyticsRollup.bucket_start.in_(months)),
+    )
+
+
+def _tail_start(start: datetime):
+    """SQL expression: where the raw tail begins -- the watermark, or `start` if later or unset."""
+    watermark = (
+        sa_select(RollupWatermark.rolled_until)
+        .where(RollupWatermark.name == WATERMARK)
+        .scalar_subquery()
+    )
+    return func.greatest(func.coalesce(watermark, literal(start)), literal(start))
+
+
+def rollup_counts(
+    db: Session,
+    metric: RollupMetric,
+    days: int,
+    splits: Optional[Sequence[str]] = None,
+    exclude_dims: Sequence[str] = (),
+    limit: Optional[int] = None,
+) -> List[Tuple[str, int]]:
+    """
+    (dim, count) for `metric` over the last `days` days, largest first.
+
+    Args:
+        splits: For split metrics, the split values to include (all if None)
+        exclude_dims: Dims to leave out (e.g. "" for unknown device types)
+        limit: Only the top N dims
+    """
+    start = _window_start(days)
+
+    rolled = sa_select(AnalyticsRollup.dim.label("dim"), AnalyticsRollup.count.label("n")).where(_in_window(start))
+    if splits:
+        rolled = rolled.where(AnalyticsRollup.metric.in_([f"{metric.name}:{s}" for s in splits]))
+    elif metric.split is not None:
+        rolled = rolled.where(AnalyticsRollup.metric.startswith(f"{metric.name}:"))
+    else:
+        rolled = rolled.where(AnalyticsRollup.metric == metric.name)
+
+    dim = cast(metric.dim, String)
+    tail = (
+        sa_select(dim.label("dim"), func.count().label("n"))
+        .where(metric.ts >= _tail_start(start), *metric.where)
+        .group_by(dim)
+    )
+    if splits:
+        tail = tail.where(metric.split.in_(splits))
+    if exclude_dims:
+        rolled = rolled.where(AnalyticsRollup.dim.notin_(exclude_dims))
+        tail = tail.where(dim.notin_(exclude_dims))
+
+    combined = union_all(rolled, tail).subquery()
+    total = func.sum(combined.c.n)
+    statement = sa_select(combined.c.dim, total).group_by(combined.c.dim).order_by(total.desc(), combined.c.dim)
+    if limit:
+        statement = statement.limit(limit)
+    return [(dim, int(n)) for dim, n in db.execute(statement).all()]
+
+
+def rollup_unique_counts(
+    db: Session,
+    metric: RollupMetric,
+    days: int,
+    dims: Sequence[str],
+) -> Dict[str, Tuple[int, int]]:
+    """Estimated distinct (users, guests) for each of `dims` over the last `days` days."""
+    if not dims:
+        return {}
+    start = _window_start(days)
+    sketches = {dim: (HyperLogLog(), HyperLogLog()) for dim in dims}
+
+    # Watermark first: buckets written after it overlap the tail, which only re-adds values
+    tail_start = db.execute(sa_select(_tail_start(start))).scalar()
+    for dim, users, guests in db.execute(
+        sa_select(AnalyticsRollup.dim, AnalyticsRollup.users, AnalyticsRollup.guests)
+        .where(_in_window(start), AnalyticsRollup.metric == metric.name, AnalyticsRollup.dim.in_(dims))
+    ).all():
+        sketches[dim][0].merge(HyperLogLog.from_bytes(users))
+        sketches[dim][1].merge(HyperLogLog.from_bytes(guests))
+
+    dim_text = cast(metric.dim, String)
+    columns = [dim_text]
+    columns.append(metric.users if metric.users is not None else literal(None))
+    columns.append(metric.guests if metric.guests is not None else literal(None))
+    for dim, user, guest in db.execute(
+        sa_select(*columns)
+        .where(metric.ts >= tail_start, dim_text.in_(dims), *metric.where)
+        .distinct()
+    ).all():
+        if user is not None:
+            sketches[dim][0].add(user)
+        if guest is not None:
+            sketches[dim][1].add(guest)
+
+    return {dim: (users.count(), guests.count()) for dim, (users, guests) in sketches.items()}
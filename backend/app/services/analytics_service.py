@@ -1,14 +1,41 @@
 """
 Analytics Service - Track user interactions and events.
+
+Seller dashboards are answered from seller_event_rollup (daily counts per
+seller, event type and source, built by app.tasks.analytics_rollup_tasks)
+plus a GROUP BY over the raw events newer than the rollup watermark, so
+their cost grows with the number of days shown, not with shop traffic.
 """
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import Date, cast, text
 from sqlmodel import Session, select, func
+from app.models.analytics_rollup import RollupWatermark, SellerEventRollup
 from app.models.subscription_features import AnalyticsEvent
 from app.core.logging_config import get_logger
 
 logger = get_logger("analytics")
 
+SELLER_ROLLUP = "seller_events"
+# Completed days rebuilt on every rollup run besides the new ones
+ROLLUP_REBUILD_DAYS = 1
+
+# Event type -> key in the metrics responses
+METRIC_KEYS = {
+    "shop_visit": "shop_visits",
+    "product_view": "product_views",
+    "product_click": "product_clicks",
+    "whatsapp_click": "whatsapp_clicks",
+    "call_click": "call_clicks",
+    "message_click": "message_clicks",
+    "follow_shop": "follows",
+}
+
+
+def _window_start(days: int) -> datetime:
+    """Start of the day `days` days ago -- dashboard windows are whole days."""
+    return datetime.combine((datetime.utcnow() - timedelta(days=days)).date(), time.min)
+
 
 class AnalyticsService:
     """Track and aggregate analytics events."""
@@ -72,6 +99,58 @@ class AnalyticsService:
             logger.error(f"Failed to track event: {str(e)}")
             return False
 
+    def _rolled_until(self, session: Session) -> Optional[datetime]:
+        """Where the seller rollups end (exclusive), or None if they were never built."""
+        try:
+            watermark = session.get(RollupWatermark, SELLER_ROLLUP)
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Seller rollups unavailable, aggregating raw events: {e}")
+            return None
+        return watermark.rolled_until if watermark else None
+
+    def _event_counts(
+        self,
+        seller_id: int,
+        start: datetime,
+        session: Session,
+    ) -> List[Tuple[date, str, str, int]]:
+        """
+        (day, event_type, source, count) rows for a seller since `start`:
+        rolled-up days up to the watermark, then a GROUP BY over the raw
+        events after it (today, normally). Without rollups the GROUP BY
+        covers the whole window.
+        """
+        rows = []
+        tail_start = start
+        rolled_until = self._rolled_until(session)
+        if rolled_until and rolled_until > start:
+            rows += session.exec(
+                select(
+                    SellerEventRollup.day,
+                    SellerEventRollup.event_type,
+                    SellerEventRollup.source,
+                    SellerEventRollup.count,
+                ).where(
+                    SellerEventRollup.seller_id == seller_id,
+                    SellerEventRollup.day >= start.date(),
+                    SellerEventRollup.day < rolled_until.date(),
+                )
+            ).all()
+            tail_start = rolled_until
+
+        day = cast(AnalyticsEvent.created_at, Date)
+        source = func.coalesce(AnalyticsEvent.source, "direct")
+        rows += session.exec(
+            select(day, AnalyticsEvent.event_type, source, func.count())
+            .where(
+                AnalyticsEvent.seller_id == seller_id,
+                AnalyticsEvent.created_at >= tail_start,
+            )
+            .group_by(day, AnalyticsEvent.event_type, source)
+        ).all()
+        return rows
+
     def get_seller_metrics(
         self,
         seller_id: int,
@@ -83,60 +162,45 @@ class AnalyticsService:
 
         Args:
             seller_id: The shop owner's ID
-            days: Number of days to look back (default 30)
+            days: Number of days to look back (default 30), from the start of that day
             session: Database session
 
         Returns:
             Dictionary of metrics
         """
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-
-        # Get all events for this seller in the period
-        events = session.exec(
-            select(AnalyticsEvent).where(
-                AnalyticsEvent.seller_id == seller_id,
-                AnalyticsEvent.created_at >= cutoff_date,
-            )
-        ).all()
+        start = _window_start(days)
 
-        # Count by event type
         event_counts = {}
-        for event_type in self.EVENT_TYPES:
-            count = len([e for e in events if e.event_type == event_type])
-            event_counts[event_type] = count
-
-        # Count by source
         source_counts = {}
-        for event in events:
-            source = event.source or "direct"
-            source_counts[source] = source_counts.get(source, 0) + 1
-
-        # Unique visitors (approximation by unique user_ids)
-        unique_visitors = len(set(e.user_id for e in events if e.user_id))
-
-        # Search queries
-        search_queries = {}
-        for event in events:
-            if event.search_query:
-                search_queries[event.search_query] = search_queries.get(event.search_query, 0) + 1
-
-        # Sort search queries by frequency
-        top_searches = sorted(
-            search_queries.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
+        total_events = 0
+        for _, event_type, source, count in self._event_counts(seller_id, start, session):
+            event_counts[event_type] = event_counts.get(event_type, 0) + count
+            source_counts[source] = source_counts.get(source, 0) + count
+            total_events += count
+
+        # Unique visitors (approximation by unique user_ids); distinct counts
+        # don't add up across days, so this one is always taken from the raw events
+        in_window = (
+            AnalyticsEvent.seller_id == seller_id,
+            AnalyticsEvent.created_at >= start,
+        )
+        unique_visitors = session.exec(
+            select(func.count(func.distinct(AnalyticsEvent.user_id))).where(*in_window)
+        ).one()
+
+        # Search queries, by frequency
+        top_searches = session.exec(
+            select(AnalyticsEvent.search_query, func.count())
+            .where(*in_window, AnalyticsEvent.search_query.is_not(None), AnalyticsEvent.search_query != "")
+            .group_by(AnalyticsEvent.search_query)
+            .order_by(func.count().desc())
+            .limit(10)
+        ).all()
 
         return {
             "period_days": days,
-            "total_events": len(events),
-            "shop_visits": event_counts.get("shop_visit", 0),
-            "product_views": event_counts.get("product_view", 0),
-            "product_clicks": event_counts.get("product_click", 0),
-            "whatsapp_clicks": event_counts.get("whatsapp_click", 0),
-            "call_clicks": event_counts.get("call_click", 0),
-            "message_clicks": event_counts.get("message_click", 0),
-            "follows": event_counts.get("follow_shop", 0),
+            "total_events": total_events,
+            **{key: event_counts.get(event_type, 0) for event_type, key in METRIC_KEYS.items()},
             "unique_visitors": unique_visitors,
             "by_source": source_counts,
             "top_search_queries": [
@@ -151,45 +215,16 @@ class AnalyticsService:
         session: Optional[Session] = None,
     ) -> List[Dict[str, Any]]:
         """Get daily breakdown of metrics."""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-
-        events = session.exec(
-            select(AnalyticsEvent).where(
-                AnalyticsEvent.seller_id == seller_id,
-                AnalyticsEvent.created_at >= cutoff_date,
-            ).order_by(AnalyticsEvent.created_at)
-        ).all()
+        start = _window_start(days)
 
         # Group by date
         daily_data = {}
-        for event in events:
-            date_key = event.created_at.date().isoformat()
+        for day, event_type, _, count in self._event_counts(seller_id, start, session):
+            date_key = day.isoformat()
             if date_key not in daily_data:
-                daily_data[date_key] = {
-                    "date": date_key,
-                    "shop_visits": 0,
-                    "product_views": 0,
-                    "product_clicks": 0,
-                    "whatsapp_clicks": 0,
-                    "call_clicks": 0,
-                    "message_clicks": 0,
-                    "follows": 0,
-                }
-
-            if event.event_type == "shop_visit":
-                daily_data[date_key]["shop_visits"] += 1
-            elif event.event_type == "product_view":
-                daily_data[date_key]["product_views"] += 1
-            elif event.event_type == "product_click":
-                daily_data[date_key]["product_clicks"] += 1
-            elif event.event_type == "whatsapp_click":
-                daily_data[date_key]["whatsapp_clicks"] += 1
-            elif event.event_type == "call_click":
-                daily_data[date_key]["call_clicks"] += 1
-            elif event.event_type == "message_click":
-                daily_data[date_key]["message_clicks"] += 1
-            elif event.event_type == "follow_shop":
-                daily_data[date_key]["follows"] += 1
+                daily_data[date_key] = {"date": date_key, **{key: 0 for key in METRIC_KEYS.values()}}
+            if event_type in METRIC_KEYS:
+                daily_data[date_key][METRIC_KEYS[event_type]] += count
 
         return sorted(daily_data.values(), key=lambda x: x["date"])
 
@@ -203,23 +238,20 @@ class AnalyticsService:
         """Get metrics for a specific product."""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
 
-        events = session.exec(
-            select(AnalyticsEvent).where(
+        event_counts = dict(session.exec(
+            select(AnalyticsEvent.event_type, func.count())
+            .where(
                 AnalyticsEvent.seller_id == seller_id,
                 AnalyticsEvent.listing_id == listing_id,
                 AnalyticsEvent.created_at >= cutoff_date,
             )
-        ).all()
-
-        event_counts = {}
-        for event_type in self.EVENT_TYPES:
-            count = len([e for e in events if e.event_type == event_type])
-            event_counts[event_type] = count
+            .group_by(AnalyticsEvent.event_type)
+        ).all())
 
         return {
             "listing_id": listing_id,
             "period_days": days,
-            "total_events": len(events),
+            "total_events": sum(event_counts.values()),
             "views": event_counts.get("product_view", 0),
             "clicks": event_counts.get("product_click", 0),
             "whatsapp_clicks": event_counts.get("whatsapp_click", 0),
@@ -231,6 +263,49 @@ class AnalyticsService:
             ),  # Click-through rate
         }
 
+    def rollup_seller_events(self, session: Session) -> Dict[str, Any]:
+        """
+        Roll up every completed day not yet in seller_event_rollup, and move
+        the watermark to the start of today. The last rolled day is rebuilt
+        too, so events committed just after midnight still land in it.
+
+        Returns:
+            {"from": first day rebuilt, "until": new watermark, "rows": rollup rows written}
+        """
+        today = datetime.combine(datetime.utcnow().date(), time.min)
+        watermark = session.get(RollupWatermark, SELLER_ROLLUP)
+        if watermark:
+            start = min(watermark.rolled_until - timedelta(days=ROLLUP_REBUILD_DAYS), today)
+        else:
+            first_event = session.exec(select(func.min(AnalyticsEvent.created_at))).one()
+            start = datetime.combine(first_event.date(), time.min) if first_event else today
+
+        # Rollup rows and watermark change in one transaction, so a dashboard
+        # never counts a day from both the rollup and the raw tail
+        params = {"start": start, "until": today}
+        session.execute(
+            text("DELETE FROM seller_event_rollup WHERE day >= CAST(:start AS date) AND day < CAST(:until AS date)"),
+            params,
+        )
+        result = session.execute(
+            text(
+                "INSERT INTO seller_event_rollup (seller_id, day, event_type, source, count) "
+                "SELECT seller_id, CAST(created_at AS date), event_type, COALESCE(source, 'direct'), COUNT(*) "
+                "FROM analytics_event WHERE created_at >= :start AND created_at < :until "
+                "GROUP BY 1, 2, 3, 4"
+            ),
+            params,
+        )
+        if watermark:
+            watermark.rolled_until = today
+            watermark.updated_at = datetime.utcnow()
+        else:
+            watermark = RollupWatermark(name=SELLER_ROLLUP, rolled_until=today)
+        session.add(watermark)
+        session.commit()
+
+        return {"from": start.date().isoformat(), "until": today.date().isoformat(), "rows": result.rowcount}
+
 
 # Singleton instance
 analytics_service = AnalyticsService()
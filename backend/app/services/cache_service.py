@@ -6,26 +6,148 @@ Usage:
     # Get/set with TTL
     value = cache.get("my_key")
     cache.set("my_key", {"data": 1}, ttl=60)
-    cache.delete_pattern("cache:listings:*")
+
+    # Tag entries on write, then drop exactly the affected ones on change
+    cache.set("shop:42", data, ttl=600, tags=["owner:42", "shops"])
+    cache.invalidate_tags("owner:42")
 
     # Decorator
-    @cache.cached(prefix="categories", ttl=300)
+    @cache.cached(prefix="categories", ttl=300, tags=["categories"])
     def get_categories(db): ...
+
+Tag invalidation is O(entries under the tag): each tag is a Redis set of the
+keys registered under it, so a listing update drops its own owner/category
+entries instead of scanning the whole keyspace with KEYS.
+
+@cache.cached is two-tier: a small per-process LRU (settings.CACHE_L1_*)
+answers repeat hits without a Redis round trip or json.loads, and misses
+are single-flight -- one worker takes a Redis lock and recomputes while the
+others serve the last stale copy or wait briefly for the fresh one.
 """
 import json
 import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from functools import wraps
-from typing import Any, Optional
+from typing import Any, Callable, Iterable, List, Optional, Union
 
 import redis as redis_lib
 from app.core.config import settings
+from app.core.metrics import CACHE_COALESCED_TOTAL, CACHE_L1_BYTES, CACHE_REQUESTS_TOTAL
 
 
 from fastapi.encoders import jsonable_encoder
 
+logger = logging.getLogger(__name__)
+
+TAG_KEY_PREFIX = "cache:tag:"
+INVALIDATION_CHANNEL = "cache:invalidations"
+
+# SET the value and register its key under every tag set in one round trip.
+# A tag set's TTL is only ever extended, so it outlives every entry in it.
+_SET_TAGGED_LUA = """
+redis.call('SET', ARGV[1], ARGV[2], 'EX', ARGV[3])
+local ttl = tonumber(ARGV[3])
+for i, tag_key in ipairs(KEYS) do
+    redis.call('SADD', tag_key, ARGV[1])
+    if redis.call('TTL', tag_key) < ttl then
+        redis.call('EXPIRE', tag_key, ttl)
+    end
+end
+return 1
+"""
+
+# Drop every key registered under the given tag sets, then the sets themselves.
+_INVALIDATE_TAGS_LUA = """
+local dropped = 0
+for i, tag_key in ipairs(KEYS) do
+    local members = redis.call('SMEMBERS', tag_key)
+    for j = 1, #members, 500 do
+        dropped = dropped + redis.call('DEL', unpack(members, j, math.min(j + 499, #members)))
+    end
+    redis.call('DEL', tag_key)
+end
+return dropped
+"""
+
+# Release the single-flight lock only if we still own it.
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_MISS = object()
+
+TagSpec = Union[Iterable[str], Callable[[dict], Iterable[str]], None]
+
+
+class LocalLRU:
+    """Thread-safe in-process LRU bounded by total encoded size.
+
+    Holds decoded values so a hit skips json.loads entirely; callers must
+    treat returned values as read-only since they're shared across requests.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, expires_at, tags)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISS
+            if entry[2] < time.monotonic():
+                self._drop(key)
+                return _MISS
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any, size: int, ttl: float, tags: Iterable[str] = ()) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl, frozenset(tags))
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+            CACHE_L1_BYTES.set(self._bytes)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e[3] & tags]:
+                self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        # Caller holds self._lock
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+        CACHE_L1_BYTES.set(self._bytes)
+
+
 class CacheService:
     def __init__(self):
         self._client: Optional[redis_lib.Redis] = None
+        self._set_tagged = None
+        self._invalidate_tags = None
+        self._release_lock = None
+        self.l1 = LocalLRU(settings.CACHE_L1_MAX_BYTES) if settings.CACHE_L1_ENABLED else None
+        self._listener: Optional[threading.Thread] = None
 
     @property
     def client(self) -> redis_lib.Redis:
@@ -39,32 +161,73 @@ class CacheService:
         return self._client
 
     def get(self, key: str) -> Any:
+        value, _ = self._get_with_size(key)
+        return value
+
+    def _get_with_size(self, key: str) -> tuple:
+        """Like get(), also returning the encoded length (for L1 sizing)."""
         try:
             data = self.client.get(key)
-            return json.loads(data) if data else None
+            return (json.loads(data), len(data)) if data else (None, 0)
         except Exception:
-            return None  # Cache miss on Redis error — degrade gracefully
+            return None, 0  # Cache miss on Redis error — degrade gracefully
 
-    def set(self, key: str, value: Any, ttl: int = 60) -> None:
+    def set(self, key: str, value: Any, ttl: int = 60, tags: Optional[Iterable[str]] = None) -> None:
         try:
             # Use jsonable_encoder to convert models/datetimes to JSON-compatible dicts/strings
-            encoded_value = jsonable_encoder(value)
-            self.client.setex(key, ttl, json.dumps(encoded_value))
+            encoded_value = json.dumps(jsonable_encoder(value))
+            tag_keys = [f"{TAG_KEY_PREFIX}{t}" for t in (tags or ())]
+            if not tag_keys:
+                self.client.setex(key, ttl, encoded_value)
+                return
+            if self._set_tagged is None:
+                self._set_tagged = self.client.register_script(_SET_TAGGED_LUA)
+            self._set_tagged(keys=tag_keys, args=[key, encoded_value, ttl])
         except Exception:
             pass  # Don't fail if Redis is unavailable
 
+    def invalidate_tags(self, *tags: str) -> None:
+        """Drop every entry registered under any of `tags`.
+
+        Also announced on INVALIDATION_CHANNEL so per-process caches in
+        front of Redis can evict the same tags.
+        """
+        tags = [t for t in tags if t]
+        if not tags:
+            return
+        if self.l1 is not None:
+            self.l1.invalidate_tags(tags)
+        try:
+            if self._invalidate_tags is None:
+                self._invalidate_tags = self.client.register_script(_INVALIDATE_TAGS_LUA)
+            self._invalidate_tags(keys=[f"{TAG_KEY_PREFIX}{t}" for t in tags])
+            self.client.publish(INVALIDATION_CHANNEL, json.dumps(tags))
+        except Exception as e:
+            logger.debug(f"Tag invalidation failed for {tags}: {e}")
+
     def delete(self, key: str) -> None:
+        if self.l1 is not None:
+            self.l1.delete(key)
         try:
             self.client.delete(key)
         except Exception:
             pass
 
     def delete_pattern(self, pattern: str) -> None:
-        """Delete all keys matching a glob pattern (e.g. 'cache:listings:*')."""
+        """Delete all keys matching a glob pattern (e.g. 'cache:listings:*').
+
+        Incremental SCAN rather than KEYS so Redis isn't blocked, but still
+        O(keyspace) -- prefer tags + invalidate_tags() on hot write paths.
+        """
         try:
-            keys = self.client.keys(pattern)
-            if keys:
-                self.client.delete(*keys)
+            batch: List[str] = []
+            for key in self.client.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                self.client.unlink(*batch)
         except Exception:
             pass
 
@@ -80,13 +243,100 @@ class CacheService:
         except Exception:
             return False  # On Redis error, allow processing (fail open)
 
-    def cached(self, prefix: str, ttl: int = 60, should_cache=None):
+    def _start_invalidation_listener(self) -> None:
+        """Evict L1 entries when any worker invalidates tags (idempotent)."""
+        if self._listener is not None:
+            return
+
+        def listen():
+            while True:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(INVALIDATION_CHANNEL)
+                    while True:
+                        # Polled rather than listen(): a quiet channel would
+                        # trip the client's socket_timeout and force a reconnect
+                        message = pubsub.get_message(timeout=1.0)
+                        if message:
+                            self.l1.invalidate_tags(json.loads(message["data"]))
+                except Exception as e:
+                    logger.debug(f"Cache invalidation listener reconnecting: {e}")
+                finally:
+                    # Hand the connection back here, never from PubSub.__del__:
+                    # run by the GC inside another thread's pool checkout, that
+                    # re-takes the pool's non-reentrant lock and hangs the worker
+                    pubsub.close()
+                time.sleep(1)
+
+        self._listener = threading.Thread(target=listen, name="cache-invalidation-listener", daemon=True)
+        self._listener.start()
+
+    def _acquire_lock(self, lock_key: str) -> Optional[str]:
+        """Try to become the single recomputing worker for a key.
+
+        Returns the lock token, "" if Redis is unreachable (fail open: just
+        recompute), or None if another worker already holds the lock.
+        """
+        token = uuid.uuid4().hex
+        try:
+            return token if self.client.set(lock_key, token, nx=True, ex=settings.CACHE_LOCK_TTL) else None
+        except Exception:
+            return ""
+
+    def _unlock(self, lock_key: str, token: str) -> None:
+        if not token:
+            return
+        try:
+            self.release_lock(lock_key, token)
+        except Exception:
+            pass  # Lock expires on its own after CACHE_LOCK_TTL
+
+    def acquire_lock(self, lock_key: str, ttl: int) -> Optional[str]:
+        """Take a lock that expires after `ttl` seconds; returns its token,
+        or None if someone else holds it. Redis errors propagate."""
+        token = uuid.uuid4().hex
+        return token if self.client.set(lock_key, token, nx=True, ex=ttl) else None
+
+    def release_lock(self, lock_key: str, token: str) -> None:
+        """Delete `lock_key` only if it still holds `token`, so a holder
+        that outlived its TTL can't release the next holder's lock."""
+        if self._release_lock is None:
+            self._release_lock = self.client.register_script(_RELEASE_LOCK_LUA)
+        self._release_lock(keys=[lock_key], args=[token])
+
+    def _wait_for(self, key: str) -> Any:
+        """Poll Redis for a key another worker is recomputing."""
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.025)
+            value, size = self._get_with_size(key)
+            if value is not None:
+                return value, size
+        return None, 0
+
+    def cached(
+        self,
+        prefix: str,
+        ttl: int = 60,
+        should_cache=None,
+        tags: TagSpec = None,
+        l1: bool = True,
+        single_flight: bool = True,
+    ):
         """Decorator that caches function return value in Redis.
 
         `should_cache`, if given, is called with the function's result before
         writing to Redis. Returning False skips the write, so a one-off bad
         result (e.g. a relationship that failed to eager-load) self-heals on
         the next request instead of getting served from cache for the full ttl.
+
+        `tags` is either a fixed list of tags or a callable taking the call's
+        kwargs and returning them, so an entry can be tagged by its filters
+        (e.g. "category:5") and dropped by invalidate_tags() on writes.
+
+        `l1=False` skips the in-process tier (use it when callers mutate the
+        returned value); `single_flight=False` lets every worker recompute a
+        miss concurrently, as before.
         """
         def decorator(func):
             @wraps(func)
@@ -97,14 +347,51 @@ class CacheService:
                     json.dumps(cache_kwargs, sort_keys=True, default=str).encode()
                 ).hexdigest()
                 cache_key = f"cache:{prefix}:{key_hash}"
+                entry_tags = list((tags(kwargs) if callable(tags) else tags) or ())
+                local = self.l1 if l1 else None
 
-                cached_value = self.get(cache_key)
+                if local is not None:
+                    cached_value = local.get(cache_key)
+                    if cached_value is not _MISS:
+                        CACHE_REQUESTS_TOTAL.labels(tier="l1", result="hit").inc()
+                        return cached_value
+                    CACHE_REQUESTS_TOTAL.labels(tier="l1", result="miss").inc()
+                    self._start_invalidation_listener()
+
+                def remember(value, size):
+                    if local is not None:
+                        local.set(cache_key, value, size, min(settings.CACHE_L1_TTL, ttl), entry_tags)
+                    return value
+
+                cached_value, size = self._get_with_size(cache_key)
                 if cached_value is not None:
-                    return cached_value
+                    CACHE_REQUESTS_TOTAL.labels(tier="redis", result="hit").inc()
+                    return remember(cached_value, size)
+                CACHE_REQUESTS_TOTAL.labels(tier="redis", result="miss").inc()
+
+                stale_key = f"{cache_key}:stale"
+                lock_key = f"lock:{cache_key}"
+                token = self._acquire_lock(lock_key) if single_flight else ""
+                if token is None:
+                    # Another worker is already recomputing this key
+                    stale = self.get(stale_key)
+                    if stale is not None:
+                        CACHE_COALESCED_TOTAL.labels(outcome="stale").inc()
+                        return stale
+                    fresh, size = self._wait_for(cache_key)
+                    if fresh is not None:
+                        CACHE_COALESCED_TOTAL.labels(outcome="waited").inc()
+                        return remember(fresh, size)
+                    CACHE_COALESCED_TOTAL.labels(outcome="timeout").inc()
 
-                result = func(*args, **kwargs)
-                if should_cache is None or should_cache(result):
-                    self.set(cache_key, result, ttl=ttl)
+                try:
+                    result = func(*args, **kwargs)
+                    if should_cache is None or should_cache(result):
+                        self.set(cache_key, result, ttl=ttl, tags=entry_tags)
+                        if single_flight:
+                            self.set(stale_key, result, ttl=ttl + settings.CACHE_STALE_TTL, tags=entry_tags)
+                finally:
+                    self._unlock(lock_key, token)
                 return result
             return wrapper
         return decorator
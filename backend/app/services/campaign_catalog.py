@@ -19,7 +19,7 @@ fixed here rather than carried forward).
 
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set
 from sqlmodel import Session, select, func
 
 from app.models.user import User
@@ -34,7 +34,9 @@ class CampaignDefinition:
     subject_variants: List[str]
     cooldown_days: int
     is_promotional: bool
-    eligibility_fn: Callable[[Session, User], bool]
+    # (db, users) -> ids of the users eligible. Evaluated for a whole batch
+    # of users at once, so targeting costs a query per batch, not per user.
+    eligibility_fn: Callable[[Session, List[User]], Set[int]]
     # Returns None if there's nothing worth sending right now (e.g. no listings).
     content_selector_fn: Callable[[Session, User], Optional[Dict[str, Any]]]
     # (email, name, subject, content) -> bool. `content` is whatever
@@ -65,6 +67,14 @@ def _has_active_listings(db: Session, min_count: int = 3) -> bool:
     return count >= min_count
 
 
+def _everyone(db: Session, users: List[User]) -> Set[int]:
+    return {u.id for u in users}
+
+
+def _everyone_if_active_listings(db: Session, users: List[User]) -> Set[int]:
+    return _everyone(db, users) if _has_active_listings(db) else set()
+
+
 # ---------------------------------------------------------------------------
 # Promotional: new arrivals
 
@@ -286,18 +296,20 @@ def _send_weekly_digest(email: str, name: str, subject: str, content: Dict[str,
 # newest of their own listing/message activity rather than a true login
 # timestamp -- documented limitation, not a precise signal.
 
-def _reengagement_eligible(db: Session, user: User) -> bool:
-    if not user.is_active:
-        return False
-    has_listing = db.exec(select(Listing.id).where(Listing.owner_id == user.id).limit(1)).first()
-    if not has_listing:
-        return False  # only targets people who've actually used the platform before
-    recent_activity = db.exec(
-        select(Listing.id).where(
-            Listing.owner_id == user.id, Listing.created_at >= datetime.utcnow() - timedelta(days=14)
-        ).limit(1)
-    ).first()
-    return recent_activity is None
+def _reengagement_eligible(db: Session, users: List[User]) -> Set[int]:
+    active_ids = [u.id for u in users if u.is_active]
+    if not active_ids:
+        return set()
+    # Only targets people who've actually used the platform before (have a
+    # listing at all) and haven't posted one in the last 14 days
+    quiet_since = datetime.utcnow() - timedelta(days=14)
+    rows = db.exec(
+        select(Listing.owner_id)
+        .where(Listing.owner_id.in_(active_ids))
+        .group_by(Listing.owner_id)
+        .having(func.max(Listing.created_at) < quiet_since)
+    ).all()
+    return set(rows)
 
 
 def _reengagement_content(db: Session, user: User) -> Optional[Dict[str, Any]]:
@@ -323,11 +335,11 @@ def _send_reengagement(email: str, name: str, subject: str, content: Dict[str, A
 # exist -- the real field is search_query -- and Listing.title, which is
 # also wrong -- the real field is title_en).
 
-def _saved_search_eligible(db: Session, user: User) -> bool:
-    search = db.exec(
-        select(SavedSearch).where(SavedSearch.user_id == user.id).order_by(SavedSearch.created_at.desc())
-    ).first()
-    return search is not None
+def _saved_search_eligible(db: Session, users: List[User]) -> Set[int]:
+    rows = db.exec(
+        select(SavedSearch.user_id).where(SavedSearch.user_id.in_([u.id for u in users])).distinct()
+    ).all()
+    return set(rows)
 
 
 def _saved_search_content(db: Session, user: User) -> Optional[Dict[str, Any]]:
@@ -370,7 +382,7 @@ CATALOG: Dict[str, CampaignDefinition] = {
             "Just in: new arrivals near you",
         ],
         cooldown_days=10, is_promotional=True,
-        eligibility_fn=lambda db, user: _has_active_listings(db),
+        eligibility_fn=_everyone_if_active_listings,
         content_selector_fn=_new_arrivals_content,
         send_fn=_send_new_arrivals,
     ),
@@ -382,7 +394,7 @@ CATALOG: Dict[str, CampaignDefinition] = {
             "You might like these too",
         ],
         cooldown_days=14, is_promotional=True,
-        eligibility_fn=lambda db, user: True,
+        eligibility_fn=_everyone,
         content_selector_fn=_category_spotlight_content,
         send_fn=_send_category_spotlight,
     ),
@@ -394,7 +406,7 @@ CATALOG: Dict[str, CampaignDefinition] = {
             "See what everyone's looking at",
         ],
         cooldown_days=10, is_promotional=True,
-        eligibility_fn=lambda db, user: _has_active_listings(db),
+        eligibility_fn=_everyone_if_active_listings,
         content_selector_fn=_trending_content,
         send_fn=_send_trending,
     ),
@@ -406,7 +418,7 @@ CATALOG: Dict[str, CampaignDefinition] = {
             "Meet one of our top sellers",
         ],
         cooldown_days=21, is_promotional=True,
-        eligibility_fn=lambda db, user: True,
+        eligibility_fn=_everyone,
         content_selector_fn=_shop_spotlight_content,
         send_fn=_send_shop_spotlight,
     ),
@@ -418,7 +430,7 @@ CATALOG: Dict[str, CampaignDefinition] = {
             "Based on what caught your eye",
         ],
         cooldown_days=14, is_promotional=True,
-        eligibility_fn=lambda db, user: True,
+        eligibility_fn=_everyone,
         content_selector_fn=_personalized_content,
         send_fn=_send_personalized,
     ),
@@ -430,7 +442,7 @@ CATALOG: Dict[str, CampaignDefinition] = {
             "Fresh sellers worth a look",
         ],
         cooldown_days=21, is_promotional=True,
-        eligibility_fn=lambda db, user: True,
+        eligibility_fn=_everyone,
         content_selector_fn=_new_shops_content,
         send_fn=_send_new_shops,
     ),
@@ -438,7 +450,7 @@ CATALOG: Dict[str, CampaignDefinition] = {
         campaign_type="weekly_digest",
         subject_variants=["This week on Suqafuran"],
         cooldown_days=6, is_promotional=False,
-        eligibility_fn=lambda db, user: True,
+        eligibility_fn=_everyone,
         content_selector_fn=_weekly_digest_content,
         send_fn=_send_weekly_digest,
     ),
@@ -0,0 +1,141 @@
+"""
+Materialized category tree served by GET /listings/categories.
+
+The nested category -> subcategory -> subsubcategory tree is built from
+three bulk queries (plus the per-category active listing counts), serialized
+once, and shared through Redis under the "categories" cache tag. The admin
+category/subcategory/subsubcategory endpoints already call
+cache.invalidate_tags("categories"), which drops the snapshot so the next
+request rebuilds it. Each worker keeps the last body in memory and only
+re-reads it from Redis when the small ETag key changes.
+
+active_listing_count moves with every approval, so the snapshot also expires
+after CATEGORY_TREE_MAX_AGE seconds to keep the counts reasonably fresh.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.models.listing import Category, SubSubCategory
+from app.models.subcategory import Subcategory
+from app.services.cache_service import cache
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_TREE_MAX_AGE = 300
+ETAG_KEY = "category_tree:etag"
+BODY_KEY = "category_tree:body"
+
+
+def _parse_schema(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return {}
+    return value
+
+
+def build_category_tree(db: Session) -> List[Dict[str, Any]]:
+    """Build the full nested tree in a fixed number of queries."""
+    rows = db.execute(
+        text(
+            """
+            SELECT l.category_id, COUNT(*) AS cnt
+            FROM listing l
+            JOIN "user" u ON u.id = l.owner_id
+            WHERE l.status = 'active'
+              AND u.is_suspended = false
+            GROUP BY l.category_id
+            """
+        )
+    ).fetchall()
+    active_counts: Dict[int, int] = {row.category_id: row.cnt for row in rows}
+
+    categories = db.exec(select(Category).order_by(Category.id)).all()
+    subcategories = db.exec(select(Subcategory).order_by(Subcategory.id)).all()
+    subsubcategories = db.exec(select(SubSubCategory).order_by(SubSubCategory.id)).all()
+
+    ssubs_by_sub: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for ssub in subsubcategories:
+        ssubs_by_sub[ssub.subcategory_id].append({
+            "id": ssub.id,
+            "name_en": ssub.name_en,
+            "name_so": ssub.name_so,
+            "slug": ssub.slug,
+            "image_url": ssub.image_url,
+            "brands": ssub.brands or [],
+        })
+
+    subs_by_cat: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for sub in subcategories:
+        subs_by_cat[sub.category_id].append({
+            "id": sub.id,
+            "name_en": sub.name_en,
+            "name_so": sub.name_so,
+            "slug": sub.slug,
+            "image_url": sub.image_url,
+            "subsubcategories": ssubs_by_sub.get(sub.id, []),
+        })
+
+    return [
+        {
+            "id": cat.id,
+            "name_en": cat.name_en,
+            "name_so": cat.name_so,
+            "slug": cat.slug,
+            "icon_name": cat.icon_name,
+            "image_url": cat.image_url,
+            "attributes_schema": _parse_schema(cat.attributes_schema),
+            "subcategories": subs_by_cat.get(cat.id, []),
+            "active_listing_count": active_counts.get(cat.id, 0),
+        }
+        for cat in categories
+    ]
+
+
+class CategoryTreeSnapshot:
+    def __init__(self):
+        self._etag: Optional[str] = None
+        self._body: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Tuple[str, bytes]:
+        """Return (etag, JSON body), rebuilding only if the snapshot is gone."""
+        etag = cache.get(ETAG_KEY)
+        if etag and etag == self._etag:
+            return self._etag, self._body
+        if etag:
+            body = cache.get(BODY_KEY)
+            if body is not None:
+                return self._remember(etag, body.encode())
+
+        with self._lock:
+            # Another thread may have rebuilt while we waited for the lock
+            etag = cache.get(ETAG_KEY)
+            if etag and etag == self._etag:
+                return self._etag, self._body
+            return self._rebuild(db)
+
+    def _rebuild(self, db: Session) -> Tuple[str, bytes]:
+        body = json.dumps(build_category_tree(db), separators=(",", ":")).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        # Body first so a reader that sees the new ETag can always fetch it
+        cache.set(BODY_KEY, body.decode(), ttl=CATEGORY_TREE_MAX_AGE, tags=["categories"])
+        cache.set(ETAG_KEY, etag, ttl=CATEGORY_TREE_MAX_AGE, tags=["categories"])
+        logger.info(f"Rebuilt category tree snapshot {etag} ({len(body)} bytes)")
+        return self._remember(etag, body)
+
+    def _remember(self, etag: str, body: bytes) -> Tuple[str, bytes]:
+        self._etag, self._body = etag, body
+        return etag, body
+
+
+category_tree = CategoryTreeSnapshot()
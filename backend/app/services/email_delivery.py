@@ -0,0 +1,273 @@
+"""
+Pooled, concurrent delivery for EmailService.
+
+Every send used to set up its own provider connection -- a fresh
+requests.post to Brevo, resend.api_key reassigned per call, a new SMTP
+connection and login per email -- and write its EmailLog in a session of
+its own, one message at a time. Delivery now goes through here:
+
+- providers are called through long-lived clients: a pooled
+  requests.Session for Brevo, the resend module configured once, and one
+  persistent SMTP connection per delivery thread (re-opened if the server
+  drops it)
+- send() groups messages into provider batch calls -- Brevo
+  messageVersions, Resend's batch endpoint, or one SMTP connection -- of
+  EMAIL_DELIVERY_BATCH_SIZE, runs up to EMAIL_DELIVERY_CONCURRENCY of them
+  at once, and writes all their EmailLog rows in one commit
+- the fallback chain is the same as before: Brevo for messages preferring
+  it, otherwise Resend, then SMTP, then the dev bypass outside production.
+  Whatever a provider doesn't accept moves on to the next one.
+
+Throughput is exported as suqafuran_emails_delivered_total (per provider
+and outcome) and suqafuran_email_delivery_seconds per provider call.
+"""
+
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.metrics import EMAILS_DELIVERED_TOTAL, EMAIL_DELIVERIES_IN_FLIGHT, EMAIL_DELIVERY_SECONDS
+from app.db.session import engine
+from app.models.email_log import EmailLog
+
+logger = logging.getLogger(__name__)
+
+BREVO_URL = "https://api.brevo.com/v3/smtp/email"
+RESEND_BATCH_LIMIT = 100
+PROVIDER_TIMEOUT = 30
+
+
+@dataclass
+class OutgoingEmail:
+    """A rendered message. `html` already carries the tracking pixel and
+    links for `log`, which delivery fills in and writes."""
+    to: str
+    subject: str
+    html: str
+    log: EmailLog
+    preferred_provider: str = "resend"
+
+
+# A transport sends a batch and returns the messages it could not deliver
+# with the reason; raising means none of the batch went out.
+Failures = List[Tuple[OutgoingEmail, str]]
+
+
+class _Brevo:
+    name = "Brevo"
+
+    def __init__(self):
+        self._session = None
+        self._lock = threading.Lock()
+
+    def available(self, preferred_provider: str) -> bool:
+        return preferred_provider == "brevo" and bool(settings.BREVO_API_KEY)
+
+    def _http(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_maxsize=settings.EMAIL_DELIVERY_CONCURRENCY))
+                session.headers.update({
+                    "api-key": settings.BREVO_API_KEY,
+                    "Content-Type": "application/json",
+                    "Accept": "application/json",
+                })
+                self._session = session
+            return self._session
+
+    def send(self, messages: List[OutgoingEmail]) -> Failures:
+        first = messages[0]
+        payload = {
+            "sender": {"name": settings.BREVO_FROM_NAME, "email": settings.BREVO_FROM_EMAIL},
+            "subject": first.subject,
+            "htmlContent": first.html,
+        }
+        if len(messages) == 1:
+            payload["to"] = [{"email": first.to}]
+        else:
+            payload["messageVersions"] = [
+                {"to": [{"email": m.to}], "subject": m.subject, "htmlContent": m.html} for m in messages
+            ]
+        resp = self._http().post(BREVO_URL, json=payload, timeout=PROVIDER_TIMEOUT)
+        resp.raise_for_status()
+        return []
+
+
+class _Resend:
+    name = "Resend"
+
+    def __init__(self):
+        self._configured = False
+
+    def available(self, preferred_provider: str) -> bool:
+        # Marketing sends preferring Brevo never fall back to Resend
+        return preferred_provider != "brevo" and bool(settings.RESEND_API_KEY)
+
+    def send(self, messages: List[OutgoingEmail]) -> Failures:
+        import resend
+
+        if not self._configured:
+            resend.api_key = settings.RESEND_API_KEY
+            self._configured = True
+        sender = f"{settings.EMAIL_FROM_NAME} <{settings.EMAIL_FROM}>"
+        params = [{"from": sender, "to": [m.to], "subject": m.subject, "html": m.html} for m in messages]
+        if len(params) == 1:
+            resend.Emails.send(params[0])
+        else:
+            resend.Batch.send(params)
+        return []
+
+
+class _Smtp:
+    name = "SMTP"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def available(self, preferred_provider: str) -> bool:
+        return bool(settings.SMTP_HOST and settings.SMTP_USER and settings.SMTP_PASSWORD)
+
+    def _connect(self) -> smtplib.SMTP:
+        if settings.SMTP_SSL:
+            server = smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, timeout=PROVIDER_TIMEOUT)
+        else:
+            server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=PROVIDER_TIMEOUT)
+            if settings.SMTP_TLS:
+                server.starttls()
+        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        return server
+
+    def _sendmail(self, to: str, body: str, retry: bool = True) -> None:
+        server = getattr(self._local, "server", None)
+        if server is None:
+            server = self._local.server = self._connect()
+        try:
+            server.sendmail(settings.SMTP_USER, to, body)
+        except smtplib.SMTPServerDisconnected:
+            # Idle connections get closed server-side; reconnect once
+            self._local.server = None
+            if not retry:
+                raise
+            self._sendmail(to, body, retry=False)
+
+    def send(self, messages: List[OutgoingEmail]) -> Failures:
+        failures: Failures = []
+        for i, m in enumerate(messages):
+            msg = MIMEMultipart("alternative")
+            msg["Subject"] = m.subject
+            msg["From"] = f"{settings.EMAIL_FROM_NAME} <{settings.SMTP_USER}>"
+            msg["To"] = m.to
+            msg.attach(MIMEText(m.html, "html"))
+            try:
+                self._sendmail(m.to, msg.as_string())
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as exc:
+                failures.append((m, str(exc)))  # refused this message; the connection is fine
+            except Exception as exc:
+                # Connection-level failure: this and the rest of the batch move on
+                self._local.server = None
+                failures.extend((rest, str(exc)) for rest in messages[i:])
+                break
+        return failures
+
+
+class EmailDelivery:
+    def __init__(self):
+        self._transports = [_Brevo(), _Resend(), _Smtp()]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use, i.e. after Celery has forked its workers
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.EMAIL_DELIVERY_CONCURRENCY, thread_name_prefix="email-delivery"
+                )
+            return self._executor
+
+    def _deliver_batch(self, messages: List[OutgoingEmail]) -> None:
+        pending = messages
+        reasons: Dict[int, List[str]] = {}
+        for transport in self._transports:
+            if not pending:
+                break
+            if not transport.available(pending[0].preferred_provider):
+                continue
+
+            started = time.perf_counter()
+            EMAIL_DELIVERIES_IN_FLIGHT.inc()
+            try:
+                failures = transport.send(pending)
+            except Exception as exc:
+                failures = [(m, str(exc)) for m in pending]
+            finally:
+                EMAIL_DELIVERIES_IN_FLIGHT.dec()
+                EMAIL_DELIVERY_SECONDS.labels(transport.name).observe(time.perf_counter() - started)
+
+            failed = {id(m) for m, _ in failures}
+            sent = [m for m in pending if id(m) not in failed]
+            for m in sent:
+                m.log.status = "sent"
+                m.log.provider_used = transport.name
+            if sent:
+                EMAILS_DELIVERED_TOTAL.labels(transport.name, "sent").inc(len(sent))
+                logger.info(f"{len(sent)} {pending[0].log.email_type} email(s) sent via {transport.name}")
+            for m, reason in failures:
+                reasons.setdefault(id(m), []).append(f"{transport.name} failed: {reason}")
+            if failures:
+                logger.warning(f"{transport.name} failed for {len(failures)} email(s): {failures[0][1]}")
+            pending = [m for m, _ in failures]
+
+        for m in pending:
+            if settings.ENVIRONMENT != "production":
+                m.log.status = "sent"
+                EMAILS_DELIVERED_TOTAL.labels("DevFallback", "sent").inc()
+            else:
+                m.log.status = "failed"
+                m.log.failed_reason = " | ".join(reasons.get(id(m), ["no email provider configured"]))
+                EMAILS_DELIVERED_TOTAL.labels("none", "failed").inc()
+
+    def _write_logs(self, messages: List[OutgoingEmail]) -> None:
+        try:
+            # expire_on_commit=False keeps the new ids readable without a reload per row
+            with Session(engine, expire_on_commit=False) as session:
+                session.add_all([m.log for m in messages])
+                session.commit()
+        except Exception as exc:
+            logger.error(f"Failed to write {len(messages)} email log(s): {exc}")
+
+    def send(self, messages: List[OutgoingEmail]) -> List[bool]:
+        """Deliver `messages`, write their EmailLog rows, and return whether
+        each one went out (in order). Blocks until all are done."""
+        size = max(1, min(settings.EMAIL_DELIVERY_BATCH_SIZE, RESEND_BATCH_LIMIT))
+        by_provider: Dict[str, List[OutgoingEmail]] = {}
+        for m in messages:
+            by_provider.setdefault(m.preferred_provider, []).append(m)
+        batches = [
+            group[i:i + size] for group in by_provider.values() for i in range(0, len(group), size)
+        ]
+
+        if len(batches) == 1:
+            self._deliver_batch(batches[0])
+        elif batches:
+            list(self._pool().map(self._deliver_batch, batches))
+
+        if messages:
+            self._write_logs(messages)
+        return [m.log.status == "sent" for m in messages]
+
+
+email_delivery = EmailDelivery()
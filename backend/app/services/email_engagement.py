@@ -0,0 +1,101 @@
+"""
+Open/click tracking for sent emails.
+
+The tracking pixel and click redirect used to load the EmailLog row, decode
+its metadata_json, append the hit to a "hits" list and write the whole blob
+back -- on every pixel load, and image proxies prefetch pixels, so the
+busiest rows grew without bound and were rewritten each time. Now:
+
+- the endpoints respond first (the pixel is a constant) and record the hit
+  in a background task
+- a repeat of the same hit (token, action, client, url) within
+  EMAIL_ENGAGEMENT_DEDUPE_SECONDS is dropped by a Redis SET NX before any
+  DB work; the same key is unique in the table, so duplicates are still
+  dropped when Redis is down
+- a new hit is one INSERT into email_engagement_event plus one conditional
+  UPDATE stamping EmailLog's status and first opened_at/clicked_at, in a
+  single transaction; nothing is read back
+"""
+
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, text, update
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.email_log import EmailLog
+from app.services.cache_service import cache
+
+logger = logging.getLogger(__name__)
+
+# 1x1 transparent GIF, decoded once
+TRACKING_PIXEL_GIF = base64.b64decode(b"R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+
+OPEN = "open"
+CLICK = "click"
+
+_INSERT_EVENT = text("""
+    INSERT INTO email_engagement_event
+        (tracking_token, action, hit_key, ip, user_agent, redirect_url, created_at)
+    SELECT tracking_token, :action, :hit_key, :ip, :user_agent, :redirect_url, :now
+    FROM emaillog WHERE tracking_token = :token
+    ON CONFLICT (tracking_token, action, hit_key) DO NOTHING
+""")
+
+
+def _hit_key(ip: str, user_agent: str, redirect_url: Optional[str], now: datetime) -> str:
+    window = int(now.timestamp()) // settings.EMAIL_ENGAGEMENT_DEDUPE_SECONDS
+    raw = f"{ip}|{user_agent}|{redirect_url or ''}|{window}"
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+
+def _seen_recently(token: str, action: str, hit_key: str) -> bool:
+    try:
+        return not cache.client.set(
+            f"email:hit:{token}:{action}:{hit_key}", 1, nx=True, ex=settings.EMAIL_ENGAGEMENT_DEDUPE_SECONDS
+        )
+    except Exception:
+        return False  # Redis down: the unique index still drops the duplicate
+
+
+def _first_engagement(action: str, token: str, now: datetime):
+    if action == OPEN:
+        return (
+            update(EmailLog)
+            .where(EmailLog.tracking_token == token, EmailLog.status.notin_(("opened", "clicked", "unsubscribed")))
+            .values(status="opened", opened_at=now)
+        )
+    # A click implies the email was opened
+    return (
+        update(EmailLog)
+        .where(EmailLog.tracking_token == token, EmailLog.status.notin_(("clicked", "unsubscribed")))
+        .values(
+            status="clicked",
+            clicked_at=func.coalesce(EmailLog.clicked_at, now),
+            opened_at=func.coalesce(EmailLog.opened_at, now),
+        )
+    )
+
+
+def record_hit(token: str, action: str, ip: str, user_agent: str, redirect_url: Optional[str] = None) -> None:
+    """Record an open or click of the email with `token`; unknown tokens are ignored."""
+    now = datetime.utcnow()
+    hit_key = _hit_key(ip, user_agent, redirect_url, now)
+    if _seen_recently(token, action, hit_key):
+        return
+    try:
+        with Session(engine) as db:
+            inserted = db.execute(_INSERT_EVENT, {
+                "token": token, "action": action, "hit_key": hit_key, "ip": ip,
+                "user_agent": user_agent, "redirect_url": redirect_url, "now": now,
+            }).rowcount
+            if inserted:
+                db.execute(_first_engagement(action, token, now))
+            db.commit()
+    except Exception as exc:
+        logger.warning(f"Failed to record email {action} for {token}: {exc}")
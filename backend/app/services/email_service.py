@@ -1,16 +1,21 @@
 import secrets
 import json
+import threading
 import redis
 from typing import Optional, List
 from app.core.config import settings
 from sqlmodel import Session
 from app.db.session import engine
 from app.models.email_log import EmailLog
+from app.services.email_delivery import OutgoingEmail, email_delivery
 
 
 class EmailService:
     def __init__(self):
         self.redis = None
+        # Per-thread id of the EmailLog row written by the latest send, so
+        # callers can link to it without querying EmailLog back
+        self._local = threading.local()
         self._connect()
 
     def _connect(self):
@@ -313,7 +318,7 @@ class EmailService:
         print(f"[Email] No email provider available for reset code to {email}")
         return False
 
-    def _send_and_log(
+    def _prepare(
         self,
         email: str,
         subject: str,
@@ -323,7 +328,7 @@ class EmailService:
         campaign_id: Optional[str] = None,
         metadata: Optional[dict] = None,
         preferred_provider: str = "resend"
-    ) -> bool:
+    ) -> OutgoingEmail:
         import json
         import re
         from urllib.parse import quote
@@ -356,115 +361,33 @@ class EmailService:
             html_body_tracked = html_body_tracked.replace("</body>", f"{tracking_pixel}</body>")
         else:
             html_body_tracked += tracking_pixel
-            
-        success = False
-        provider = None
-        failed_reason = None
-
-        # Marketing/promotional sends prefer Brevo; everything else prefers
-        # Resend. Whichever isn't preferred still acts as a fallback below.
-        if preferred_provider == "brevo" and settings.BREVO_API_KEY:
-            try:
-                import requests
-
-                resp = requests.post(
-                    "https://api.brevo.com/v3/smtp/email",
-                    headers={
-                        "api-key": settings.BREVO_API_KEY,
-                        "Content-Type": "application/json",
-                        "Accept": "application/json",
-                    },
-                    json={
-                        "sender": {"name": settings.BREVO_FROM_NAME, "email": settings.BREVO_FROM_EMAIL},
-                        "to": [{"email": email}],
-                        "subject": subject,
-                        "htmlContent": html_body_tracked,
-                    },
-                    timeout=15,
-                )
-                resp.raise_for_status()
-                print(f"[Email] {email_type} sent via Brevo to {email}")
-                success = True
-                provider = "Brevo"
-            except Exception as e:
-                failed_reason = f"Brevo failed: {str(e)}"
-                print(f"[Email] Brevo failed ({e}), trying Resend fallback...")
-
-        # Primary Resend API Delivery -- skipped entirely when Brevo was the
-        # preferred provider (marketing/promotional sends): those should
-        # never fall back to Resend, only to SMTP/dev-bypass beyond Brevo.
-        if not success and settings.RESEND_API_KEY and preferred_provider != "brevo":
-            try:
-                import resend
 
-                resend.api_key = settings.RESEND_API_KEY
-
-                resend.Emails.send({
-                    "from": f"{settings.EMAIL_FROM_NAME} <{settings.EMAIL_FROM}>",
-                    "to": [email],
-                    "subject": subject,
-                    "html": html_body_tracked,
-                })
-                print(f"[Email] {email_type} sent via Resend to {email}")
-                success = True
-                provider = "Resend"
-            except Exception as e:
-                failed_reason = (failed_reason + " | " if failed_reason else "") + f"Resend failed: {str(e)}"
-                print(f"[Email] Resend failed ({e}), trying SMTP fallback...")
-
-        # Secondary: SMTP Fallback Delivery Chain
-        if not success and settings.SMTP_HOST and settings.SMTP_USER and settings.SMTP_PASSWORD:
-            try:
-                import smtplib
-                from email.mime.multipart import MIMEMultipart
-                from email.mime.text import MIMEText
-
-                msg = MIMEMultipart("alternative")
-                msg["Subject"] = subject
-                msg["From"] = f"{settings.EMAIL_FROM_NAME} <{settings.SMTP_USER}>"
-                msg["To"] = email
-                msg.attach(MIMEText(html_body_tracked, "html"))
-
-                # Check for SSL vs TLS vs standard connection
-                if settings.SMTP_SSL:
-                    with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                        server.sendmail(settings.SMTP_USER, email, msg.as_string())
-                else:
-                    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                        if settings.SMTP_TLS:
-                            server.starttls()
-                        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                        server.sendmail(settings.SMTP_USER, email, msg.as_string())
-                print(f"[Email] {email_type} sent via SMTP to {email}")
-                success = True
-                provider = "SMTP"
-            except Exception as e:
-                failed_reason = (failed_reason + " | " if failed_reason else "") + f"SMTP failed: {str(e)}"
-                print(f"[Email] SMTP failed: {e}")
+        return OutgoingEmail(email, subject, html_body_tracked, log_entry, preferred_provider)
 
-        # Local Dev Bypass fallback
-        if not success:
-            if settings.ENVIRONMENT != "production":
-                print(f"[Email] Dev bypass logged for {email} ({email_type})")
-                success = True
-                provider = "DevFallback"
-                log_entry.status = "sent"
-            else:
-                log_entry.status = "failed"
-                log_entry.failed_reason = failed_reason
-        else:
-            log_entry.status = "sent"
-            log_entry.provider_used = provider
+    def _send_and_log(
+        self,
+        email: str,
+        subject: str,
+        html_body: str,
+        email_type: str,
+        user_id: Optional[int] = None,
+        campaign_id: Optional[str] = None,
+        metadata: Optional[dict] = None,
+        preferred_provider: str = "resend"
+    ) -> bool:
+        message = self._prepare(email, subject, html_body, email_type, user_id, campaign_id, metadata, preferred_provider)
+        return self.send_many([message])[0]
 
-        try:
-            with Session(engine) as session:
-                session.add(log_entry)
-                session.commit()
-        except Exception as db_err:
-            print(f"[Email] Failed to write email log: {db_err}")
+    def send_many(self, messages: List[OutgoingEmail]) -> List[bool]:
+        """Deliver prepared messages concurrently through the pooled
+        providers (see email_delivery.py); one EmailLog commit for all."""
+        results = email_delivery.send(messages)
+        self._local.last_log_id = messages[-1].log.id if messages else None
+        return results
 
-        return success
+    def last_log_id(self) -> Optional[int]:
+        """Id of the EmailLog row written by this thread's most recent send."""
+        return getattr(self._local, "last_log_id", None)
 
     def send_email(self, to: str, subject: str, html_content: str, user_id: Optional[int] = None) -> bool:
         """Generic send for callers with their own pre-built HTML (admin
@@ -1805,6 +1728,25 @@ class EmailService:
         campaign_id: Optional[str] = None,
         user_id: Optional[int] = None
     ) -> bool:
+        message = self.prepare_custom_manual_email(
+            email, subject, title, subtitle, content_html, action_text, action_url, campaign_id, user_id
+        )
+        return self.send_many([message])[0]
+
+    def prepare_custom_manual_email(
+        self,
+        email: str,
+        subject: str,
+        title: str,
+        subtitle: Optional[str],
+        content_html: str,
+        action_text: Optional[str] = None,
+        action_url: Optional[str] = None,
+        campaign_id: Optional[str] = None,
+        user_id: Optional[int] = None
+    ) -> OutgoingEmail:
+        """Render an admin-authored email for one recipient without sending
+        it, so broadcasts can hand a whole batch to send_many()."""
         # Resolve target user details + a real recent listing, so any
         # {{item_title}}/{{offer_amount}}/{{listing_id}}-style placeholder in
         # an admin-authored template (Send Test / Broadcast) renders real
@@ -1947,7 +1889,7 @@ class EmailService:
                 subtitle=subtitle or "Direct communication from Suqafuran Support",
                 content=content
             )
-        return self._send_and_log(email, subject, html_body, f"crm_manual_{campaign_id or 'custom'}", user_id, campaign_id=campaign_id, preferred_provider="brevo")
+        return self._prepare(email, subject, html_body, f"crm_manual_{campaign_id or 'custom'}", user_id, campaign_id=campaign_id, preferred_provider="brevo")
 
     def check_verification_code(self, email: str, code: str) -> bool:
         from app.services.otp_log_service import otp_log
@@ -8,6 +8,8 @@ from enum import Enum
 from dataclasses import dataclass, asdict, field
 import asyncio
 
+from app.services.ws_backplane import ws_backplane
+
 logger = logging.getLogger(__name__)
 
 
@@ -68,6 +70,8 @@ class EventStreamManager:
         self.connections: Set[asyncio.Queue] = set()
         self.event_history: List[LiveEvent] = []
         self.max_event_history = max_event_history
+        # Events emitted on any worker reach the dashboards connected to every worker
+        ws_backplane.register("event_stream", self._deliver_event)
 
     async def connect(self, queue: asyncio.Queue) -> None:
         """Register a new client connection."""
@@ -83,7 +87,13 @@ class EventStreamManager:
         logger.info(f"Client disconnected. Total connections: {len(self.connections)}")
 
     async def broadcast_event(self, event: LiveEvent) -> None:
-        """Broadcast event to all connected clients."""
+        """Broadcast event to all connected clients, on every worker."""
+        await ws_backplane.publish("event_stream", event.to_dict())
+
+    async def _deliver_event(self, payload: Dict[str, Any]) -> None:
+        """Deliver an event to this worker's clients."""
+        event = LiveEvent(**{**payload, "event_type": EventType(payload["event_type"])})
+
         # Store in history
         self.event_history.append(event)
         if len(self.event_history) > self.max_event_history:
@@ -0,0 +1,206 @@
+"""
+Faceted attribute filtering over listing.attributes.
+
+Listing attributes live in the listing.attributes JSON column, indexed as
+JSONB with jsonb_path_ops (alembic listing_attributes_001). Filters are
+expressed as JSONB containment (`attributes::jsonb @> '{"brand": "nike"}'`)
+so they can use that index, unlike json_extract_path_text() per key.
+
+Facet counts are disjunctive: each attribute's option counts apply every
+*other* active filter but not its own, so picking "Samsung" still shows how
+many Apple phones there are. All facets are counted in one GROUP BY over
+jsonb_each(), with multiselect arrays unnested by
+jsonb_array_elements_text(), and facet_counts() returns it as a scalar
+subquery that callers attach to their page query, so listings and counts
+come back in a single round trip.
+
+Per-category facet definitions (attribute + options) are one joined query,
+cached under the "facets" tag; the attribute admin endpoints invalidate it.
+"""
+
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, case, cast, column, literal, or_, true
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Session, func, select
+
+from app.models.attribute import Attribute
+from app.models.attribute_option import AttributeOption
+from app.models.category_attribute import CategoryAttribute
+from app.models.listing import Listing
+from app.services.cache_service import cache
+
+FACETS_TAG = "facets"
+FACET_DEFINITIONS_TTL = 3600
+# Attribute types whose values form a closed option set worth counting
+FACET_FIELD_TYPES = ("select", "multiselect", "checkbox")
+
+# Must match the indexed expression exactly for the planner to use it
+_ATTRIBUTES = cast(Listing.attributes, JSONB)
+
+
+def _value_variants(value: Any) -> List[Any]:
+    """
+    JSON values a filter value should match. Attributes are free-form JSON
+    written by the posting form, so "128" may be stored as 128 and "true"
+    as true; the old json_extract_path_text() comparison matched those by
+    their text, and containment needs each typed spelling spelled out.
+    """
+    variants = [value]
+    if isinstance(value, bool):
+        variants.append("true" if value else "false")
+    elif isinstance(value, (int, float)):
+        variants.append(str(value))
+    elif isinstance(value, str):
+        if value in ("true", "false"):
+            variants.append(value == "true")
+        else:
+            try:
+                number = float(value)
+            except ValueError:
+                pass
+            else:
+                variants.append(int(number) if number.is_integer() else number)
+    return variants
+
+
+def attribute_match(key: str, values: Iterable[Any]):
+    """
+    Listing has attribute `key` equal to, or (multiselect, stored as a JSON
+    array) containing, any of `values`. Both are containment on the whole
+    document -- `{"k": "v"}` and `{"k": ["v"]}`, the latter being
+    `attributes->'k' @> '["v"]'` -- so the GIN index serves them.
+    """
+    clauses = [
+        _ATTRIBUTES.op("@>")(cast(literal(json.dumps({key: stored})), JSONB))
+        for value in values
+        for variant in _value_variants(value)
+        for stored in (variant, [variant])
+    ]
+    return or_(*clauses) if clauses else true()
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """{"brand": "nike"} / {"brand": ["nike", "apple"]} -> {"brand": ["nike"...]}; drops empties."""
+    normalized = {}
+    for key, values in (filters or {}).items():
+        if not isinstance(values, list):
+            values = [values]
+        values = [v for v in values if v is not None and v != ""]
+        if values:
+            normalized[key] = values
+    return normalized
+
+
+def facet_definitions(db: Session, category_id: int) -> List[Dict[str, Any]]:
+    """Attributes assigned to a category with their options, in sort order."""
+    cache_key = f"facets:definitions:{category_id}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    rows = db.exec(
+        select(CategoryAttribute, Attribute, AttributeOption)
+        .join(Attribute, Attribute.id == CategoryAttribute.attribute_id)
+        .join(AttributeOption, AttributeOption.attribute_id == Attribute.id, isouter=True)
+        .where(CategoryAttribute.category_id == category_id)
+        .order_by(CategoryAttribute.sort_order, CategoryAttribute.id, AttributeOption.sort_order, AttributeOption.id)
+    ).all()
+
+    definitions: Dict[int, Dict[str, Any]] = {}
+    for cat_attr, attr, option in rows:
+        definition = definitions.get(attr.id)
+        if definition is None:
+            definition = definitions[attr.id] = {
+                "id": attr.id,
+                "name": attr.name,
+                "slug": attr.slug,
+                "field_type": attr.field_type,
+                "required": cat_attr.required,
+                "options": [],
+            }
+        if option is not None and attr.field_type in ("select", "multiselect"):
+            definition["options"].append({"value": option.value, "display_name": option.display_name})
+
+    result = list(definitions.values())
+    cache.set(cache_key, result, ttl=FACET_DEFINITIONS_TTL, tags=[FACETS_TAG])
+    return result
+
+
+def facet_counts(base_statement, filters: Dict[str, List[Any]], facet_keys: List[str]):
+    """
+    Scalar subquery yielding [[key, value, count], ...] as JSON for every
+    value of `facet_keys` among listings matching `base_statement` (a
+    select(Listing) carrying every filter except the attribute ones) and
+    all attribute `filters` other than the key being counted.
+    """
+    matches = [attribute_match(key, values).label(f"m{i}") for i, (key, values) in enumerate(filters.items())]
+    base = (
+        base_statement
+        .with_only_columns(_ATTRIBUTES.label("attrs"), *matches)
+        .where(func.jsonb_typeof(_ATTRIBUTES) == "object")  # jsonb_each() rejects arrays/scalars
+        .order_by(None)
+        .subquery("facet_base")
+    )
+    pairs = func.jsonb_each(base.c.attrs).table_valued("key", column("value", JSONB)).alias("facet_pair")
+    # One row per option: a multiselect's JSON array is unnested, a plain
+    # value is wrapped as a one-element array so both read back as text
+    elements = func.jsonb_array_elements_text(
+        case(
+            (func.jsonb_typeof(pairs.c.value) == "array", pairs.c.value),
+            else_=func.jsonb_build_array(pairs.c.value),
+        )
+    ).table_valued("value").lateral("facet_value")
+
+    # Disjunctive: a row counts toward key K if it matches every filter on keys other than K
+    conditions = [
+        or_(pairs.c.key == key, base.c[f"m{i}"])
+        for i, key in enumerate(filters)
+    ]
+    counts = (
+        select(pairs.c.key, elements.c.value, func.count().label("n"))
+        .select_from(base)
+        .join(pairs, true())
+        .join(elements, true())
+        .where(pairs.c.key.in_(facet_keys), and_(true(), *conditions))
+        .group_by(pairs.c.key, elements.c.value)
+        .subquery("facet_counts")
+    )
+    return (
+        select(func.json_agg(func.json_build_array(counts.c.key, counts.c.value, counts.c.n)))
+        .scalar_subquery()
+    )
+
+
+def build_facets(
+    definitions: List[Dict[str, Any]],
+    raw_counts: Optional[list],
+    filters: Dict[str, List[Any]],
+) -> List[Dict[str, Any]]:
+    """Merge definitions with counts from facet_counts() into the response shape."""
+    counts: Dict[str, Dict[str, int]] = defaultdict(dict)
+    for key, value, n in raw_counts or []:
+        counts[key][value] = n
+
+    facets = []
+    for definition in definitions:
+        if definition["field_type"] not in FACET_FIELD_TYPES:
+            continue
+        slug = definition["slug"]
+        selected = {str(v) for v in filters.get(slug, [])}
+        options = [
+            {
+                "value": option["value"],
+                "display_name": option["display_name"],
+                "count": counts[slug].pop(option["value"], 0),
+                "selected": option["value"] in selected,
+            }
+            for option in definition["options"]
+        ]
+        # Values listings actually use that aren't a defined option
+        for value, n in sorted(counts[slug].items(), key=lambda item: -item[1]):
+            options.append({"value": value, "display_name": value, "count": n, "selected": value in selected})
+        facets.append({"slug": slug, "name": definition["name"], "field_type": definition["field_type"], "options": options})
+    return facets
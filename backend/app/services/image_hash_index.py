@@ -0,0 +1,168 @@
+"""
+Near-duplicate listing image lookup over perceptual hashes.
+
+storage_service.calculate_phash() yields a 64-bit pHash per photo (16 hex
+chars); recropped or re-encoded copies of a photo land within a few bits of
+each other. Hashes are stored in listing_image_hash with the hash split
+into BANDS 16-bit bands, each with its own btree index (multi-index
+hashing): if two hashes differ in at most k bits, at least one band differs
+in at most k // BANDS bits. A lookup therefore only probes, per band, the
+exact band values within that radius -- 17 values per band for the default
+k = 6 -- and checks full Hamming distance on the few rows that come back.
+Cost depends on how many near-matching photos exist, not on catalog size.
+"""
+
+import logging
+from itertools import combinations
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, or_
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.listing import Listing
+from app.models.listing_image_hash import ListingImageHash
+
+logger = logging.getLogger(__name__)
+
+BANDS = 4
+BAND_BITS = 64 // BANDS
+_BAND_MASK = (1 << BAND_BITS) - 1
+_BAND_COLUMNS = [ListingImageHash.band_0, ListingImageHash.band_1, ListingImageHash.band_2, ListingImageHash.band_3]
+
+
+def parse_phash(value: Optional[str]) -> Optional[int]:
+    """Unsigned 64-bit int from a hex pHash string, or None if it isn't one."""
+    if not value:
+        return None
+    try:
+        parsed = int(value, 16)
+    except (TypeError, ValueError):
+        return None
+    return parsed if 0 <= parsed < (1 << 64) else None
+
+
+def _to_signed(value: int) -> int:
+    # Postgres BIGINT is signed; store the same 64 bits
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def _bands(value: int) -> List[int]:
+    return [(value >> (BAND_BITS * i)) & _BAND_MASK for i in range(BANDS)]
+
+
+def _neighbours(band: int, radius: int) -> List[int]:
+    """Every BAND_BITS-bit value within `radius` bit flips of `band`."""
+    values = [band]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), r):
+            flipped = band
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def index_listing_images(db: Session, listing: Listing) -> int:
+    """
+    Replace the hash rows for `listing` with its current image_hashes.
+    Does not commit.
+
+    Returns:
+        Number of hashes indexed
+    """
+    db.execute(delete(ListingImageHash).where(ListingImageHash.listing_id == listing.id))
+    seen: Set[int] = set()
+    for raw in listing.image_hashes or []:
+        value = parse_phash(raw)
+        if value is None or value in seen:
+            continue
+        seen.add(value)
+        bands = _bands(value)
+        db.add(ListingImageHash(
+            listing_id=listing.id,
+            owner_id=listing.owner_id,
+            phash=_to_signed(value),
+            band_0=bands[0],
+            band_1=bands[1],
+            band_2=bands[2],
+            band_3=bands[3],
+        ))
+    return len(seen)
+
+
+def find_near_duplicates(
+    db: Session,
+    hashes: Iterable[str],
+    *,
+    exclude_owner_id: Optional[int] = None,
+    max_distance: Optional[int] = None,
+    limit: int = 20,
+) -> List[Tuple[int, int]]:
+    """
+    Listings holding a photo within `max_distance` bits of any of `hashes`.
+
+    Returns:
+        [(listing_id, distance)] sorted by distance, closest first
+    """
+    if max_distance is None:
+        max_distance = settings.IMAGE_DUPLICATE_MAX_DISTANCE
+    radius = max_distance // BANDS
+
+    best = {}
+    for value in {v for v in (parse_phash(h) for h in hashes) if v is not None}:
+        band_filters = [
+            column.in_(_neighbours(band, radius))
+            for column, band in zip(_BAND_COLUMNS, _bands(value))
+        ]
+        statement = select(ListingImageHash.listing_id, ListingImageHash.phash).where(or_(*band_filters))
+        if exclude_owner_id is not None:
+            statement = statement.where(ListingImageHash.owner_id != exclude_owner_id)
+        for listing_id, stored in db.exec(statement).all():
+            distance = hamming(value, _to_unsigned(stored))
+            if distance <= max_distance and distance < best.get(listing_id, max_distance + 1):
+                best[listing_id] = distance
+
+    return sorted(best.items(), key=lambda item: (item[1], item[0]))[:limit]
+
+
+def backfill_image_hashes(db: Session, batch_size: int = 500, limit: Optional[int] = None) -> int:
+    """
+    Index every listing with image_hashes but no listing_image_hash rows,
+    walking listings by id. Commits per batch.
+
+    Returns:
+        Number of listings indexed
+    """
+    indexed = 0
+    scanned = 0
+    last_id = 0
+    while limit is None or scanned < limit:
+        size = batch_size if limit is None else min(batch_size, limit - scanned)
+        listings = db.exec(
+            select(Listing)
+            .where(
+                Listing.id > last_id,
+                ~select(ListingImageHash.id).where(ListingImageHash.listing_id == Listing.id).exists(),
+            )
+            .order_by(Listing.id)
+            .limit(size)
+        ).all()
+        if not listings:
+            break
+        for listing in listings:
+            if index_listing_images(db, listing):
+                indexed += 1
+        db.commit()
+        scanned += len(listings)
+        last_id = listings[-1].id
+        logger.info(f"Indexed image hashes up to listing {last_id} ({indexed} listings so far)")
+    return indexed
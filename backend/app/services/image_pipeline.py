@@ -0,0 +1,155 @@
+"""
+Background image pipeline for listing photos.
+
+Uploads persist the original and return straight away; everything
+CPU-heavy happens here, off the request:
+
+1. render_variants() decodes the photo once and produces the pHash plus
+   thumb/card/full renditions as WebP (and AVIF where Pillow supports it).
+   It runs in a process pool -- PIL holds the GIL for most of a resize or
+   encode, so threads would just queue behind each other.
+2. The storage backend stores the renditions (LocalStorage writes files,
+   and serves the "full" one at the original's URL; Cloudinary renders
+   them itself from eager transformations).
+3. The result is kept in Redis under the original URL. When a listing is
+   saved, app.tasks.image_tasks.attach_listing_images picks the results up
+   (or processes anything missing itself) and writes pHashes, variant URLs
+   and duplicate-image flags back to the listing.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.cache_service import cache
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels per rendition
+VARIANT_SIZES = {"thumb": 200, "card": 480, "full": 1200}
+VARIANT_QUALITY = {"webp": 80, "avif": 60}
+RESULT_TTL = 24 * 3600
+
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+
+def _avif_supported() -> bool:
+    try:
+        from PIL import features
+        return bool(features.check("avif"))
+    except Exception:
+        return False
+
+
+def render_variants(content: bytes, with_variants: bool = True) -> Dict[str, Any]:
+    """
+    Decode `content` once and return its pHash and encoded renditions:
+    {"phash": str, "width": int, "height": int,
+     "variants": {"thumb": {"webp": bytes, "avif": bytes}, ...}}
+
+    Runs in a worker process, so it takes and returns plain picklable data.
+    """
+    from PIL import Image, ImageOps
+    import imagehash
+
+    img = Image.open(io.BytesIO(content))
+    img = ImageOps.exif_transpose(img)
+    result: Dict[str, Any] = {
+        "phash": str(imagehash.phash(img)),
+        "width": img.width,
+        "height": img.height,
+        "variants": {},
+    }
+    if not with_variants:
+        return result
+
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+    formats = ["webp"] + (["avif"] if _avif_supported() else [])
+
+    # Largest first, each rendition downscaled from the previous one
+    source = img
+    for name, edge in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        source = source.copy()
+        source.thumbnail((edge, edge), Image.LANCZOS)
+        encoded = {}
+        for fmt in formats:
+            buf = io.BytesIO()
+            source.save(buf, format=fmt.upper(), quality=VARIANT_QUALITY[fmt])
+            encoded[fmt] = buf.getvalue()
+        result["variants"][name] = encoded
+    return result
+
+
+def _result_key(url: str) -> str:
+    return f"image_pipeline:{hashlib.sha1(url.encode()).hexdigest()}"
+
+
+class ImagePipeline:
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: set = set()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the API process runs background threads (cache
+            # invalidation listener, Kafka clients) that fork would copy mid-state
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PIPELINE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(self, url: str, content: bytes) -> None:
+        """Queue an uploaded photo for processing; returns immediately."""
+        cache.set(_result_key(url), {"status": PROCESSING}, ttl=RESULT_TTL)
+        task = asyncio.create_task(self._process(url, content))
+        # Hold a reference until done so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, url: str, content: bytes) -> None:
+        from app.services.storage_service import storage_service
+        loop = asyncio.get_running_loop()
+        try:
+            rendered = await loop.run_in_executor(
+                self.executor, render_variants, content, storage_service.renders_variants
+            )
+            variant_urls = await storage_service.store_variants(url, rendered["variants"])
+            self._save(url, rendered, variant_urls)
+        except Exception as e:
+            logger.warning(f"Image pipeline failed for {url}: {e}")
+            cache.set(_result_key(url), {"status": FAILED, "error": str(e)}, ttl=RESULT_TTL)
+
+    def process_sync(self, url: str, content: bytes) -> Dict[str, Any]:
+        """Process in the calling process (Celery workers). Returns the stored result."""
+        from app.services.storage_service import storage_service
+        rendered = render_variants(content, storage_service.renders_variants)
+        variant_urls = asyncio.run(storage_service.store_variants(url, rendered["variants"]))
+        return self._save(url, rendered, variant_urls)
+
+    def _save(self, url: str, rendered: Dict[str, Any], variant_urls: Dict[str, Any]) -> Dict[str, Any]:
+        result = {
+            "status": DONE,
+            "phash": rendered["phash"],
+            "width": rendered["width"],
+            "height": rendered["height"],
+            "variants": variant_urls,
+        }
+        cache.set(_result_key(url), result, ttl=RESULT_TTL)
+        return result
+
+    def get_result(self, url: str) -> Optional[Dict[str, Any]]:
+        """Latest pipeline state for an uploaded URL, or None if never submitted/expired."""
+        return cache.get(_result_key(url))
+
+
+image_pipeline = ImagePipeline()
@@ -3,50 +3,135 @@ Kafka Producer Wrapper - Event Publishing Service
 
 Handles publishing domain events to Kafka with standardized envelope.
 Uses aiokafka for async/await support in FastAPI endpoints.
+
+publish_event() used to await send_and_wait, so every request that
+published paid a broker round-trip per event (create_listing paid three).
+Now it builds the envelope and puts it on a bounded in-process outbox, and
+returns; a background task hands queued events to the producer, which
+batches them per partition (KAFKA_LINGER_MS, KAFKA_MAX_BATCH_BYTES) and
+compresses (KAFKA_COMPRESSION_TYPE).
+
+Events Kafka can't take -- broker unreachable, delivery failed, or the
+outbox full -- are written to the kafka_outbox table instead of being lost.
+Every KAFKA_OUTBOX_RETRY_SECONDS the producer reconnects if needed and
+replays that table in id order (rows locked with SKIP LOCKED, so several
+workers can replay at once), deleting each row once the broker acks it.
+Replayed events arrive after newer ones already published; consumers
+order by the envelope timestamp where it matters.
+
+A row the broker keeps rejecting (e.g. over its message size limit) is
+dead-lettered after KAFKA_OUTBOX_MAX_ATTEMPTS failed replays: it stays in
+the table for inspection but is no longer replayed, so it can't hold up
+the rows behind it. Rows older than KAFKA_OUTBOX_RETENTION_HOURS are
+deleted whether delivered or not, so a broker that stays down can't grow
+the table without bound.
+
+publish_event(..., wait=True) keeps the old behaviour for callers that
+need the broker's ack before continuing.
 """
 
+import asyncio
 import json
 import logging
+import time
 import uuid
-from datetime import datetime
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
 from aiokafka import AIOKafkaProducer
+from aiokafka import codec
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+
 from app.core.config import settings
+from app.core.metrics import KAFKA_EVENTS_TOTAL, KAFKA_OUTBOX_DEPTH, KAFKA_PUBLISH_SECONDS
+from app.models.kafka_outbox import KafkaOutboxEvent
 
 logger = logging.getLogger("kafka_producer")
 
 
+@dataclass
+class _Pending:
+    topic: str
+    key: Optional[bytes]
+    value: bytes
+    event_type: str
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+def _compression_type() -> Optional[str]:
+    ctype = settings.KAFKA_COMPRESSION_TYPE or None
+    if ctype and not getattr(codec, f"has_{ctype}", lambda: False)():
+        logger.warning(f"Kafka compression {ctype} unavailable (pip install cramjam), sending uncompressed")
+        return None
+    return ctype
+
+
 class KafkaEventProducer:
     """Publishes domain events to Kafka with standard envelope."""
 
     def __init__(self):
         self.producer: Optional[AIOKafkaProducer] = None
         self.is_connected = False
+        self._outbox: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._background: set = set()
+        self._failed: List[_Pending] = []
+        self._last_error = ""
 
     async def start(self):
-        """Initialize Kafka producer connection."""
+        """Initialize Kafka producer connection and the outbox tasks."""
         if not settings.KAFKA_BOOTSTRAP_SERVERS:
             logger.warning("Kafka not configured - events will not be published")
             return
 
+        self._outbox = asyncio.Queue(maxsize=settings.KAFKA_OUTBOX_SIZE)
+        await self._connect()
+        # Started even if Kafka is down: queued events go to kafka_outbox until it's back
+        self._tasks = [asyncio.create_task(self._drain()), asyncio.create_task(self._replay_loop())]
+
+    async def _connect(self) -> None:
+        producer = AIOKafkaProducer(
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+            linger_ms=settings.KAFKA_LINGER_MS,
+            max_batch_size=settings.KAFKA_MAX_BATCH_BYTES,
+            compression_type=_compression_type(),
+        )
         try:
-            self.producer = AIOKafkaProducer(
-                bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
-                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-            )
-            await self.producer.start()
-            self.is_connected = True
-            logger.info(f"Kafka Producer connected to {settings.KAFKA_BOOTSTRAP_SERVERS}")
+            await producer.start()
         except Exception as e:
             logger.error(f"Failed to connect Kafka Producer: {e}")
+            try:
+                await producer.stop()
+            except Exception:
+                pass
             self.is_connected = False
+            return
+        self.producer = producer
+        self.is_connected = True
+        logger.info(f"Kafka Producer connected to {settings.KAFKA_BOOTSTRAP_SERVERS}")
 
     async def stop(self):
-        """Close Kafka producer connection."""
+        """Publish (or store) whatever is still queued, then close the connection."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+        leftover = []
+        while self._outbox is not None and not self._outbox.empty():
+            leftover.append(self._outbox.get_nowait())
+        KAFKA_OUTBOX_DEPTH.set(0)
+        for item in leftover:
+            await self._send(item)
+
         if self.producer:
-            await self.producer.stop()
+            await self.producer.stop()  # waits for in-flight batches
             self.is_connected = False
             logger.info("Kafka Producer stopped")
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        self._outbox = None
 
     async def publish_event(
         self,
@@ -58,6 +143,7 @@ class KafkaEventProducer:
         source: str = "api",
         correlation_id: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        wait: bool = False,
     ) -> bool:
         """
         Publish an event to Kafka with standard envelope.
@@ -71,45 +157,232 @@ class KafkaEventProducer:
             source: Origin of event (api, scheduled, internal)
             correlation_id: Trace ID for correlation across services
             metadata: Additional metadata (ip, device, etc.)
+            wait: Wait for the broker's acknowledgement instead of queueing
 
         Returns:
-            True if published successfully, False if Kafka unavailable
+            True if the event was queued (or, with wait, published);
+            False if Kafka isn't configured or the publish failed
         """
-        if not self.is_connected or not self.producer:
-            logger.error(f"❌ Kafka producer not available! is_connected={self.is_connected}, producer={self.producer is not None}. Skipping event: {event_type}")
+        if self._outbox is None:
+            logger.error(f"❌ Kafka producer not available! Skipping event: {event_type}")
             return False
 
-        try:
-            # Build standard event envelope
-            event = {
-                "event_id": str(uuid.uuid4()),
-                "event_type": event_type,
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "user_id": user_id,
-                "source": source,
-                "correlation_id": correlation_id or str(uuid.uuid4()),
-                "payload": payload,
-                "metadata": metadata or {},
-            }
-
-            # Use partition_key for ordering guarantee (same entity stays on same partition)
-            key = (partition_key or user_id or "").encode('utf-8') if partition_key or user_id else None
-
-            logger.info(f"📤 Publishing {event_type} to {topic}...")
-
-            # Publish asynchronously
-            await self.producer.send_and_wait(
-                topic,
-                value=event,
-                key=key,
-            )
-
-            logger.info(f"✅ Published {event_type} to {topic} (id: {event['event_id']})")
+        # Build standard event envelope
+        event = {
+            "event_id": str(uuid.uuid4()),
+            "event_type": event_type,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "user_id": user_id,
+            "source": source,
+            "correlation_id": correlation_id or str(uuid.uuid4()),
+            "payload": payload,
+            "metadata": metadata or {},
+        }
+
+        # Use partition_key for ordering guarantee (same entity stays on same partition)
+        key = (partition_key or user_id or "").encode('utf-8') if partition_key or user_id else None
+        item = _Pending(topic, key, json.dumps(event, default=str).encode('utf-8'), event_type)
+
+        if wait:
+            if not self.is_connected:
+                logger.error(f"❌ Kafka producer not connected, cannot publish {event_type}")
+                return False
+            try:
+                await self.producer.send_and_wait(topic, value=item.value, key=key)
+            except Exception as e:
+                logger.error(f"❌ Failed to publish event {event_type}: {e}", exc_info=True)
+                return False
+            KAFKA_EVENTS_TOTAL.labels("published").inc()
+            KAFKA_PUBLISH_SECONDS.observe(time.monotonic() - item.queued_at)
             return True
 
+        try:
+            self._outbox.put_nowait(item)
+        except asyncio.QueueFull:
+            # Don't block the request on a backed-up outbox; store it for replay
+            self._in_background(asyncio.to_thread(self._spill, [item], "outbox full"))
+        KAFKA_OUTBOX_DEPTH.set(self._outbox.qsize())
+        logger.debug(f"📤 Queued {event_type} for {topic} (id: {event['event_id']})")
+        return True
+
+    # -- delivery (background) -------------------------------------------------
+
+    def _in_background(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _drain(self) -> None:
+        while True:
+            item = await self._outbox.get()
+            KAFKA_OUTBOX_DEPTH.set(self._outbox.qsize())
+            if not self.is_connected:
+                # Move everything queued so far to the table in one write
+                items = [item]
+                while not self._outbox.empty() and len(items) < settings.KAFKA_OUTBOX_REPLAY_BATCH:
+                    items.append(self._outbox.get_nowait())
+                KAFKA_OUTBOX_DEPTH.set(self._outbox.qsize())
+                await asyncio.to_thread(self._spill, items, "Kafka not connected")
+                continue
+            try:
+                await self._send(item)
+            except asyncio.CancelledError:
+                self._outbox.put_nowait(item)  # stop() publishes what's left in the queue
+                raise
+
+    async def _send(self, item: _Pending) -> None:
+        """Hand `item` to the producer's batch accumulator; the ack is handled in _on_sent."""
+        if not self.is_connected:
+            self._on_failed(item, "Kafka not connected")
+            return
+        try:
+            # Only waits if the accumulator is full; delivery completes the future later
+            future = await self.producer.send(item.topic, value=item.value, key=item.key)
         except Exception as e:
-            logger.error(f"❌ Failed to publish event {event_type}: {e}", exc_info=True)
-            return False
+            self._on_failed(item, str(e))
+            return
+        future.add_done_callback(lambda f: self._on_sent(item, f))
+
+    def _on_sent(self, item: _Pending, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self._on_failed(item, "cancelled")
+        elif future.exception() is not None:
+            self._on_failed(item, str(future.exception()))
+        else:
+            KAFKA_EVENTS_TOTAL.labels("published").inc()
+            KAFKA_PUBLISH_SECONDS.observe(time.monotonic() - item.queued_at)
+
+    def _on_failed(self, item: _Pending, error: str) -> None:
+        logger.warning(f"Kafka publish of {item.event_type} failed, storing for replay: {error}")
+        # Failures of one batch arrive together; store them in one write
+        if not self._failed:
+            self._in_background(self._spill_failed())
+        self._failed.append(item)
+        self._last_error = error
+
+    async def _spill_failed(self) -> None:
+        await asyncio.sleep(0)
+        items, self._failed = self._failed, []
+        await asyncio.to_thread(self._spill, items, self._last_error)
+
+    def _spill(self, items: List[_Pending], error: str) -> None:
+        """Write `items` to kafka_outbox for replay (runs in a worker thread)."""
+        from app.db.session import engine
+
+        rows = [
+            {
+                "topic": i.topic,
+                "key": i.key.decode('utf-8') if i.key is not None else None,
+                "value": i.value.decode('utf-8'),
+                "event_type": i.event_type,
+                "created_at": datetime.utcnow(),
+                "attempts": 0,
+                "last_error": error[:500],
+            }
+            for i in items
+        ]
+        try:
+            with Session(engine) as db:
+                db.execute(insert(KafkaOutboxEvent), rows)
+                db.commit()
+            KAFKA_EVENTS_TOTAL.labels("spilled").inc(len(rows))
+        except Exception as e:
+            KAFKA_EVENTS_TOTAL.labels("dropped").inc(len(rows))
+            logger.error(f"❌ Lost {len(rows)} Kafka event(s), outbox table unavailable: {e}")
+
+    # -- replay of kafka_outbox --------------------------------------------------
+
+    async def _replay_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(settings.KAFKA_OUTBOX_RETRY_SECONDS)
+            try:
+                await asyncio.to_thread(self._expire_outbox)
+            except Exception as e:
+                logger.warning(f"Kafka outbox cleanup failed: {e}")
+            if not self.is_connected:
+                await self._connect()
+                if not self.is_connected:
+                    continue
+            try:
+                while await asyncio.to_thread(self._replay_batch, loop) == settings.KAFKA_OUTBOX_REPLAY_BATCH:
+                    pass
+            except Exception as e:
+                logger.warning(f"Kafka outbox replay failed: {e}")
+
+    def _expire_outbox(self) -> int:
+        """Delete kafka_outbox rows past KAFKA_OUTBOX_RETENTION_HOURS (runs in a worker thread)."""
+        from app.db.session import engine
+
+        cutoff = datetime.utcnow() - timedelta(hours=settings.KAFKA_OUTBOX_RETENTION_HOURS)
+        with Session(engine) as db:
+            expired = db.execute(delete(KafkaOutboxEvent).where(KafkaOutboxEvent.created_at < cutoff)).rowcount
+            db.commit()
+        if expired:
+            KAFKA_EVENTS_TOTAL.labels("expired").inc(expired)
+            logger.error(f"❌ Dropped {expired} Kafka event(s) older than {settings.KAFKA_OUTBOX_RETENTION_HOURS}h from the outbox table")
+        return expired
+
+    def _replay_batch(self, loop: asyncio.AbstractEventLoop) -> int:
+        """
+        Publish the oldest replayable kafka_outbox rows and delete the
+        delivered ones (runs in a worker thread; the sends run on `loop`).
+        The rows stay locked until then, so a crash mid-replay only means a
+        resend. Dead-lettered rows are skipped.
+
+        Returns:
+            Rows delivered
+        """
+        from app.db.session import engine
+
+        with Session(engine) as db:
+            rows = db.exec(
+                select(KafkaOutboxEvent)
+                .where(KafkaOutboxEvent.attempts < settings.KAFKA_OUTBOX_MAX_ATTEMPTS)
+                .order_by(KafkaOutboxEvent.id)
+                .limit(settings.KAFKA_OUTBOX_REPLAY_BATCH)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                return 0
+
+            messages = [
+                (r.topic, r.value.encode('utf-8'), r.key.encode('utf-8') if r.key is not None else None)
+                for r in rows
+            ]
+            errors = asyncio.run_coroutine_threadsafe(self._send_all(messages), loop).result()
+
+            delivered = [r.id for r, error in zip(rows, errors) if error is None]
+            dead = 0
+            for r, error in zip(rows, errors):
+                if error is not None:
+                    r.attempts += 1
+                    r.last_error = str(error)[:500]
+                    db.add(r)
+                    if r.attempts >= settings.KAFKA_OUTBOX_MAX_ATTEMPTS:
+                        dead += 1
+                        logger.error(
+                            f"❌ Dead-lettered Kafka outbox row {r.id} ({r.event_type} -> {r.topic}) "
+                            f"after {r.attempts} attempts: {r.last_error}"
+                        )
+            if delivered:
+                db.execute(delete(KafkaOutboxEvent).where(KafkaOutboxEvent.id.in_(delivered)))
+            db.commit()
+
+        KAFKA_EVENTS_TOTAL.labels("replayed").inc(len(delivered))
+        if dead:
+            KAFKA_EVENTS_TOTAL.labels("dead_lettered").inc(dead)
+        if delivered:
+            logger.info(f"Replayed {len(delivered)} Kafka event(s) from the outbox table")
+        return len(delivered)
+
+    async def _send_all(self, messages) -> List[Optional[BaseException]]:
+        async def send(topic, value, key):
+            future = await self.producer.send(topic, value=value, key=key)
+            await future
+
+        results = await asyncio.gather(*(send(*m) for m in messages), return_exceptions=True)
+        return [r if isinstance(r, BaseException) else None for r in results]
 
 
 # Global producer instance
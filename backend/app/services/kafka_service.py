@@ -7,6 +7,7 @@ from typing import Any, Dict, List, Optional
 from datetime import datetime
 from fastapi import WebSocket
 from app.core.config import settings
+from app.services.ws_backplane import ws_backplane
 
 logger = logging.getLogger("kafka_service")
 
@@ -26,6 +27,9 @@ class ConnectionManager:
         self.active_connections: Dict[str, List[WebSocket]] = {}  # business_id -> websockets
         self.user_connections: Dict[int, List[WebSocket]] = {}  # user_id -> websockets (personal channel)
         self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Broadcasts go through the backplane so sockets on other workers get them too
+        ws_backplane.register("business", self._deliver_to_business)
+        ws_backplane.register("user", self._deliver_to_user)
 
     def set_event_loop(self, loop: asyncio.AbstractEventLoop):
         self.loop = loop
@@ -46,8 +50,12 @@ class ConnectionManager:
         logger.info(f"WebSocket disconnected for business {business_id}")
 
     async def broadcast_to_business(self, business_id: str, message: dict):
+        await ws_backplane.publish("business", {"business_id": business_id, "message": message})
+
+    async def _deliver_to_business(self, payload: dict):
+        business_id, message = payload["business_id"], payload["message"]
         if business_id in self.active_connections:
-            for connection in self.active_connections[business_id]:
+            for connection in list(self.active_connections[business_id]):
                 try:
                     await connection.send_json(message)
                 except Exception as e:
@@ -77,7 +85,11 @@ class ConnectionManager:
         logger.info(f"WebSocket disconnected for user {user_id}")
 
     async def broadcast_to_user(self, user_id: int, message: dict):
-        for connection in self.user_connections.get(user_id, []):
+        await ws_backplane.publish("user", {"user_id": user_id, "message": message})
+
+    async def _deliver_to_user(self, payload: dict):
+        user_id, message = int(payload["user_id"]), payload["message"]
+        for connection in list(self.user_connections.get(user_id, [])):
             try:
                 await connection.send_json(message)
             except Exception as e:
@@ -185,6 +185,21 @@ class MarketingAutomationService:
         related_shop_id: Optional[int] = None
     ):
         """Send email based on event type."""
+        self.send_event_email_sync(
+            session, user_id, event_type, context,
+            related_listing_id=related_listing_id, related_shop_id=related_shop_id,
+        )
+
+    def send_event_email_sync(
+        self,
+        session: Session,
+        user_id: int,
+        event_type: EmailEventType,
+        context: Dict[str, Any],
+        related_listing_id: Optional[int] = None,
+        related_shop_id: Optional[int] = None
+    ):
+        """send_event_email for threadpool callers: queries and sends synchronously, no event loop needed."""
         
         # Check user preferences. A missing row means the user has never
         # opened notification settings -- treat that as opted-in (every
@@ -3,6 +3,7 @@ Notification Integration Service
 Handles email and SMS notifications for orders, deliveries, and abandoned carts
 """
 
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from sqlmodel import Session, select
@@ -11,8 +12,8 @@ import logging
 from app.models.user import User
 from app.models.order import Order, OrderStatus
 from app.models.cart import Cart
-from app.services.email_service import send_email
-from app.services.africastalking_service import send_sms
+from app.services.email_service import email_service
+from app.services.sms_service import sms_service
 
 logger = logging.getLogger(__name__)
 
@@ -248,6 +249,11 @@ class NotificationIntegrationService:
         session: Session,
     ) -> None:
         """Send abandoned cart recovery emails and SMS"""
+        await asyncio.to_thread(NotificationIntegrationService.notify_abandoned_cart, cart, user)
+
+    @staticmethod
+    def notify_abandoned_cart(cart: Cart, user: User) -> None:
+        """send_abandoned_cart_notification for sync callers (blocks on the email/SMS send)"""
         try:
             if not user.email and not user.phone:
                 logger.warning(f"User {user.id} has no email or phone")
@@ -255,7 +261,7 @@ class NotificationIntegrationService:
 
             # Prepare cart items summary
             items_list = "\n".join(
-                [f"  • {item.quantity}x {item.product_title} - KSh {item.quantity * item.price_at_add:.2f}"
+                [f"  • {item.quantity}x {item.product.title_en if item.product else 'Item'} - KSh {item.quantity * item.price_at_add:.2f}"
                  for item in cart.items]
             )
 
@@ -276,7 +282,7 @@ class NotificationIntegrationService:
 
             # Send Email
             if user.email and user.email_notifications:
-                await NotificationIntegrationService._send_email_notification(
+                NotificationIntegrationService._email_notification(
                     user.email,
                     "abandoned_cart",
                     cart_data,
@@ -284,7 +290,7 @@ class NotificationIntegrationService:
 
             # Send SMS
             if user.phone and user.sms_notifications:
-                await NotificationIntegrationService._send_sms_notification(
+                NotificationIntegrationService._sms_notification(
                     user.phone,
                     "abandoned_cart",
                     cart_data,
@@ -337,6 +343,15 @@ class NotificationIntegrationService:
         data: Dict[str, Any],
     ) -> None:
         """Send email using email service"""
+        # The send is a blocking SMTP/HTTP call
+        await asyncio.to_thread(NotificationIntegrationService._email_notification, email, notification_type, data)
+
+    @staticmethod
+    def _email_notification(
+        email: str,
+        notification_type: str,
+        data: Dict[str, Any],
+    ) -> None:
         try:
             if notification_type not in EMAIL_TEMPLATES:
                 logger.warning(f"Unknown notification type: {notification_type}")
@@ -346,11 +361,10 @@ class NotificationIntegrationService:
             subject = template["subject"].format(**data)
             body = template["body"].format(**data)
 
-            await send_email(
-                to_email=email,
+            email_service.send_email(
+                to=email,
                 subject=subject,
-                body=body,
-                html=f"<pre>{body}</pre>",  # Simple HTML version
+                html_content=f"<pre>{body}</pre>",  # Simple HTML version
             )
 
         except Exception as e:
@@ -363,6 +377,14 @@ class NotificationIntegrationService:
         data: Dict[str, Any],
     ) -> None:
         """Send SMS using AfricasTalking service"""
+        await asyncio.to_thread(NotificationIntegrationService._sms_notification, phone, notification_type, data)
+
+    @staticmethod
+    def _sms_notification(
+        phone: str,
+        notification_type: str,
+        data: Dict[str, Any],
+    ) -> None:
         try:
             if notification_type not in SMS_TEMPLATES:
                 logger.warning(f"Unknown SMS notification type: {notification_type}")
@@ -375,8 +397,8 @@ class NotificationIntegrationService:
             if len(message) > 160:
                 message = message[:157] + "..."
 
-            await send_sms(
-                phone_number=phone,
+            sms_service.send_sms(
+                to_number=phone,
                 message=message,
             )
 
@@ -391,6 +413,14 @@ class AbandonedCartNotificationService:
     async def check_and_notify_abandoned_carts(
         session: Session,
         hours_threshold: int = 2,
+    ) -> None:
+        """Run notify_abandoned_carts in a worker thread: it queries and sends synchronously"""
+        await asyncio.to_thread(AbandonedCartNotificationService.notify_abandoned_carts, session, hours_threshold)
+
+    @staticmethod
+    def notify_abandoned_carts(
+        session: Session,
+        hours_threshold: int = 2,
     ) -> None:
         """
         Check for abandoned carts and send notifications
@@ -407,7 +437,7 @@ class AbandonedCartNotificationService:
                 select(Cart)
                 .where(
                     (Cart.updated_at < cutoff_time) &
-                    (len(Cart.items) > 0)  # Has items
+                    Cart.items.any()  # Has items
                 )
             ).all()
 
@@ -417,9 +447,7 @@ class AbandonedCartNotificationService:
                     continue
 
                 # Send notification
-                await NotificationIntegrationService.send_abandoned_cart_notification(
-                    cart, user, session
-                )
+                NotificationIntegrationService.notify_abandoned_cart(cart, user)
 
             logger.info(f"Checked and notified {len(abandoned_carts)} abandoned carts")
 
@@ -4,6 +4,7 @@ from sqlmodel import Session, select
 from app.models.promotion import Promotion, PromotionStatus, PromotionPlan
 from app.models.mobile_money import MobileTransaction
 from app.models.listing import Listing
+from app.services.shop_stats_service import refresh_shop_stats
 
 class PaymentService:
     def match_transaction(self, db: Session, transaction: MobileTransaction) -> Optional[Promotion]:
@@ -101,6 +102,11 @@ class PaymentService:
         
         db.commit()
         db.refresh(order)
+        if listing:
+            try:
+                refresh_shop_stats(db, listing.owner_id)
+            except Exception as e:
+                print(f"Failed to refresh shop_stats for owner {listing.owner_id}: {e}")
         print(f"PAYMENT MATCHED: Order {order.id} linked to Trans {transaction.reference}")
 
         # 4. Create Notification
@@ -15,12 +15,17 @@ Round-robins subject-line variants per user+campaign_type based on how many
 times that pair has been sent before, and hands campaign_selector_fn a
 lookback window it can use to avoid repeating the same categories/shops too
 soon (via CampaignSendLog.category_id / shop_ids).
+
+Runs over users in batches: load_batch() fetches everyone's preferences and
+send history in two grouped queries and evaluates each campaign's
+eligibility_fn once for the whole batch, so selecting for a user touches
+the database only for the content of the campaign it ends up sending.
 """
 
 import json
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from sqlmodel import Session, select, func
 
 from app.models.user import User
@@ -48,9 +53,46 @@ class SelectedCampaign:
     send_fn: Callable[[str, str, str, Dict[str, Any]], bool]
 
 
-def _get_preference(db: Session, user_id: int) -> EmailPreference:
-    preference = db.exec(select(EmailPreference).where(EmailPreference.user_id == user_id)).first()
-    return preference or EmailPreference(user_id=user_id)
+@dataclass
+class RotationBatch:
+    """Preferences and CampaignSendLog history for a batch of users."""
+    preferences: Dict[int, EmailPreference]
+    # (user_id, campaign_type) -> (last sent_at, number of sends)
+    history: Dict[Tuple[int, str], Tuple[datetime, int]]
+    promo_sent_this_week: Dict[int, int]
+    # campaign_type -> ids of the batch's users its eligibility_fn accepted
+    eligible: Dict[str, Set[int]]
+
+
+def load_batch(db: Session, users: List[User]) -> RotationBatch:
+    user_ids = [u.id for u in users]
+    preferences = {
+        p.user_id: p
+        for p in db.exec(select(EmailPreference).where(EmailPreference.user_id.in_(user_ids))).all()
+    }
+
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    promo_types = {c for c, d in CATALOG.items() if d.is_promotional}
+    history: Dict[Tuple[int, str], Tuple[datetime, int]] = {}
+    promo_sent_this_week: Dict[int, int] = {}
+    rows = db.exec(
+        select(
+            CampaignSendLog.user_id,
+            CampaignSendLog.campaign_type,
+            func.max(CampaignSendLog.sent_at),
+            func.count(),
+            func.count().filter(CampaignSendLog.sent_at >= week_ago),
+        )
+        .where(CampaignSendLog.user_id.in_(user_ids))
+        .group_by(CampaignSendLog.user_id, CampaignSendLog.campaign_type)
+    ).all()
+    for user_id, campaign_type, last_sent, sends, sends_this_week in rows:
+        history[(user_id, campaign_type)] = (last_sent, sends)
+        if campaign_type in promo_types:
+            promo_sent_this_week[user_id] = promo_sent_this_week.get(user_id, 0) + sends_this_week
+
+    eligible = {c: d.eligibility_fn(db, users) for c, d in CATALOG.items()}
+    return RotationBatch(preferences, history, promo_sent_this_week, eligible)
 
 
 def _is_gated_out(definition: CampaignDefinition, preference: EmailPreference) -> bool:
@@ -62,61 +104,35 @@ def _is_gated_out(definition: CampaignDefinition, preference: EmailPreference) -
     return False
 
 
-def _last_sent_at(db: Session, user_id: int, campaign_type: str) -> Optional[datetime]:
-    row = db.exec(
-        select(func.max(CampaignSendLog.sent_at)).where(
-            CampaignSendLog.user_id == user_id, CampaignSendLog.campaign_type == campaign_type
-        )
-    ).first()
-    return row
-
-
-def _prior_send_count(db: Session, user_id: int, campaign_type: str) -> int:
-    return db.exec(
-        select(func.count()).where(
-            CampaignSendLog.user_id == user_id, CampaignSendLog.campaign_type == campaign_type
-        )
-    ).one() or 0
-
-
-def _promo_sent_this_week(db: Session, user_id: int) -> int:
-    since = datetime.utcnow() - timedelta(days=7)
-    promo_types = [c for c, d in CATALOG.items() if d.is_promotional]
-    if not promo_types:
-        return 0
-    return db.exec(
-        select(func.count()).where(
-            CampaignSendLog.user_id == user_id,
-            CampaignSendLog.campaign_type.in_(promo_types),
-            CampaignSendLog.sent_at >= since,
-        )
-    ).one() or 0
-
+def select_campaigns_for_user(db: Session, user: User, batch: Optional[RotationBatch] = None) -> List[SelectedCampaign]:
+    """`batch` must come from load_batch() over users including this one;
+    without it the user's history is loaded on its own."""
+    if batch is None:
+        batch = load_batch(db, [user])
+    preference = batch.preferences.get(user.id) or EmailPreference(user_id=user.id)
+    promo_remaining = WEEKLY_PROMO_CAP - batch.promo_sent_this_week.get(user.id, 0)
+    now = datetime.utcnow()
 
-def select_campaigns_for_user(db: Session, user: User) -> List[SelectedCampaign]:
-    preference = _get_preference(db, user.id)
-    promo_remaining = WEEKLY_PROMO_CAP - _promo_sent_this_week(db, user.id)
-
-    candidates: List[tuple] = []  # (last_sent_at or None, definition)
+    candidates: List[tuple] = []  # (last_sent_at or None, prior send count, definition)
     for definition in CATALOG.values():
         if _is_gated_out(definition, preference):
             continue
         if definition.is_promotional and promo_remaining <= 0:
             continue
 
-        last_sent = _last_sent_at(db, user.id, definition.campaign_type)
-        if last_sent and (datetime.utcnow() - last_sent) < timedelta(days=definition.cooldown_days):
+        last_sent, prior_count = batch.history.get((user.id, definition.campaign_type), (None, 0))
+        if last_sent and (now - last_sent) < timedelta(days=definition.cooldown_days):
             continue
-        if not definition.eligibility_fn(db, user):
+        if user.id not in batch.eligible[definition.campaign_type]:
             continue
 
-        candidates.append((last_sent, definition))
+        candidates.append((last_sent, prior_count, definition))
 
     # Never-sent campaigns (None) first, then longest-since-sent.
-    candidates.sort(key=lambda pair: pair[0] or datetime.min)
+    candidates.sort(key=lambda c: c[0] or datetime.min)
 
     selected: List[SelectedCampaign] = []
-    for _, definition in candidates:
+    for _, prior_count, definition in candidates:
         if len(selected) >= MAX_SENDS_PER_RUN:
             break
         if definition.is_promotional and promo_remaining <= 0:
@@ -126,7 +142,7 @@ def select_campaigns_for_user(db: Session, user: User) -> List[SelectedCampaign]
         if not content:
             continue  # nothing worth sending right now, try the next candidate
 
-        variant_index = _prior_send_count(db, user.id, definition.campaign_type) % len(definition.subject_variants)
+        variant_index = prior_count % len(definition.subject_variants)
         subject = definition.subject_variants[variant_index]
 
         selected.append(SelectedCampaign(
@@ -141,10 +157,10 @@ def select_campaigns_for_user(db: Session, user: User) -> List[SelectedCampaign]
     return selected
 
 
-def record_send(db: Session, user_id: int, selected: SelectedCampaign, email_log_id: Optional[int]) -> None:
+def _send_log(user_id: int, selected: SelectedCampaign, email_log_id: Optional[int]) -> CampaignSendLog:
     listing_ids = selected.content.get("listing_ids") or []
     shop_ids = selected.content.get("shop_ids") or []
-    db.add(CampaignSendLog(
+    return CampaignSendLog(
         user_id=user_id,
         campaign_type=selected.campaign_type,
         subject_variant=selected.subject,
@@ -152,5 +168,10 @@ def record_send(db: Session, user_id: int, selected: SelectedCampaign, email_log
         listing_ids=json.dumps(listing_ids) if listing_ids else None,
         shop_ids=json.dumps(shop_ids) if shop_ids else None,
         email_log_id=email_log_id,
-    ))
+    )
+
+
+def record_send(db: Session, user_id: int, selected: SelectedCampaign, email_log_id: Optional[int]) -> None:
+    db.add(_send_log(user_id, selected, email_log_id))
     db.commit()
+
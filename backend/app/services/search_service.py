@@ -0,0 +1,127 @@
+"""
+Listing text search shared by the feed (?q=), /search/listings/search and
+the SEO landing pages, so all three match and rank the same way.
+
+Matching runs against listing.search_vector, a stored tsvector kept up to
+date by a database trigger (see alembic listing_search_001) and weighted
+title > category names > description, plus pg_trgm on the titles and
+Somali description for substring and typo-tolerant hits. Every branch of
+the match is index-backed (GIN on search_vector, GIN trigram on the text
+columns), unlike the per-row to_tsvector() / ILIKE scans it replaces.
+
+Results are ordered by a relevance score -- ts_rank_cd plus title word
+similarity -- scaled up for boosted listings and trusted sellers.
+"""
+
+from sqlalchemy import Float, cast, literal, literal_column, or_, tuple_
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.sql import column, table
+from sqlmodel import func, select
+
+from app.models.listing import Listing
+from app.models.user import User
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+# How much a fuzzy title hit counts next to a full-text hit (ts_rank_cd is
+# normalized to [0, 1) below, word_similarity is already in [0, 1])
+FUZZY_WEIGHT = 0.5
+# Each boost level adds 25% to a listing's score...
+BOOST_WEIGHT = 0.25
+# ...and a trust_score of 100 adds another 50%
+TRUST_WEIGHT = 0.005
+
+# Not mapped on Listing: nothing outside search reads it, and it shouldn't
+# ride along on every select(Listing).
+_SEARCH_VECTOR = literal_column("listing.search_vector", type_=TSVECTOR)
+
+# Lightweight handles for scoring the cursor row in a subquery
+_listing_t = table(
+    "listing",
+    column("id"), column("owner_id"), column("search_vector", TSVECTOR),
+    column("title_en"), column("title_so"), column("boost_level"),
+)
+_user_t = table("user", column("id"), column("trust_score"))
+
+
+def _tsquery(q: str):
+    # English stemming for English text, 'simple' so Somali words in the
+    # query still hit the Somali lexemes stored under the simple config
+    return func.websearch_to_tsquery("english", q).op("||")(func.websearch_to_tsquery("simple", q))
+
+
+def _score(q: str, search_vector, title_en, title_so, boost_level, trust_score):
+    text_rank = func.ts_rank_cd(search_vector, _tsquery(q), 32) + FUZZY_WEIGHT * func.greatest(
+        func.word_similarity(q, func.coalesce(title_en, "")),
+        func.word_similarity(q, func.coalesce(title_so, "")),
+    )
+    return (
+        cast(text_rank, Float)
+        * (1 + BOOST_WEIGHT * func.coalesce(boost_level, 0))
+        * (1 + TRUST_WEIGHT * func.greatest(func.coalesce(trust_score, 0), 0))
+    )
+
+
+def search_match(q: str):
+    """WHERE clause matching listings against the search text `q`."""
+    pattern = f"%{q}%"
+    return or_(
+        _SEARCH_VECTOR.op("@@")(_tsquery(q)),
+        literal(q).op("<%")(Listing.title_en),
+        literal(q).op("<%")(Listing.title_so),
+        Listing.title_so.ilike(pattern),
+        Listing.description_so.ilike(pattern),
+    )
+
+
+def search_score(q: str):
+    """Blended relevance score; needs Listing joined to its owner User."""
+    return _score(q, _SEARCH_VECTOR, Listing.title_en, Listing.title_so, Listing.boost_level, User.trust_score)
+
+
+def search_cursor(listing: Listing) -> str:
+    """Next-page cursor for a search result ordered by search_statement()."""
+    return encode_cursor({"s": 1, "i": listing.id})
+
+
+def search_keyset_filter(q: str, cursor: str):
+    """Rows sorting strictly after `cursor` in search_statement() order for `q`."""
+    values = decode_cursor(cursor)
+    try:
+        last_id = int(values["i"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor("Malformed pagination cursor") from e
+    if values.get("s") != 1:
+        # A feed cursor sent to a search (or vice versa)
+        raise InvalidCursor("Cursor does not belong to this search")
+
+    # Re-score the cursor row in SQL rather than carrying a float in the
+    # token, so the comparison is against the exact same computed value.
+    cl = _listing_t.alias("cursor_listing")
+    cu = _user_t.alias("cursor_owner")
+    last_score = (
+        select(_score(q, cl.c.search_vector, cl.c.title_en, cl.c.title_so, cl.c.boost_level, cu.c.trust_score))
+        .select_from(cl.join(cu, cu.c.id == cl.c.owner_id))
+        .where(cl.c.id == last_id)
+        .scalar_subquery()
+    )
+    return tuple_(search_score(q), Listing.id) < tuple_(last_score, last_id)
+
+
+def search_statement(q: str, *filters, cursor: str = None):
+    """
+    select(Listing) matching `q`, owner joined and suspended sellers
+    excluded, ordered by relevance (id as tie-breaker). Callers add their
+    own .where()/.limit()/.offset() on top.
+
+    `cursor`, if given, must come from search_cursor() for the same `q`;
+    raises InvalidCursor otherwise.
+    """
+    statement = (
+        select(Listing)
+        .join(User, Listing.owner_id == User.id)
+        .where(User.is_suspended == False, search_match(q), *filters)
+        .order_by(search_score(q).desc(), Listing.id.desc())
+    )
+    if cursor:
+        statement = statement.where(search_keyset_filter(q, cursor))
+    return statement
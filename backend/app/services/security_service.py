@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.models.device import Device, UserDeviceLink
 from app.models.user import User
 from app.models.fraud import FraudEvent, FraudTargetType
+from app.crud.crud_listing import sync_owner_ranking
 
 from prometheus_client import Counter
 from app.core.logging_config import get_security_logger
@@ -111,6 +112,7 @@ class SecurityService:
                     user.is_flagged = True
                     user.trust_score = max(0, user.trust_score - 500)
                     db.add(user)
+                    sync_owner_ranking(db, user)
                     
         db.commit()
 
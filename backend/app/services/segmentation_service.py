@@ -1,7 +1,16 @@
-"""Customer segmentation service for targeting campaigns."""
+"""
+Customer segmentation service for targeting campaigns.
+
+Segment criteria are compiled into a single WHERE clause on User (derived
+fields become correlated EXISTS subqueries), so members and counts come
+straight from the database instead of evaluating every user in Python.
+"""
 
 import json
-from typing import List
+from datetime import datetime
+from typing import Any, List
+from sqlalchemy import Boolean, DateTime, Enum, Integer, String, TypeDecorator, and_, cast, exists, false, or_, true
+from sqlalchemy.sql.elements import ColumnElement
 from sqlmodel import Session, select, func
 from app.models.user import User
 from app.models.customer_segment import CustomerSegment
@@ -11,100 +20,151 @@ from app.core.logging_config import get_logger
 logger = get_logger("segmentation_service")
 
 
+def _is_seller() -> ColumnElement:
+    return exists().where(Listing.owner_id == User.id, Listing.approval_status == "approved")
+
+
+# Segment fields that aren't User columns, as SQL expressions correlated to User
+DERIVED_FIELDS = {
+    "is_seller": _is_seller,
+}
+# Columns segments may not filter on
+HIDDEN_FIELDS = {"hashed_password"}
+# Operators comparing the column's text, so any value goes
+TEXT_OPERATORS = {"contains", "not_contains"}
+TRUE_STRINGS = {"true", "1", "yes"}
+FALSE_STRINGS = {"false", "0", "no"}
+
+
+def _coerce(column: ColumnElement, value: Any) -> Any:
+    """
+    `value` as the Python type of `column`, so a rule like
+    trust_score > "abc" is caught here instead of failing the query in
+    Postgres. Raises ValueError if it doesn't fit.
+    """
+    if value is None:
+        return None
+    sql_type = column.type
+    if isinstance(sql_type, TypeDecorator):  # e.g. SQLModel's AutoString
+        sql_type = sql_type.impl_instance
+    if isinstance(sql_type, Boolean):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int) and value in (0, 1):
+            return bool(value)
+        if isinstance(value, str) and value.strip().lower() in TRUE_STRINGS | FALSE_STRINGS:
+            return value.strip().lower() in TRUE_STRINGS
+    elif isinstance(sql_type, Integer):
+        if isinstance(value, bool):
+            raise ValueError(f"expected a number, got {value!r}")
+        if isinstance(value, (int, float)):
+            return value
+        if isinstance(value, str):
+            return float(value) if "." in value else int(value)
+    elif isinstance(sql_type, DateTime):
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, str):
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    elif isinstance(sql_type, Enum) and sql_type.enum_class is not None:
+        enum_class = sql_type.enum_class
+        if isinstance(value, enum_class):
+            return value
+        for member in enum_class:
+            if value in (member.value, member.name):
+                return member
+    elif isinstance(sql_type, Enum):
+        if value in sql_type.enums:
+            return value
+    elif isinstance(sql_type, String):
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+    raise ValueError(f"{value!r} is not a valid {type(sql_type).__name__}")
+
+
 class SegmentationService:
     """Service for evaluating and managing customer segments."""
 
     @staticmethod
-    def evaluate_user_against_criteria(user: User, criteria_dict: dict) -> bool:
+    def compile_criteria(criteria_dict: dict) -> ColumnElement:
         """
-        Evaluate if a user matches segment criteria.
+        Translate segment criteria into a WHERE clause on User.
 
-        Args:
-            user: User object to evaluate
-            criteria_dict: Dictionary of criteria rules
-
-        Returns:
-            True if user matches all criteria, False otherwise
+        Criteria are {"operator": "and"|"or", "rules": [...]}; a rule is
+        {"field", "operator", "value"} or itself a nested group. Fields are
+        User columns or DERIVED_FIELDS (e.g. is_seller, an EXISTS over the
+        user's approved listings). As before, a rule on a NULL column, an
+        unknown field or an unknown operator doesn't match.
         """
-        try:
-            # Get the rules (can be a single rule or list of rules)
-            rules = criteria_dict.get("rules", [])
-            operator = criteria_dict.get("operator", "and")  # and or or
-
-            if not rules:
-                return True
-
-            results = []
-            for rule in rules:
-                field = rule.get("field")
-                op = rule.get("operator")  # equals, contains, greater_than, less_than, in, not_in
-                value = rule.get("value")
-
-                # Evaluate individual rule
-                rule_result = SegmentationService._evaluate_rule(user, field, op, value)
-                results.append(rule_result)
-
-            # Combine results based on operator
-            if operator == "or":
-                return any(results)
-            else:  # default to "and"
-                return all(results)
+        rules = criteria_dict.get("rules", [])
+        if not rules:
+            return true()
+
+        clauses = []
+        for rule in rules:
+            if "rules" in rule:
+                clauses.append(SegmentationService.compile_criteria(rule))
+            else:
+                clauses.append(SegmentationService._compile_rule(rule.get("field"), rule.get("operator"), rule.get("value")))
 
-        except Exception as e:
-            logger.warning(f"Error evaluating segment criteria: {e}")
-            return False
+        if criteria_dict.get("operator", "and") == "or":
+            return or_(*clauses)
+        return and_(*clauses)
 
     @staticmethod
-    def _evaluate_rule(user: User, field: str, operator: str, value: any) -> bool:
-        """Evaluate a single rule against a user."""
-        try:
-            # Special handling for is_seller (not a real field, derived from listings)
-            if field == "is_seller":
-                from sqlmodel import Session, select
-                from app.db import engine
-                from app.models.listing import Listing
-                with Session(engine) as db:
-                    has_listings = db.exec(
-                        select(Listing).where(
-                            Listing.owner_id == user.id,
-                            Listing.approval_status == 'approved'
-                        )
-                    ).first() is not None
-                user_value = has_listings
-            else:
-                # Get user attribute value
-                user_value = getattr(user, field, None)
-
-            if user_value is None and field != "is_seller":
-                return False
-
-            # Apply operator logic
-            if operator == "equals":
-                return user_value == value
-            elif operator == "not_equals":
-                return user_value != value
-            elif operator == "contains":
-                return str(value).lower() in str(user_value).lower()
-            elif operator == "not_contains":
-                return str(value).lower() not in str(user_value).lower()
-            elif operator == "greater_than":
-                return user_value > value
-            elif operator == "less_than":
-                return user_value < value
-            elif operator == "greater_equal":
-                return user_value >= value
-            elif operator == "less_equal":
-                return user_value <= value
-            elif operator == "in":
-                return user_value in value if isinstance(value, list) else user_value in [value]
-            elif operator == "not_in":
-                return user_value not in value if isinstance(value, list) else user_value not in [value]
-            else:
-                return False
+    def _compile_rule(field: str, operator: str, value: Any) -> ColumnElement:
+        """One rule as a SQL condition (false() if it can't match anything)."""
+        if field in DERIVED_FIELDS:
+            column = DERIVED_FIELDS[field]()
+            if operator in ("equals", "not_equals") and isinstance(value, bool):
+                # Bare EXISTS / NOT EXISTS, which Postgres plans as a (anti-)semi-join
+                return column if value == (operator == "equals") else ~column
+        elif field in User.__table__.c and field not in HIDDEN_FIELDS:
+            column = User.__table__.c[field]
+        else:
+            logger.warning(f"Unknown segment field: {field}")
+            return false()
+
+        if operator not in TEXT_OPERATORS:
+            try:
+                if isinstance(value, list):
+                    value = [_coerce(column, v) for v in value]
+                else:
+                    value = _coerce(column, value)
+            except ValueError as e:
+                logger.warning(f"Invalid value for segment field {field}: {e}")
+                return false()
+
+        values = value if isinstance(value, list) else [value]
+        if operator == "equals":
+            return column == value
+        elif operator == "not_equals":
+            return column != value
+        elif operator == "contains":
+            return func.lower(cast(column, String)).contains(str(value).lower(), autoescape=True)
+        elif operator == "not_contains":
+            return ~func.lower(cast(column, String)).contains(str(value).lower(), autoescape=True)
+        elif operator == "greater_than":
+            return column > value
+        elif operator == "less_than":
+            return column < value
+        elif operator == "greater_equal":
+            return column >= value
+        elif operator == "less_equal":
+            return column <= value
+        elif operator == "in":
+            return column.in_(values)
+        elif operator == "not_in":
+            return column.notin_(values)
+        logger.warning(f"Unknown segment operator: {operator}")
+        return false()
 
-        except Exception as e:
-            logger.warning(f"Error evaluating rule {field} {operator} {value}: {e}")
-            return False
+    @staticmethod
+    def _members_clause(segment: CustomerSegment) -> ColumnElement:
+        criteria = json.loads(segment.criteria)
+        return and_(User.is_active == True, SegmentationService.compile_criteria(criteria))  # noqa: E712
 
     @staticmethod
     def get_segment_members(
@@ -126,29 +186,32 @@ class SegmentationService:
             Tuple of (matching_users, total_count)
         """
         try:
-            criteria = json.loads(segment.criteria)
-
-            # Get all users
-            query = select(User).where(User.is_active == True)
-            all_users = db.exec(query).all()
-
-            # Filter by criteria
-            matching_users = [
-                user for user in all_users
-                if SegmentationService.evaluate_user_against_criteria(user, criteria)
-            ]
-
-            total_count = len(matching_users)
-
-            # Apply pagination
-            paginated = matching_users[offset : offset + limit]
-
-            return paginated, total_count
+            clause = SegmentationService._members_clause(segment)
+            members = db.exec(
+                select(User).where(clause).order_by(User.id).offset(offset).limit(limit)
+            ).all()
+            total_count = db.exec(select(func.count(User.id)).where(clause)).one()
+            return members, total_count
 
         except Exception as e:
+            db.rollback()
             logger.error(f"Failed to get segment members: {e}")
             return [], 0
 
+    @staticmethod
+    def count_segment_members(db: Session, segment: CustomerSegment) -> int:
+        """Number of users matching a segment's criteria."""
+        return db.exec(
+            select(func.count(User.id)).where(SegmentationService._members_clause(segment))
+        ).one()
+
+    @staticmethod
+    def seller_ids(db: Session, user_ids: List[int]) -> set:
+        """Which of `user_ids` count as sellers (the is_seller segment field)."""
+        if not user_ids:
+            return set()
+        return set(db.exec(select(User.id).where(User.id.in_(user_ids), _is_seller())).all())
+
     @staticmethod
     def update_segment_member_count(db: Session, segment: CustomerSegment) -> int:
         """
@@ -162,13 +225,14 @@ class SegmentationService:
             Updated member count
         """
         try:
-            _, count = SegmentationService.get_segment_members(db, segment, limit=10000)
+            count = SegmentationService.count_segment_members(db, segment)
             segment.member_count = count
             db.add(segment)
             db.commit()
             return count
 
         except Exception as e:
+            db.rollback()
             logger.error(f"Failed to update segment member count: {e}")
             return 0
 
@@ -0,0 +1,127 @@
+"""Persisted, unique shop slugs for O(log n) shop page lookup."""
+
+import unicodedata
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.models.user import User
+
+
+def slugify_shop_name(name: Optional[str], user_id: int) -> str:
+    """
+    URL-friendly slug from a shop name: NFKD-folded to ASCII, lowercase,
+    alphanumeric only, e.g. "Moon Glow Cosmetics" -> "moonglowcosmetics".
+
+    Falls back to "shop<id>" for names with no ASCII alphanumerics, and
+    prefixes all-digit names so they can't shadow the numeric-ID lookup
+    in GET /listings/shops/{slug}.
+    """
+    normalized = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii')
+    slug = ''.join(c for c in normalized.lower() if c.isalnum())
+    if not slug:
+        return f"shop{user_id}"
+    if slug.isdigit():
+        return f"shop{slug}"
+    return slug
+
+
+def _slug_taken(db: Session, slug: str, user_id: int) -> bool:
+    with db.no_autoflush:
+        return db.exec(
+            select(User.id).where(User.shop_slug == slug, User.id != user_id)
+        ).first() is not None
+
+
+def assign_shop_slug(db: Session, user: User) -> Optional[str]:
+    """
+    Set user.shop_slug from its current business_name. Does not commit.
+
+    Collisions resolve deterministically: whoever holds the bare slug keeps
+    it, and later claimants get their user id appended ("moonglow" ->
+    "moonglow42"). Users without a business_name have no slug.
+    """
+    if not user.business_name:
+        user.shop_slug = None
+        return None
+
+    base = slugify_shop_name(user.business_name, user.id)
+    for candidate in (base, f"{base}{user.id}", f"shop{user.id}"):
+        if candidate == user.shop_slug or not _slug_taken(db, candidate, user.id):
+            user.shop_slug = candidate
+            return candidate
+
+    # shop<id> embeds our unique id, so only another shop literally *named*
+    # "shop<id>" can hold it -- append the id once more to step around it.
+    user.shop_slug = f"shop{user.id}{user.id}"
+    return user.shop_slug
+
+
+def commit_shop_rename(db: Session, user: User) -> None:
+    """
+    Commit `user` after assign_shop_slug(). Two shops renamed to the same
+    name at once both pass the collision check; the unique index rejects
+    the second, which becomes a 409 instead of a 500.
+    """
+    db.add(user)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if "shop_slug" in str(e.orig):
+            raise HTTPException(
+                status_code=409,
+                detail="Another shop was just given this name. Please try again or choose a different name.",
+            )
+        raise
+
+
+def find_unslugged_shop(db: Session, slug: str) -> Optional[User]:
+    """
+    Match `slug` against shops that have no shop_slug yet (registered
+    before the backfill ran), deriving theirs the way assign_shop_slug()
+    would. Only those rows are scanned, so this costs nothing once
+    python -m app.cli.backfill_shop_slugs has run.
+    """
+    rows = db.exec(
+        select(User.id, User.business_name)
+        .where(User.business_name.isnot(None), User.shop_slug.is_(None))
+        .order_by(User.id)
+    ).all()
+    for user_id, business_name in rows:
+        if slugify_shop_name(business_name, user_id) == slug:
+            return db.get(User, user_id)
+    return None
+
+
+def backfill_shop_slugs(db: Session, batch_size: int = 500, limit: Optional[int] = None) -> int:
+    """
+    Assign slugs to every shop missing one, in id order so the oldest shop
+    wins any collision. Commits per batch.
+
+    Returns:
+        Number of shops updated
+    """
+    updated = 0
+    last_id = 0
+    while limit is None or updated < limit:
+        size = batch_size if limit is None else min(batch_size, limit - updated)
+        users = db.exec(
+            select(User)
+            .where(User.business_name.isnot(None), User.shop_slug.is_(None), User.id > last_id)
+            .order_by(User.id)
+            .limit(size)
+        ).all()
+        if not users:
+            break
+        for user in users:
+            assign_shop_slug(db, user)
+            db.add(user)
+            # Flush each one so the next user's collision check sees it
+            db.flush()
+        db.commit()
+        updated += len(users)
+        last_id = users[-1].id
+    return updated
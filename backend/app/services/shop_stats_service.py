@@ -0,0 +1,128 @@
+"""Maintains the shop_stats table backing the shop directories.
+
+Listing write paths call refresh_shop_stats() for the affected owner, which
+re-aggregates just that shop's listings (one grouped query over
+ix_listing_status_owner_id) and upserts its row. Recomputing per shop rather
+than applying +1/-1 deltas keeps the row correct no matter which status
+transition happened, and reconcile_shop_stats() catches any path that
+changes listings without calling it.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+
+from app.models.shop_stats import ShopStats
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = (
+    "total_count", "active_count", "pending_count", "sold_count",
+    "deleted_count", "latest_listing_at", "primary_category_id",
+)
+
+# Same aggregate as refresh_shop_stats(), for every shop at once. Primary
+# category = the category holding most of the shop's active listings,
+# lowest id on ties so reruns are stable.
+_AGGREGATE_SQL = """
+    WITH per_category AS (
+        SELECT owner_id, category_id, COUNT(*) AS cnt
+        FROM listing
+        WHERE status = 'active' {owner_filter}
+        GROUP BY owner_id, category_id
+    ),
+    primary_category AS (
+        SELECT DISTINCT ON (owner_id) owner_id, category_id
+        FROM per_category
+        ORDER BY owner_id, cnt DESC, category_id
+    )
+    SELECT l.owner_id,
+           COUNT(*) AS total_count,
+           COUNT(*) FILTER (WHERE l.status = 'active') AS active_count,
+           COUNT(*) FILTER (WHERE l.status = 'pending') AS pending_count,
+           COUNT(*) FILTER (WHERE l.status = 'sold') AS sold_count,
+           COUNT(*) FILTER (WHERE l.status = 'deleted') AS deleted_count,
+           MAX(l.created_at) FILTER (WHERE l.status = 'active') AS latest_listing_at,
+           pc.category_id AS primary_category_id
+    FROM listing l
+    LEFT JOIN primary_category pc ON pc.owner_id = l.owner_id
+    WHERE TRUE {owner_filter_l}
+    GROUP BY l.owner_id, pc.category_id
+"""
+
+
+def _aggregate(db: Session, owner_id: Optional[int] = None) -> Dict[int, dict]:
+    if owner_id is None:
+        sql = _AGGREGATE_SQL.format(owner_filter="", owner_filter_l="")
+        params = {}
+    else:
+        sql = _AGGREGATE_SQL.format(owner_filter="AND owner_id = :owner_id", owner_filter_l="AND l.owner_id = :owner_id")
+        params = {"owner_id": owner_id}
+    rows = db.execute(text(sql), params).mappings().all()
+    return {row["owner_id"]: {f: row[f] for f in STAT_FIELDS} for row in rows}
+
+
+def _upsert(db: Session, owner_id: int, stats: dict) -> None:
+    values = {"owner_id": owner_id, **stats, "updated_at": datetime.utcnow()}
+    stmt = insert(ShopStats.__table__).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["owner_id"],
+        set_={k: stmt.excluded[k] for k in values if k != "owner_id"},
+    )
+    db.execute(stmt)
+
+
+def _empty_stats() -> dict:
+    return {f: 0 for f in STAT_FIELDS if f.endswith("_count")} | {
+        "latest_listing_at": None,
+        "primary_category_id": None,
+    }
+
+
+def refresh_shop_stats(db: Session, owner_id: int) -> None:
+    """Recompute and upsert one shop's row. Commits."""
+    stats = _aggregate(db, owner_id).get(owner_id) or _empty_stats()
+    _upsert(db, owner_id, stats)
+    db.commit()
+
+
+def reconcile_shop_stats(db: Session, fix: bool = True) -> dict:
+    """
+    Recompute every shop's stats from the listing table and diff them
+    against shop_stats, optionally repairing drift. Used by the nightly
+    reconcile task.
+
+    Returns:
+        {"checked": n, "drifted": n, "missing": n, "orphaned": n}
+    """
+    expected = _aggregate(db)
+    stored = {
+        row.owner_id: {f: getattr(row, f) for f in STAT_FIELDS}
+        for row in db.execute(ShopStats.__table__.select()).all()
+    }
+
+    drifted = missing = 0
+    for owner_id, stats in expected.items():
+        current = stored.get(owner_id)
+        if current == stats:
+            continue
+        if current is None:
+            missing += 1
+        else:
+            drifted += 1
+            logger.info(f"shop_stats drift for owner {owner_id}: stored={current} actual={stats}")
+        if fix:
+            _upsert(db, owner_id, stats)
+
+    # Rows for shops whose listings have all been hard-deleted
+    orphaned = [owner_id for owner_id, stats in stored.items() if owner_id not in expected and stats != _empty_stats()]
+    if fix:
+        for owner_id in orphaned:
+            _upsert(db, owner_id, _empty_stats())
+        db.commit()
+
+    return {"checked": len(expected), "drifted": drifted, "missing": missing, "orphaned": len(orphaned)}
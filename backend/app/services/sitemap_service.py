@@ -8,19 +8,10 @@ from datetime import datetime
 from xml.sax.saxutils import escape
 from sqlmodel import Session
 from sqlalchemy import text
+from app.services.shop_slug_service import slugify_shop_name
 
 BASE_URL = "https://suqafuran.com"
 
-# Slug generation must exactly match get_public_shops() in listings.py --
-# shop slugs aren't a stored column, they're derived from the name the same
-# way every time a shop is looked up.
-def _shop_slug(shop_name: str, user_id) -> str:
-    name = shop_name or f"Shop_{user_id}"
-    slug = name.lower().strip().replace(" ", "").replace("_", "").replace("shop", "shop")
-    slug = "".join(c for c in slug if c.isalnum() or c == "-")
-    return slug or f"shop_{user_id}"
-
-
 STATIC_PAGES = [
     ("/", "daily", "1.0"),
     ("/shops", "daily", "0.9"),
@@ -55,14 +46,15 @@ def generate_sitemap_xml(db: Session) -> str:
         entries.append(_url_entry(f"{BASE_URL}/{slug}", today, "daily", "0.7"))
 
     shops = db.execute(text("""
-        SELECT u.id, COALESCE(u.business_name, u.full_name) as shop_name
+        SELECT u.id, COALESCE(u.business_name, u.full_name) as shop_name, u.shop_slug
         FROM "user" u
         INNER JOIN listing l ON l.owner_id = u.id AND l.status = 'active'
         WHERE u.is_verified = true
-        GROUP BY u.id, u.business_name, u.full_name
+        GROUP BY u.id, u.business_name, u.full_name, u.shop_slug
     """)).fetchall()
-    for user_id, shop_name in shops:
-        slug = _shop_slug(shop_name, user_id)
+    for user_id, shop_name, shop_slug in shops:
+        # Same persisted slug GET /listings/shops/{slug} resolves against
+        slug = shop_slug or slugify_shop_name(shop_name, user_id)
         entries.append(_url_entry(f"{BASE_URL}/shop/{slug}", today, "daily", "0.6"))
 
     listings = db.execute(text("""
@@ -2,7 +2,11 @@ import asyncio
 import io
 import os
 import uuid
+
+from fastapi.staticfiles import StaticFiles
+
 from app.core.config import settings
+from app.services.image_pipeline import VARIANT_SIZES, image_pipeline
 
 MAX_WIDTH = 1200
 MAX_HEIGHT = 1200
@@ -47,7 +51,54 @@ def _cloudinary_upload_sync(resized: bytes, public_id: str, resource_type: str,
     return cloudinary.uploader.upload(resized, **kwargs)
 
 
+def _cloudinary_explicit_sync(public_id: str, eager: list) -> dict:
+    """Ask Cloudinary to render `eager` transformations of an uploaded asset in the background."""
+    import cloudinary.uploader
+    return cloudinary.uploader.explicit(public_id, type="upload", eager=eager, eager_async=True)
+
+
+def _cloudinary_public_id(url: str) -> str:
+    """".../image/upload/v123/suqafuran/abc.jpg" -> "suqafuran/abc"."""
+    if "/upload/" not in url:
+        return ""
+    path = url.split("/upload/", 1)[1].split("/")
+    if path and path[0].startswith("v") and path[0][1:].isdigit():
+        path = path[1:]
+    return "/".join(path).rsplit(".", 1)[0]
+
+
+def _save_webp(file_content: bytes, dest: str) -> bool:
+    """Resize to WebP at `dest`; False if PIL can't read the image. Runs in the image pipeline's process pool."""
+    try:
+        from PIL import Image, ImageOps
+        img = Image.open(io.BytesIO(file_content))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "P", "LA"):
+            img = img.convert("RGB")
+        img.thumbnail((MAX_WIDTH, MAX_HEIGHT), Image.BILINEAR)
+        img.save(dest, format="WEBP", quality=JPEG_QUALITY, method=0)  # method=0 is fastest
+        return True
+    except Exception:
+        return False
+
+
+def _write_file(path: str, content: bytes) -> None:
+    # Written aside and renamed, so the file is never served half-written
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _variant_name(stem: str, name: str, fmt: str) -> str:
+    return f"{stem}_{name}.{fmt}"
+
+
 class CloudinaryStorage:
+    # Cloudinary renders variants itself from eager transformations, so the
+    # image pipeline only needs the pHash from us
+    renders_variants = False
+
     def __init__(self):
         import cloudinary
         cloudinary.config(
@@ -57,7 +108,13 @@ class CloudinaryStorage:
             secure=True,
         )
 
-    async def upload_file(self, file_content: bytes, filename: str, high_quality: bool = False) -> tuple[str, str]:
+    async def upload_file(self, file_content: bytes, filename: str, high_quality: bool = False,
+                          defer_processing: bool = False) -> tuple[str, str]:
+        """
+        Upload and return (url, phash). With defer_processing the pHash is
+        left to the image pipeline (app/services/image_pipeline.py) and ""
+        is returned for it.
+        """
         filename = filename or ""
         ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
         is_video = ext in ["mp4", "mov", "avi", "3gp", "webm", "mpeg", "mkv"]
@@ -72,7 +129,7 @@ class CloudinaryStorage:
             # text/logos stay crisp instead of getting capped at 1200px + auto
             # compression meant for regular listing photos.
             resized = file_content
-            phash_task = asyncio.create_task(asyncio.to_thread(calculate_phash, file_content))
+            phash_task = None if defer_processing else asyncio.create_task(asyncio.to_thread(calculate_phash, file_content))
             resource_type = "image"
             upload_format = None
             transformation = None
@@ -80,7 +137,7 @@ class CloudinaryStorage:
             # Skip resize for fast uploads — let Cloudinary handle transformations
             resized = file_content
             # phash runs in background after we return — don't block the response
-            phash_task = asyncio.create_task(asyncio.to_thread(calculate_phash, file_content))
+            phash_task = None if defer_processing else asyncio.create_task(asyncio.to_thread(calculate_phash, file_content))
             resource_type = "image"
             upload_format = None
             transformation = [{"quality": "auto", "fetch_format": "auto", "width": 1200, "crop": "scale"}]
@@ -115,43 +172,96 @@ class CloudinaryStorage:
 
         return result["secure_url"], phash
 
+    async def store_variants(self, url: str, variants: dict) -> dict:
+        """Pre-generate the pipeline's renditions as eager transformations."""
+        import cloudinary
+
+        public_id = _cloudinary_public_id(url)
+        if not public_id:
+            return {}
+        transformations = {
+            (name, fmt): {"width": edge, "height": edge, "crop": "limit", "quality": "auto", "fetch_format": fmt}
+            for name, edge in VARIANT_SIZES.items()
+            for fmt in ("webp", "avif")
+        }
+        await asyncio.to_thread(
+            _cloudinary_explicit_sync, public_id, list(transformations.values())
+        )
+        urls: dict = {}
+        for (name, fmt), transformation in transformations.items():
+            urls.setdefault(name, {})[fmt] = cloudinary.CloudinaryImage(public_id).build_url(
+                transformation=[transformation], secure=True
+            )
+        return urls
+
 
 class LocalStorage:
+    renders_variants = True
+
     def __init__(self):
         os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
-    async def upload_file(self, file_content: bytes, filename: str, high_quality: bool = False) -> tuple[str, str]:
+    async def upload_file(self, file_content: bytes, filename: str, high_quality: bool = False,
+                          defer_processing: bool = False) -> tuple[str, str]:
+        """
+        Save and return (url, phash). With defer_processing the original is
+        written untouched and "" is returned for the pHash: the image
+        pipeline (app/services/image_pipeline.py) renders the "full" WebP
+        that LocalImageFiles serves at the same URL, plus the pHash.
+        """
         ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "jpg"
 
-        if ext == "gif" or high_quality:
+        if defer_processing or ext == "gif" or high_quality:
             # Write the original bytes untouched — re-encoding through PIL
             # without save_all=True would collapse the animation to one frame,
             # and high_quality uploads (marketing creatives) shouldn't get
             # downscaled/recompressed either.
             unique_name = f"{uuid.uuid4()}.{ext}"
-            dest = os.path.join(settings.UPLOAD_DIR, unique_name)
-            with open(dest, "wb") as f:
-                f.write(file_content)
+            await asyncio.to_thread(_write_file, os.path.join(settings.UPLOAD_DIR, unique_name), file_content)
         else:
             unique_name = f"{uuid.uuid4()}.webp"
             dest = os.path.join(settings.UPLOAD_DIR, unique_name)
-            try:
-                from PIL import Image, ImageOps
-                img = Image.open(io.BytesIO(file_content))
-                img = ImageOps.exif_transpose(img)
-                if img.mode in ("RGBA", "P", "LA"):
-                    img = img.convert("RGB")
-                img.thumbnail((MAX_WIDTH, MAX_HEIGHT), Image.BILINEAR)
-                img.save(dest, format="WEBP", quality=JPEG_QUALITY, method=0)  # method=0 is fastest
-            except Exception:
+            # PIL holds the GIL for most of a resize, so not a thread
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(image_pipeline.executor, _save_webp, file_content, dest):
                 unique_name = f"{uuid.uuid4()}.{ext}"
-                dest = os.path.join(settings.UPLOAD_DIR, unique_name)
-                with open(dest, "wb") as f:
-                    f.write(file_content)
+                await asyncio.to_thread(_write_file, os.path.join(settings.UPLOAD_DIR, unique_name), file_content)
 
+        if defer_processing:
+            return f"/api/v1/listings/images/{unique_name}", ""
         phash = await asyncio.to_thread(calculate_phash, file_content)
         return f"/api/v1/listings/images/{unique_name}", phash
 
+    async def store_variants(self, url: str, variants: dict) -> dict:
+        """Write the pipeline's renditions next to the original; returns their URLs."""
+        stem = url.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        urls: dict = {}
+        for name, encoded in variants.items():
+            for fmt, content in encoded.items():
+                unique_name = _variant_name(stem, name, fmt)
+                await asyncio.to_thread(_write_file, os.path.join(settings.UPLOAD_DIR, unique_name), content)
+                urls.setdefault(name, {})[fmt] = f"/api/v1/listings/images/{unique_name}"
+        return urls
+
+
+class LocalImageFiles(StaticFiles):
+    """
+    Serves UPLOAD_DIR. An original listing photo is served as its "full"
+    WebP rendition once the image pipeline has written it, so the URLs in
+    listing.images get the resized image without being rewritten; until
+    then (or for uploads the pipeline never renders) the original is served.
+    """
+
+    def lookup_path(self, path: str):
+        stem, dot, _ = os.path.basename(path).rpartition(".")
+        if dot and not stem.endswith(tuple(f"_{name}" for name in VARIANT_SIZES)):
+            full_path, stat_result = super().lookup_path(
+                os.path.join(os.path.dirname(path), _variant_name(stem, "full", "webp"))
+            )
+            if stat_result is not None:
+                return full_path, stat_result
+        return super().lookup_path(path)
+
 
 if settings.CLOUDINARY_CLOUD_NAME and settings.CLOUDINARY_API_KEY and settings.CLOUDINARY_API_SECRET:
     storage_service = CloudinaryStorage()
@@ -20,6 +20,7 @@ from app.models import (
     User,
 )
 from app.models.verification import VerificationRequest, VerificationStatus
+from app.crud.crud_listing import sync_owner_ranking
 from app.core.config import settings
 from app.core.logging_config import get_logger
 
@@ -466,6 +467,7 @@ class SubscriptionService:
             if user:
                 user.is_verified = True
                 session.add(user)
+                sync_owner_ranking(session, user)
 
             session.commit()
 
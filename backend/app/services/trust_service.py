@@ -6,6 +6,7 @@ from app.models.user import User, TrustLevel
 from app.models.fraud import RiskHistory, FraudEvent, FraudTargetType
 from app.models.listing import Listing
 from app.models.trust import Rating, Report
+from app.crud.crud_listing import sync_owner_ranking
 
 class TrustService:
     WEIGHTS = {
@@ -73,6 +74,7 @@ class TrustService:
                 user.trust_level = TrustLevel.NEW
                 
             db.add(user)
+            sync_owner_ranking(db, user)
             
             # Record History
             history = RiskHistory(
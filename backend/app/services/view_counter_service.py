@@ -0,0 +1,263 @@
+"""
+Write-behind counters for listing and profile views.
+
+A page view used to increment listing.views (or user.profile_views) and
+commit, then insert a user_browsing_history row and commit again -- two
+fsyncs per read, and every viewer of a hot listing queueing on the same
+row lock. Views are now recorded in Redis instead:
+
+- listing/profile view counts: HINCRBY on a pending-delta hash keyed by id
+- browsing history: appended to a pending list as "user_id:listing_id:ts"
+
+app.tasks.view_counter_tasks.flush_view_counters periodically drains both
+and applies them in one bulk UPDATE per table and one bulk INSERT. Draining
+RENAMEs each pending key to a :flushing key first, so views arriving during
+a flush land in a fresh pending key; a :flushing key left by a crashed run
+is applied on the next one. Each claimed batch gets an id, and its
+view_flush_batch marker is inserted in the same transaction as its rows,
+so a run that dies after committing but before deleting the :flushing key
+doesn't apply it twice on the retry.
+
+Reads add pending_listing_views() / pending_profile_views() to the stored
+count so it never lags by more than the current, unflushed window; a
+:flushing hash whose batch marker is already committed is skipped, so a
+read between the commit and the delete doesn't count it twice. If Redis
+is unavailable, views are written straight to the database as before.
+"""
+
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.models.listing import Listing
+from app.services.cache_service import cache
+
+logger = logging.getLogger(__name__)
+
+LISTING_VIEWS_KEY = "views:pending:listing"
+PROFILE_VIEWS_KEY = "views:pending:profile"
+HISTORY_KEY = "views:pending:history"
+FLUSHING_SUFFIX = ":flushing"
+BATCH_SUFFIX = ":batch"
+FLUSH_LOCK_KEY = "views:flush_lock"
+FLUSH_LOCK_TTL = 300
+# view_flush_batch markers only need to outlive a retry of their batch
+MARKER_RETENTION = timedelta(days=7)
+# History rows inserted per statement
+HISTORY_BATCH_SIZE = 5000
+
+
+def record_listing_view(db: Session, listing: Listing, viewer_id: Optional[int] = None) -> None:
+    """
+    Count a view of `listing`, and remember it in `viewer_id`'s browsing
+    history (guests and the owner aren't tracked).
+    """
+    track_history = viewer_id is not None and viewer_id != listing.owner_id
+    try:
+        pipe = cache.client.pipeline(transaction=False)
+        pipe.hincrby(LISTING_VIEWS_KEY, listing.id, 1)
+        if track_history:
+            pipe.rpush(HISTORY_KEY, f"{viewer_id}:{listing.id}:{int(time.time())}")
+        pipe.execute()
+        return
+    except Exception as e:
+        logger.warning(f"View buffer unavailable, writing listing {listing.id} view directly: {e}")
+
+    db.execute(text("UPDATE listing SET views = views + 1 WHERE id = :id"), {"id": listing.id})
+    db.commit()
+    if track_history:
+        try:
+            from app.models.marketing import UserBrowsingHistory
+            db.add(UserBrowsingHistory(
+                user_id=viewer_id,
+                listing_id=listing.id,
+                category_id=listing.category_id,
+                shop_id=listing.owner_id,
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+
+
+def record_profile_view(db: Session, user_id: int) -> None:
+    """Count a view of `user_id`'s public profile."""
+    try:
+        cache.client.hincrby(PROFILE_VIEWS_KEY, user_id, 1)
+        return
+    except Exception as e:
+        logger.warning(f"View buffer unavailable, writing profile {user_id} view directly: {e}")
+    db.execute(text('UPDATE "user" SET profile_views = profile_views + 1 WHERE id = :id'), {"id": user_id})
+    db.commit()
+
+
+def _pending(db: Session, key: str, ids: List[int]) -> Dict[int, int]:
+    if not ids:
+        return {}
+    flushing_key = key + FLUSHING_SUFFIX
+    try:
+        pipe = cache.client.pipeline(transaction=False)
+        pipe.hmget(key, ids)
+        pipe.hmget(flushing_key, ids)
+        pipe.get(flushing_key + BATCH_SUFFIX)
+        pending, flushing, batch_id = pipe.execute()
+    except Exception:
+        return {}
+    # Between the flush committing and deleting its :flushing hash, those
+    # views are already in the stored count -- its marker says so
+    if batch_id and any(flushing) and _is_applied(db, f"{flushing_key}:{batch_id}"):
+        flushing = [None] * len(ids)
+    return {
+        id_: int(a or 0) + int(b or 0)
+        for id_, a, b in zip(ids, pending, flushing)
+        if a or b
+    }
+
+
+def pending_listing_views(db: Session, listing_ids: Iterable[int]) -> Dict[int, int]:
+    """Views recorded but not yet flushed, by listing id (absent = 0)."""
+    return _pending(db, LISTING_VIEWS_KEY, list(listing_ids))
+
+
+def pending_profile_views(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+    """Profile views recorded but not yet flushed, by user id (absent = 0)."""
+    return _pending(db, PROFILE_VIEWS_KEY, list(user_ids))
+
+
+def _claim(key: str) -> Optional[Tuple[str, str]]:
+    """
+    Move `key` aside for flushing.
+
+    Returns:
+        (key to flush, batch id), or None if nothing is pending
+    """
+    flushing = key + FLUSHING_SUFFIX
+    client = cache.client
+    if not client.exists(flushing):  # else left over from a run that died mid-flush
+        try:
+            client.rename(key, flushing)
+        except Exception as e:
+            if "no such key" in str(e).lower():
+                return None
+            raise
+    # A leftover batch keeps its id; one that died before getting an id
+    # can't have been applied yet, so it just gets a fresh one
+    client.set(flushing + BATCH_SUFFIX, uuid.uuid4().hex, nx=True)
+    return flushing, client.get(flushing + BATCH_SUFFIX)
+
+
+def _release(flushing: str) -> None:
+    cache.client.delete(flushing, flushing + BATCH_SUFFIX)
+
+
+def _mark_applied(db: Session, marker: str) -> bool:
+    """Insert `marker` in the current transaction; False if that batch was already applied."""
+    result = db.execute(
+        text("INSERT INTO view_flush_batch (id, flushed_at) VALUES (:id, :now) ON CONFLICT (id) DO NOTHING"),
+        {"id": marker, "now": datetime.utcnow()},
+    )
+    return result.rowcount == 1
+
+
+def _is_applied(db: Session, marker: str) -> bool:
+    return db.execute(
+        text("SELECT 1 FROM view_flush_batch WHERE id = :id"), {"id": marker}
+    ).first() is not None
+
+
+def _apply_counts(db: Session, key: str, table: str, column: str) -> int:
+    claimed = _claim(key)
+    if not claimed:
+        return 0
+    flushing, batch_id = claimed
+    deltas = cache.client.hgetall(flushing)
+    applied = bool(deltas) and _mark_applied(db, f"{flushing}:{batch_id}")
+    if applied:
+        db.execute(
+            text(
+                f'UPDATE "{table}" SET {column} = "{table}".{column} + d.delta '
+                f'FROM unnest(CAST(:ids AS integer[]), CAST(:deltas AS integer[])) AS d(id, delta) '
+                f'WHERE "{table}".id = d.id'
+            ),
+            {"ids": [int(k) for k in deltas], "deltas": [int(v) for v in deltas.values()]},
+        )
+        db.commit()
+    else:
+        db.rollback()
+    _release(flushing)
+    return len(deltas) if applied else 0
+
+
+def _apply_history(db: Session) -> int:
+    claimed = _claim(HISTORY_KEY)
+    if not claimed:
+        return 0
+    flushing, batch_id = claimed
+    entries = cache.client.lrange(flushing, 0, -1)
+    inserted = 0
+    for start in range(0, len(entries), HISTORY_BATCH_SIZE):
+        # Each chunk commits with its own marker, so a retry after a
+        # failure part-way through skips the chunks already inserted
+        if not _mark_applied(db, f"{flushing}:{batch_id}:{start}"):
+            db.rollback()
+            continue
+        user_ids, listing_ids, viewed_at = [], [], []
+        for entry in entries[start:start + HISTORY_BATCH_SIZE]:
+            try:
+                user_id, listing_id, ts = entry.split(":")
+                user_ids.append(int(user_id))
+                listing_ids.append(int(listing_id))
+                viewed_at.append(datetime.utcfromtimestamp(int(ts)))
+            except ValueError:
+                logger.warning(f"Skipping malformed browsing history entry {entry!r}")
+        # Category/shop come from the listing at flush time; the joins also
+        # drop views of listings or users deleted since they were buffered.
+        result = db.execute(
+            text(
+                "INSERT INTO user_browsing_history (user_id, listing_id, category_id, shop_id, viewed_at, time_spent_seconds) "
+                "SELECT h.user_id, h.listing_id, l.category_id, l.owner_id, h.viewed_at, 0 "
+                "FROM unnest(CAST(:user_ids AS integer[]), CAST(:listing_ids AS integer[]), CAST(:viewed_at AS timestamp[])) "
+                "AS h(user_id, listing_id, viewed_at) "
+                "JOIN listing l ON l.id = h.listing_id "
+                'JOIN "user" u ON u.id = h.user_id'
+            ),
+            {"user_ids": user_ids, "listing_ids": listing_ids, "viewed_at": viewed_at},
+        )
+        db.commit()
+        inserted += result.rowcount
+    _release(flushing)
+    return inserted
+
+
+def flush_view_counters(db: Session) -> Dict[str, int]:
+    """
+    Apply every buffered view to the database.
+
+    Returns:
+        {"listings": rows updated, "profiles": rows updated, "history": rows inserted},
+        or {"skipped": 1} if another flush is already running
+    """
+    token = cache.acquire_lock(FLUSH_LOCK_KEY, FLUSH_LOCK_TTL)
+    if not token:
+        return {"skipped": 1}
+    try:
+        result = {
+            "listings": _apply_counts(db, LISTING_VIEWS_KEY, "listing", "views"),
+            "profiles": _apply_counts(db, PROFILE_VIEWS_KEY, "user", "profile_views"),
+            "history": _apply_history(db),
+        }
+        db.execute(
+            text("DELETE FROM view_flush_batch WHERE flushed_at < :cutoff"),
+            {"cutoff": datetime.utcnow() - MARKER_RETENTION},
+        )
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cache.release_lock(FLUSH_LOCK_KEY, token)
@@ -0,0 +1,181 @@
+"""
+Cross-process fan-out for the WebSocket managers.
+
+Each WebSocket manager (chat in services/websocket_service.py, business and
+personal channels in kafka_service.ws_manager, the monitoring stream in
+event_stream.py) only knows the sockets connected to its own process. With
+several uvicorn workers or pods behind the HPA, a broadcast from one
+process used to miss every socket held by the others.
+
+Managers now register a local delivery handler per topic and broadcast
+through publish(), which:
+- delivers to this process's sockets right away, as before
+- publishes the payload to the Redis channel "ws:<topic>"; every other
+  process's listener hands it to its own handler (messages a process
+  published itself are skipped, they were already delivered)
+
+Presence is shared the same way: a user is online while any process holds
+a connection for them. Each process adds its node id to the Redis set
+"ws:presence:<user_id>" on the user's first local connection and removes it
+on the last, and re-adds (with a WS_PRESENCE_TTL_SECONDS expiry) every
+heartbeat, so a crashed process's users go offline once its entries expire.
+
+Without Redis (or with WS_BACKPLANE_ENABLED off) everything degrades to the
+old single-process behaviour.
+
+Usage:
+    ws_backplane.register("chat_user", self._deliver_to_user)
+    await ws_backplane.publish("chat_user", {"user_id": "7", "message": {...}})
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "ws:"
+PRESENCE_PREFIX = "ws:presence:"
+RECONNECT_DELAY = 2.0
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class WebSocketBackplane:
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self._handlers: Dict[str, Handler] = {}
+        self._local_users: Counter = Counter()
+        self._redis = None
+        self._tasks: list = []
+
+    def register(self, topic: str, handler: Handler) -> None:
+        """Deliver `topic` broadcasts from any process to `handler` (this process's sockets)."""
+        self._handlers[topic] = handler
+
+    # -- lifecycle ------------------------------------------------------------
+
+    async def start(self) -> None:
+        if not settings.WS_BACKPLANE_ENABLED or self._redis is not None:
+            return
+        try:
+            import redis.asyncio as redis_async
+
+            client = redis_async.from_url(settings.REDIS_URL, decode_responses=True)
+            await client.ping()
+        except Exception as exc:
+            logger.warning(f"WebSocket backplane disabled, Redis unavailable: {exc}")
+            return
+        self._redis = client
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._heartbeat())]
+        logger.info(f"WebSocket backplane started (node {self.node_id})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._redis is None:
+            return
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for user_id in self._local_users:
+                    pipe.srem(PRESENCE_PREFIX + user_id, self.node_id)
+                await pipe.execute()
+            await self._redis.aclose()
+        except Exception as exc:
+            logger.warning(f"WebSocket backplane shutdown: {exc}")
+        self._redis = None
+
+    # -- fan-out --------------------------------------------------------------
+
+    async def _deliver(self, topic: str, payload: Dict[str, Any]) -> None:
+        handler = self._handlers.get(topic)
+        if handler is None:
+            return  # no manager for this topic in this process
+        try:
+            await handler(payload)
+        except Exception as exc:
+            logger.error(f"WebSocket delivery for {topic} failed: {exc}")
+
+    async def publish(self, topic: str, payload: Dict[str, Any]) -> None:
+        """Deliver `payload` to the `topic` handler in this and every other process."""
+        await self._deliver(topic, payload)
+        if self._redis is None:
+            return
+        try:
+            envelope = json.dumps({"origin": self.node_id, "payload": payload}, default=str)
+            await self._redis.publish(CHANNEL_PREFIX + topic, envelope)
+        except Exception as exc:
+            logger.warning(f"WebSocket backplane publish to {topic} failed: {exc}")
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        topic = message["channel"][len(CHANNEL_PREFIX):]
+                        envelope = json.loads(message["data"])
+                        if envelope.get("origin") == self.node_id:
+                            continue
+                        await self._deliver(topic, envelope["payload"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning(f"WebSocket backplane listener lost Redis, retrying: {exc}")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    # -- presence -------------------------------------------------------------
+
+    async def user_connected(self, user_id: str) -> None:
+        self._local_users[user_id] += 1
+        if self._local_users[user_id] == 1:
+            await self._presence_add(user_id)
+
+    async def user_disconnected(self, user_id: str) -> None:
+        if self._local_users[user_id] <= 1:
+            self._local_users.pop(user_id, None)
+            if self._redis is not None:
+                try:
+                    await self._redis.srem(PRESENCE_PREFIX + user_id, self.node_id)
+                except Exception as exc:
+                    logger.warning(f"Presence update for user {user_id} failed: {exc}")
+        else:
+            self._local_users[user_id] -= 1
+
+    async def is_user_online(self, user_id: str) -> bool:
+        if user_id in self._local_users:
+            return True
+        if self._redis is None:
+            return False
+        try:
+            return bool(await self._redis.scard(PRESENCE_PREFIX + user_id))
+        except Exception:
+            return False
+
+    async def _presence_add(self, *user_ids: str) -> None:
+        if self._redis is None or not user_ids:
+            return
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.sadd(PRESENCE_PREFIX + user_id, self.node_id)
+                    pipe.expire(PRESENCE_PREFIX + user_id, settings.WS_PRESENCE_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as exc:
+            logger.warning(f"Presence update failed: {exc}")
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_PRESENCE_TTL_SECONDS / 3)
+            await self._presence_add(*list(self._local_users))
+
+
+ws_backplane = WebSocketBackplane()
@@ -0,0 +1,25 @@
+"""
+Admin dashboard background tasks:
+- refresh_admin_stats: recomputes the /admin/stats snapshot (runs every
+  minute via beat)
+"""
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+
+@shared_task(name="app.tasks.admin_stats_tasks.refresh_admin_stats")
+def refresh_admin_stats():
+    """
+    Beat task: keep the admin stats snapshot fresh so the dashboard poll
+    only reads it (see app.services.admin_stats_service). Skips if an
+    inline refresh is already running.
+    """
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.services.admin_stats_service import refresh_admin_stats as refresh
+
+    with Session(engine) as db:
+        snapshot = refresh(db)
+    return {"refreshed": snapshot is not None}
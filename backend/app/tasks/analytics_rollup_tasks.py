@@ -0,0 +1,51 @@
+"""
+Analytics rollup background tasks:
+- rollup_seller_events: rolls completed days of analytics_event into
+  seller_event_rollup for the seller dashboards (runs hourly via beat)
+- rollup_admin_analytics: folds new tracking rows into analytics_rollup
+  for the admin dashboards (runs every minute via beat)
+"""
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+
+@shared_task(name="app.tasks.analytics_rollup_tasks.rollup_seller_events")
+def rollup_seller_events():
+    """
+    Beat task: roll up any day that has closed since the last run and
+    advance the "seller_events" watermark. Only the first run after
+    midnight has new days to add; the others just rebuild yesterday.
+    """
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.services.analytics_service import analytics_service
+
+    with Session(engine) as db:
+        result = analytics_service.rollup_seller_events(db)
+    logger.info(
+        f"Seller events rolled up from {result['from']} until {result['until']}: {result['rows']} rows"
+    )
+    return result
+
+
+@shared_task(name="app.tasks.analytics_rollup_tasks.rollup_admin_analytics")
+def rollup_admin_analytics():
+    """
+    Beat task: aggregate item/shop views, clicks and geographic events newer
+    than the "admin_analytics" watermark into the day/month rollups (see
+    app.services.analytics_rollup_service). Overlapping runs skip.
+    """
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.services.analytics_rollup_service import roll_up
+
+    with Session(engine) as db:
+        result = roll_up(db)
+    if result.get("steps"):
+        logger.info(
+            f"Admin analytics rolled up until {result['rolled_until']}: "
+            f"{result['steps']} steps, {result['buckets']} buckets, {result['pruned']} pruned"
+        )
+    return result
@@ -12,6 +12,11 @@ celery_app = Celery(
         "app.tasks.email_tasks",
         "app.tasks.alert_tasks",
         "app.tasks.subscription_tasks",
+        "app.tasks.shop_stats_tasks",
+        "app.tasks.image_tasks",
+        "app.tasks.view_counter_tasks",
+        "app.tasks.analytics_rollup_tasks",
+        "app.tasks.admin_stats_tasks",
     ],
 )
 
@@ -84,5 +89,30 @@ celery_app.conf.update(
             "task": "app.tasks.email_tasks.send_viewed_no_contact_reminders",
             "schedule": 3600.0,
         },
+        # Repair shop_stats drift against the listing table — daily at 03:00 UTC
+        "reconcile-shop-stats": {
+            "task": "app.tasks.shop_stats_tasks.reconcile_shop_stats",
+            "schedule": crontab(hour=3, minute=0),
+        },
+        # Apply buffered listing/profile views and browsing history — every 30 seconds
+        "flush-view-counters": {
+            "task": "app.tasks.view_counter_tasks.flush_view_counters",
+            "schedule": 30.0,
+        },
+        # Roll closed days of seller analytics events into seller_event_rollup — hourly
+        "rollup-seller-events": {
+            "task": "app.tasks.analytics_rollup_tasks.rollup_seller_events",
+            "schedule": 3600.0,
+        },
+        # Fold new tracking events into the admin analytics rollups — every minute
+        "rollup-admin-analytics": {
+            "task": "app.tasks.analytics_rollup_tasks.rollup_admin_analytics",
+            "schedule": 60.0,
+        },
+        # Recompute the admin dashboard stats snapshot — every minute
+        "refresh-admin-stats": {
+            "task": "app.tasks.admin_stats_tasks.refresh_admin_stats",
+            "schedule": 60.0,
+        },
     },
 )
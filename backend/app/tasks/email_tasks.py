@@ -428,31 +428,43 @@ def run_promotional_rotation_task():
     from sqlmodel import Session, select
     from app.db.session import engine
     from app.models.user import User
-    from app.models.email_log import EmailLog
-    from app.services.rotation_engine import select_campaigns_for_user, record_send
+    from app.services.email_service import email_service
+    from app.services.rotation_engine import load_batch, select_campaigns_for_user, record_send
 
     BATCH_SIZE = 500
     total_users = 0
     total_sent = 0
-    offset = 0
+    last_id = 0
 
+    # Keyset pagination on User.id: each batch is an index range scan, where
+    # OFFSET re-read every earlier user and skipped/repeated users whenever
+    # the table changed mid-run. Sends are committed one by one, so keep the
+    # batch's users and preferences loaded across those commits
     while True:
-        with Session(engine) as db:
+        with Session(engine, expire_on_commit=False) as db:
             users = db.exec(
                 select(User).where(
+                    User.id > last_id,
                     User.is_active == True,  # noqa: E712
                     User.email.isnot(None),
                     User.email.notlike("%@suqafuran.local"),
                 )
-                .order_by(User.id).offset(offset).limit(BATCH_SIZE)
+                .order_by(User.id).limit(BATCH_SIZE)
             ).all()
             if not users:
                 break
+            last_id = users[-1].id
+
+            try:
+                batch = load_batch(db, users)
+            except Exception as exc:
+                logger.warning(f"Rotation batch load failed for users {users[0].id}-{last_id}: {exc}")
+                continue
 
             for user in users:
                 total_users += 1
                 try:
-                    selected = select_campaigns_for_user(db, user)
+                    selected = select_campaigns_for_user(db, user, batch)
                 except Exception as exc:
                     logger.warning(f"Rotation selection failed for user {user.id}: {exc}")
                     continue
@@ -460,16 +472,17 @@ def run_promotional_rotation_task():
                 for campaign in selected:
                     try:
                         campaign.send_fn(user.email, user.full_name or "Customer", campaign.subject, campaign.content)
-                        log_row = db.exec(
-                            select(EmailLog).where(EmailLog.user_id == user.id)
-                            .order_by(EmailLog.sent_at.desc()).limit(1)
-                        ).first()
-                        record_send(db, user.id, campaign, log_row.id if log_row else None)
-                        total_sent += 1
                     except Exception as exc:
                         logger.warning(f"Campaign '{campaign.campaign_type}' failed for user {user.id}: {exc}")
-
-        offset += BATCH_SIZE
+                        continue
+                    total_sent += 1
+                    # Commit the send log right away: if the run dies later,
+                    # the cooldown still covers everyone already emailed
+                    try:
+                        record_send(db, user.id, campaign, email_service.last_log_id())
+                    except Exception as exc:
+                        db.rollback()
+                        logger.error(f"Failed to record campaign '{campaign.campaign_type}' send for user {user.id}: {exc}")
 
     logger.info(f"Promotional rotation run complete: {total_users} users evaluated, {total_sent} emails sent")
     return {"users_evaluated": total_users, "emails_sent": total_sent}
@@ -600,14 +613,21 @@ def process_broadcast_jobs_task():
     firing everyone at once. Marks a job "completed" once every recipient
     has been attempted.
 
-    acks_late=False, and each recipient's "sent" status is committed
-    individually rather than once at the end of the batch -- both for the
-    same reason as run_promotional_rotation_task: a worker restart mid-batch
+    Recipients go out in chunks through email_service.send_many (pooled
+    providers, EMAIL_DELIVERY_CONCURRENCY batch calls in flight), so a
+    large broadcast's daily allowance takes minutes instead of hours.
+
+    acks_late=False, and recipients' statuses are committed after every
+    chunk rather than once at the end of the batch -- both for the same
+    reason as run_promotional_rotation_task: a worker restart mid-batch
     under acks_late redelivers the message and resends the entire batch,
     including recipients already emailed but not yet committed as "sent".
+    An interruption can now resend at most the one chunk in flight.
     """
+    import time
     from datetime import datetime
     from sqlmodel import Session, select, func
+    from app.core.config import settings
     from app.db.session import engine
     from app.models.broadcast_job import BroadcastJob, BroadcastJobRecipient
     from app.services.email_service import email_service
@@ -615,8 +635,11 @@ def process_broadcast_jobs_task():
     today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     jobs_processed = 0
     total_sent = 0
+    started = time.monotonic()
 
-    with Session(engine) as db:
+    # expire_on_commit=False: committing a chunk must not make the next
+    # chunk's recipients reload one SELECT at a time
+    with Session(engine, expire_on_commit=False) as db:
         jobs = db.exec(select(BroadcastJob).where(BroadcastJob.status == "in_progress")).all()
 
         for job in jobs:
@@ -638,29 +661,43 @@ def process_broadcast_jobs_task():
                 .limit(remaining_today)
             ).all()
 
-            for recipient in batch:
-                try:
-                    email_service.send_custom_manual_email(
-                        recipient.email,
-                        subject=job.subject,
-                        title=job.title,
-                        subtitle=job.subtitle,
-                        content_html=job.content_html,
-                        action_text=job.action_text,
-                        action_url=job.action_url,
-                        campaign_id=job.campaign_id,
-                        user_id=recipient.user_id,
-                    )
-                    recipient.status = "sent"
-                    recipient.sent_at = datetime.utcnow()
-                    job.sent_count += 1
-                    total_sent += 1
-                except Exception as exc:
-                    recipient.status = "failed"
-                    recipient.failed_reason = str(exc)
-                    job.failed_count += 1
-                    logger.warning(f"Broadcast job {job.id} failed to send to {recipient.email}: {exc}")
-                db.add(recipient)
+            chunk_size = settings.EMAIL_DELIVERY_BATCH_SIZE * settings.EMAIL_DELIVERY_CONCURRENCY
+            for start in range(0, len(batch), chunk_size):
+                chunk = batch[start:start + chunk_size]
+                prepared = []
+                for recipient in chunk:
+                    try:
+                        message = email_service.prepare_custom_manual_email(
+                            recipient.email,
+                            subject=job.subject,
+                            title=job.title,
+                            subtitle=job.subtitle,
+                            content_html=job.content_html,
+                            action_text=job.action_text,
+                            action_url=job.action_url,
+                            campaign_id=job.campaign_id,
+                            user_id=recipient.user_id,
+                        )
+                        prepared.append((recipient, message))
+                    except Exception as exc:
+                        recipient.status = "failed"
+                        recipient.failed_reason = str(exc)
+                        job.failed_count += 1
+                        logger.warning(f"Broadcast job {job.id} failed to render for {recipient.email}: {exc}")
+
+                results = email_service.send_many([message for _, message in prepared])
+                sent_at = datetime.utcnow()
+                for (recipient, message), ok in zip(prepared, results):
+                    if ok:
+                        recipient.status = "sent"
+                        recipient.sent_at = sent_at
+                        job.sent_count += 1
+                        total_sent += 1
+                    else:
+                        recipient.status = "failed"
+                        recipient.failed_reason = message.log.failed_reason
+                        job.failed_count += 1
+                db.add_all(chunk)
                 db.add(job)
                 db.commit()
 
@@ -677,5 +714,9 @@ def process_broadcast_jobs_task():
             db.commit()
             jobs_processed += 1
 
-    logger.info(f"Broadcast job processing complete: {jobs_processed} job(s) processed, {total_sent} emails sent")
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Broadcast job processing complete: {jobs_processed} job(s) processed, {total_sent} emails sent "
+        f"in {elapsed:.1f}s ({total_sent / elapsed if elapsed else 0:.1f}/s)"
+    )
     return {"jobs_processed": jobs_processed, "emails_sent": total_sent}
@@ -0,0 +1,110 @@
+"""
+Listing image background tasks:
+- attach_listing_images: writes image pipeline results (pHashes, variant
+  URLs) back to a listing and re-runs the duplicate-image check
+"""
+import os
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+LOCAL_IMAGE_PREFIX = "/api/v1/listings/images/"
+CLOUDINARY_URL_PREFIX = "https://res.cloudinary.com/{cloud_name}/image/upload/"
+
+
+def _fetch_original(url: str) -> bytes:
+    """
+    Read an uploaded photo back for processing. listing.images comes from
+    the client, so only our own storage is read: files inside UPLOAD_DIR,
+    or our Cloudinary account -- never an arbitrary host -- and never more
+    than MAX_FILE_SIZE bytes.
+    """
+    from app.core.config import settings
+
+    if url.startswith(LOCAL_IMAGE_PREFIX):
+        upload_dir = os.path.realpath(settings.UPLOAD_DIR)
+        path = os.path.realpath(os.path.join(upload_dir, url[len(LOCAL_IMAGE_PREFIX):]))
+        if os.path.commonpath([upload_dir, path]) != upload_dir:
+            raise ValueError(f"Image path outside the upload directory: {url}")
+        if os.path.getsize(path) > settings.MAX_FILE_SIZE:
+            raise ValueError(f"Image larger than {settings.MAX_FILE_SIZE} bytes: {url}")
+        with open(path, "rb") as f:
+            return f.read()
+
+    if not settings.CLOUDINARY_CLOUD_NAME or not url.startswith(
+        CLOUDINARY_URL_PREFIX.format(cloud_name=settings.CLOUDINARY_CLOUD_NAME)
+    ):
+        raise ValueError(f"Not an image from our storage: {url}")
+
+    import httpx
+    content = bytearray()
+    with httpx.stream("GET", url, timeout=30.0, follow_redirects=False) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            content.extend(chunk)
+            if len(content) > settings.MAX_FILE_SIZE:
+                raise ValueError(f"Image larger than {settings.MAX_FILE_SIZE} bytes: {url}")
+    return bytes(content)
+
+
+@shared_task(name="app.tasks.image_tasks.attach_listing_images", bind=True, max_retries=6)
+def attach_listing_images(self, listing_id: int):
+    """
+    Enqueued whenever a listing's images are saved. Waits (via retry) for
+    photos still in the API's pipeline, processes any the pipeline never
+    saw (older uploads, expired results) here, then stores image_hashes
+    aligned with images, image_variants keyed by original URL, and flags
+    the listing if a photo nearly matches another seller's.
+    """
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.models.listing import Listing
+    from app.services.image_hash_index import find_near_duplicates, index_listing_images
+    from app.services.image_pipeline import DONE, PROCESSING, image_pipeline
+
+    with Session(engine) as db:
+        listing = db.get(Listing, listing_id)
+        if not listing or not listing.images:
+            return {"listing_id": listing_id, "processed": 0}
+
+        results = {}
+        for url in listing.images:
+            result = image_pipeline.get_result(url)
+            if result and result.get("status") == PROCESSING and self.request.retries < self.max_retries:
+                raise self.retry(countdown=5)
+            if not result or result.get("status") != DONE:
+                try:
+                    result = image_pipeline.process_sync(url, _fetch_original(url))
+                except Exception as e:
+                    logger.warning(f"Could not process image {url} of listing {listing_id}: {e}")
+                    continue
+            results[url] = result
+
+        # The listing may have been edited while we worked; only touch URLs it still has
+        db.refresh(listing)
+        previous_hashes = list(listing.image_hashes or [])
+        hashes = []
+        for i, url in enumerate(listing.images):
+            if url in results:
+                hashes.append(results[url]["phash"])
+            else:
+                hashes.append(previous_hashes[i] if i < len(previous_hashes) else "")
+        variants = dict(listing.image_variants or {})
+        variants.update({url: result["variants"] for url, result in results.items() if result.get("variants")})
+
+        listing.image_hashes = hashes
+        listing.image_variants = variants
+        index_listing_images(db, listing)
+
+        if find_near_duplicates(db, hashes, exclude_owner_id=listing.owner_id, limit=1):
+            flags = list(listing.fraud_flags or [])
+            if "duplicate_image_detected" not in flags:
+                listing.fraud_flags = flags + ["duplicate_image_detected"]
+
+        db.add(listing)
+        db.commit()
+
+    logger.info(f"Attached {len(results)} processed images to listing {listing_id}")
+    return {"listing_id": listing_id, "processed": len(results)}
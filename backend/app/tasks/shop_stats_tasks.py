@@ -0,0 +1,29 @@
+"""
+Shop directory background tasks:
+- reconcile_shop_stats: recomputes shop_stats from the listing table and
+  repairs drift (runs nightly via beat)
+"""
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+
+@shared_task(name="app.tasks.shop_stats_tasks.reconcile_shop_stats")
+def reconcile_shop_stats():
+    """
+    Nightly beat task: diff shop_stats against a full re-aggregation of the
+    listing table and fix any rows that drifted (e.g. a bulk admin action
+    that changed listing statuses without refreshing the owner's stats).
+    """
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.services.shop_stats_service import reconcile_shop_stats as reconcile
+
+    with Session(engine) as db:
+        result = reconcile(db, fix=True)
+    logger.info(
+        f"shop_stats reconciled: {result['checked']} shops checked, "
+        f"{result['drifted']} drifted, {result['missing']} missing, {result['orphaned']} orphaned"
+    )
+    return result
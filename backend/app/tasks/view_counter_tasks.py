@@ -0,0 +1,30 @@
+"""
+View counter background tasks:
+- flush_view_counters: applies listing/profile views and browsing history
+  buffered in Redis to the database (runs every 30 seconds via beat)
+"""
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+
+@shared_task(name="app.tasks.view_counter_tasks.flush_view_counters")
+def flush_view_counters():
+    """
+    Beat task: drain the write-behind view buffers (see
+    app.services.view_counter_service) into one bulk UPDATE per counter
+    table and bulk INSERTs of browsing history.
+    """
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.services.view_counter_service import flush_view_counters as flush
+
+    with Session(engine) as db:
+        result = flush(db)
+    if not result.get("skipped"):
+        logger.info(
+            f"Flushed views: {result['listings']} listings, {result['profiles']} profiles, "
+            f"{result['history']} browsing history rows"
+        )
+    return result
@@ -0,0 +1,49 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token wrapping the sort tuple of the last
+row a client has seen. The next page is fetched with a `WHERE (sort cols) <
+(cursor values)` predicate instead of OFFSET, so page 500 costs the same as
+page 1 -- Postgres seeks straight to the cursor position instead of walking
+and discarding every skipped row.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor token we can't decode."""
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Pack a dict of sort-key values into an opaque cursor token."""
+    def _default(obj: Any) -> Any:
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        raise TypeError(f"Unsupported cursor value: {type(obj).__name__}")
+
+    raw = json.dumps(values, separators=(",", ":"), default=_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    """Unpack a cursor token produced by encode_cursor()."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise InvalidCursor("Malformed pagination cursor") from e
+    if not isinstance(values, dict):
+        raise InvalidCursor("Malformed pagination cursor")
+    return values
+
+
+def cursor_datetime(value: Any) -> datetime:
+    """Parse a datetime stored in a cursor, raising InvalidCursor on junk."""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("Malformed pagination cursor") from e
@@ -49,6 +49,13 @@ class Settings(BaseSettings):
     FIREBASE_CREDENTIALS_JSON: str = os.getenv("FIREBASE_CREDENTIALS_JSON", "")
     FIREBASE_PROJECT_ID: str = os.getenv("FIREBASE_PROJECT_ID", "")
 
+    # Rider dispatch (services/dispatch_service.py)
+    DISPATCH_GRID_CELL_KM: float = 1.0  # Spatial index cell size
+    DISPATCH_INDEX_TTL_SECONDS: float = 5.0  # Reload open orders/riders from the DB after this long
+    DISPATCH_MAX_ACTIVE_PER_RIDER: int = 3  # Suggestions never give a rider more active deliveries
+    DISPATCH_LOAD_PENALTY_KM: float = 2.0  # Each active delivery counts as this much extra distance
+    DISPATCH_CANDIDATES: int = 5  # Nearest riders considered per order
+
     # App
     APP_NAME: str = "Suqafuran API"
     APP_VERSION: str = "1.0.0"
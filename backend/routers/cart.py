@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional, List
 import asyncio
 
@@ -7,56 +9,56 @@ from app.models.cart import Cart, CartItem, CartItemRead, CartRead, CartSummaryR
 from app.models.listing import Listing
 from app.models.marketing_code import MarketingCode
 from app.models.user import User
-from app.db import get_session
-from app.utils.security import get_current_user
-from app.services.notification_integration import NotificationIntegrationService
+from app.db import engine, get_async_session
+from app.api.deps import get_current_user
+from app.services.notification_integration import AbandonedCartNotificationService
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
 
-def get_user_cart(user_id: int, session: Session) -> Cart:
-    """Get or create user's cart"""
-    cart = session.exec(select(Cart).where(Cart.user_id == user_id)).first()
+async def get_user_cart(user_id: int, session: AsyncSession) -> Cart:
+    """Get or create user's cart, with its items loaded"""
+    # Items are loaded up front: AsyncSession can't lazy-load cart.items on access
+    cart = (await session.exec(
+        select(Cart).where(Cart.user_id == user_id).options(selectinload(Cart.items))
+    )).first()
     if not cart:
-        cart = Cart(user_id=user_id)
+        cart = Cart(user_id=user_id, items=[])
         session.add(cart)
-        session.commit()
-        session.refresh(cart)
+        await session.commit()
     return cart
 
 
 @router.get("", response_model=CartRead)
 async def get_cart(
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Get user's shopping cart"""
-    cart = get_user_cart(current_user.id, session)
-    session.refresh(cart)
-    return cart
+    return await get_user_cart(current_user.id, session)
 
 
 @router.post("/items", response_model=CartItemRead)
 async def add_to_cart(
     request: AddToCartRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Add product to cart"""
     # Verify product exists
-    product = session.exec(select(Listing).where(Listing.id == request.product_id)).first()
+    product = (await session.exec(select(Listing).where(Listing.id == request.product_id))).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    cart = get_user_cart(current_user.id, session)
+    cart = await get_user_cart(current_user.id, session)
 
     # Check if product already in cart
-    existing_item = session.exec(
+    existing_item = (await session.exec(
         select(CartItem).where(
             CartItem.cart_id == cart.id,
             CartItem.product_id == request.product_id
         )
-    ).first()
+    )).first()
 
     if existing_item:
         # Update quantity
@@ -72,11 +74,11 @@ async def add_to_cart(
         )
         session.add(item)
 
-    session.commit()
+    await session.commit()
     if existing_item:
-        session.refresh(existing_item)
+        await session.refresh(existing_item)
         return existing_item
-    session.refresh(item)
+    await session.refresh(item)
     return item
 
 
@@ -84,20 +86,20 @@ async def add_to_cart(
 async def remove_from_cart(
     item_id: int,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Remove item from cart"""
-    item = session.exec(select(CartItem).where(CartItem.id == item_id)).first()
+    item = (await session.exec(select(CartItem).where(CartItem.id == item_id))).first()
     if not item:
         raise HTTPException(status_code=404, detail="Cart item not found")
 
     # Verify item belongs to user's cart
-    cart = get_user_cart(current_user.id, session)
+    cart = await get_user_cart(current_user.id, session)
     if item.cart_id != cart.id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    session.delete(item)
-    session.commit()
+    await session.delete(item)
+    await session.commit()
 
 
 @router.patch("/items/{item_id}", response_model=CartItemRead)
@@ -105,68 +107,65 @@ async def update_cart_item(
     item_id: int,
     request: UpdateCartItemRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Update cart item quantity"""
-    item = session.exec(select(CartItem).where(CartItem.id == item_id)).first()
+    item = (await session.exec(select(CartItem).where(CartItem.id == item_id))).first()
     if not item:
         raise HTTPException(status_code=404, detail="Cart item not found")
 
     # Verify item belongs to user's cart
-    cart = get_user_cart(current_user.id, session)
+    cart = await get_user_cart(current_user.id, session)
     if item.cart_id != cart.id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
     if request.quantity <= 0:
-        session.delete(item)
+        await session.delete(item)
     else:
         item.quantity = request.quantity
         session.add(item)
 
-    session.commit()
+    await session.commit()
     if request.quantity > 0:
-        session.refresh(item)
+        await session.refresh(item)
         return item
 
 
 @router.delete("", status_code=204)
 async def clear_cart(
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Clear entire cart"""
-    cart = get_user_cart(current_user.id, session)
+    cart = await get_user_cart(current_user.id, session)
 
     # Delete all items
-    session.exec(
-        select(CartItem).where(CartItem.cart_id == cart.id)
-    )
     for item in cart.items:
-        session.delete(item)
+        await session.delete(item)
 
     # Reset promo code
     cart.promo_code = None
     cart.promo_discount_amount = 0
 
     session.add(cart)
-    session.commit()
+    await session.commit()
 
 
 @router.post("/promo", response_model=CartRead)
 async def apply_promo_code(
     request: ApplyPromoRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Apply promotional code to cart"""
-    cart = get_user_cart(current_user.id, session)
+    cart = await get_user_cart(current_user.id, session)
 
     # Verify promo code exists and is valid
-    promo = session.exec(
+    promo = (await session.exec(
         select(MarketingCode).where(
             MarketingCode.code == request.code.upper()
         )
-    ).first()
+    )).first()
 
     if not promo:
         raise HTTPException(status_code=404, detail="Promo code not found")
@@ -186,8 +185,7 @@ async def apply_promo_code(
     cart.promo_discount_amount = min(discount, subtotal)  # Can't exceed subtotal
 
     session.add(cart)
-    session.commit()
-    session.refresh(cart)
+    await session.commit()
     return cart
 
 
@@ -195,10 +193,10 @@ async def apply_promo_code(
 async def remove_promo_code(
     code: str,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Remove promo code from cart"""
-    cart = get_user_cart(current_user.id, session)
+    cart = await get_user_cart(current_user.id, session)
 
     if cart.promo_code != code.upper():
         raise HTTPException(status_code=400, detail="Promo code not applied to cart")
@@ -207,16 +205,16 @@ async def remove_promo_code(
     cart.promo_discount_amount = 0
 
     session.add(cart)
-    session.commit()
+    await session.commit()
 
 
 @router.get("/summary", response_model=CartSummaryRead)
 async def get_cart_summary(
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Get cart summary with pricing breakdown"""
-    cart = get_user_cart(current_user.id, session)
+    cart = await get_user_cart(current_user.id, session)
 
     # Calculate totals
     subtotal = sum(item.quantity * item.price_at_add for item in cart.items)
@@ -250,17 +248,23 @@ async def get_cart_summary(
 @router.post("/validate", response_model=dict)
 async def validate_cart(
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Validate cart before checkout"""
-    cart = get_user_cart(current_user.id, session)
+    cart = await get_user_cart(current_user.id, session)
 
     if not cart.items:
         raise HTTPException(status_code=400, detail="Cart is empty")
 
     # Check all products still exist and have stock
+    products = {
+        product.id: product
+        for product in (await session.exec(
+            select(Listing).where(Listing.id.in_([item.product_id for item in cart.items]))
+        )).all()
+    }
     for item in cart.items:
-        product = session.exec(select(Listing).where(Listing.id == item.product_id)).first()
+        product = products.get(item.product_id)
         if not product:
             raise HTTPException(status_code=400, detail=f"Product {item.product_id} no longer exists")
 
@@ -274,11 +278,19 @@ async def validate_cart(
     }
 
 
+def _notify_abandoned_carts(hours_threshold: int) -> None:
+    # Runs in the threadpool with its own sync session: the service queries
+    # and sends synchronously, and the request's session is closed by the
+    # time this runs
+    with Session(engine) as session:
+        AbandonedCartNotificationService.notify_abandoned_carts(session, hours_threshold=hours_threshold)
+
+
 @router.post("/check-abandoned", response_model=dict, tags=["admin"])
 async def check_abandoned_carts(
+    background_tasks: BackgroundTasks,
     hours_threshold: int = 2,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
 ):
     """
     Check and send notifications for abandoned carts (admin endpoint)
@@ -289,12 +301,7 @@ async def check_abandoned_carts(
         raise HTTPException(status_code=403, detail="Only admins can trigger abandoned cart checks")
 
     # Run notification check in background
-    asyncio.create_task(
-        NotificationIntegrationService.check_and_notify_abandoned_carts(
-            session=session,
-            hours_threshold=hours_threshold,
-        )
-    )
+    background_tasks.add_task(_notify_abandoned_carts, hours_threshold)
 
     return {
         "status": "success",
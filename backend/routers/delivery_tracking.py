@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional
+
+import anyio
+
 from app.api import deps
 from app.crud import crud_user
+from services.live_location_service import live_deliveries
+from services.websocket_service import manager
 
 router = APIRouter(prefix="/api/v1/deliveries", tags=["deliveries"])
 
+logger = logging.getLogger(__name__)
+
 
 class LocationUpdate(BaseModel):
     order_id: str
@@ -34,8 +43,57 @@ class DeliveryResponse(BaseModel):
     updated_at: datetime
 
 
-# In-memory storage for live tracking (use Redis in production)
-live_deliveries = {}
+def _push_update(order_id: str, rider_id: str, location: Optional[dict], status: str):
+    """Push the delivery's state to its order_/rider_ WebSocket subscribers on every worker"""
+    try:
+        anyio.from_thread.run(
+            manager.send_delivery_update,
+            order_id,
+            rider_id,
+            location["latitude"] if location else None,
+            location["longitude"] if location else None,
+            None,
+            status,
+        )
+    except Exception as e:
+        logger.warning(f"Delivery update push for {order_id} failed: {e}")
+
+
+# Pending trailing pushes, referenced until done so they aren't garbage collected
+_trailing_pushes: set = set()
+
+
+async def _trailing_push(order_id: str, delay: float):
+    """Once the push window closes, push the latest location if no newer ping did"""
+    try:
+        await anyio.sleep(delay)
+        delivery = await anyio.to_thread.run_sync(live_deliveries.claim_trailing_push, order_id)
+        if delivery is None:
+            return
+        location = delivery["current_location"]
+        await manager.send_delivery_update(
+            order_id,
+            delivery["rider_id"],
+            location["latitude"] if location else None,
+            location["longitude"] if location else None,
+            None,
+            delivery["status"],
+        )
+    except Exception as e:
+        logger.warning(f"Trailing delivery update push for {order_id} failed: {e}")
+
+
+def _schedule_trailing_push(order_id: str, delay: float):
+    """From a threadpool endpoint, run _trailing_push on the event loop"""
+    def spawn():
+        task = asyncio.get_running_loop().create_task(_trailing_push(order_id, delay))
+        _trailing_pushes.add(task)
+        task.add_done_callback(_trailing_pushes.discard)
+
+    try:
+        anyio.from_thread.run_sync(spawn)
+    except Exception as e:
+        logger.warning(f"Could not schedule trailing push for {order_id}: {e}")
 
 
 @router.post("/accept/{order_id}")
@@ -49,18 +107,12 @@ def accept_delivery(
         raise HTTPException(status_code=403, detail="Only riders can accept deliveries")
 
     # In production, update database order
-    if order_id not in live_deliveries:
-        live_deliveries[order_id] = {
-            "order_id": order_id,
-            "status": "accepted",
-            "rider_id": current_user.get("id"),
-            "rider_name": current_user.get("full_name"),
-            "rider_phone": current_user.get("phone"),
-            "current_location": None,
-            "accepted_at": datetime.utcnow(),
-            "started_at": None,
-            "completed_at": None,
-        }
+    live_deliveries.accept(
+        order_id,
+        current_user.get("id"),
+        current_user.get("full_name"),
+        current_user.get("phone"),
+    )
 
     return {
         "success": True,
@@ -86,23 +138,8 @@ def update_delivery_status(
     if status_update.status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
 
-    if order_id not in live_deliveries:
-        raise HTTPException(status_code=404, detail="Delivery not found")
-
-    delivery = live_deliveries[order_id]
-    old_status = delivery["status"]
-
-    # Update status
-    delivery["status"] = status_update.status
-    delivery["updated_at"] = datetime.utcnow()
-
-    if status_update.status == "in_transit":
-        delivery["started_at"] = datetime.utcnow()
-    elif status_update.status == "completed":
-        delivery["completed_at"] = datetime.utcnow()
-
-    if status_update.notes:
-        delivery["notes"] = status_update.notes
+    old_status, delivery = live_deliveries.set_status(order_id, status_update.status, status_update.notes)
+    _push_update(order_id, delivery["rider_id"], delivery["current_location"], status_update.status)
 
     return {
         "success": True,
@@ -125,28 +162,28 @@ def update_rider_location(
     if not current_user.get("is_rider"):
         raise HTTPException(status_code=403, detail="Only riders can update location")
 
-    if order_id not in live_deliveries:
-        raise HTTPException(status_code=404, detail="Delivery not found")
-
-    delivery = live_deliveries[order_id]
-
-    # Verify rider is assigned to this delivery
-    if delivery.get("rider_id") != current_user.get("id"):
-        raise HTTPException(status_code=403, detail="Not assigned to this delivery")
-
-    # Update location
-    delivery["current_location"] = {
-        "latitude": location.latitude,
-        "longitude": location.longitude,
-        "accuracy": location.accuracy,
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    # 404s unknown deliveries and 403s riders not assigned to this one
+    result = live_deliveries.record_ping(
+        order_id, current_user.get("id"), location.latitude, location.longitude, location.accuracy
+    )
+
+    # Pings inside the push interval are coalesced into one trailing push
+    # of the latest location when the interval ends
+    if result["push"]:
+        _push_update(
+            order_id,
+            current_user.get("id"),
+            {"latitude": location.latitude, "longitude": location.longitude},
+            result["status"],
+        )
+    elif result["trailing_in"] is not None:
+        _schedule_trailing_push(order_id, result["trailing_in"])
 
     return {
         "success": True,
         "order_id": order_id,
         "location_updated": True,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": result["timestamp"]
     }
 
 
@@ -157,10 +194,7 @@ def get_delivery_location(
     db: Session = Depends(deps.get_db)
 ):
     """Get current delivery location and status"""
-    if order_id not in live_deliveries:
-        raise HTTPException(status_code=404, detail="Delivery not found")
-
-    delivery = live_deliveries[order_id]
+    delivery = live_deliveries.require(order_id)
 
     return {
         "order_id": order_id,
@@ -191,14 +225,12 @@ def get_delivery_location(
 @router.get("/{order_id}/history")
 def get_delivery_history(
     order_id: str,
+    breadcrumbs: int = Query(500, ge=0, le=2000, description="Most recent trail points to return"),
     current_user: dict = Depends(deps.get_current_user),
     db: Session = Depends(deps.get_db)
 ):
-    """Get delivery status history and timeline"""
-    if order_id not in live_deliveries:
-        raise HTTPException(status_code=404, detail="Delivery not found")
-
-    delivery = live_deliveries[order_id]
+    """Get delivery status history, timeline and the rider's breadcrumb trail"""
+    delivery = live_deliveries.require(order_id)
 
     history = []
 
@@ -227,7 +259,8 @@ def get_delivery_history(
         "order_id": order_id,
         "status": delivery.get("status"),
         "history": history,
-        "current_location": delivery.get("current_location")
+        "current_location": delivery.get("current_location"),
+        "breadcrumbs": live_deliveries.trail(order_id, limit=breadcrumbs)
     }
 
 
@@ -242,17 +275,9 @@ def complete_delivery(
     if not current_user.get("is_rider"):
         raise HTTPException(status_code=403, detail="Only riders can complete deliveries")
 
-    if order_id not in live_deliveries:
-        raise HTTPException(status_code=404, detail="Delivery not found")
-
-    delivery = live_deliveries[order_id]
-
-    if delivery.get("rider_id") != current_user.get("id"):
-        raise HTTPException(status_code=403, detail="Not assigned to this delivery")
-
     # Mark as completed
-    delivery["status"] = "completed"
-    delivery["completed_at"] = datetime.utcnow()
+    _, delivery = live_deliveries.set_status(order_id, "completed", rider_id=current_user.get("id"))
+    _push_update(order_id, delivery["rider_id"], delivery["current_location"], "completed")
 
     # Calculate earnings (mock calculation)
     base_fee = 50  # KSh
@@ -276,3 +301,16 @@ def complete_delivery(
         },
         "message": f"Delivery completed. Earned KSh {total_earnings}"
     }
+
+
+@router.get("/riders/nearby")
+def get_nearby_riders(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5, gt=0, le=50),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(deps.get_current_active_superuser),
+):
+    """Riders whose latest live location is within radius_km, nearest first (admins and agents only)"""
+    riders = live_deliveries.riders_near(lat, lng, radius_km, limit)
+    return {"riders": riders, "total": len(riders)}
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, date
+from typing import Optional
 from math import radians, sin, cos, sqrt, atan2
 
 from database import get_db
 from models import Rider, User, Order, DeliveryAssignment, RiderEarnings, RiderDeliveryStatus, OrderItem, RiderWithdrawal, WithdrawalStatus
 from schemas import RiderRegister, RiderResponse, RiderLocationUpdate, DeliveryAssignmentResponse, DeliveryStatusUpdate
-from utils.security import get_current_user
+from utils.security import get_current_user, require_admin_or_seller
+from services.dispatch_service import dispatch_index, ACTIVE_ASSIGNMENT_STATUSES
 
 router = APIRouter(prefix="/riders", tags=["riders"])
 
@@ -75,30 +77,45 @@ def register_rider(
 def get_available_riders(
     limit: int = Query(10, ge=1, le=50),
     skip: int = Query(0, ge=0),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Sort by distance from this point"),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=100),
     db: Session = Depends(get_db)
 ):
-    """Get list of available riders for order assignment"""
+    """Get list of available riders for order assignment, nearest first if lat/lng are given"""
     try:
+        if lat is not None and lng is not None:
+            in_range = dispatch_index.riders_within(db, lat, lng, radius_km)
+            return {
+                "riders": [
+                    {
+                        "id": str(rider.id),
+                        "name": "Rider",
+                        "phone": rider.phone or "",
+                        "rating": 5.0,
+                        "active_deliveries": rider.active_deliveries,
+                        "distance_km": round(distance, 2),
+                        "location": {"lat": float(rider.lat), "lng": float(rider.lng)},
+                    }
+                    for distance, rider in in_range[skip:skip + limit]
+                ],
+                "total": len(in_range)
+            }
+
         from sqlalchemy import text
 
         result = db.execute(text("""
-            SELECT id, phone, is_active, is_verified, current_lat, current_lng
-            FROM riders
-            WHERE is_active = true AND is_verified = true
+            SELECT r.id, r.phone, r.is_active, r.is_verified, r.current_lat, r.current_lng,
+                   (SELECT count(*) FROM delivery_assignments a
+                    WHERE a.rider_id = r.id AND a.status = ANY(:active_statuses)) AS active_count
+            FROM riders r
+            WHERE r.is_active = true AND r.is_verified = true
             LIMIT :limit OFFSET :skip
-        """), {"limit": limit, "skip": skip})
+        """), {"limit": limit, "skip": skip, "active_statuses": ACTIVE_ASSIGNMENT_STATUSES})
 
         available_riders = []
         for row in result:
-            rider_id, phone, is_active, is_verified, lat, lng = row
-
-            try:
-                active_count = db.query(DeliveryAssignment).filter(
-                    DeliveryAssignment.rider_id == rider_id,
-                    DeliveryAssignment.status.in_(["assigned", "picked_up"])
-                ).count()
-            except:
-                active_count = 0
+            rider_id, phone, is_active, is_verified, rider_lat, rider_lng, active_count = row
 
             available_riders.append({
                 "id": str(rider_id),
@@ -107,8 +124,8 @@ def get_available_riders(
                 "rating": 5.0,
                 "active_deliveries": active_count,
                 "location": {
-                    "lat": float(lat or 0),
-                    "lng": float(lng or 0)
+                    "lat": float(rider_lat or 0),
+                    "lng": float(rider_lng or 0)
                 }
             })
 
@@ -120,6 +137,21 @@ def get_available_riders(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/dispatch/suggestions")
+def get_dispatch_suggestions(
+    radius_km: float = Query(10, gt=0, le=100, description="Furthest a rider may be from the order"),
+    limit: int = Query(100, ge=1, le=500, description="Oldest open orders to place"),
+    current_user: User = Depends(require_admin_or_seller),
+    db: Session = Depends(get_db)
+):
+    """
+    Suggested rider for each of the oldest open delivery orders, balancing
+    distance against the riders' current load. Nothing is assigned; apply a
+    suggestion with POST /riders/assignments/assign.
+    """
+    return dispatch_index.suggest_assignments(db, radius_km, limit)
+
+
 @router.get("/{rider_id}", response_model=RiderResponse)
 def get_rider_profile(
     rider_id: str,
@@ -153,6 +185,7 @@ def update_rider_location(
     rider.current_lng = location_data.longitude
     rider.updated_at = datetime.utcnow()
     db.commit()
+    dispatch_index.rider_moved(rider.id, rider.current_lat, rider.current_lng)
 
     return {
         "success": True,
@@ -186,6 +219,7 @@ def assign_delivery(
     order.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(assignment)
+    dispatch_index.order_assigned(order_id, rider_id)
 
     return {
         "id": assignment.id,
@@ -291,53 +325,28 @@ def get_available_deliveries(
     if rider.current_lat is None or rider.current_lng is None:
         raise HTTPException(status_code=400, detail="Rider location not set")
 
-    # Get available orders (ready for pickup and not yet assigned)
-    query = db.query(Order).filter(
-        Order.delivery_option == "delivery",
-        Order.status.in_(["ready_for_pickup", "pending"])
-    )
-
-    # Get all unassigned orders
-    assigned_order_ids = db.query(DeliveryAssignment.order_id).all()
-    assigned_order_ids = [aid[0] for aid in assigned_order_ids]
-    query = query.filter(~Order.id.in_(assigned_order_ids)) if assigned_order_ids else query
-
-    orders = query.all()
-
-    # Filter by distance and enrich with delivery info
-    available_orders = []
-    for order in orders:
-        distance = calculate_distance(
-            rider.current_lat,
-            rider.current_lng,
-            order.location_lat,
-            order.location_lng
-        )
-
-        if distance <= max_distance:
-            items_count = db.query(OrderItem).filter(OrderItem.order_id == order.id).count()
-
-            available_orders.append({
-                "order_id": order.id,
-                "distance_km": distance,
-                "delivery_fee": order.courier_tip or 100,  # Base fee
-                "items_count": items_count,
-                "pickup_location": order.seller_id,  # In real app, get seller location
-                "delivery_address": order.delivery_address,
-                "customer_rating": 4.5,  # In real app, calculate from ratings
-                "total_amount": order.total_amount,
-                "created_at": order.created_at.isoformat() if order.created_at else None
-            })
-
-    # Sort by distance (closest first)
-    available_orders.sort(key=lambda x: x["distance_km"])
+    # Open, unassigned delivery orders within range, nearest first
+    nearby = dispatch_index.orders_within(db, rider.current_lat, rider.current_lng, max_distance)
 
     # Pagination
     skip = (page - 1) * limit
-    paginated_orders = available_orders[skip:skip + limit]
+    paginated_orders = [
+        {
+            "order_id": order.id,
+            "distance_km": round(distance, 2),
+            "delivery_fee": order.courier_tip or 100,  # Base fee
+            "items_count": order.items_count,
+            "pickup_location": order.seller_id,  # In real app, get seller location
+            "delivery_address": order.delivery_address,
+            "customer_rating": 4.5,  # In real app, calculate from ratings
+            "total_amount": order.total_amount,
+            "created_at": order.created_at.isoformat() if order.created_at else None
+        }
+        for distance, order in nearby[skip:skip + limit]
+    ]
 
     return {
-        "total": len(available_orders),
+        "total": len(nearby),
         "page": page,
         "limit": limit,
         "deliveries": paginated_orders
@@ -7,6 +7,7 @@ from database import get_db
 from models import Seller, Order, User
 from schemas import SellerRegister, SellerResponse, SellerUpdate, MPesaVerification, EarningsResponse, WithdrawalRequest, WithdrawalResponse
 from utils.security import get_current_user
+from services.dispatch_service import dispatch_index
 
 router = APIRouter(prefix="/sellers", tags=["sellers"])
 
@@ -715,6 +716,7 @@ def assign_rider_to_order(
     order.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(assignment)
+    dispatch_index.order_assigned(order_id, rider_id)
 
     return {
         "assignment_id": assignment.id,
@@ -130,8 +130,9 @@ async def websocket_status(
     current_user: User = Depends(get_current_user),
 ):
     """Get WebSocket connection status for current user"""
-    is_online = manager.is_user_online(current_user.id)
-    connections = manager.get_user_connections(current_user.id)
+    # The manager keys users by string id
+    is_online = await manager.is_user_online(str(current_user.id))
+    connections = manager.get_user_connections(str(current_user.id))
 
     return {
         "user_id": current_user.id,
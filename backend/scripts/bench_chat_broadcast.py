@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+In-process benchmark of chat channel broadcasts (services/websocket_service.py).
+
+Opens --connections simulated WebSocket connections on a ConnectionManager
+(no network and no Redis -- the backplane isn't started), pairs them into
+one-to-one conversations subscribed the way chat_ws does, plus a few extra
+channels each, and makes --slow-fraction of them slow (every send sleeps
+--slow-ms). It then fires --broadcasts typing/message events at random
+conversations, --rate per second, and prints p50/p95/p99 of:
+
+  - lookup_index / lookup_scan: finding a channel's subscribers through the
+    channel index vs. the old scan over every connection's subscriptions
+  - enqueue: how long broadcast_to_channel takes to return
+  - delivery_fast / delivery_slow: broadcast -> send_json on the
+    recipient's socket, for normal and slow clients
+
+Usage:
+    python scripts/bench_chat_broadcast.py [--connections 10000] \\
+        [--broadcasts 2000] [--rate 2000] [--slow-fraction 0.01] \\
+        [--slow-ms 200] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.websocket_service import ConnectionManager  # noqa: E402
+
+latencies = defaultdict(list)
+
+
+def record(kind: str, started: float):
+    latencies[kind].append((time.perf_counter() - started) * 1000)
+
+
+def summary():
+    result = {}
+    for kind in sorted(latencies):
+        samples = sorted(latencies[kind])
+        if len(samples) >= 2:
+            cuts = statistics.quantiles(samples, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = samples[0] if samples else 0.0
+        result[kind] = {
+            "count": len(samples),
+            "p50_ms": round(p50, 4),
+            "p95_ms": round(p95, 4),
+            "p99_ms": round(p99, 4),
+        }
+    return result
+
+
+class SimulatedSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.kind = "delivery_slow" if delay else "delivery_fast"
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message: dict):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        sent_at = message.get("bench_sent_at")
+        if sent_at is not None:
+            record(self.kind, sent_at)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def channel_for(a: int, b: int) -> str:
+    return f"chat_{min(a, b)}_{max(a, b)}"
+
+
+async def run(args):
+    manager = ConnectionManager()
+    rng = random.Random(args.seed)
+    users = list(range(1, args.connections + 1))
+    slow = set(rng.sample(users, int(len(users) * args.slow_fraction)))
+
+    conversations = []
+    for user in users:
+        socket = SimulatedSocket(args.slow_ms / 1000 if user in slow else 0)
+        await manager.connect(str(user), f"conn-{user}", socket)
+    for a, b in zip(users[::2], users[1::2]):
+        channel = channel_for(a, b)
+        conversations.append((a, b, channel))
+        await manager.subscribe(f"conn-{a}", channel)
+        await manager.subscribe(f"conn-{b}", channel)
+    for user in users:
+        for _ in range(args.extra_channels):
+            await manager.subscribe(f"conn-{user}", channel_for(user, rng.choice(users)))
+
+    # Subscriber lookup: index vs. the old full scan
+    for a, b, channel in rng.sample(conversations, min(200, len(conversations))):
+        started = time.perf_counter()
+        _ = manager.channel_subscribers.get(channel, ())
+        record("lookup_index", started)
+        started = time.perf_counter()
+        _ = [c for c, subs in manager.subscriptions.items() if channel in subs]
+        record("lookup_scan", started)
+
+    interval = 1 / args.rate if args.rate else 0
+    for i in range(args.broadcasts):
+        a, b, channel = rng.choice(conversations)
+        sender, receiver = (a, b) if i % 2 else (b, a)
+        event_type = "new_message" if i % 5 == 0 else "user_typing"
+        message = {
+            "event_type": event_type,
+            "user_id": sender,
+            "other_user_id": receiver,
+            "bench_sent_at": time.perf_counter(),
+        }
+        started = time.perf_counter()
+        await manager.broadcast_to_channel(channel, message, exclude_users=[str(sender)])
+        record("enqueue", started)
+        await asyncio.sleep(interval)
+
+    # Let the writers drain
+    deadline = time.monotonic() + args.drain_seconds
+    while time.monotonic() < deadline and any(len(o) for o in manager.outboxes.values()):
+        await asyncio.sleep(0.05)
+
+    stats = manager.get_stats()
+    for outbox in list(manager.outboxes.values()):
+        outbox.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--extra-channels", type=int, default=3, help="extra channels per connection")
+    parser.add_argument("--broadcasts", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=2000, help="broadcasts per second (0 = as fast as possible)")
+    parser.add_argument("--slow-fraction", type=float, default=0.01)
+    parser.add_argument("--slow-ms", type=float, default=200)
+    parser.add_argument("--drain-seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args))
+    result = {"config": vars(args), "manager": stats, "latency": summary()}
+
+    print(f"{args.connections} connections, {args.broadcasts} broadcasts")
+    for kind, row in result["latency"].items():
+        print(f"  {kind:<15} n={row['count']:<6} p50={row['p50_ms']:.3f}ms "
+              f"p95={row['p95_ms']:.3f}ms p99={row['p99_ms']:.3f}ms")
+    print(f"  still queued: {stats['queued_messages']}, connections left: {stats['active_connections']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Dispatch Service - Spatial matching of open delivery orders and riders
+
+get_available_deliveries used to load every unassigned delivery order plus
+every DeliveryAssignment.order_id ever created, compute the haversine
+distance in Python for each order, count items with one query per match,
+and sort and paginate in memory; get_available_riders counted active
+assignments with one query per rider.
+
+DispatchIndex keeps open orders and available riders in a grid of
+DISPATCH_GRID_CELL_KM cells. A radius or k-nearest query only visits the
+cells around the point, nearest ring first, so its cost follows how many
+orders are nearby, not how many are open across Nairobi and Mogadishu.
+
+- The index is loaded with one query for open orders (unassigned via NOT
+  EXISTS, item counts as a correlated count) and one for riders (active
+  load likewise), and reloaded once it is DISPATCH_INDEX_TTL_SECONDS old
+- assignments and location updates made through this process are applied
+  to it immediately; other workers' show up at the next reload
+- suggest_assignments() pairs the oldest open orders with nearby riders,
+  scoring distance plus DISPATCH_LOAD_PENALTY_KM per delivery the rider
+  already has (including ones suggested earlier in the same batch), and
+  never loads a rider past DISPATCH_MAX_ACTIVE_PER_RIDER
+
+Usage:
+    from services.dispatch_service import dispatch_index
+    dispatch_index.orders_within(db, lat, lng, radius_km=5)
+    dispatch_index.suggest_assignments(db, radius_km=10)
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from math import asin, atan2, ceil, cos, degrees, floor, pi, radians, sin, sqrt
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import DeliveryAssignment, Order, OrderItem, Rider
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 2 * pi * EARTH_RADIUS_KM / 360  # of latitude, on haversine_km's sphere
+
+OPEN_ORDER_STATUSES = ["ready_for_pickup", "pending"]
+ACTIVE_ASSIGNMENT_STATUSES = ["assigned", "picked_up"]
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+@dataclass
+class OpenOrder:
+    id: str
+    lat: float
+    lng: float
+    seller_id: str
+    delivery_address: Optional[str]
+    courier_tip: Optional[float]
+    total_amount: float
+    items_count: int
+    created_at: Optional[datetime]
+
+
+@dataclass
+class AvailableRider:
+    id: str
+    lat: float
+    lng: float
+    phone: Optional[str]
+    active_deliveries: int
+
+
+T = TypeVar("T", OpenOrder, AvailableRider)
+
+
+class GridIndex(Generic[T]):
+    """Entries with .id/.lat/.lng bucketed into square cells of `cell_km`."""
+
+    def __init__(self, cell_km: float):
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.cells: Dict[Tuple[int, int], Set[str]] = {}
+        self.entries: Dict[str, T] = {}
+        self._cell_of: Dict[str, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return floor(lat / self.cell_deg), floor(lng / self.cell_deg)
+
+    def add(self, entry: T) -> None:
+        self.remove(entry.id)
+        cell = self._cell(entry.lat, entry.lng)
+        self.cells.setdefault(cell, set()).add(entry.id)
+        self.entries[entry.id] = entry
+        self._cell_of[entry.id] = cell
+
+    def remove(self, entry_id: str) -> Optional[T]:
+        cell = self._cell_of.pop(entry_id, None)
+        if cell is None:
+            return None
+        members = self.cells[cell]
+        members.discard(entry_id)
+        if not members:
+            del self.cells[cell]
+        return self.entries.pop(entry_id)
+
+    def _span(self, lat: float, radius_km: float) -> Tuple[int, int]:
+        """Cells to search either side of `lat` to cover `radius_km` (lat, lng)."""
+        # The widest point of the circle in longitude; a degree of longitude
+        # shrinks away from the equator, and the circle reaches all of them
+        # once it covers the pole
+        ratio = sin(radius_km / EARTH_RADIUS_KM) / max(cos(radians(lat)), 1e-9)
+        lng_deg = degrees(asin(ratio)) if ratio < 1 else 180.0
+        return ceil(radius_km / self.cell_km), ceil(lng_deg / self.cell_deg)
+
+    def _cells_in(self, cy: int, cx: int, dy: int, dx: int) -> List[Tuple[str, ...]]:
+        if (2 * dy + 1) * (2 * dx + 1) > len(self.cells):
+            # Sparse index: cheaper to filter the occupied cells than probe the box
+            return [tuple(m) for (y, x), m in list(self.cells.items()) if abs(y - cy) <= dy and abs(x - cx) <= dx]
+        cells = (self.cells.get((y, x)) for y in range(cy - dy, cy + dy + 1) for x in range(cx - dx, cx + dx + 1))
+        return [tuple(m) for m in cells if m]
+
+    @staticmethod
+    def _ring(cy: int, cx: int, r: int, max_dy: int, max_dx: int) -> Iterable[Tuple[int, int]]:
+        """Cells exactly `r` rings out from (cy, cx), clipped to the search box."""
+        dy, dx = min(r, max_dy), min(r, max_dx)
+        for y in range(cy - dy, cy + dy + 1):
+            if abs(y - cy) == r:
+                yield from ((y, x) for x in range(cx - dx, cx + dx + 1))
+            elif r <= max_dx:
+                yield (y, cx - r)
+                if r:
+                    yield (y, cx + r)
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[float, T]]:
+        """Entries within `radius_km` of the point, nearest first, with their distance."""
+        cy, cx = self._cell(lat, lng)
+        dy, dx = self._span(lat, radius_km)
+        found = []
+        # Queries run unlocked while DispatchIndex applies updates, so they
+        # walk copies of the cell sets and skip entries removed meanwhile
+        for members in self._cells_in(cy, cx, dy, dx):
+            for entry_id in members:
+                entry = self.entries.get(entry_id)
+                if entry is None:
+                    continue
+                distance = haversine_km(lat, lng, entry.lat, entry.lng)
+                if distance <= radius_km:
+                    found.append((distance, entry))
+        found.sort(key=lambda hit: hit[0])
+        return found
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        max_km: float,
+        accept: Optional[Callable[[T], bool]] = None,
+    ) -> List[Tuple[float, T]]:
+        """
+        The `k` nearest entries within `max_km` (that `accept` allows), nearest
+        first. Searches ring by ring and stops once nothing further out can
+        beat the k-th best.
+        """
+        cy, cx = self._cell(lat, lng)
+        max_dy, max_dx = self._span(lat, max_km)
+        # Every entry beyond ring r is at least r cells of latitude or of
+        # longitude away; a cell of longitude is narrowest at the most
+        # poleward latitude the search reaches
+        pole_cos = cos(radians(min(abs(lat) + max_km / KM_PER_DEGREE, 90.0)))
+
+        def beyond_km(r: int) -> float:
+            # haversine_km with the latitudes bounded by pole_cos
+            return 2 * EARTH_RADIUS_KM * asin(min(pole_cos * sin(radians(r * self.cell_deg) / 2), 1.0))
+
+        best: List[Tuple[float, T]] = []
+        for r in range(max(max_dy, max_dx) + 1):
+            for cell in self._ring(cy, cx, r, max_dy, max_dx):
+                for entry_id in tuple(self.cells.get(cell, ())):
+                    entry = self.entries.get(entry_id)
+                    if entry is None or (accept is not None and not accept(entry)):
+                        continue
+                    distance = haversine_km(lat, lng, entry.lat, entry.lng)
+                    if distance <= max_km:
+                        best.append((distance, entry))
+            best.sort(key=lambda hit: hit[0])
+            del best[k:]
+            if len(best) == k and best[-1][0] <= beyond_km(r):
+                break
+        return best
+
+
+class DispatchIndex:
+    def __init__(self):
+        self.orders: GridIndex[OpenOrder] = GridIndex(settings.DISPATCH_GRID_CELL_KM)
+        self.riders: GridIndex[AvailableRider] = GridIndex(settings.DISPATCH_GRID_CELL_KM)
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    # -- loading ---------------------------------------------------------------
+
+    def refresh(self, db: Session, force: bool = False) -> None:
+        """Reload the index from the database if it is older than the TTL."""
+        if not force and time.monotonic() - self._loaded_at < settings.DISPATCH_INDEX_TTL_SECONDS:
+            return
+        with self._lock:
+            # Another request may have reloaded it while we waited
+            if not force and time.monotonic() - self._loaded_at < settings.DISPATCH_INDEX_TTL_SECONDS:
+                return
+            started = time.perf_counter()
+            orders, riders = self._load_orders(db), self._load_riders(db)
+            self.orders, self.riders = orders, riders
+            self._loaded_at = time.monotonic()
+            logger.debug(
+                f"Dispatch index loaded: {len(orders)} open orders, {len(riders)} riders "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+
+    def _load_orders(self, db: Session) -> GridIndex[OpenOrder]:
+        items_count = (
+            select(func.count(OrderItem.id))
+            .where(OrderItem.order_id == Order.id)
+            .correlate(Order)
+            .scalar_subquery()
+        )
+        rows = db.query(
+            Order.id, Order.location_lat, Order.location_lng, Order.seller_id, Order.delivery_address,
+            Order.courier_tip, Order.total_amount, items_count, Order.created_at,
+        ).filter(
+            Order.delivery_option == "delivery",
+            Order.status.in_(OPEN_ORDER_STATUSES),
+            ~exists().where(DeliveryAssignment.order_id == Order.id),
+        ).all()
+
+        index: GridIndex[OpenOrder] = GridIndex(settings.DISPATCH_GRID_CELL_KM)
+        for row in rows:
+            index.add(OpenOrder(*row))
+        return index
+
+    def _load_riders(self, db: Session) -> GridIndex[AvailableRider]:
+        active = (
+            select(func.count(DeliveryAssignment.id))
+            .where(
+                DeliveryAssignment.rider_id == Rider.id,
+                DeliveryAssignment.status.in_(ACTIVE_ASSIGNMENT_STATUSES),
+            )
+            .correlate(Rider)
+            .scalar_subquery()
+        )
+        rows = db.query(Rider.id, Rider.current_lat, Rider.current_lng, Rider.phone, active).filter(
+            Rider.is_active == True,
+            Rider.is_verified == True,
+            Rider.current_lat.isnot(None),
+            Rider.current_lng.isnot(None),
+        ).all()
+
+        index: GridIndex[AvailableRider] = GridIndex(settings.DISPATCH_GRID_CELL_KM)
+        for row in rows:
+            index.add(AvailableRider(*row))
+        return index
+
+    # -- updates from this process ---------------------------------------------
+
+    def order_assigned(self, order_id: str, rider_id: str) -> None:
+        with self._lock:
+            self.orders.remove(order_id)
+            rider = self.riders.entries.get(rider_id)
+            if rider is not None:
+                rider.active_deliveries += 1
+
+    def rider_moved(self, rider_id: str, lat: float, lng: float) -> None:
+        with self._lock:
+            rider = self.riders.entries.get(rider_id)
+            if rider is not None:
+                rider.lat, rider.lng = lat, lng
+                self.riders.add(rider)
+
+    # -- queries ---------------------------------------------------------------
+
+    def orders_within(self, db: Session, lat: float, lng: float, radius_km: float) -> List[Tuple[float, OpenOrder]]:
+        self.refresh(db)
+        return self.orders.within(lat, lng, radius_km)
+
+    def riders_within(self, db: Session, lat: float, lng: float, radius_km: float) -> List[Tuple[float, AvailableRider]]:
+        self.refresh(db)
+        return self.riders.within(lat, lng, radius_km)
+
+    def nearest_riders(
+        self, db: Session, lat: float, lng: float, k: int, radius_km: float
+    ) -> List[Tuple[float, AvailableRider]]:
+        self.refresh(db)
+        return self.riders.nearest(lat, lng, k, radius_km)
+
+    def suggest_assignments(self, db: Session, radius_km: float, limit: int = 100) -> Dict[str, list]:
+        """
+        Propose a rider for up to `limit` of the oldest open orders. Nothing
+        is assigned; the suggestions go through /riders/assignments/assign.
+
+        Returns:
+            {"suggestions": [{order_id, rider_id, distance_km, rider_load}],
+             "unmatched": [order ids with no rider in range and capacity]}
+        """
+        self.refresh(db)
+        orders = sorted(list(self.orders.entries.values()), key=lambda o: o.created_at or datetime.max)[:limit]
+        planned: Dict[str, int] = {}
+
+        def load(rider: AvailableRider) -> int:
+            return rider.active_deliveries + planned.get(rider.id, 0)
+
+        def has_capacity(rider: AvailableRider) -> bool:
+            return load(rider) < settings.DISPATCH_MAX_ACTIVE_PER_RIDER
+
+        suggestions, unmatched = [], []
+        for order in orders:
+            candidates = self.riders.nearest(
+                order.lat, order.lng, settings.DISPATCH_CANDIDATES, radius_km, accept=has_capacity
+            )
+            if not candidates:
+                unmatched.append(order.id)
+                continue
+            distance, rider = min(
+                candidates, key=lambda hit: hit[0] + settings.DISPATCH_LOAD_PENALTY_KM * load(hit[1])
+            )
+            planned[rider.id] = planned.get(rider.id, 0) + 1
+            suggestions.append({
+                "order_id": order.id,
+                "rider_id": rider.id,
+                "distance_km": round(distance, 2),
+                "rider_load": load(rider),
+            })
+        return {"suggestions": suggestions, "unmatched": unmatched}
+
+
+dispatch_index = DispatchIndex()
@@ -0,0 +1,284 @@
+"""
+Live Location Service - Shared live state of in-progress deliveries
+
+routers/delivery_tracking.py kept deliveries in a module-level dict, so a
+location posted to one worker was invisible to the others and everything
+was lost on restart. The state now lives in Redis, shared by every worker:
+
+- delivery:live:<order_id>   hash: status, rider, timeline, latest location
+- delivery:trail:<order_id>  stream: breadcrumbs, capped at LIVE_LOCATION_TRAIL_MAX
+- delivery:riders:geo        GEO set of each rider's latest position, for
+                             nearby-rider searches (riders silent for
+                             LIVE_RIDER_STALE_SECONDS are pruned)
+
+Both per-delivery keys expire LIVE_DELIVERY_TTL_SECONDS after the last
+update, or LIVE_DELIVERY_DONE_TTL_SECONDS after the delivery completes.
+
+Riders ping every few seconds, so a ping is one read and one pipelined
+write (two more commands when it falls inside a push window), and most of
+it is coalesced:
+- the latest location always overwrites the previous one
+- a WebSocket push (send_delivery_update, to the order_<id> and
+  rider_<id> channels on every worker) goes out at most once per
+  LIVE_LOCATION_PUSH_INTERVAL_SECONDS. The window is a SET NX PX key, so
+  of two concurrent pings only one pushes. A ping inside the window
+  schedules one trailing push for when it closes (claim_trailing_push),
+  so the rider's last position still goes out if they stop pinging
+- a breadcrumb is only added once the rider has moved
+  LIVE_LOCATION_BREADCRUMB_METERS, or LIVE_LOCATION_BREADCRUMB_SECONDS
+  have passed, so a rider waiting at a pickup doesn't fill the trail
+
+Usage:
+    from services.live_location_service import live_deliveries
+    result = live_deliveries.record_ping(order_id, rider_id, lat, lng)
+    if result["push"]:
+        ...  # push now
+    elif result["trailing_in"] is not None:
+        ...  # after trailing_in seconds: live_deliveries.claim_trailing_push(order_id)
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services.cache_service import cache
+from services.dispatch_service import haversine_km
+
+logger = logging.getLogger(__name__)
+
+LIVE_PREFIX = "delivery:live:"
+TRAIL_PREFIX = "delivery:trail:"
+RIDERS_GEO = "delivery:riders:geo"
+RIDERS_SEEN = "delivery:riders:seen"
+PUSH_WINDOW_PREFIX = "delivery:push:"
+TRAILING_PUSH_PREFIX = "delivery:push:trailing:"
+
+DONE_STATUSES = {"completed", "cancelled"}
+STATE_FIELDS = [
+    "order_id", "status", "rider_id", "rider_name", "rider_phone", "notes",
+    "accepted_at", "started_at", "completed_at", "updated_at",
+    "lat", "lng", "accuracy", "location_at",
+]
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _location(lat, lng, accuracy, timestamp) -> Optional[Dict[str, Any]]:
+    if lat in (None, ""):
+        return None
+    return {
+        "latitude": float(lat),
+        "longitude": float(lng),
+        "accuracy": float(accuracy) if accuracy not in (None, "") else None,
+        "timestamp": timestamp,
+    }
+
+
+class LiveDeliveryStore:
+    @property
+    def client(self):
+        return cache.client
+
+    def _unavailable(self, exc: Exception) -> HTTPException:
+        logger.error(f"Live delivery store unavailable: {exc}")
+        return HTTPException(status_code=503, detail="Live tracking temporarily unavailable")
+
+    def _ttl(self, status: Optional[str]) -> int:
+        if status in DONE_STATUSES:
+            return settings.LIVE_DELIVERY_DONE_TTL_SECONDS
+        return settings.LIVE_DELIVERY_TTL_SECONDS
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """The delivery's state, or None if it isn't being tracked"""
+        try:
+            values = self.client.hmget(LIVE_PREFIX + order_id, STATE_FIELDS)
+        except RedisError as e:
+            raise self._unavailable(e)
+        state = dict(zip(STATE_FIELDS, values))
+        if state["order_id"] is None:
+            return None
+        state["current_location"] = _location(
+            state.pop("lat"), state.pop("lng"), state.pop("accuracy"), state.pop("location_at")
+        )
+        return state
+
+    def require(self, order_id: str) -> Dict[str, Any]:
+        state = self.get(order_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Delivery not found")
+        return state
+
+    def accept(self, order_id: str, rider_id: str, rider_name: Optional[str], rider_phone: Optional[str]) -> None:
+        """Start tracking the delivery for `rider_id`; a no-op if it already is"""
+        key = LIVE_PREFIX + order_id
+        try:
+            # HSETNX makes the first acceptance win when two arrive at once
+            if self.client.hsetnx(key, "order_id", order_id):
+                pipe = self.client.pipeline(transaction=False)
+                fields = {
+                    "status": "accepted",
+                    "rider_id": str(rider_id),
+                    "rider_name": rider_name,
+                    "rider_phone": rider_phone,
+                    "accepted_at": _now_iso(),
+                }
+                pipe.hset(key, mapping={k: v for k, v in fields.items() if v is not None})
+                pipe.expire(key, settings.LIVE_DELIVERY_TTL_SECONDS)
+                pipe.execute()
+        except RedisError as e:
+            raise self._unavailable(e)
+
+    def set_status(self, order_id: str, status: str, notes: Optional[str] = None,
+                   rider_id: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Move the delivery to `status` (only by `rider_id`, if given).
+
+        Returns:
+            (previous status, updated state)
+        """
+        state = self.require(order_id)
+        if rider_id is not None and state["rider_id"] != str(rider_id):
+            raise HTTPException(status_code=403, detail="Not assigned to this delivery")
+
+        now = _now_iso()
+        changes = {"status": status, "updated_at": now}
+        if status == "in_transit":
+            changes["started_at"] = now
+        elif status == "completed":
+            changes["completed_at"] = now
+        if notes:
+            changes["notes"] = notes
+
+        ttl = self._ttl(status)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(LIVE_PREFIX + order_id, mapping=changes)
+            pipe.expire(LIVE_PREFIX + order_id, ttl)
+            pipe.expire(TRAIL_PREFIX + order_id, ttl)
+            pipe.execute()
+        except RedisError as e:
+            raise self._unavailable(e)
+
+        previous = state["status"]
+        state.update(changes)
+        return previous, state
+
+    def record_ping(self, order_id: str, rider_id: str, lat: float, lng: float,
+                    accuracy: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Store the rider's latest location for the delivery.
+
+        Returns:
+            {"push": whether to push it to WebSocket subscribers now,
+             "trailing_in": seconds until this caller should run
+                 claim_trailing_push(), or None,
+             "status": the delivery's status, "timestamp": iso time}
+        """
+        key = LIVE_PREFIX + order_id
+        now, now_iso = time.time(), _now_iso()
+        try:
+            assigned, status, crumb_lat, crumb_lng, crumb_at = self.client.hmget(
+                key, ["rider_id", "status", "crumb_lat", "crumb_lng", "crumb_at"]
+            )
+        except RedisError as e:
+            raise self._unavailable(e)
+        if assigned is None:
+            raise HTTPException(status_code=404, detail="Delivery not found")
+        if assigned != str(rider_id):
+            raise HTTPException(status_code=403, detail="Not assigned to this delivery")
+
+        breadcrumb = (
+            crumb_at is None
+            or now - float(crumb_at) >= settings.LIVE_LOCATION_BREADCRUMB_SECONDS
+            or haversine_km(float(crumb_lat), float(crumb_lng), lat, lng) * 1000
+            >= settings.LIVE_LOCATION_BREADCRUMB_METERS
+        )
+
+        changes = {"lat": lat, "lng": lng, "accuracy": "" if accuracy is None else accuracy, "location_at": now_iso}
+        if breadcrumb:
+            changes.update(crumb_lat=lat, crumb_lng=lng, crumb_at=now)
+
+        ttl = self._ttl(status)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(key, mapping=changes)
+            pipe.expire(key, ttl)
+            if breadcrumb:
+                trail = TRAIL_PREFIX + order_id
+                pipe.xadd(
+                    trail,
+                    {"lat": lat, "lng": lng, "accuracy": changes["accuracy"], "timestamp": now_iso},
+                    maxlen=settings.LIVE_LOCATION_TRAIL_MAX,
+                    approximate=True,
+                )
+                pipe.expire(trail, ttl)
+            pipe.geoadd(RIDERS_GEO, (lng, lat, str(rider_id)))
+            pipe.zadd(RIDERS_SEEN, {str(rider_id): now})
+            # Claimed after the location is stored, so whichever push takes
+            # the window -- this one or a trailing one -- sends it
+            window_ms = max(int(settings.LIVE_LOCATION_PUSH_INTERVAL_SECONDS * 1000), 1)
+            pipe.set(PUSH_WINDOW_PREFIX + order_id, now, nx=True, px=window_ms)
+            push = bool(pipe.execute()[-1])
+
+            trailing_in = None
+            if not push and self.client.set(TRAILING_PUSH_PREFIX + order_id, now, nx=True, px=window_ms):
+                trailing_in = max(self.client.pttl(PUSH_WINDOW_PREFIX + order_id), 0) / 1000
+        except RedisError as e:
+            raise self._unavailable(e)
+
+        return {"push": push, "trailing_in": trailing_in, "status": status, "timestamp": now_iso}
+
+    def claim_trailing_push(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Run once the push window a throttled ping fell into has closed.
+        Returns the delivery's state to push, or None if a newer ping
+        already claimed the next window (and pushed its own location).
+        """
+        try:
+            self.client.delete(TRAILING_PUSH_PREFIX + order_id)
+            window_ms = max(int(settings.LIVE_LOCATION_PUSH_INTERVAL_SECONDS * 1000), 1)
+            if not self.client.set(PUSH_WINDOW_PREFIX + order_id, time.time(), nx=True, px=window_ms):
+                return None
+        except RedisError as e:
+            raise self._unavailable(e)
+        return self.get(order_id)
+
+    def trail(self, order_id: str, limit: int = 500) -> List[Dict[str, Any]]:
+        """The delivery's most recent `limit` breadcrumbs, oldest first"""
+        try:
+            entries = self.client.xrevrange(TRAIL_PREFIX + order_id, count=limit)
+        except RedisError as e:
+            raise self._unavailable(e)
+        return [
+            _location(fields["lat"], fields["lng"], fields.get("accuracy"), fields["timestamp"])
+            for _, fields in reversed(entries)
+        ]
+
+    def riders_near(self, lat: float, lng: float, radius_km: float, limit: int = 20) -> List[Dict[str, Any]]:
+        """Riders whose latest ping is within `radius_km`, nearest first"""
+        try:
+            stale = self.client.zrangebyscore(RIDERS_SEEN, "-inf", time.time() - settings.LIVE_RIDER_STALE_SECONDS)
+            if stale:
+                pipe = self.client.pipeline(transaction=False)
+                pipe.zrem(RIDERS_GEO, *stale)
+                pipe.zrem(RIDERS_SEEN, *stale)
+                pipe.execute()
+            hits = self.client.geosearch(
+                RIDERS_GEO, longitude=lng, latitude=lat, radius=radius_km, unit="km",
+                withdist=True, withcoord=True, sort="ASC", count=limit,
+            )
+        except RedisError as e:
+            raise self._unavailable(e)
+        return [
+            {"rider_id": rider_id, "distance_km": round(distance, 2), "latitude": coord[1], "longitude": coord[0]}
+            for rider_id, distance, coord in hits
+        ]
+
+
+live_deliveries = LiveDeliveryStore()
@@ -1,14 +1,99 @@
 """
 WebSocket Service - Real-time connection management and broadcasting
+
+Connections live in this process; broadcasts and presence go through
+app/services/ws_backplane.py so they reach sockets held by other workers.
+
+Channel broadcasts look subscribers up in an inverted channel -> connections
+index instead of scanning every connection. Delivery only appends to each
+connection's bounded outbound queue; a writer task per connection does the
+actual send, so one slow client no longer holds up everyone after it.
+Under backpressure typing indicators are coalesced (a newer one replaces a
+queued one for the same conversation) or dropped; a client that falls
+WS_SEND_QUEUE_SIZE messages behind on anything else is disconnected and
+catches up on reconnect.
 """
+import asyncio
 import json
 import logging
-from typing import Dict, Set, Optional, List
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Set, Optional, List
 from datetime import datetime
 from fastapi import WebSocket
 
+from app.core.config import settings
+from app.services.ws_backplane import ws_backplane
+
 logger = logging.getLogger(__name__)
 
+# Events that only carry the latest state, safe to coalesce or drop
+COALESCIBLE_EVENTS = {"user_typing", "user_stopped_typing"}
+
+
+def _coalesce_key(message: dict):
+    return (message.get("user_id"), message.get("other_user_id"))
+
+
+class Outbox:
+    """Bounded outbound queue of one connection, drained by its own writer task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_error: Callable[[Exception], Awaitable[None]],
+        maxsize: int,
+    ):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self._queue: Deque[dict] = deque()
+        self._ready = asyncio.Event()
+        self._on_error = on_error
+        self._task = asyncio.create_task(self._run())
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, message: dict) -> bool:
+        """Queue a message; False if the client is too far behind to keep up"""
+        if message.get("event_type") in COALESCIBLE_EVENTS:
+            key = _coalesce_key(message)
+            for i, queued in enumerate(self._queue):
+                if queued.get("event_type") in COALESCIBLE_EVENTS and _coalesce_key(queued) == key:
+                    self._queue[i] = message
+                    return True
+            if len(self._queue) >= self.maxsize:
+                return True  # a missed typing indicator is harmless
+        elif len(self._queue) >= self.maxsize and not self._drop_coalescible():
+            return False
+
+        self._queue.append(message)
+        self._ready.set()
+        return True
+
+    def _drop_coalescible(self) -> bool:
+        for i, queued in enumerate(self._queue):
+            if queued.get("event_type") in COALESCIBLE_EVENTS:
+                del self._queue[i]
+                return True
+        return False
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                message = self._queue.popleft()
+                try:
+                    await self.websocket.send_json(message)
+                except Exception as e:
+                    await self._on_error(e)
+                    return
+            self._ready.clear()
+
+    def close(self):
+        # The writer may be the one closing us (send failed); don't cancel it mid-cleanup
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
 
 class ConnectionManager:
     """Manage WebSocket connections and broadcasting"""
@@ -22,6 +107,14 @@ class ConnectionManager:
         self.subscriptions: Dict[str, Set[str]] = {}
         # Store online users: {user_id: last_seen}
         self.online_users: Dict[str, datetime] = {}
+        # Inverted index of subscriptions: {channel: {connection_id, ...}}
+        self.channel_subscribers: Dict[str, Set[str]] = {}
+        # Outbound queue per connection: {connection_id: Outbox}
+        self.outboxes: Dict[str, Outbox] = {}
+
+        ws_backplane.register("chat_user", self._deliver_to_user)
+        ws_backplane.register("chat_channel", self._deliver_to_channel)
+        ws_backplane.register("chat_everyone", self._deliver_to_everyone)
 
     async def connect(
         self,
@@ -39,6 +132,7 @@ class ConnectionManager:
         self.connection_users[connection_id] = user_id
         self.online_users[user_id] = datetime.utcnow()
         self.subscriptions[connection_id] = set()
+        await ws_backplane.user_connected(user_id)
 
         logger.info(f"User {user_id} connected: {connection_id}")
 
@@ -52,16 +146,31 @@ class ConnectionManager:
             }
         )
 
+        async def on_send_error(error: Exception):
+            logger.error(f"Error sending message to {user_id}:{connection_id}: {str(error)}")
+            await self.disconnect(user_id, connection_id)
+
+        self.outboxes[connection_id] = Outbox(websocket, on_send_error, settings.WS_SEND_QUEUE_SIZE)
+
     async def disconnect(self, user_id: str, connection_id: str):
         """Unregister WebSocket connection"""
+        outbox = self.outboxes.pop(connection_id, None)
+        if outbox:
+            outbox.close()
+        for channel in self.subscriptions.get(connection_id, ()):
+            self._remove_subscriber(channel, connection_id)
+
+        removed = False
         if user_id in self.active_connections:
-            self.active_connections[user_id].pop(connection_id, None)
+            removed = self.active_connections[user_id].pop(connection_id, None) is not None
 
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
 
         self.connection_users.pop(connection_id, None)
         self.subscriptions.pop(connection_id, None)
+        if removed:
+            await ws_backplane.user_disconnected(user_id)
 
         # Mark as offline if no other connections
         if user_id not in self.active_connections:
@@ -74,40 +183,34 @@ class ConnectionManager:
         """Subscribe connection to channel (e.g., order_123)"""
         if connection_id in self.subscriptions:
             self.subscriptions[connection_id].add(channel)
+            self.channel_subscribers.setdefault(channel, set()).add(connection_id)
             logger.debug(f"Connection {connection_id} subscribed to {channel}")
 
     async def unsubscribe(self, connection_id: str, channel: str):
         """Unsubscribe connection from channel"""
         if connection_id in self.subscriptions:
             self.subscriptions[connection_id].discard(channel)
+            self._remove_subscriber(channel, connection_id)
             logger.debug(f"Connection {connection_id} unsubscribed from {channel}")
 
+    def _remove_subscriber(self, channel: str, connection_id: str):
+        subscribers = self.channel_subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(connection_id)
+            if not subscribers:
+                del self.channel_subscribers[channel]
+
     async def broadcast_to_user(
         self,
         user_id: str,
         message: dict,
         exclude_connection: Optional[str] = None,
     ):
-        """Send message to all connections of a user"""
-        if user_id not in self.active_connections:
-            return
-
-        disconnected = []
-        for connection_id, websocket in self.active_connections[user_id].items():
-            if exclude_connection and connection_id == exclude_connection:
-                continue
-
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(
-                    f"Error sending message to {user_id}:{connection_id}: {str(e)}"
-                )
-                disconnected.append(connection_id)
-
-        # Clean up disconnected connections
-        for connection_id in disconnected:
-            await self.disconnect(user_id, connection_id)
+        """Send message to all connections of a user, on any worker"""
+        await ws_backplane.publish(
+            "chat_user",
+            {"user_id": user_id, "message": message, "exclude_connection": exclude_connection},
+        )
 
     async def broadcast_to_channel(
         self,
@@ -115,18 +218,59 @@ class ConnectionManager:
         message: dict,
         exclude_users: Optional[List[str]] = None,
     ):
-        """Send message to all subscribers of a channel"""
-        exclude_users = exclude_users or []
+        """Send message to all subscribers of a channel, on any worker"""
+        await ws_backplane.publish(
+            "chat_channel",
+            {"channel": channel, "message": message, "exclude_users": exclude_users or []},
+        )
+
+    def send_to_connection(self, connection_id: str, message: dict):
+        """Queue a message for one connection of this worker"""
+        outbox = self.outboxes.get(connection_id)
+        if outbox is None or outbox.put(message):
+            return
+        user_id = self.connection_users.get(connection_id)
+        logger.warning(f"Dropping slow connection {user_id}:{connection_id} ({len(outbox)} messages queued)")
+        asyncio.create_task(self._drop_slow_connection(user_id, connection_id, outbox.websocket))
+
+    async def _drop_slow_connection(self, user_id: str, connection_id: str, websocket: WebSocket):
+        await self.disconnect(user_id, connection_id)
+        try:
+            await websocket.close(code=1013, reason="Too slow")
+        except Exception:
+            pass
+
+    def _send_to_user(
+        self,
+        user_id: str,
+        message: dict,
+        exclude_connection: Optional[str] = None,
+    ):
+        """Queue message for this worker's connections of a user"""
+        for connection_id in list(self.active_connections.get(user_id, ())):
+            if exclude_connection and connection_id == exclude_connection:
+                continue
+            self.send_to_connection(connection_id, message)
+
+    async def _deliver_to_user(self, payload: dict):
+        self._send_to_user(payload["user_id"], payload["message"], payload.get("exclude_connection"))
+
+    async def _deliver_to_channel(self, payload: dict):
+        """Send to this worker's subscribers of a channel"""
+        exclude_users = payload.get("exclude_users") or []
         recipients = set()
 
-        for connection_id, subscriptions in self.subscriptions.items():
-            if channel in subscriptions:
-                user_id = self.connection_users.get(connection_id)
-                if user_id and user_id not in exclude_users:
-                    recipients.add(user_id)
+        for connection_id in self.channel_subscribers.get(payload["channel"], ()):
+            user_id = self.connection_users.get(connection_id)
+            if user_id and user_id not in exclude_users:
+                recipients.add(user_id)
 
         for user_id in recipients:
-            await self.broadcast_to_user(user_id, message)
+            self._send_to_user(user_id, payload["message"])
+
+    async def _deliver_to_everyone(self, payload: dict):
+        for connection_id in list(self.outboxes):
+            self.send_to_connection(connection_id, payload["message"])
 
     async def broadcast_to_multiple_channels(
         self,
@@ -138,12 +282,12 @@ class ConnectionManager:
         for channel in channels:
             await self.broadcast_to_channel(channel, message, exclude_users)
 
-    def is_user_online(self, user_id: str) -> bool:
-        """Check if user has active connections"""
-        return user_id in self.active_connections
+    async def is_user_online(self, user_id: str) -> bool:
+        """Check if user has active connections on any worker"""
+        return await ws_backplane.is_user_online(user_id)
 
     def get_online_users(self) -> List[str]:
-        """Get list of online users"""
+        """Get list of users connected to this worker"""
         return list(self.online_users.keys())
 
     def get_user_connections(self, user_id: str) -> List[str]:
@@ -273,9 +417,8 @@ class ConnectionManager:
             "timestamp": datetime.utcnow().isoformat(),
         }
 
-        # Broadcast to all online users
-        for online_user in self.get_online_users():
-            await self.broadcast_to_user(online_user, message_data)
+        # Broadcast to all online users, on every worker
+        await ws_backplane.publish("chat_everyone", {"message": message_data})
 
     def get_stats(self) -> dict:
         """Get connection statistics"""
@@ -291,6 +434,8 @@ class ConnectionManager:
             "online_users": total_users,
             "active_connections": total_connections,
             "active_subscriptions": total_subscriptions,
+            "active_channels": len(self.channel_subscribers),
+            "queued_messages": sum(len(outbox) for outbox in self.outboxes.values()),
             "timestamp": datetime.utcnow().isoformat(),
         }
 
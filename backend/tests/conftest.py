@@ -4,10 +4,29 @@ Pytest Configuration and Shared Fixtures
 
 import pytest
 import os
+import sys
+from pathlib import Path
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+# app/, services/ and models.py import from the backend root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Settings the app won't import without; the unit tests never reach
+# Postgres or SMTP (they use sqlite and fakeredis)
+for _key, _value in {
+    "SECRET_KEY": "test-secret-key",
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "SMTP_USER": "test",
+    "SMTP_PASSWORD": "test",
+    "EMAILS_FROM_EMAIL": "test@example.com",
+}.items():
+    os.environ.setdefault(_key, _value)
+
 # Assuming these exist in your project
 # from app.main import app
 # from app.db.base import Base
@@ -0,0 +1,140 @@
+"""
+Batched analytics ingestion (app/services/analytics_ingest.py): the bounded
+ring buffer, counter events summed before they're applied, the row-by-row
+fallback, and events put back when the database can't be reached.
+
+Runs against in-memory sqlite; the flush thread is never started.
+"""
+
+from collections import Counter
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, select
+
+import app.db.session
+from app.core.config import settings
+from app.core.metrics import ANALYTICS_EVENTS_TOTAL
+from app.models.analytics import ItemView
+from app.services.analytics_ingest import BANNER_IMPRESSION, LISTING_AD_IMPRESSION, AnalyticsIngest, _kind_label
+
+
+def _count(kind, outcome):
+    return ANALYTICS_EVENTS_TOTAL.labels(kind=kind, outcome=outcome)._value.get()
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    monkeypatch.setattr(settings, "ANALYTICS_BUFFER_SIZE", 5)
+    monkeypatch.setattr(settings, "ANALYTICS_BATCH_SIZE", 100)
+    ingest = AnalyticsIngest()
+    monkeypatch.setattr(ingest, "start", lambda: None)  # Flushed by hand
+    return ingest
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    ItemView.__table__.create(engine)
+    monkeypatch.setattr(app.db.session, "engine", engine)
+    return engine
+
+
+@pytest.fixture
+def unreachable(monkeypatch, tmp_path):
+    monkeypatch.setattr(app.db.session, "engine", create_engine(f"sqlite:///{tmp_path}/missing/db.sqlite"))
+
+
+def _recorder(applied, kind):
+    def apply(db, counts):
+        applied[kind] = counts
+        return sum(counts.values())
+    return apply
+
+
+def _views(engine):
+    with Session(engine) as session:
+        return sorted(view.listing_id for view in session.exec(select(ItemView)).all())
+
+
+def test_full_buffer_drops_the_oldest_events(ingest):
+    dropped = _count("item_view", "dropped")
+    for listing_id in range(1, 8):
+        ingest.track(ItemView, listing_id=listing_id)
+
+    assert [payload["listing_id"] for _, payload in ingest._buffer] == [3, 4, 5, 6, 7]
+    assert _count("item_view", "dropped") == dropped + 2
+
+
+def test_track_fills_ids_and_timestamps_when_queued(ingest):
+    row = ingest.track(ItemView, listing_id=1)
+
+    assert row["id"] and row["viewed_at"]
+    assert "user_agent" not in row  # Plain defaults are filled at insert time
+
+
+def test_rows_are_inserted_in_one_batch(ingest, engine):
+    for listing_id in (1, 2, 3):
+        ingest.track(ItemView, listing_id=listing_id)
+
+    assert ingest.flush() == {"item_view": 3}
+    assert _views(engine) == [1, 2, 3]
+    assert not ingest._buffer
+
+
+def test_a_rejected_row_falls_back_to_row_by_row(ingest, engine):
+    failed = _count("item_view", "failed")
+    ingest.track(ItemView, listing_id=1)
+    ingest.track(ItemView, listing_id=None)  # NOT NULL violation fails the batch
+    ingest.track(ItemView, listing_id=3)
+
+    assert ingest.flush() == {"item_view": 2}
+    assert _views(engine) == [1, 3]
+    assert _count("item_view", "failed") == failed + 1
+
+
+def test_counter_events_are_summed_per_target(ingest, engine, monkeypatch):
+    applied = {}
+    monkeypatch.setattr(ingest, "_apply_banner_impressions", _recorder(applied, BANNER_IMPRESSION))
+    monkeypatch.setattr(ingest, "_apply_listing_ad_impressions", _recorder(applied, LISTING_AD_IMPRESSION))
+    for banner_id in (7, 8, 7):
+        ingest.count_banner_impression(banner_id)
+    ingest.count_listing_ad_impression(42)
+    ingest.count_listing_ad_impression(42)
+
+    assert ingest.flush() == {BANNER_IMPRESSION: 3, LISTING_AD_IMPRESSION: 2}
+    assert applied == {BANNER_IMPRESSION: Counter({7: 2, 8: 1}), LISTING_AD_IMPRESSION: Counter({42: 2})}
+
+
+def test_unreachable_database_puts_the_batch_back(ingest, unreachable):
+    for listing_id in (1, 2):
+        ingest.track(ItemView, listing_id=listing_id)
+    ingest.count_banner_impression(7)
+
+    assert ingest.flush() == {}
+    assert Counter(_kind_label(kind) for kind, _ in ingest._buffer) == {"item_view": 2, BANNER_IMPRESSION: 1}
+
+
+def test_requeued_events_go_before_newer_ones_and_overflow_is_dropped(ingest):
+    dropped = _count("item_view", "dropped")
+    for listing_id in (1, 2, 3, 4):
+        ingest.track(ItemView, listing_id=listing_id)
+    events = ingest._drain()
+    for listing_id in (5, 6, 7):
+        ingest.track(ItemView, listing_id=listing_id)
+
+    ingest._requeue(events)
+
+    assert [payload["listing_id"] for _, payload in ingest._buffer] == [3, 4, 5, 6, 7]
+    assert _count("item_view", "dropped") == dropped + 2
+
+
+def test_requeued_events_are_written_once_the_database_is_back(ingest, engine, unreachable, monkeypatch):
+    ingest.track(ItemView, listing_id=1)
+    ingest.flush()
+    ingest.track(ItemView, listing_id=2)
+
+    monkeypatch.setattr(app.db.session, "engine", engine)
+    assert ingest.flush() == {"item_view": 2}
+    assert _views(engine) == [1, 2]
@@ -0,0 +1,205 @@
+"""
+Two-tier cache (app/services/cache_service.py): the per-process LRU's byte
+budget, tag invalidation across both tiers and other workers' LRUs, and
+single-flight misses served stale while one worker recomputes.
+
+Runs against fakeredis (with lupa, for the tag and lock scripts).
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from app.core.config import settings
+from app.services.cache_service import _MISS, INVALIDATION_CHANNEL, TAG_KEY_PREFIX, CacheService, LocalLRU
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def _worker(server, max_bytes=1024 * 1024):
+    """A CacheService as one worker process sees it: its own LRU, shared Redis."""
+    service = CacheService()
+    service._client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    service.l1 = LocalLRU(max_bytes)
+    return service
+
+
+def _feed(service, calls, delay=0.0):
+    @service.cached(prefix="feed", ttl=60, tags=lambda kwargs: [f"category:{kwargs['category_id']}"])
+    def get_feed(*, category_id):
+        calls.append(category_id)
+        time.sleep(delay)
+        return {"category": category_id, "page": len(calls)}
+    return get_feed
+
+
+def _key(category_id):
+    """The Redis key @cached derives for get_feed(category_id=...)."""
+    digest = hashlib.md5(json.dumps({"category_id": category_id}, sort_keys=True).encode()).hexdigest()
+    return f"cache:feed:{digest}"
+
+
+def test_lru_evicts_least_recently_used_within_its_byte_budget():
+    lru = LocalLRU(100)
+    lru.set("a", 1, 40, 60)
+    lru.set("b", 2, 40, 60)
+    assert lru.get("a") == 1  # "b" is now the least recently used
+
+    lru.set("c", 3, 40, 60)
+    assert lru.get("b") is _MISS
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert lru._bytes == 80
+
+    lru.set("a", 4, 60, 60)  # Replacing an entry re-counts its size: 40 + 60 still fits
+    assert (lru.get("a"), lru.get("c")) == (4, 3)
+    assert lru._bytes == 100
+
+    lru.set("d", 5, 30, 60)  # Evicts "a", read before "c", which then fits
+    assert lru.get("a") is _MISS and (lru.get("c"), lru.get("d")) == (3, 5)
+    assert lru._bytes == 70
+
+
+def test_lru_skips_oversized_values_and_drops_expired_ones():
+    lru = LocalLRU(100)
+    lru.set("big", 1, 101, 60)
+    assert lru.get("big") is _MISS and lru._bytes == 0
+
+    lru.set("short", 1, 10, 0.05)
+    time.sleep(0.06)
+    assert lru.get("short") is _MISS and lru._bytes == 0
+
+
+def test_lru_byte_total_never_exceeds_budget():
+    lru = LocalLRU(1000)
+    for i in range(500):
+        lru.set(f"k{i % 70}", i, (i * 37) % 300 + 1, 60, tags=[f"t{i % 3}"])
+        assert lru._bytes <= 1000
+        assert lru._bytes == sum(entry[1] for entry in lru._entries.values())
+
+    lru.invalidate_tags(["t0", "t1", "t2"])
+    assert lru._bytes == 0 and not lru._entries
+
+
+def test_invalidate_tags_drops_only_tagged_entries_from_both_tiers(server):
+    service = _worker(server)
+    calls = []
+    get_feed = _feed(service, calls)
+    for category_id in (1, 2, 1, 2):  # Computed, then copied into L1 from Redis
+        get_feed(category_id=category_id)
+    key_1, key_2 = _key(1), _key(2)
+    assert calls == [1, 2]
+    assert service.l1.get(key_1) is not _MISS
+
+    service.invalidate_tags("category:1")
+
+    assert service.l1.get(key_1) is _MISS
+    assert service.client.get(key_1) is None and service.client.get(f"{key_1}:stale") is None
+    assert not service.client.exists(f"{TAG_KEY_PREFIX}category:1")
+    assert service.l1.get(key_2) is not _MISS and service.client.get(key_2) is not None
+
+    get_feed(category_id=1)
+    get_feed(category_id=2)
+    assert calls == [1, 2, 1]
+
+
+def test_invalidation_reaches_other_workers_l1(server):
+    writer, reader = _worker(server), _worker(server)
+    calls = []
+    read_feed = _feed(reader, calls)
+    read_feed(category_id=1)  # Also starts the reader's invalidation listener
+    read_feed(category_id=1)  # Copied into its L1 from Redis
+    key = _key(1)
+    assert reader.l1.get(key) is not _MISS
+
+    announcements = writer.client.pubsub(ignore_subscribe_messages=True)
+    announcements.subscribe(INVALIDATION_CHANNEL)
+    time.sleep(0.2)  # Let the listener subscribe
+
+    writer.invalidate_tags("category:1")
+
+    message, deadline = None, time.monotonic() + 2
+    while message is None and time.monotonic() < deadline:
+        message = announcements.get_message(timeout=0.1)  # None for the subscribe confirmation
+    assert message["data"] == '["category:1"]'
+    deadline = time.monotonic() + 2
+    while reader.l1.get(key) is not _MISS and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reader.l1.get(key) is _MISS
+    announcements.close()
+
+
+def test_concurrent_misses_compute_once(server, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_LOCK_WAIT", 2.0)
+    calls = []
+    workers = [_worker(server) for _ in range(6)]
+    feeds = [_feed(worker, calls, delay=0.2) for worker in workers]
+    results = [None] * len(feeds)
+
+    def fetch(i):
+        results[i] = feeds[i](category_id=1)
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(len(feeds))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [{"category": 1, "page": 1}] * len(feeds)
+    assert not list(workers[0].client.scan_iter(match="lock:*"))  # The leader released its lock
+
+
+def test_miss_while_another_worker_recomputes_serves_the_stale_copy(server):
+    service = _worker(server)
+    calls = []
+    get_feed = _feed(service, calls)
+    get_feed(category_id=1)
+    key = _key(1)
+
+    # The fresh copy expired and another worker is already recomputing it
+    service.client.delete(key)
+    service.l1.delete(key)
+    service.client.set(f"lock:{key}", "other-worker", ex=10)
+
+    assert get_feed(category_id=1) == {"category": 1, "page": 1}
+    assert calls == [1]
+
+
+def test_miss_without_a_stale_copy_waits_for_the_recomputing_worker(server, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_LOCK_WAIT", 2.0)
+    service = _worker(server)
+    calls = []
+    get_feed = _feed(service, calls)
+    get_feed(category_id=1)
+    key = _key(1)
+    service.client.delete(key, f"{key}:stale")
+    service.l1.delete(key)
+    service.client.set(f"lock:{key}", "other-worker", ex=10)
+
+    threading.Timer(0.1, lambda: service.client.set(key, '{"category": 1, "page": "theirs"}', ex=60)).start()
+
+    assert get_feed(category_id=1) == {"category": 1, "page": "theirs"}
+    assert calls == [1]
+
+
+def test_miss_recomputes_itself_once_the_wait_times_out(server, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_LOCK_WAIT", 0.1)
+    service = _worker(server)
+    calls = []
+    get_feed = _feed(service, calls)
+    get_feed(category_id=1)
+    key = _key(1)
+    service.client.delete(key, f"{key}:stale")
+    service.l1.delete(key)
+    service.client.set(f"lock:{key}", "other-worker", ex=10)
+
+    assert get_feed(category_id=1) == {"category": 1, "page": 2}
+    assert calls == [1, 1]
+    assert service.client.get(f"lock:{key}") == "other-worker"  # Not ours to release
@@ -0,0 +1,141 @@
+"""
+Spatial queries of the dispatch grid (services/dispatch_service.py),
+checked against a brute-force haversine scan over random points,
+including at high latitudes where a cell of longitude narrows.
+"""
+
+import math
+import random
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from services.dispatch_service import AvailableRider, DispatchIndex, GridIndex, haversine_km
+
+
+@dataclass
+class Point:
+    id: str
+    lat: float
+    lng: float
+
+
+def _scatter(rng, lat, lng, count, spread_km):
+    """`count` points within about `spread_km` of (lat, lng), half of them near its edge."""
+    points = []
+    for i in range(count):
+        bearing = rng.uniform(0, 2 * math.pi)
+        distance = spread_km * (rng.uniform(0.99, 1.0) if i % 2 else rng.uniform(0, 1))
+        points.append(Point(
+            str(i),
+            lat + distance * math.cos(bearing) / 111.195,
+            lng + distance * math.sin(bearing) / (111.195 * math.cos(math.radians(lat))),
+        ))
+    return points
+
+
+def _brute_force(points, lat, lng, radius_km, accept=None):
+    hits = [(haversine_km(lat, lng, p.lat, p.lng), p.id) for p in points if accept is None or accept(p)]
+    return sorted(hit for hit in hits if hit[0] <= radius_km)
+
+
+CASES = [
+    (lat, cell_km, radius_km)
+    for lat in (-1.29, 2.05, 45.0, 70.0, 85.0)  # Nairobi, Mogadishu, ..., near the pole
+    for cell_km in (0.5, 2.0)
+    for radius_km in (1.0, 5.0, 10.0)
+]
+
+
+@pytest.mark.parametrize("lat,cell_km,radius_km", CASES)
+def test_within_matches_brute_force(lat, cell_km, radius_km):
+    rng = random.Random(f"within-{lat}-{cell_km}-{radius_km}")
+    for _ in range(20):
+        center = (lat + rng.uniform(-0.01, 0.01), 40 + rng.uniform(-0.01, 0.01))
+        points = _scatter(rng, *center, 80, radius_km)
+        index = GridIndex(cell_km)
+        for p in points:
+            index.add(p)
+
+        hits = index.within(*center, radius_km)
+
+        assert [(round(d, 9), p.id) for d, p in hits] == [(round(d, 9), i) for d, i in _brute_force(points, *center, radius_km)]
+
+
+@pytest.mark.parametrize("lat,cell_km,radius_km", CASES)
+def test_nearest_matches_brute_force(lat, cell_km, radius_km):
+    rng = random.Random(f"nearest-{lat}-{cell_km}-{radius_km}")
+    accept = lambda p: int(p.id) % 3 != 0
+    for _ in range(20):
+        center = (lat + rng.uniform(-0.01, 0.01), 40 + rng.uniform(-0.01, 0.01))
+        points = _scatter(rng, *center, 80, radius_km * 1.2)
+        index = GridIndex(cell_km)
+        for p in points:
+            index.add(p)
+
+        for k in (1, 5, 80):
+            expected = [round(d, 9) for d, _ in _brute_force(points, *center, radius_km)[:k]]
+            assert [round(d, 9) for d, _ in index.nearest(*center, k, radius_km)] == expected
+
+            expected = [round(d, 9) for d, _ in _brute_force(points, *center, radius_km, accept)[:k]]
+            assert [round(d, 9) for d, _ in index.nearest(*center, k, radius_km, accept)] == expected
+
+
+def _destination(lat, lng, bearing, distance_km):
+    """The point `distance_km` from (lat, lng) along `bearing` (radians), on haversine_km's sphere."""
+    lat, lng, angle = math.radians(lat), math.radians(lng), distance_km / 6371
+    dest_lat = math.asin(math.sin(lat) * math.cos(angle) + math.cos(lat) * math.sin(angle) * math.cos(bearing))
+    dest_lng = lng + math.atan2(
+        math.sin(bearing) * math.sin(angle) * math.cos(lat),
+        math.cos(angle) - math.sin(lat) * math.sin(dest_lat),
+    )
+    return math.degrees(dest_lat), math.degrees(dest_lng)
+
+
+@pytest.mark.parametrize("lat", [2.05, 60.0, 85.0])
+def test_points_on_the_edge_of_the_radius_are_found(lat):
+    """Query points swept across their cell, entries a hair inside the radius all round."""
+    radius_km, cell_deg = 10.0, GridIndex(1.0).cell_deg
+    for step in range(20):
+        center = (lat + step * cell_deg / 20, 40 + step * cell_deg / 20)
+        points = [
+            Point(str(i), *_destination(*center, math.radians(i), radius_km * 0.99999))
+            for i in range(0, 360, 3)
+        ]
+        index = GridIndex(1.0)
+        for p in points:
+            index.add(p)
+
+        assert len(index.within(*center, radius_km)) == len(points)
+        assert len(index.nearest(*center, len(points), radius_km)) == len(points)
+
+
+def test_add_moves_and_remove_drops_an_entry():
+    index = GridIndex(1.0)
+    rider = Point("r1", -1.29, 36.82)
+    index.add(rider)
+    assert [p.id for _, p in index.within(-1.29, 36.82, 1)] == ["r1"]
+
+    index.add(Point("r1", -1.20, 36.90))  # ~13 km away
+    assert index.within(-1.29, 36.82, 1) == []
+    assert [p.id for _, p in index.within(-1.20, 36.90, 1)] == ["r1"]
+    assert len(index) == 1 and len(index.cells) == 1
+
+    assert index.remove("r1").lat == -1.20
+    assert index.remove("r1") is None
+    assert len(index) == 0 and index.cells == {}
+
+
+def test_dispatch_index_applies_local_updates():
+    dispatch = DispatchIndex()
+    dispatch._loaded_at = time.monotonic()  # treat as freshly loaded; no database
+    dispatch.riders.add(AvailableRider("r1", -1.29, 36.82, None, 0))
+    dispatch.riders.add(AvailableRider("r2", -1.30, 36.83, None, 1))
+
+    dispatch.rider_moved("r1", -1.20, 36.90)
+    dispatch.order_assigned("o1", "r2")
+
+    assert [r.id for _, r in dispatch.nearest_riders(None, -1.29, 36.82, k=2, radius_km=3)] == ["r2"]
+    assert dispatch.riders.entries["r2"].active_deliveries == 2
+    assert [r.id for _, r in dispatch.riders_within(None, -1.20, 36.90, 1)] == ["r1"]
@@ -0,0 +1,194 @@
+"""
+Batched email delivery (app/services/email_delivery.py): the provider
+fallback chain, partial failures inside an SMTP batch, and the EmailLog
+rows written in one commit.
+
+Providers are stub transports, SMTP a stub server; EmailLog rows go to
+in-memory sqlite.
+"""
+
+import smtplib
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine, select
+
+import app.services.email_delivery as email_delivery_module
+from app.core.config import settings
+from app.models.email_log import EmailLog
+from app.services.email_delivery import EmailDelivery, OutgoingEmail, _Smtp
+
+
+class StubTransport:
+    """Delivers every batch except the addresses in `refuse`; raises
+    instead when `down` -- the way a provider's API call fails."""
+
+    def __init__(self, name, refuse=(), down=False, provider=None):
+        self.name = name
+        self.refuse = set(refuse)
+        self.down = down
+        self.provider = provider
+        self.batches = []
+
+    def available(self, preferred_provider):
+        return self.provider is None or preferred_provider == self.provider
+
+    def send(self, messages):
+        self.batches.append([m.to for m in messages])
+        if self.down:
+            raise ConnectionError(f"{self.name} unreachable")
+        return [(m, "refused") for m in messages if m.to in self.refuse]
+
+
+class StubSmtpServer:
+    def __init__(self, refuse=(), drop_at=None, disconnect_once=False):
+        self.refuse = set(refuse)
+        self.drop_at = drop_at
+        self.disconnect_once = disconnect_once
+        self.sent = []
+
+    def sendmail(self, sender, to, body):
+        if self.disconnect_once:
+            self.disconnect_once = False
+            raise smtplib.SMTPServerDisconnected("idle timeout")
+        if to in self.refuse:
+            raise smtplib.SMTPRecipientsRefused({to: (550, b"no such user")})
+        if self.drop_at is not None and len(self.sent) == self.drop_at:
+            raise OSError("connection reset")
+        self.sent.append(to)
+
+
+def _email(to, provider="resend"):
+    return OutgoingEmail(
+        to=to,
+        subject="Hello",
+        html="<p>Hi</p>",
+        log=EmailLog(email=to, email_type="test", subject="Hello"),
+        preferred_provider=provider,
+    )
+
+
+def _delivery(*transports):
+    delivery = EmailDelivery()
+    delivery._transports = list(transports)
+    return delivery
+
+
+@pytest.fixture
+def production(monkeypatch):
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    EmailLog.__table__.create(engine)
+    monkeypatch.setattr(email_delivery_module, "engine", engine)
+    return engine
+
+
+def test_a_provider_that_raises_hands_the_whole_batch_to_the_next(production):
+    resend, smtp = StubTransport("Resend", down=True), StubTransport("SMTP")
+    messages = [_email("a@example.com"), _email("b@example.com")]
+
+    _delivery(resend, smtp)._deliver_batch(messages)
+
+    assert smtp.batches == [["a@example.com", "b@example.com"]]
+    assert [(m.log.status, m.log.provider_used) for m in messages] == [("sent", "SMTP")] * 2
+
+
+def test_only_the_refused_messages_move_down_the_chain(production):
+    resend = StubTransport("Resend", refuse={"b@example.com"})
+    smtp = StubTransport("SMTP", refuse={"b@example.com"})
+    messages = [_email("a@example.com"), _email("b@example.com"), _email("c@example.com")]
+
+    _delivery(resend, smtp)._deliver_batch(messages)
+
+    assert smtp.batches == [["b@example.com"]]
+    assert [m.log.status for m in messages] == ["sent", "failed", "sent"]
+    assert messages[1].log.failed_reason == "Resend failed: refused | SMTP failed: refused"
+    assert messages[0].log.provider_used == "Resend"
+
+
+def test_unavailable_providers_are_skipped(production):
+    brevo = StubTransport("Brevo", provider="brevo")
+    resend = StubTransport("Resend", down=True)
+    messages = [_email("a@example.com")]
+
+    _delivery(brevo, resend)._deliver_batch(messages)
+
+    assert brevo.batches == []
+    assert messages[0].log.status == "failed"
+    assert messages[0].log.failed_reason == "Resend failed: Resend unreachable"
+
+
+def test_no_provider_counts_as_sent_outside_production(monkeypatch):
+    monkeypatch.setattr(settings, "ENVIRONMENT", "development")
+    messages = [_email("a@example.com")]
+
+    _delivery(StubTransport("Resend", down=True))._deliver_batch(messages)
+
+    assert messages[0].log.status == "sent"
+
+
+def test_smtp_keeps_the_connection_past_a_refused_recipient(monkeypatch):
+    server = StubSmtpServer(refuse={"b@example.com"})
+    smtp = _Smtp()
+    monkeypatch.setattr(smtp, "_connect", lambda: server)
+    messages = [_email("a@example.com"), _email("b@example.com"), _email("c@example.com")]
+
+    failures = smtp.send(messages)
+
+    assert [(m.to, "no such user" in reason) for m, reason in failures] == [("b@example.com", True)]
+    assert server.sent == ["a@example.com", "c@example.com"]
+    assert smtp._local.server is server
+
+
+def test_smtp_connection_failure_fails_the_rest_of_the_batch(monkeypatch):
+    server = StubSmtpServer(drop_at=1)
+    smtp = _Smtp()
+    monkeypatch.setattr(smtp, "_connect", lambda: server)
+    messages = [_email("a@example.com"), _email("b@example.com"), _email("c@example.com")]
+
+    failures = smtp.send(messages)
+
+    assert [m.to for m, _ in failures] == ["b@example.com", "c@example.com"]
+    assert smtp._local.server is None  # Reconnects on the next batch
+
+
+def test_smtp_reconnects_once_after_an_idle_disconnect(monkeypatch):
+    servers = [StubSmtpServer(disconnect_once=True), StubSmtpServer()]
+    smtp = _Smtp()
+    monkeypatch.setattr(smtp, "_connect", lambda: servers.pop(0))
+
+    assert smtp.send([_email("a@example.com")]) == []
+    assert servers == []
+
+
+def test_send_batches_per_provider_and_writes_every_log_in_one_commit(engine, monkeypatch, production):
+    monkeypatch.setattr(settings, "EMAIL_DELIVERY_BATCH_SIZE", 2)
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(conn))
+    brevo = StubTransport("Brevo", provider="brevo")
+    resend = StubTransport("Resend", refuse={"r3@example.com"})
+    messages = [_email(f"r{i}@example.com") for i in range(4)] + [_email("b0@example.com", provider="brevo")]
+    delivery = _delivery(brevo, resend)
+
+    results = delivery.send(messages)
+
+    assert results == [True, True, True, False, True]
+    assert sorted(resend.batches) == [["r0@example.com", "r1@example.com"], ["r2@example.com", "r3@example.com"]]
+    assert brevo.batches == [["b0@example.com"]]
+    assert len(commits) == 1
+    with Session(engine) as session:
+        rows = session.exec(select(EmailLog).order_by(EmailLog.id)).all()
+    assert [(r.email, r.status, r.provider_used) for r in rows] == [
+        ("r0@example.com", "sent", "Resend"),
+        ("r1@example.com", "sent", "Resend"),
+        ("r2@example.com", "sent", "Resend"),
+        ("r3@example.com", "failed", None),
+        ("b0@example.com", "sent", "Brevo"),
+    ]
+    assert all(m.log.id for m in messages)
+    delivery._executor.shutdown()
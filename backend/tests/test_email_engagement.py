@@ -0,0 +1,134 @@
+"""
+Email open/click recording (app/services/email_engagement.py): one event
+row per distinct hit, EmailLog stamped only by the first open/click, and
+repeats dropped by Redis or, with Redis down, by the unique index.
+
+Runs against in-memory sqlite and fakeredis.
+"""
+
+from datetime import datetime
+
+import fakeredis
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine, select
+
+import app.services.email_engagement as email_engagement
+from app.core.config import settings
+from app.models.email_log import EmailEngagementEvent, EmailLog
+from app.services.cache_service import cache
+from app.services.email_engagement import CLICK, OPEN, record_hit
+
+TOKEN = "tok-1"
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    EmailLog.__table__.create(engine)
+    EmailEngagementEvent.__table__.create(engine)
+    monkeypatch.setattr(email_engagement, "engine", engine)
+    monkeypatch.setattr(settings, "EMAIL_ENGAGEMENT_DEDUPE_SECONDS", 3600)
+    with Session(engine) as session:
+        session.add(EmailLog(email="a@example.com", email_type="test", subject="Hi", status="sent", tracking_token=TOKEN))
+        session.commit()
+    return engine
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(cache, "_client", fakeredis.FakeRedis(server=server, decode_responses=True))
+    return server
+
+
+def _state(engine, token=TOKEN):
+    with Session(engine) as session:
+        log = session.exec(select(EmailLog).where(EmailLog.tracking_token == token)).one()
+        events = session.exec(select(EmailEngagementEvent).order_by(EmailEngagementEvent.id)).all()
+    return log, [(e.action, e.ip, e.redirect_url) for e in events]
+
+
+def test_first_open_stamps_the_log_and_records_the_hit(engine, redis):
+    record_hit(TOKEN, OPEN, "1.1.1.1", "Mail/1.0")
+
+    log, events = _state(engine)
+    assert log.status == "opened" and log.opened_at is not None and log.clicked_at is None
+    assert events == [(OPEN, "1.1.1.1", None)]
+
+
+def test_repeat_hit_is_dropped_before_touching_the_database(engine, redis):
+    record_hit(TOKEN, OPEN, "1.1.1.1", "Mail/1.0")
+    with Session(engine) as session:
+        session.exec(select(EmailEngagementEvent)).one()
+        session.query(EmailEngagementEvent).delete()
+        session.commit()
+
+    record_hit(TOKEN, OPEN, "1.1.1.1", "Mail/1.0")
+
+    assert _state(engine)[1] == []  # Redis said seen; no INSERT was attempted
+
+
+def test_with_redis_down_the_unique_index_drops_the_repeat(engine, redis):
+    redis.connected = False
+
+    record_hit(TOKEN, OPEN, "1.1.1.1", "Mail/1.0")
+    opened_at = _state(engine)[0].opened_at
+    record_hit(TOKEN, OPEN, "1.1.1.1", "Mail/1.0")
+
+    log, events = _state(engine)
+    assert events == [(OPEN, "1.1.1.1", None)]
+    assert log.opened_at == opened_at
+
+
+def test_other_clients_add_events_but_keep_the_first_open(engine, redis):
+    record_hit(TOKEN, OPEN, "1.1.1.1", "Mail/1.0")
+    opened_at = _state(engine)[0].opened_at
+    record_hit(TOKEN, OPEN, "2.2.2.2", "Proxy/2.0")
+
+    log, events = _state(engine)
+    assert [ip for _, ip, _ in events] == ["1.1.1.1", "2.2.2.2"]
+    assert log.opened_at == opened_at
+
+
+def test_click_after_open_keeps_opened_at(engine, redis):
+    record_hit(TOKEN, OPEN, "1.1.1.1", "Mail/1.0")
+    opened_at = _state(engine)[0].opened_at
+    record_hit(TOKEN, CLICK, "1.1.1.1", "Mail/1.0", redirect_url="https://suqafuran.com/a")
+    clicked_at = _state(engine)[0].clicked_at
+    record_hit(TOKEN, CLICK, "1.1.1.1", "Mail/1.0", redirect_url="https://suqafuran.com/b")
+
+    log, events = _state(engine)
+    assert log.status == "clicked"
+    assert log.opened_at == opened_at and log.clicked_at == clicked_at
+    assert [url for _, _, url in events] == [None, "https://suqafuran.com/a", "https://suqafuran.com/b"]
+
+
+def test_click_without_an_open_implies_one(engine, redis):
+    record_hit(TOKEN, CLICK, "1.1.1.1", "Mail/1.0", redirect_url="https://suqafuran.com/a")
+
+    log, _ = _state(engine)
+    assert log.status == "clicked" and log.opened_at == log.clicked_at
+    assert log.opened_at <= datetime.utcnow()
+
+
+def test_unsubscribed_status_is_never_overwritten(engine, redis):
+    with Session(engine) as session:
+        log = session.exec(select(EmailLog)).one()
+        log.status = "unsubscribed"
+        session.add(log)
+        session.commit()
+
+    record_hit(TOKEN, OPEN, "1.1.1.1", "Mail/1.0")
+    record_hit(TOKEN, CLICK, "1.1.1.1", "Mail/1.0", redirect_url="https://suqafuran.com/a")
+
+    log, events = _state(engine)
+    assert log.status == "unsubscribed" and log.opened_at is None
+    assert len(events) == 2
+
+
+def test_unknown_tokens_are_ignored(engine, redis):
+    record_hit("no-such-token", OPEN, "1.1.1.1", "Mail/1.0")
+
+    log, events = _state(engine)
+    assert events == [] and log.status == "sent"
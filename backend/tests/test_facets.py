@@ -0,0 +1,102 @@
+"""
+Multiselect-aware attribute filters and facet counts
+(app/services/facet_service.py).
+
+The queries are Postgres JSONB, so they are checked as compiled SQL; the
+pure helpers and the response merge are exercised directly.
+"""
+
+import json
+
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+
+from app.models.listing import Listing
+from app.services.facet_service import (
+    _value_variants,
+    attribute_match,
+    build_facets,
+    facet_counts,
+    normalize_filters,
+)
+
+
+def _sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _contained_documents(clause) -> list:
+    """The JSON documents an attribute_match() clause tests containment of."""
+    return [
+        json.loads(bind.value)
+        for bind in clause.compile(dialect=postgresql.dialect()).binds.values()
+        if isinstance(bind.value, str) and bind.value.startswith("{")
+    ]
+
+
+def test_filter_matches_scalar_and_multiselect_storage():
+    documents = _contained_documents(attribute_match("color", ["red"]))
+    assert {"color": "red"} in documents
+    assert {"color": ["red"]} in documents
+
+
+def test_filter_matches_each_typed_spelling():
+    documents = _contained_documents(attribute_match("storage", ["128"]))
+    assert {"storage": "128"} in documents
+    assert {"storage": 128} in documents
+    assert {"storage": [128]} in documents
+
+    assert _value_variants("true") == ["true", True]
+    assert _value_variants(False) == [False, "false"]
+    assert _value_variants("1.5") == ["1.5", 1.5]
+    assert _value_variants("nike") == ["nike"]
+
+
+def test_filter_uses_jsonb_containment():
+    sql = _sql(attribute_match("color", ["red", "blue"]))
+    assert "@>" in sql
+    assert "json_extract_path_text" not in sql
+
+
+def test_normalize_filters_drops_empties():
+    assert normalize_filters({"brand": "nike", "size": ["", None], "color": ["red", "blue"]}) == {
+        "brand": ["nike"],
+        "color": ["red", "blue"],
+    }
+    assert normalize_filters(None) == {}
+
+
+def test_facet_counts_unnest_multiselect_arrays():
+    base = select(Listing).where(Listing.status == "active")
+    sql = _sql(facet_counts(base, {"color": ["red"], "brand": ["nike"]}, ["color", "brand"]))
+    assert "jsonb_each" in sql
+    assert "jsonb_array_elements_text" in sql
+    # A plain value is wrapped so arrays and scalars both unnest
+    assert "jsonb_build_array" in sql
+
+
+def test_build_facets_merges_counts_into_options():
+    definitions = [
+        {
+            "slug": "color",
+            "name": "Color",
+            "field_type": "multiselect",
+            "options": [
+                {"value": "red", "display_name": "Red"},
+                {"value": "blue", "display_name": "Blue"},
+            ],
+        },
+        {"slug": "notes", "name": "Notes", "field_type": "text", "options": []},
+    ]
+    raw_counts = [["color", "red", 4], ["color", "green", 2], ["color", "teal", 5]]
+
+    facets = build_facets(definitions, raw_counts, {"color": ["red"]})
+
+    assert [f["slug"] for f in facets] == ["color"]
+    options = facets[0]["options"]
+    assert options[:2] == [
+        {"value": "red", "display_name": "Red", "count": 4, "selected": True},
+        {"value": "blue", "display_name": "Blue", "count": 0, "selected": False},
+    ]
+    # Values in use that aren't defined options follow, most common first
+    assert [(o["value"], o["count"]) for o in options[2:]] == [("teal", 5), ("green", 2)]
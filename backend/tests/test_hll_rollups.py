@@ -0,0 +1,74 @@
+"""
+HyperLogLog sketches behind the analytics rollups (app/utils/hll.py) and
+the bucket plan rollup reads use (app/services/analytics_rollup_service.py).
+"""
+
+from datetime import datetime
+
+import pytest
+
+from app.services.analytics_rollup_service import DAY, MONTH, _truncate, _window_buckets
+from app.utils.hll import M, HyperLogLog
+
+
+def _sketch(values) -> HyperLogLog:
+    return HyperLogLog().update(values)
+
+
+def test_empty_sketch_counts_zero():
+    assert HyperLogLog().count() == 0
+    assert HyperLogLog.from_bytes(None).count() == 0
+
+
+def test_small_sets_are_near_exact():
+    assert _sketch(range(50)).count() == pytest.approx(50, abs=1)
+    # Adding the same users again changes nothing
+    assert _sketch(list(range(50)) * 3).count() == _sketch(range(50)).count()
+
+
+@pytest.mark.parametrize("n", [5_000, 50_000])
+def test_large_sets_within_error(n):
+    # p=10 is ~3% standard error; allow a generous 4 sigma
+    assert _sketch(range(n)).count() == pytest.approx(n, rel=0.12)
+
+
+def test_merge_estimates_the_union():
+    a = _sketch(range(0, 6_000))
+    b = _sketch(range(3_000, 9_000))
+    merged = HyperLogLog().merge(a).merge(b)
+    assert merged.count() == pytest.approx(9_000, rel=0.12)
+    # Merging is register-wise max, so it's order independent and idempotent
+    assert merged.registers == HyperLogLog().merge(b).merge(a).merge(a).registers
+
+
+def test_sparse_round_trip():
+    sketch = _sketch(f"guest-{i}" for i in range(20))
+    data = sketch.to_bytes()
+    assert len(data) < M // 4
+    assert HyperLogLog.from_bytes(data).registers == sketch.registers
+
+
+def test_dense_round_trip():
+    sketch = _sketch(range(20_000))
+    data = sketch.to_bytes()
+    assert len(data) == M + 1
+    assert HyperLogLog.from_bytes(data).registers == sketch.registers
+    # Stored as bytea, read back as memoryview
+    assert HyperLogLog.from_bytes(memoryview(data)).count() == sketch.count()
+
+
+def test_truncate_to_bucket():
+    ts = datetime(2026, 3, 17, 14, 5)
+    assert _truncate(ts, DAY) == datetime(2026, 3, 17)
+    assert _truncate(ts, MONTH) == datetime(2026, 3, 1)
+
+
+def test_window_uses_days_up_to_the_month_boundary_then_months():
+    days, months = _window_buckets(datetime(2026, 1, 28), datetime(2026, 4, 10, 12))
+    assert days == [datetime(2026, 1, 28), datetime(2026, 1, 29), datetime(2026, 1, 30), datetime(2026, 1, 31)]
+    assert months == [datetime(2026, 2, 1), datetime(2026, 3, 1), datetime(2026, 4, 1)]
+
+
+def test_year_window_reads_few_buckets():
+    days, months = _window_buckets(datetime(2025, 4, 11), datetime(2026, 4, 10))
+    assert len(days) + len(months) <= 45
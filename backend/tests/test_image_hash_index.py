@@ -0,0 +1,147 @@
+"""
+Near-duplicate image lookup (app/services/image_hash_index.py), checked
+against a brute-force Hamming scan over every indexed hash.
+
+Runs against in-memory sqlite; the band probes are plain IN lists.
+"""
+
+import random
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine, select
+
+from app.models.listing_image_hash import ListingImageHash
+from app.services.image_hash_index import (
+    BAND_BITS,
+    BANDS,
+    _neighbours,
+    _to_signed,
+    _to_unsigned,
+    find_near_duplicates,
+    hamming,
+    index_listing_images,
+    parse_phash,
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    ListingImageHash.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def _hex(value):
+    return f"{value:016x}"
+
+
+def _flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def _spread(rng, count):
+    """`count` distinct bit positions dealt round-robin over the bands, the
+    spread that leaves every band as far from the original as it can be."""
+    order = [rng.sample(range(BAND_BITS), BAND_BITS) for _ in range(BANDS)]
+    return [(i % BANDS) * BAND_BITS + order[i % BANDS][i // BANDS] for i in range(count)]
+
+
+def _brute_force(stored, probes, max_distance, exclude_owner_id=None, limit=20):
+    best = {}
+    for listing_id, owner_id, value in stored:
+        if owner_id == exclude_owner_id:
+            continue
+        for probe in probes:
+            distance = hamming(probe, value)
+            if distance <= max_distance:
+                best[listing_id] = min(distance, best.get(listing_id, distance))
+    return sorted(best.items(), key=lambda item: (item[1], item[0]))[:limit]
+
+
+@pytest.mark.parametrize("radius", [0, 1, 2])
+def test_neighbours_are_exactly_the_band_values_within_radius(radius):
+    rng = random.Random(f"neighbours-{radius}")
+    for band in [0, (1 << BAND_BITS) - 1] + [rng.randrange(1 << BAND_BITS) for _ in range(3)]:
+        values = _neighbours(band, radius)
+
+        assert len(values) == len(set(values))
+        assert set(values) == {v for v in range(1 << BAND_BITS) if hamming(v, band) <= radius}
+
+
+def test_hamming_counts_differing_bits():
+    rng = random.Random("hamming")
+    for _ in range(500):
+        a, b = rng.getrandbits(64), rng.getrandbits(64)
+        assert hamming(a, b) == sum(((a >> i) & 1) != ((b >> i) & 1) for i in range(64))
+    assert hamming(0, (1 << 64) - 1) == 64
+
+
+@pytest.mark.parametrize("value", [0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1])
+def test_hashes_survive_the_signed_bigint_round_trip(value):
+    assert parse_phash(_hex(value)) == value
+    assert -(1 << 63) <= _to_signed(value) < (1 << 63)
+    assert _to_unsigned(_to_signed(value)) == value
+
+
+@pytest.mark.parametrize("raw", [None, "", "not hex", "1" * 17, "-1"])
+def test_parse_phash_rejects_non_hashes(raw):
+    assert parse_phash(raw) is None
+
+
+def test_index_replaces_a_listings_rows(db):
+    listing = SimpleNamespace(id=1, owner_id=7, image_hashes=["00ff00ff00ff00ff", "00FF00FF00FF00FF", "junk", None])
+    assert index_listing_images(db, listing) == 1
+
+    listing.image_hashes = ["ffffffffffffffff", "0000000000000001"]
+    assert index_listing_images(db, listing) == 2
+    db.commit()
+
+    rows = db.exec(select(ListingImageHash)).all()
+    assert sorted(_to_unsigned(r.phash) for r in rows) == [1, (1 << 64) - 1]
+    assert {(r.listing_id, r.owner_id) for r in rows} == {(1, 7)}
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 6, 10])
+def test_find_near_duplicates_matches_brute_force(db, max_distance):
+    rng = random.Random(f"near-{max_distance}")
+    originals = [rng.getrandbits(64) for _ in range(12)]
+
+    # Listings holding copies of the originals at every distance up to a few
+    # bits past the threshold, plus unrelated photos
+    stored = []
+    for listing_id in range(1, 121):
+        original = rng.choice(originals)
+        flips = rng.randint(0, max_distance + 3)
+        bits = _spread(rng, flips) if listing_id % 2 else rng.sample(range(64), flips)
+        hashes = [_flip(original, bits), rng.getrandbits(64)]
+        index_listing_images(db, SimpleNamespace(id=listing_id, owner_id=listing_id % 5, image_hashes=[_hex(h) for h in hashes]))
+        stored.extend((listing_id, listing_id % 5, h) for h in hashes)
+    db.commit()
+
+    for original in originals:
+        probes = [original, _flip(original, _spread(rng, max_distance // 2))]
+        query = [_hex(p) for p in probes]
+
+        assert find_near_duplicates(db, query, max_distance=max_distance) == _brute_force(stored, probes, max_distance)
+        assert find_near_duplicates(db, query, max_distance=max_distance, exclude_owner_id=3, limit=5) == \
+            _brute_force(stored, probes, max_distance, exclude_owner_id=3, limit=5)
+
+
+def test_worst_case_spread_at_the_threshold_is_found(db):
+    """Flips dealt evenly over the bands leave no band exact; the match must
+    still come back through a band within max_distance // BANDS."""
+    rng = random.Random("worst-case")
+    for listing_id in range(1, 41):
+        original = rng.getrandbits(64)
+        max_distance = rng.randint(0, 12)
+        copy = _flip(original, _spread(rng, max_distance))
+        index_listing_images(db, SimpleNamespace(id=listing_id, owner_id=1, image_hashes=[_hex(copy)]))
+        db.commit()
+
+        assert (listing_id, max_distance) in find_near_duplicates(db, [_hex(original)], max_distance=max_distance)
+        assert (listing_id, max_distance) not in find_near_duplicates(db, [_hex(original)], max_distance=max_distance - 1)
@@ -0,0 +1,206 @@
+"""
+Keyset cursor pagination of the listing feed (app/crud/crud_listing.py,
+app/utils/pagination.py).
+
+Runs against in-memory sqlite, which supports the row-value comparison the
+cursor filter compiles to.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine
+
+from app.crud import crud_listing
+from app.models.listing import Listing
+from app.models.user import User
+from app.utils.pagination import InvalidCursor, cursor_datetime, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    User.__table__.create(engine)
+    Listing.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def feed(db):
+    """Listings spread over owners of different rank, with tied sort keys."""
+    owners = [
+        User(email="trusted@example.com", phone="1", hashed_password="x", trust_score=500, is_verified=True),
+        User(email="unverified@example.com", phone="2", hashed_password="x", trust_score=500, is_verified=False),
+        User(email="new@example.com", phone="3", hashed_password="x", trust_score=100),
+        User(email="suspended@example.com", phone="4", hashed_password="x", trust_score=900, is_suspended=True),
+    ]
+    db.add_all(owners)
+    db.commit()
+
+    base = datetime(2026, 1, 1)
+    for i in range(14):
+        owner = owners[i % 4]
+        db.add(Listing(
+            title_en=f"Listing {i}",
+            description_en="",
+            price=10,
+            location="Nairobi",
+            condition="New",
+            category_id=1,
+            status="active",
+            owner_id=owner.id,
+            owner_trust_score=owner.trust_score,
+            owner_is_verified=owner.is_verified,
+            boost_level=1 if i % 5 == 0 else 0,
+            # Pairs share a timestamp, so only the id tie-breaker orders them
+            created_at=base + timedelta(hours=i // 2),
+        ))
+    db.commit()
+    return owners
+
+
+def _all_pages(db, limit):
+    pages, cursor = [], None
+    while True:
+        page = crud_listing.get_listings(db, limit=limit, cursor=cursor or "")
+        pages.append([l.id for l in page])
+        if len(page) < limit:
+            return pages
+        cursor = crud_listing.listing_feed_cursor(page[-1])
+
+
+def test_cursor_round_trip():
+    created = datetime(2026, 3, 4, 5, 6, 7, 890)
+    token = encode_cursor({"b": 2, "c": created, "i": 17})
+    values = decode_cursor(token)
+    assert values["b"] == 2 and values["i"] == 17
+    assert cursor_datetime(values["c"]) == created
+    assert "=" not in token
+
+
+@pytest.mark.parametrize("token", ["not a cursor", "W10", "e30x"])
+def test_malformed_cursor_rejected(token):
+    with pytest.raises(InvalidCursor):
+        values = decode_cursor(token)
+        cursor_datetime(values.get("c"))
+
+
+def test_feed_pages_match_the_unpaged_order(db, feed):
+    full = [l.id for l in crud_listing.get_listings(db, limit=100)]
+    pages = _all_pages(db, limit=4)
+
+    flattened = [listing_id for page in pages for listing_id in page]
+    assert flattened == full
+    assert len(set(flattened)) == len(flattened)
+
+
+def test_feed_order_ranks_boost_then_owner_trust(db, feed):
+    listings = crud_listing.get_listings(db, limit=100)
+    keys = [
+        (l.boost_level, l.owner.trust_score, l.created_at, l.owner.is_verified, l.id)
+        for l in listings
+    ]
+    assert keys == sorted(keys, reverse=True)
+    assert all(not l.owner.is_suspended for l in listings)
+
+
+def test_cursor_survives_inserts_ahead_of_it(db, feed):
+    first = crud_listing.get_listings(db, limit=5, cursor="")
+    cursor = crud_listing.listing_feed_cursor(first[-1])
+    # A new boosted listing sorts at the very top; OFFSET paging would
+    # shift everything down one and repeat a row on the next page
+    db.add(Listing(
+        title_en="Late arrival", description_en="", price=1, location="Nairobi", condition="New",
+        category_id=1, status="active", owner_id=feed[0].id, boost_level=3,
+        owner_trust_score=feed[0].trust_score, owner_is_verified=feed[0].is_verified,
+    ))
+    db.commit()
+
+    second = crud_listing.get_listings(db, limit=5, cursor=cursor)
+    assert not {l.id for l in first} & {l.id for l in second}
+
+
+def test_owner_rank_changes_reach_the_feed_order(db, feed):
+    new_owner = feed[2]
+    new_owner.trust_score, new_owner.is_verified = 950, True
+    db.add(new_owner)
+    crud_listing.sync_owner_ranking(db, new_owner)
+    db.commit()
+
+    listings = crud_listing.get_listings(db, limit=100)
+    assert all(
+        (l.owner_trust_score, l.owner_is_verified) == (l.owner.trust_score, l.owner.is_verified)
+        for l in listings
+    )
+    unboosted = [l for l in listings if not l.boost_level]
+    assert unboosted[0].owner_id == new_owner.id
+
+
+def test_new_listing_copies_its_owners_rank(db, feed):
+    from app.models.listing import ListingBase
+    listing = crud_listing.create_listing(
+        db,
+        listing_in=ListingBase(title_en="Fresh", description_en="", price=5, location="Nairobi", condition="New", category_id=1),
+        owner_id=feed[0].id,
+    )
+    assert (listing.owner_trust_score, listing.owner_is_verified) == (500, True)
+
+
+def test_feed_rejects_cursor_without_sort_keys(db, feed):
+    with pytest.raises(InvalidCursor):
+        crud_listing.get_listings(db, limit=5, cursor=encode_cursor({"i": 3}))
+
+
+# ---------------------------------------------------------------------------
+# Search (app/services/search_service.py, /search/listings/search)
+# ---------------------------------------------------------------------------
+
+def test_search_cursor_is_distinct_from_feed_cursor(db, feed):
+    listing = crud_listing.get_listings(db, limit=1)[0]
+    assert decode_cursor(crud_listing.listing_feed_cursor(listing, search="phone")) == {"s": 1, "i": listing.id}
+    assert "s" not in decode_cursor(crud_listing.listing_feed_cursor(listing))
+
+
+def test_search_rejects_a_feed_cursor(db, feed):
+    from app.services.search_service import search_keyset_filter
+
+    listing = crud_listing.get_listings(db, limit=1)[0]
+    with pytest.raises(InvalidCursor):
+        search_keyset_filter("phone", crud_listing.listing_feed_cursor(listing))
+    with pytest.raises(InvalidCursor):
+        search_keyset_filter("phone", encode_cursor({"s": 1}))
+
+
+def test_search_cursor_compares_against_the_rescored_cursor_row():
+    from sqlalchemy.dialects import postgresql
+    from app.services.search_service import search_statement
+
+    sql = str(search_statement("phone", cursor=encode_cursor({"s": 1, "i": 42})).compile(dialect=postgresql.dialect()))
+    # (score, id) < (score of listing 42, 42), ordered by the same pair
+    assert "cursor_listing.id =" in sql
+    assert "ORDER BY" in sql and sql.rstrip().endswith("listing.id DESC")
+
+
+def test_search_browse_pages_by_listing_columns(db, feed):
+    from sqlmodel import select
+    from app.api.api_v1.endpoints.search import _search_keyset_filter
+
+    browse = select(Listing).where(Listing.status == "active").order_by(
+        Listing.boost_level.desc(), Listing.created_at.desc(), Listing.id.desc()
+    )
+    full = [l.id for l in db.exec(browse).all()]
+
+    seen, cursor = [], None
+    while True:
+        statement = browse.limit(4)
+        if cursor:
+            statement = statement.where(_search_keyset_filter(cursor))
+        page = db.exec(statement).all()
+        seen += [l.id for l in page]
+        if len(page) < 4:
+            break
+        last = page[-1]
+        cursor = encode_cursor({"b": last.boost_level or 0, "c": last.created_at, "i": last.id})
+    assert seen == full
@@ -0,0 +1,84 @@
+"""
+Rider ping coalescing in the live delivery store
+(services/live_location_service.py): at most one WebSocket push per
+delivery per LIVE_LOCATION_PUSH_INTERVAL_SECONDS, one trailing push for
+pings inside the window, and breadcrumbs only once the rider has moved.
+
+Runs against fakeredis.
+"""
+
+import time
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.cache_service import cache
+from services.live_location_service import LiveDeliveryStore
+
+WINDOW = 0.2
+NAIROBI = (-1.2921, 36.8219)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(cache, "_client", fakeredis.FakeRedis(decode_responses=True))
+    monkeypatch.setattr(settings, "LIVE_LOCATION_PUSH_INTERVAL_SECONDS", WINDOW)
+    store = LiveDeliveryStore()
+    store.accept("o1", "7", "Rider", "+254700000000")
+    return store
+
+
+def test_pings_inside_the_window_coalesce_into_one_trailing_push(store):
+    lat, lng = NAIROBI
+
+    first = store.record_ping("o1", "7", lat, lng)
+    assert first["push"] is True and first["trailing_in"] is None
+    assert first["status"] == "accepted"
+
+    second = store.record_ping("o1", "7", lat + 0.001, lng)
+    assert second["push"] is False
+    assert 0 < second["trailing_in"] <= WINDOW
+
+    # Already scheduled by the second ping
+    third = store.record_ping("o1", "7", lat + 0.002, lng)
+    assert third["push"] is False and third["trailing_in"] is None
+
+    time.sleep(second["trailing_in"] + 0.05)
+    state = store.claim_trailing_push("o1")
+    assert state["current_location"]["latitude"] == pytest.approx(lat + 0.002)
+
+    # The trailing push took the next window
+    assert store.record_ping("o1", "7", lat + 0.003, lng)["push"] is False
+
+
+def test_trailing_push_yields_to_a_newer_ping(store):
+    lat, lng = NAIROBI
+    store.record_ping("o1", "7", lat, lng)
+    trailing_in = store.record_ping("o1", "7", lat + 0.001, lng)["trailing_in"]
+
+    time.sleep(trailing_in + 0.05)
+    assert store.record_ping("o1", "7", lat + 0.002, lng)["push"] is True
+    assert store.claim_trailing_push("o1") is None
+
+
+def test_breadcrumbs_only_once_the_rider_moves(store):
+    lat, lng = NAIROBI
+    store.record_ping("o1", "7", lat, lng)
+    store.record_ping("o1", "7", lat + 0.0001, lng)  # ~11 m
+    store.record_ping("o1", "7", lat + 0.0005, lng)  # ~55 m from the last breadcrumb
+
+    assert [p["latitude"] for p in store.trail("o1")] == pytest.approx([lat, lat + 0.0005])
+    assert store.get("o1")["current_location"]["latitude"] == pytest.approx(lat + 0.0005)
+
+
+def test_pings_for_unknown_or_other_riders_deliveries_are_refused(store):
+    with pytest.raises(HTTPException) as exc:
+        store.record_ping("missing", "7", *NAIROBI)
+    assert exc.value.status_code == 404
+
+    with pytest.raises(HTTPException) as exc:
+        store.record_ping("o1", "8", *NAIROBI)
+    assert exc.value.status_code == 403
+    assert store.get("o1")["current_location"] is None
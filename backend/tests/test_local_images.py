@@ -0,0 +1,74 @@
+"""
+Listing photos on local storage (app/services/storage_service.py): the
+upload writes the original untouched, and once the image pipeline has
+rendered it the same URL serves the resized "full" WebP.
+"""
+
+import asyncio
+import io
+
+import fakeredis
+import pytest
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from app.core.config import settings
+from app.services.cache_service import cache
+from app.services.image_pipeline import image_pipeline
+from app.services.storage_service import LocalImageFiles, LocalStorage
+
+PREFIX = "/api/v1/listings/images"
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "_client", fakeredis.FakeRedis(decode_responses=True))
+    return tmp_path
+
+
+@pytest.fixture
+def client(upload_dir):
+    app = Starlette()
+    app.mount(PREFIX, LocalImageFiles(directory=str(upload_dir)))
+    return TestClient(app)
+
+
+def _photo(size=(3000, 2000)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, "red").save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _served(response):
+    return response.headers["content-type"], Image.open(io.BytesIO(response.content)).size
+
+
+def test_deferred_upload_stores_the_original(upload_dir):
+    content = _photo()
+    url, phash = asyncio.run(LocalStorage().upload_file(content, "a.jpg", defer_processing=True))
+
+    assert url.startswith(PREFIX) and url.endswith(".jpg")
+    assert phash == ""
+    assert (upload_dir / url.rsplit("/", 1)[-1]).read_bytes() == content
+
+
+def test_original_url_serves_the_full_rendition_once_rendered(upload_dir, client):
+    content = _photo()
+    url, _ = asyncio.run(LocalStorage().upload_file(content, "a.jpg", defer_processing=True))
+    assert _served(client.get(url)) == ("image/jpeg", (3000, 2000))
+
+    result = image_pipeline.process_sync(url, content)
+
+    assert _served(client.get(url)) == ("image/webp", (1200, 800))
+    assert _served(client.get(result["variants"]["thumb"]["webp"])) == ("image/webp", (200, 133))
+    # The original is kept for reprocessing
+    assert (upload_dir / url.rsplit("/", 1)[-1]).read_bytes() == content
+
+
+def test_files_without_a_rendition_are_served_as_stored(upload_dir, client):
+    (upload_dir / "banner.gif").write_bytes(b"GIF89a")
+    response = client.get(f"{PREFIX}/banner.gif")
+    assert response.status_code == 200 and response.content == b"GIF89a"
+    assert client.get(f"{PREFIX}/missing.jpg").status_code == 404
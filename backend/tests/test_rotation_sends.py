@@ -0,0 +1,100 @@
+"""
+Send recording in the promotional rotation run
+(app/tasks/email_tasks.py run_promotional_rotation_task): each send is
+logged to CampaignSendLog as soon as it goes out, so a run that dies
+part-way still leaves everyone already emailed under their cooldown.
+
+The campaign selection is stubbed; the run's own loop, sessions and
+commits go against in-memory sqlite.
+"""
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine, func, select
+
+import app.db.session
+from app.models.campaign_send_log import CampaignSendLog
+from app.models.user import User
+from app.services import rotation_engine
+from app.services.email_service import email_service
+from app.tasks.email_tasks import run_promotional_rotation_task
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    User.__table__.create(engine)
+    CampaignSendLog.__table__.create(engine)
+    with Session(engine) as db:
+        db.add_all([
+            User(email=f"user{i}@example.com", phone=str(i), hashed_password="x", full_name=f"User {i}")
+            for i in range(3)
+        ])
+        db.add(User(email="system@suqafuran.local", phone="99", hashed_password="x"))
+        db.commit()
+
+    monkeypatch.setattr(app.db.session, "engine", engine)
+    monkeypatch.setattr(rotation_engine, "load_batch", lambda db, users: None)
+    monkeypatch.setattr(email_service, "last_log_id", lambda: None)
+    return engine
+
+
+def _logged(engine) -> int:
+    with Session(engine) as db:
+        return db.exec(select(func.count()).select_from(CampaignSendLog)).one()
+
+
+def _select(send_fn):
+    def select_campaigns_for_user(db, user, batch):
+        return [rotation_engine.SelectedCampaign("weekly_digest", "Your week", {"category_id": None}, send_fn)]
+    return select_campaigns_for_user
+
+
+def test_each_send_is_committed_before_the_next(engine, monkeypatch):
+    logged_before_send = []
+
+    def send(email, name, subject, content):
+        # Read through a separate session: only committed rows are visible
+        logged_before_send.append(_logged(engine))
+        return True
+
+    monkeypatch.setattr(rotation_engine, "select_campaigns_for_user", _select(send))
+    result = run_promotional_rotation_task()
+
+    assert result == {"users_evaluated": 3, "emails_sent": 3}
+    assert logged_before_send == [0, 1, 2]
+    assert _logged(engine) == 3
+
+
+def test_failed_send_is_not_recorded(engine, monkeypatch):
+    def send(email, name, subject, content):
+        if email == "user1@example.com":
+            raise RuntimeError("provider down")
+        return True
+
+    monkeypatch.setattr(rotation_engine, "select_campaigns_for_user", _select(send))
+    result = run_promotional_rotation_task()
+
+    assert result["emails_sent"] == 2
+    with Session(engine) as db:
+        recipients = db.exec(select(CampaignSendLog.user_id).order_by(CampaignSendLog.user_id)).all()
+    assert recipients == [1, 3]
+
+
+def test_recording_failure_does_not_stop_the_run(engine, monkeypatch):
+    real_record_send = rotation_engine.record_send
+
+    def record_send(db, user_id, selected, email_log_id):
+        if user_id == 1:
+            db.add(CampaignSendLog(user_id=user_id, campaign_type=None, subject_variant=selected.subject))
+            db.commit()  # NOT NULL violation -> IntegrityError, session needs a rollback
+        real_record_send(db, user_id, selected, email_log_id)
+
+    monkeypatch.setattr(rotation_engine, "select_campaigns_for_user", _select(lambda *args: True))
+    monkeypatch.setattr(rotation_engine, "record_send", record_send)
+    result = run_promotional_rotation_task()
+
+    assert result["emails_sent"] == 3
+    with Session(engine) as db:
+        recipients = db.exec(select(CampaignSendLog.user_id).order_by(CampaignSendLog.user_id)).all()
+    assert recipients == [2, 3]
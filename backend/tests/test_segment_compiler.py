@@ -0,0 +1,124 @@
+"""
+Segment criteria compiled to SQL (app/services/segmentation_service.py),
+run against in-memory sqlite.
+"""
+
+import json
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine, select
+
+from app.models.customer_segment import CustomerSegment
+from app.models.listing import Listing
+from app.models.user import User
+from app.services.segmentation_service import SegmentationService, segmentation_service
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    for model in (User, Listing, CustomerSegment):
+        model.__table__.create(engine)
+    with Session(engine) as session:
+        session.add_all([
+            User(email="seller@example.com", phone="1", hashed_password="x", trust_score=600,
+                 verified_level="tier2", email_verified=True, location="Nairobi"),
+            User(email="buyer@example.com", phone="2", hashed_password="x", trust_score=50,
+                 location="Mogadishu"),
+            User(email="gone@example.com", phone="3", hashed_password="x", trust_score=900, is_active=False),
+        ])
+        session.commit()
+        session.add(Listing(
+            title_en="Phone", description_en="", price=1, location="Nairobi", condition="New",
+            category_id=1, owner_id=1, approval_status="approved",
+        ))
+        session.commit()
+        yield session
+
+
+def _matching(db, rules, operator="and"):
+    clause = SegmentationService.compile_criteria({"operator": operator, "rules": rules})
+    return sorted(u.email for u in db.exec(select(User).where(clause)).all())
+
+
+def _segment(db, rules) -> CustomerSegment:
+    segment = CustomerSegment(name="s", criteria=json.dumps({"operator": "and", "rules": rules}))
+    db.add(segment)
+    db.commit()
+    return segment
+
+
+def test_no_rules_matches_everyone(db):
+    assert len(_matching(db, [])) == 3
+
+
+def test_derived_is_seller_field(db):
+    assert _matching(db, [{"field": "is_seller", "operator": "equals", "value": True}]) == ["seller@example.com"]
+    assert _matching(db, [{"field": "is_seller", "operator": "equals", "value": False}]) == [
+        "buyer@example.com", "gone@example.com",
+    ]
+
+
+def test_nested_groups(db):
+    rules = [
+        {"field": "is_active", "operator": "equals", "value": True},
+        {"operator": "or", "rules": [
+            {"field": "location", "operator": "contains", "value": "mogad"},
+            {"field": "trust_score", "operator": "greater_equal", "value": 600},
+        ]},
+    ]
+    assert _matching(db, rules) == ["buyer@example.com", "seller@example.com"]
+
+
+@pytest.mark.parametrize("rule, expected", [
+    ({"field": "trust_score", "operator": "greater_than", "value": "500"}, ["gone@example.com", "seller@example.com"]),
+    ({"field": "email_verified", "operator": "equals", "value": "true"}, ["seller@example.com"]),
+    ({"field": "is_active", "operator": "equals", "value": 0}, ["gone@example.com"]),
+    ({"field": "verified_level", "operator": "in", "value": ["tier2", "tier3"]}, ["seller@example.com"]),
+    ({"field": "created_at", "operator": "greater_than", "value": "2000-01-01T00:00:00Z"},
+     ["buyer@example.com", "gone@example.com", "seller@example.com"]),
+])
+def test_values_coerced_to_column_type(db, rule, expected):
+    assert _matching(db, [rule]) == expected
+
+
+@pytest.mark.parametrize("rule", [
+    {"field": "trust_score", "operator": "greater_than", "value": "lots"},
+    {"field": "trust_score", "operator": "equals", "value": True},
+    {"field": "is_active", "operator": "equals", "value": "maybe"},
+    {"field": "verified_level", "operator": "equals", "value": "platinum"},
+    {"field": "created_at", "operator": "less_than", "value": "yesterday"},
+    {"field": "hashed_password", "operator": "equals", "value": "x"},
+    {"field": "no_such_field", "operator": "equals", "value": 1},
+    {"field": "trust_score", "operator": "between", "value": [1, 2]},
+])
+def test_invalid_rules_match_nothing(db, rule):
+    assert _matching(db, [rule]) == []
+    # ...without poisoning the rest of an OR
+    assert _matching(db, [rule, {"field": "email", "operator": "equals", "value": "buyer@example.com"}], operator="or") == [
+        "buyer@example.com",
+    ]
+
+
+def test_members_and_count_exclude_inactive_users(db):
+    segment = _segment(db, [{"field": "trust_score", "operator": "greater_than", "value": 10}])
+    members, total = segmentation_service.get_segment_members(db, segment, limit=1)
+    assert [m.email for m in members] == ["seller@example.com"]
+    assert total == 2
+    assert segmentation_service.update_segment_member_count(db, segment) == 2
+    assert db.get(CustomerSegment, segment.id).member_count == 2
+
+
+def test_failed_queries_roll_back(db, monkeypatch):
+    segment = _segment(db, [{"field": "is_seller", "operator": "equals", "value": True}])
+    rollbacks = []
+    real_rollback = db.rollback
+    monkeypatch.setattr(db, "rollback", lambda: (rollbacks.append(1), real_rollback()))
+    Listing.__table__.drop(db.get_bind())
+
+    assert segmentation_service.get_segment_members(db, segment) == ([], 0)
+    assert segmentation_service.update_segment_member_count(db, segment) == 0
+    assert len(rollbacks) == 2
+    # The session is still usable afterwards
+    assert db.exec(select(User.id).where(User.id == 1)).one() == 1
@@ -0,0 +1,65 @@
+"""
+Pending view counts (app/services/view_counter_service.py): a :flushing
+hash counts until its batch marker commits, and not after.
+
+Runs against in-memory sqlite and fakeredis.
+"""
+
+from datetime import datetime
+
+import fakeredis
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine
+
+from app.models.view_flush import ViewFlushBatch
+from app.services.cache_service import cache
+from app.services.view_counter_service import (
+    BATCH_SUFFIX,
+    FLUSHING_SUFFIX,
+    LISTING_VIEWS_KEY,
+    pending_listing_views,
+)
+
+FLUSHING = LISTING_VIEWS_KEY + FLUSHING_SUFFIX
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    ViewFlushBatch.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "_client", client)
+    return client
+
+
+def test_pending_adds_the_batch_being_flushed(db, redis):
+    redis.hset(LISTING_VIEWS_KEY, mapping={1: 2})
+    redis.hset(FLUSHING, mapping={1: 5, 2: 3})
+    redis.set(FLUSHING + BATCH_SUFFIX, "b1")
+
+    assert pending_listing_views(db, [1, 2, 3]) == {1: 7, 2: 3}
+
+
+def test_pending_skips_a_batch_already_committed(db, redis):
+    redis.hset(LISTING_VIEWS_KEY, mapping={1: 2})
+    redis.hset(FLUSHING, mapping={1: 5, 2: 3})
+    redis.set(FLUSHING + BATCH_SUFFIX, "b1")
+    db.add(ViewFlushBatch(id=f"{FLUSHING}:b1", flushed_at=datetime.utcnow()))
+    db.commit()
+
+    assert pending_listing_views(db, [1, 2, 3]) == {1: 2}
+
+
+def test_pending_counts_a_batch_that_died_before_getting_an_id(db, redis):
+    redis.hset(FLUSHING, mapping={1: 5})
+    db.add(ViewFlushBatch(id=f"{FLUSHING}:old", flushed_at=datetime.utcnow()))
+    db.commit()
+
+    assert pending_listing_views(db, [1]) == {1: 5}
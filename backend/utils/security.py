@@ -7,7 +7,7 @@ import jwt
 
 from config import settings
 from database import get_db
-from models import User
+from models import Seller, User
 from passlib.context import CryptContext
 
 security = HTTPBearer()
@@ -43,3 +43,12 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
+
+def require_admin_or_seller(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Admins, or users with an active seller account -- the people who dispatch deliveries"""
+    if current_user.is_admin:
+        return current_user
+    seller = db.query(Seller.id).filter(Seller.user_id == str(current_user.id), Seller.is_active == True).first()
+    if seller is None:
+        raise HTTPException(status_code=403, detail="Admin or seller access required")
+    return current_user